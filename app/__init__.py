@@ -1,3 +1,4 @@
+import logging
 import os
 from flask import Flask
 from .modulos.formatacao import formatar_moeda, formatar_percentual
@@ -7,6 +8,15 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    # Logs da aplicação (níveis por módulo, fila de escrita e campos da requisição)
+    from .modulos.log_aplicacao import instalar_logs
+    instalar_logs(app)
+    log = logging.getLogger(__name__)
+    if Config.DATABASE_TYPE == 'postgresql':
+        log.info("🚀 Usando PostgreSQL (Servidor)")
+    else:
+        log.info("💻 Usando SQLite (Local - 3 bancos)")
+
     # Registra os filtros de template
     app.jinja_env.filters['formatar_moeda'] = formatar_moeda
     app.jinja_env.filters['formatar_percentual'] = formatar_percentual
@@ -26,4 +36,19 @@ def create_app():
     app.register_blueprint(rreo_bp, url_prefix='/rreo')
     # --- FIM DA CORREÇÃO ---
 
+    # Perfil das consultas por requisição (visualizador/perfil)
+    from .modulos.perfil_consultas import instalar_perfil
+    instalar_perfil(app)
+
+    # Compila uma vez, para o dialeto em uso, as consultas registradas pelos relatórios
+    from .modulos.consultas import precompilar_consultas
+    precompilar_consultas()
+
+    # Modo leitura do SQLite: confere na inicialização se os bancos batem com a versão dos conversores
+    from .modulos.conexao_hibrida import get_db_environment, sqlite_modo_leitura, verificar_versao_dados
+    if get_db_environment() == 'sqlite' and sqlite_modo_leitura():
+        estados = verificar_versao_dados()
+        confirmados = sum(1 for estado in estados.values() if estado == 'ok')
+        log.info("📚 SQLite em modo leitura: %d/%d bancos com versão confirmada.", confirmados, len(estados))
+
     return app
\ No newline at end of file
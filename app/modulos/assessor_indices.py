@@ -0,0 +1,510 @@
+# app/modulos/assessor_indices.py
+"""
+Assessor de índices guiado pela carga de trabalho.
+Reproduz as consultas registradas (todas as variantes) e as rotas de relatório e de
+detalhamento de lançamentos sobre os dados atuais, gravando o SQL pelo perfil de
+consultas. Para cada consulta lê o plano e os predicados sobre as tabelas de fatos e
+propõe índices compostos: igualdades primeiro e depois a primeira faixa; de cobertura
+quando as demais colunas usadas cabem no índice; no PostgreSQL, parciais com os
+predicados constantes da consulta. O conjunto recomendado é o que os conversores criam.
+"""
+
+import hashlib
+import math
+import re
+import time
+
+from .conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from .consultas import _REGISTRO, consultar_df, dialeto_atual, obter_consulta, variante_filtro
+from .catalogo_dados import ultimo_periodo
+from .cubo_receita import variante_origem_receita
+from .indices_recomendados import TABELAS_FATO
+from .perfil_consultas import gravar_consultas, normalizar_sql, _rotulos
+from .regras_contabeis_receita import FILTROS_RELATORIO_ESPECIAIS
+from .regras_mascara import tem_mascara_regras
+
+_MAX_COLUNAS_CHAVE = 4
+_MAX_COLUNAS_COBERTURA = 6
+
+_RE_TABELA = re.compile(
+    r"\b(?:FROM|JOIN)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(?!(?:WHERE|ON|JOIN|LEFT|RIGHT|INNER|CROSS|GROUP|ORDER|LIMIT|UNION)\b)(\w+))?",
+    re.I)
+_RE_FIM_WHERE = re.compile(r"\b(?:GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION|WINDOW)\b", re.I)
+_RE_BETWEEN = re.compile(r"(\bBETWEEN\s+\S+?\s+)AND\b", re.I)
+_RE_AND = re.compile(r"\bAND\b", re.I)
+_RE_PREDICADO = re.compile(
+    r"^\(?\s*(?:CAST\(\s*)?(?:(\w+)\.)?(\w+)(?:\s+AS\s+\w+\s*\))?(?:::\w+)?\s*(=|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b)",
+    re.I)
+_RE_MARCADOR = re.compile(r"\?|%s")
+_RE_INDICE_USADO = re.compile(r"USING (?:COVERING )?INDEX (\w+)|(?:Index Only Scan|Index Scan) using (\w+)|Bitmap Index Scan on (\w+)")
+
+
+# --- CARGA DE TRABALHO ---
+
+def _periodo_e_exemplos(conn):
+    """Último (ano, mês) carregado, a UG com mais saldos e um lançamento para os detalhamentos."""
+    d = dialeto_atual()
+    cursor = conn.cursor()
+    try:
+        ano, mes = ultimo_periodo()
+        cursor.execute(adaptar_query(f"""
+            SELECT coug FROM fato_saldos WHERE {d.int('coexercicio')} = ?
+            GROUP BY coug ORDER BY COUNT(*) DESC LIMIT 1"""), (ano,))
+        coug = str(cursor.fetchone()[0])
+        cursor.execute(adaptar_query(f"""
+            SELECT categoriareceita, cofontereceita, cosubfontereceita, coalinea, cofonte
+            FROM lancamentos_db.lancamentos
+            WHERE {d.int('coexercicio')} = ? AND {d.txt('coug')} = ? AND coalinea IS NOT NULL LIMIT 1"""), (ano, coug))
+        lancamento = cursor.fetchone()
+    finally:
+        cursor.close()
+    return ano, mes, coug, (tuple(lancamento) if lancamento else None)
+
+
+def _urls_carga(ano, mes, coug, lancamento):
+    bimestre = math.ceil(mes / 2)
+    urls = [
+        '/relatorios/balanco-orcamentario-receita',
+        f'/relatorios/balanco-orcamentario-receita?coug={coug}',
+        f'/relatorios/balanco-orcamentario-receita?coug={coug}&filtro=tributarias',
+        f'/relatorios/api/relatorio-receita-fonte?tipo=receita&ano={ano}&mes={mes}',
+        f'/relatorios/api/relatorio-receita-fonte?tipo=fonte&ano={ano}&mes={mes}&coug={coug}',
+        f'/rreo/anexo2?ano={ano}&bimestre={bimestre}',
+        f'/rreo/intra?ano={ano}&bimestre={bimestre}',
+        f'/rreo/despesa-funcional?ano={ano}&bimestre={bimestre}',
+        f'/rreo/despesa-funcional-intra?ano={ano}&bimestre={bimestre}',
+        f'/inconsistencias/relatorio?exercicio={ano}',
+    ]
+    if lancamento:
+        categoria, origem, especie, alinea, fonte = lancamento
+        urls += [
+            f'/relatorios/api/lancamentos/{fase}?origem=balanco&ano={ano}&mes={mes}&coug={coug}&cat_id={categoria}'
+            f'&fonte_id={origem}&subfonte_id={especie}&alinea_id={alinea}'
+            for fase in ('resumo', 'pagina')
+        ]
+        urls += [
+            f'/relatorios/api/lancamentos/{fase}?origem=receita_fonte&ano={ano}&mes={mes}&coug={coug}'
+            f'&coalinea={alinea}&cofonte={fonte}'
+            for fase in ('resumo', 'pagina')
+        ]
+    return urls
+
+
+# Filtradas pelos códigos de um lançamento real: executadas pelas URLs do drill-down em _urls_carga
+_REPRODUZIDAS_PELAS_URLS = {'lancamentos_pagina', 'lancamentos_resumo'}
+
+
+def _parametros_exemplo(ordem, variante, ano, mes, coug):
+    bimestre = math.ceil(mes / 2)
+    params = {
+        'ano': ano, 'ano_anterior': ano - 1, 'mes': mes, 'coug': coug,
+        'ate_ini': 1, 'ate_fim': mes, 'bim_ini': bimestre * 2 - 1, 'bim_fim': bimestre * 2,
+        'fonte_ini': '1', 'fonte_fim': '9', 'categoria': '3', 'ano_inicial': ano - 1,
+    }
+    # Valores de um filtro especial que corresponda à variante
+    for chave in FILTROS_RELATORIO_ESPECIAIS:
+        opcoes, valores = variante_filtro(chave)
+        if opcoes['campo_filtro'] == variante.get('campo_filtro') and opcoes['n_filtro'] == variante.get('n_filtro'):
+            params.update(valores)
+            break
+    return {nome: params[nome] for nome in ordem}
+
+
+def _reproduzir_registradas(ano, mes, coug):
+    """Executa cada variante de cada consulta registrada; as inaplicáveis aos dados atuais são puladas."""
+    for nome, registro in _REGISTRO.items():
+        if nome in _REPRODUZIDAS_PELAS_URLS:
+            continue
+        for variante in registro['variantes']:
+            consulta = obter_consulta(nome, **variante)
+            despesa = 'fato_saldo_despesa' in consulta.sql
+            try:
+                with ConexaoBanco('saldos_despesa' if despesa else 'saldos') as conn:
+                    # Só as variantes que a aplicação usa com os dados atuais (cubo e máscara)
+                    if 'cubo' in variante:
+                        em_uso = variante_origem_receita()
+                    else:
+                        em_uso = {'mascara': tem_mascara_regras('fato_saldo_despesa' if despesa else 'fato_saldos')}
+                    if any(variante.get(opcao, valor) != valor for opcao, valor in em_uso.items()):
+                        continue
+                    consultar_df(conn, nome, _parametros_exemplo(consulta.ordem, variante, ano, mes, coug), **variante)
+            except Exception as e:
+                print(f"   ⚠️ {nome} {variante}: {e}")
+
+
+def reproduzir_carga(app):
+    """
+    Reproduz a carga de trabalho e devolve as consultas distintas executadas:
+    [{'banco', 'sql', 'parametros', 'rotulo'}].
+    """
+    with ConexaoBanco() as conn:
+        ano, mes, coug, lancamento = _periodo_e_exemplos(conn)
+    print(f"   Período {mes:02d}/{ano}, UG {coug}")
+
+    cliente = app.test_client()
+    with gravar_consultas() as gravadas:
+        _reproduzir_registradas(ano, mes, coug)
+        for url in _urls_carga(ano, mes, coug, lancamento):
+            resposta = cliente.get(url)
+            if resposta.status_code != 200:
+                print(f"   ⚠️ {url}: HTTP {resposta.status_code}")
+
+    distintas = {}
+    for banco, sql, params in gravadas:
+        if not re.match(r"\s*(?:WITH|SELECT)\b", sql, re.I) or 'sqlite_master' in sql:
+            continue
+        distintas.setdefault((banco, normalizar_sql(sql)), {
+            'banco': banco, 'sql': sql, 'parametros': params,
+            'rotulo': _rotulos.get(sql) or normalizar_sql(sql)[:70],
+        })
+    return list(distintas.values())
+
+
+# --- PLANOS E PREDICADOS ---
+
+def plano(conn, sql, params) -> str:
+    cursor = conn.cursor()
+    try:
+        if get_db_environment() == 'postgres':
+            cursor.execute("EXPLAIN " + sql, params or None)
+            return '\n'.join(linha[0] for linha in cursor.fetchall())
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params or ())
+        return '\n'.join(linha[3] for linha in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def indices_usados(texto_plano: str) -> set:
+    return {next(nome for nome in grupos if nome) for grupos in _RE_INDICE_USADO.findall(texto_plano)}
+
+
+def medir(conn, sql, params, repeticoes=3) -> float:
+    """Menor tempo (ms) de execução e leitura completa da consulta."""
+    melhor = None
+    for _ in range(repeticoes):
+        cursor = conn.cursor()
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(sql, params or ())
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        duracao = (time.perf_counter() - inicio) * 1000
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    return melhor
+
+
+def _clausulas_where(sql: str) -> list:
+    """Texto de cada WHERE do SQL (inclusive de subconsultas), até o fim do seu nível de parênteses."""
+    clausulas = []
+    for m in re.finditer(r"\bWHERE\b", sql, re.I):
+        profundidade, fim = 0, len(sql)
+        for i in range(m.end(), len(sql)):
+            if sql[i] == '(':
+                profundidade += 1
+            elif sql[i] == ')':
+                profundidade -= 1
+                if profundidade < 0:
+                    fim = i
+                    break
+            elif profundidade == 0 and _RE_FIM_WHERE.match(sql, i):
+                fim = i
+                break
+        clausulas.append(sql[m.end():fim])
+    return clausulas
+
+
+def _termos(clausula: str) -> list:
+    """Termos ligados por AND no nível externo (o AND do BETWEEN não separa termos)."""
+    texto = _RE_BETWEEN.sub(lambda m: m.group(1) + '\0', clausula)
+    termos, profundidade, inicio = [], 0, 0
+    i = 0
+    while i < len(texto):
+        if texto[i] == '(':
+            profundidade += 1
+        elif texto[i] == ')':
+            profundidade -= 1
+        elif profundidade == 0:
+            m = _RE_AND.match(texto, i)
+            if m and (i == 0 or not texto[i - 1].isalnum()):
+                termos.append(texto[inicio:i])
+                inicio = i = m.end()
+                continue
+        i += 1
+    termos.append(texto[inicio:])
+    return [termo.replace('\0', 'AND').strip() for termo in termos if termo.strip()]
+
+
+def _sem_parenteses(termo: str) -> str:
+    while termo.startswith('(') and termo.endswith(')'):
+        profundidade = 0
+        for i, c in enumerate(termo):
+            profundidade += (c == '(') - (c == ')')
+            if profundidade == 0 and i < len(termo) - 1:
+                return termo
+        termo = termo[1:-1].strip()
+    return termo
+
+
+def predicados(sql: str, tabela: str, colunas: set) -> dict:
+    """
+    Predicados da consulta sobre a tabela: colunas comparadas por igualdade e por faixa
+    com parâmetros, termos constantes (candidatos a índice parcial) e demais colunas usadas.
+    """
+    apelidos = {tabela}
+    for nome, apelido in _RE_TABELA.findall(sql):
+        if nome.lower() == tabela and apelido:
+            apelidos.add(apelido.lower())
+    unica = len({nome.lower() for nome, _ in _RE_TABELA.findall(sql)}) == 1
+
+    def da_tabela(apelido, coluna):
+        coluna = coluna.lower()
+        if coluna not in colunas:
+            return None
+        if apelido:
+            return coluna if apelido.lower() in apelidos else None
+        return coluna if unica else None
+
+    igualdades, faixas, constantes = [], [], []
+    for clausula in _clausulas_where(sql):
+        for termo in _termos(clausula):
+            termo = _sem_parenteses(termo)
+            if re.search(r"\b(?:OR|SELECT)\b", termo, re.I):
+                continue
+            m = _RE_PREDICADO.match(termo)
+            coluna = da_tabela(m.group(1), m.group(2)) if m else None
+            if coluna is None:
+                continue
+            if _RE_MARCADOR.search(termo):
+                destino = igualdades if m.group(3).upper() in ('=', 'IN') else faixas
+                if coluna not in destino:
+                    destino.append(coluna)
+            else:
+                constantes.append(re.sub(r"\b\w+\.(?=\w)", '', termo))
+
+    usadas = set()
+    for apelido, coluna in re.findall(r"\b(\w+)\.(\w+)\b", sql):
+        if da_tabela(apelido, coluna):
+            usadas.add(coluna.lower())
+    if unica:
+        usadas |= {palavra.lower() for palavra in re.findall(r"\b\w+\b", sql) if palavra.lower() in colunas}
+    return {'igualdades': igualdades, 'faixas': faixas, 'constantes': constantes, 'usadas': usadas}
+
+
+# --- PROPOSTAS ---
+
+def _nome_indice(tabela, colunas, incluidas, parcial):
+    partes = [re.sub(r'^(?:co|in)(?=[a-z]{2})', '', coluna) for coluna in colunas]
+    nome = f"idx_{TABELAS_FATO[tabela]}_{'_'.join(partes)}"
+    if incluidas:
+        nome += '_cob'
+    if parcial:
+        nome += '_p' + hashlib.md5(parcial.encode('utf-8')).hexdigest()[:6]
+    if len(nome) > 60:
+        nome = nome[:52] + '_' + hashlib.md5(nome.encode('utf-8')).hexdigest()[:7]
+    return nome
+
+
+def _colunas_tabela(conn, tabela) -> set:
+    cursor = conn.cursor()
+    try:
+        if get_db_environment() == 'postgres':
+            cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (tabela,))
+            return {linha[0].lower() for linha in cursor.fetchall()}
+        for esquema in _esquemas(conn):
+            cursor.execute(f"PRAGMA {esquema}.table_info({tabela})")
+            linhas = cursor.fetchall()
+            if linhas:
+                return {linha[1].lower() for linha in linhas}
+        return set()
+    finally:
+        cursor.close()
+
+
+def _esquemas(conn) -> dict:
+    """Esquemas anexados à conexão SQLite: nome -> arquivo."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("PRAGMA database_list")
+        return {linha[1]: linha[2] for linha in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def indices_existentes(conn, tabela) -> dict:
+    """nome -> lista de colunas dos índices da tabela."""
+    cursor = conn.cursor()
+    existentes = {}
+    try:
+        if get_db_environment() == 'postgres':
+            cursor.execute("""
+                SELECT i.relname, a.attname
+                FROM pg_index x
+                JOIN pg_class t ON t.oid = x.indrelid
+                JOIN pg_class i ON i.oid = x.indexrelid
+                JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ordem) ON TRUE
+                JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                WHERE t.relname = %s
+                ORDER BY i.relname, k.ordem
+            """, (tabela,))
+            for nome, coluna in cursor.fetchall():
+                existentes.setdefault(nome, []).append(coluna.lower())
+            return existentes
+        for esquema in _esquemas(conn):
+            cursor.execute(f"PRAGMA {esquema}.index_list({tabela})")
+            for nome in [linha[1] for linha in cursor.fetchall()]:
+                cursor.execute(f"PRAGMA {esquema}.index_info({nome})")
+                existentes[nome] = [linha[2].lower() for linha in cursor.fetchall() if linha[2]]
+        return existentes
+    finally:
+        cursor.close()
+
+
+def _distintos(conn, tabela, coluna, cache) -> int:
+    if (tabela, coluna) not in cache:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT COUNT(DISTINCT {coluna}) FROM {tabela}")
+            cache[(tabela, coluna)] = cursor.fetchone()[0] or 0
+        finally:
+            cursor.close()
+    return cache[(tabela, coluna)]
+
+
+def _chave(conn, tabela, p, distintos) -> list:
+    """
+    Colunas da chave: exercício na frente (os compostos da mesma tabela compartilham o
+    prefixo), depois as demais igualdades da mais seletiva para a menos e, no fim, a
+    primeira faixa. As igualdades menos seletivas saem quando a chave passa do limite.
+    """
+    faixa = p['faixas'][:1]
+    outras = sorted((coluna for coluna in p['igualdades'] if coluna != 'coexercicio'),
+                    key=lambda coluna: -_distintos(conn, tabela, coluna, distintos))
+    inicio = ['coexercicio'] if 'coexercicio' in p['igualdades'] else []
+    limite = _MAX_COLUNAS_CHAVE - len(inicio) - len(faixa)
+    return inicio + outras[:limite] + [coluna for coluna in faixa if coluna not in outras[:limite]]
+
+
+def _atendida(proposta, colunas_indice, incluidas_indice=()) -> bool:
+    """O índice tem a chave da proposta como prefixo e todas as colunas que ela cobre."""
+    todas = set(colunas_indice) | set(incluidas_indice)
+    return list(colunas_indice[:len(proposta['colunas'])]) == proposta['colunas'] \
+        and set(proposta['incluidas']) <= todas
+
+
+def propor_indices(consultas: list) -> dict:
+    """
+    Analisa as consultas gravadas e devolve, por tabela de fatos, as propostas
+    ({'nome', 'colunas', 'incluidas', 'parcial', 'consultas'}), os índices usados
+    nos planos e os existentes. Cada consulta ganha 'plano_antes'.
+    """
+    postgres = get_db_environment() == 'postgres'
+    resultado, distintos = {}, {}
+    for consulta in consultas:
+        with ConexaoBanco(consulta['banco'] or 'saldos') as conn:
+            try:
+                consulta['plano_antes'] = plano(conn, consulta['sql'], consulta['parametros'])
+            except Exception as e:
+                consulta['plano_antes'] = f"(plano indisponível: {e})"
+            for tabela in TABELAS_FATO:
+                if not re.search(rf"\b{tabela}\b", consulta['sql'], re.I):
+                    continue
+                if tabela not in resultado:
+                    resultado[tabela] = {
+                        'banco': consulta['banco'], 'colunas': _colunas_tabela(conn, tabela),
+                        'existentes': indices_existentes(conn, tabela), 'usados': set(), 'propostas': {},
+                    }
+                analise = resultado[tabela]
+                analise['usados'] |= indices_usados(consulta['plano_antes']) & set(analise['existentes'])
+
+                p = predicados(consulta['sql'], tabela, analise['colunas'])
+                chave = _chave(conn, tabela, p, distintos)
+                if not chave:
+                    continue
+                parcial = ' AND '.join(p['constantes']) if postgres else ''
+                # Uma proposta por chave: as consultas que a usam somam as colunas a cobrir
+                proposta = analise['propostas'].setdefault((tuple(chave), parcial), {
+                    'colunas': chave, 'cobrir': set(), 'parcial': parcial, 'consultas': [],
+                })
+                proposta['cobrir'] |= p['usadas'] - set(chave)
+                proposta['consultas'].append(consulta['rotulo'])
+
+    for tabela, analise in resultado.items():
+        propostas = []
+        for proposta in analise['propostas'].values():
+            cobrir = sorted(proposta.pop('cobrir'))
+            proposta['incluidas'] = cobrir if len(proposta['colunas']) + len(cobrir) <= _MAX_COLUNAS_COBERTURA else []
+            proposta['nome'] = _nome_indice(tabela, proposta['colunas'], proposta['incluidas'], proposta['parcial'])
+            propostas.append(proposta)
+        # Fora as já atendidas por um índice existente ou por outra proposta mais larga
+        analise['propostas'] = [
+            proposta for proposta in propostas
+            if not (not proposta['parcial'] and any(
+                _atendida(proposta, colunas) for colunas in analise['existentes'].values()))
+            and not any(
+                outra is not proposta and outra['parcial'] == proposta['parcial']
+                and len(outra['colunas']) + len(outra['incluidas']) > len(proposta['colunas']) + len(proposta['incluidas'])
+                and _atendida(proposta, outra['colunas'] + outra['incluidas'] if not postgres else outra['colunas'],
+                              outra['incluidas'])
+                for outra in propostas)
+        ]
+    return resultado
+
+
+def sql_indice(tabela: str, proposta: dict, esquema: str = '') -> str:
+    """CREATE INDEX da proposta; no SQLite as colunas incluídas entram no fim da chave."""
+    postgres = get_db_environment() == 'postgres'
+    nome = f"{esquema}.{proposta['nome']}" if esquema and not postgres else proposta['nome']
+    if postgres:
+        sql = f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({', '.join(proposta['colunas'])})"
+        if proposta['incluidas']:
+            sql += f" INCLUDE ({', '.join(proposta['incluidas'])})"
+        if proposta['parcial']:
+            sql += f" WHERE {proposta['parcial']}"
+        return sql
+    return f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({', '.join(proposta['colunas'] + proposta['incluidas'])})"
+
+
+def aplicar_propostas(analises: dict) -> list:
+    """
+    Cria os índices propostos e atualiza as estatísticas das tabelas.
+    Retorna os arquivos SQLite alterados (precisam de nova versão registrada).
+    """
+    alterados = []
+    for tabela, analise in analises.items():
+        if not analise['propostas']:
+            continue
+        with ConexaoBanco(analise['banco'] or 'saldos') as conn:
+            cursor = conn.cursor()
+            try:
+                esquema = ''
+                if get_db_environment() != 'postgres':
+                    for nome, arquivo in _esquemas(conn).items():
+                        cursor.execute(f"SELECT 1 FROM {nome}.sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+                        if cursor.fetchone():
+                            esquema = nome
+                            alterados.append(arquivo)
+                            break
+                for proposta in analise['propostas']:
+                    print(f"   - Criando {proposta['nome']}...")
+                    cursor.execute(sql_indice(tabela, proposta, esquema))
+                cursor.execute(f"ANALYZE {esquema}.{tabela}" if esquema else f"ANALYZE {tabela}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    return alterados
+
+
+def conjunto_recomendado(analises: dict) -> dict:
+    """Por tabela: os índices existentes que os planos usaram e as propostas (como nome, colunas)."""
+    conjunto = {}
+    for tabela, analise in analises.items():
+        indices = [(nome, ', '.join(colunas)) for nome, colunas in sorted(analise['existentes'].items())
+                   if nome in analise['usados'] and not nome.startswith('sqlite_autoindex')]
+        indices += [(proposta['nome'], ', '.join(proposta['colunas'] + proposta['incluidas']))
+                    for proposta in analise['propostas'] if not proposta['parcial']]
+        conjunto[tabela] = indices
+    return conjunto
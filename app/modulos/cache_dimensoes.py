@@ -0,0 +1,105 @@
+# app/modulos/cache_dimensoes.py
+"""
+Cache das tabelas de dimensões em memória.
+As dimensões (UGs, categorias, origens, espécies, alíneas, fontes, funções e subfunções)
+são pequenas e só mudam com a carga dos dados: são lidas uma vez por versão dos dados
+para dicionários código -> nome. Os relatórios agregam só pelos códigos e colocam os
+nomes depois da agregação, sem os LEFT JOINs nas consultas pesadas.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, Optional
+
+import pandas as pd
+
+from .conexao_hibrida import ConexaoBanco
+from .cache_resultados import versao_dados_atual
+
+log = logging.getLogger(__name__)
+
+# Tabela de dimensoes -> (coluna do código, coluna do nome)
+DIMENSOES = {
+    'unidades_gestoras': ('coug', 'noug'),
+    'categorias': ('cocategoriareceita', 'nocategoriareceita'),
+    'origens': ('cofontereceita', 'nofontereceita'),
+    'especies': ('cosubfontereceita', 'nosubfontereceita'),
+    'alineas': ('coalinea', 'noalinea'),
+    'fontes': ('cofonte', 'nofonte'),
+    'funcoes': ('cofuncao', 'nofuncao'),
+    'subfuncoes': ('cosubfuncao', 'nosubfuncao'),
+}
+
+
+def _chave(codigo) -> Optional[str]:
+    """Código como texto, como na comparação do JOIN; 130101.0 vira '130101'."""
+    if codigo is None or (isinstance(codigo, float) and pd.isna(codigo)):
+        return None
+    if isinstance(codigo, float) and codigo.is_integer():
+        codigo = int(codigo)
+    return str(codigo).strip()
+
+
+class Dimensao:
+    """Nomes de uma tabela de dimensões, em dicionário e em Series para o map do pandas."""
+
+    def __init__(self, tabela: str, nomes: Dict[str, str]):
+        self.tabela = tabela
+        self.nomes = nomes
+        self.serie = pd.Series(nomes, dtype=object)
+
+    def nome(self, codigo, prefixo: Optional[str] = None) -> Optional[str]:
+        """
+        Equivale a COALESCE(dim.nome, prefixo || codigo) de um LEFT JOIN;
+        sem prefixo, código sem nome dá None. Código nulo dá None.
+        """
+        chave = _chave(codigo)
+        if chave is None:
+            return None
+        nome = self.nomes.get(chave)
+        if nome is None and prefixo is not None:
+            return f"{prefixo}{chave}"
+        return nome
+
+    def nomear(self, codigos: pd.Series, prefixo: Optional[str] = None) -> pd.Series:
+        """Versão vetorizada de nome() para uma coluna de códigos."""
+        if pd.api.types.is_float_dtype(codigos):
+            codigos = codigos.astype('Int64')
+        chaves = codigos.astype(str).str.strip().where(codigos.notna())
+        nomes = chaves.map(self.serie)
+        if prefixo is not None:
+            nomes = nomes.fillna(prefixo + chaves)
+        return nomes.astype(object).where(nomes.notna(), None)
+
+
+@lru_cache(maxsize=1)
+def _carregar(_versao: str) -> Dict[str, Dimensao]:
+    dimensoes = {}
+    with ConexaoBanco() as conn:
+        cursor = conn.cursor()
+        try:
+            for tabela, (campo, nome) in DIMENSOES.items():
+                nomes = {}
+                try:
+                    cursor.execute(f"SELECT {campo}, {nome} FROM dimensoes.{tabela}")
+                    for codigo, descricao in cursor.fetchall():
+                        chave = _chave(codigo)
+                        if chave is not None and descricao is not None:
+                            # Códigos repetidos: fica o primeiro nome, como no JOIN com uma linha só
+                            nomes.setdefault(chave, descricao)
+                except Exception as e:
+                    conn.rollback()
+                    log.warning("⚠️ Dimensão %s indisponível; os relatórios usam só os códigos: %s", tabela, e)
+                dimensoes[tabela] = Dimensao(tabela, nomes)
+        finally:
+            cursor.close()
+    return dimensoes
+
+
+def dimensao(tabela: str) -> Dimensao:
+    """Dimensão em cache; recarregada quando muda a versão dos dados."""
+    return _carregar(versao_dados_atual())[tabela]
+
+
+def nome_dimensao(tabela: str, codigo, prefixo: Optional[str] = None) -> Optional[str]:
+    return dimensao(tabela).nome(codigo, prefixo)
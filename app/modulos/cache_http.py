@@ -0,0 +1,125 @@
+# app/modulos/cache_http.py
+"""
+GET condicional (ETag) para as páginas de relatório.
+Uma página só muda quando muda a versão dos dados (nova carga dos conversores), os
+parâmetros da URL ou o código da aplicação. O ETag é derivado desses três itens e,
+quando o navegador ou o proxy já tem a cópia atual, a resposta é um 304 calculado
+antes da rota rodar, sem nenhuma consulta aos relatórios.
+O Last-Modified (instante UTC da carga) é só informativo: uma data não cobre o código
+nem os parâmetros, por isso If-Modified-Since não gera 304; a validação é pelo ETag.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.parse import urlencode
+
+from flask import current_app, g, request, template_rendered
+
+from .cache_resultados import versao_dados_atual
+from .versao_dados import FORMATO_VERSAO
+
+log = logging.getLogger(__name__)
+
+_RAIZ_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@lru_cache(maxsize=1)
+def _max_age():
+    """Segundos em que o navegador usa a cópia sem revalidar (padrão 0: sempre revalida)."""
+    return int(os.environ.get('CACHE_HTTP_MAX_AGE', 0))
+
+
+@lru_cache(maxsize=1)
+def _versao_codigo():
+    """Data da última alteração do código e dos templates; um novo deploy muda o ETag."""
+    mais_recente = 0
+    for raiz, _, arquivos in os.walk(_RAIZ_APP):
+        for arquivo in arquivos:
+            if arquivo.endswith(('.py', '.html', '.js', '.css')):
+                try:
+                    mais_recente = max(mais_recente, os.stat(os.path.join(raiz, arquivo)).st_mtime_ns)
+                except OSError:
+                    continue
+    return str(mais_recente)
+
+
+def _data_versao(versao):
+    """
+    Instante (UTC) da carga mais recente, lido das versões AAAAMMDDHHMMSSZ do carimbo.
+    Versões antigas, no horário local sem fuso, não têm data: a resposta fica sem Last-Modified.
+    """
+    datas = re.findall(r'@(\d{14}Z)', versao or '')
+    if not datas:
+        return None
+    return datetime.strptime(max(datas), FORMATO_VERSAO).replace(tzinfo=timezone.utc)
+
+
+def etag_requisicao(versao):
+    parametros = urlencode(sorted(request.args.items(multi=True)))
+    base = '|'.join([_versao_codigo(), versao, request.path, parametros])
+    return hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+
+def _aplicar_cabecalhos(response):
+    response.set_etag(g.etag_condicional)
+    if g.ultima_modificacao is not None:
+        response.last_modified = g.ultima_modificacao
+    response.headers['Cache-Control'] = f"public, max-age={_max_age()}, must-revalidate"
+    return response
+
+
+def _verificar_condicional():
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    try:
+        versao = versao_dados_atual()
+    except Exception as e:
+        log.warning("⚠️ GET condicional desativado nesta requisição: %s", e)
+        return None
+
+    g.etag_condicional = etag_requisicao(versao)
+    g.ultima_modificacao = _data_versao(versao)
+
+    # Só o ETag valida a cópia (If-Modified-Since sozinho não vê deploy nem parâmetros)
+    if not request.if_none_match or not request.if_none_match.contains(g.etag_condicional):
+        return None
+
+    return _aplicar_cabecalhos(current_app.response_class(status=304))
+
+
+def _resposta_de_erro(response):
+    """As rotas exibem erro.html ou {"erro": ...} com status 200; essas respostas não ganham ETag."""
+    if g.get('pagina_erro'):
+        return True
+    # Corpos em streaming (drill-down paginado) não são lidos aqui: as rotas devolvem o erro antes
+    if response.is_json and not response.is_streamed:
+        corpo = response.get_json(silent=True)
+        return isinstance(corpo, dict) and 'erro' in corpo
+    return False
+
+
+def _marcar_resposta(response):
+    if 'etag_condicional' not in g or response.status_code == 304:
+        return response
+    if response.status_code != 200 or _resposta_de_erro(response):
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    return _aplicar_cabecalhos(response)
+
+
+def _registrar_template(sender, template, context, **extra):
+    if template.name == 'erro.html':
+        g.pagina_erro = True
+
+
+template_rendered.connect(_registrar_template)
+
+
+def instalar_get_condicional(blueprint):
+    """Registra os ganchos de ETag/Last-Modified nas rotas do blueprint."""
+    blueprint.before_request(_verificar_condicional)
+    blueprint.after_request(_marcar_resposta)
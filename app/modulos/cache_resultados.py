@@ -0,0 +1,218 @@
+# app/modulos/cache_resultados.py
+"""
+Cache dos resultados dos relatórios.
+O resultado de um relatório depende só dos parâmetros (período, UG, filtro) e da versão
+dos dados, que muda apenas quando os conversores rodam. Cada resultado fica guardado sob
+(relatório, parâmetros, versão dos dados); os menos usados saem quando o total passa do
+limite de memória (CACHE_RELATORIOS_MB) e tudo é descartado quando a versão muda.
+A leitura da nova versão (carimbo_versao_dados) também recria os pools de conexão, e
+o que for calculado com uma conexão emprestada antes da carga não é guardado: o
+resultado novo nunca sai de uma conexão que ainda enxerga os dados antigos.
+"""
+
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from .conexao_hibrida import carimbo_versao_dados, conexao_desatualizada, get_db_environment
+
+log = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _limite_bytes():
+    """Limite de memória do cache; CACHE_RELATORIOS_MB=0 desliga o cache."""
+    return int(float(os.environ.get('CACHE_RELATORIOS_MB', 64)) * 1024 * 1024)
+
+
+@lru_cache(maxsize=1)
+def _intervalo_versao():
+    """Segundos entre verificações da versão dos dados (no PostgreSQL custa uma consulta)."""
+    padrao = 30 if get_db_environment() == 'postgres' else 2
+    return float(os.environ.get('CACHE_VERSAO_INTERVALO_S', padrao))
+
+
+class CacheResultados:
+    """
+    LRU thread-safe limitado por memória. Os valores ficam serializados (pickle):
+    o tamanho guardado é o tamanho real e cada leitura devolve uma cópia independente,
+    que o chamador pode alterar sem afetar o cache.
+    """
+
+    def __init__(self, limite_bytes, intervalo_versao):
+        self.limite_bytes = limite_bytes
+        self.intervalo_versao = intervalo_versao
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()  # (relatório, parâmetros) -> bytes
+        self._bytes = 0
+        self._versao = None
+        self._verificado_em = 0.0
+        self._stats = self._stats_zerados()
+        # Relatórios já avisados nesta versão por resultado maior que o limite
+        self._grandes_avisados = set()
+
+    @staticmethod
+    def _stats_zerados():
+        return {'acertos': 0, 'faltas': 0, 'remocoes': 0, 'invalidacoes': 0, 'grandes_demais': 0,
+                'conexao_desatualizada': 0}
+
+    def versao_atual(self):
+        """
+        Versão dos dados; ao detectar uma nova carga, descarta todos os resultados guardados.
+        Os pools de conexão já foram recriados por carimbo_versao_dados() ao ler o novo carimbo.
+        """
+        agora = time.monotonic()
+        if self._versao is not None and agora - self._verificado_em < self.intervalo_versao:
+            return self._versao
+        self._verificado_em = agora
+        try:
+            versao = carimbo_versao_dados()
+        except Exception as e:
+            log.warning("⚠️ Não foi possível ler a versão dos dados: %s", e)
+            return self._versao or 'desconhecida'
+
+        with self._lock:
+            if versao != self._versao:
+                if self._versao is not None:
+                    log.info("🔄 Nova versão dos dados; descartando %d resultados em cache.", len(self._itens))
+                    self._stats['invalidacoes'] += 1
+                self._itens.clear()
+                self._bytes = 0
+                self._grandes_avisados.clear()
+                self._versao = versao
+        return versao
+
+    def obter_ou_calcular(self, relatorio, parametros, calcular, armazenar=None):
+        """
+        Devolve o resultado guardado para (relatório, parâmetros) ou o calcula e guarda.
+        `armazenar(resultado) -> bool` permite recusar resultados que não devem ficar em cache.
+        """
+        self.versao_atual()
+        chave = (relatorio, parametros)
+        with self._lock:
+            serializado = self._itens.get(chave)
+            if serializado is not None:
+                self._itens.move_to_end(chave)
+                self._stats['acertos'] += 1
+            else:
+                self._stats['faltas'] += 1
+        if serializado is not None:
+            return pickle.loads(serializado)
+
+        versao = self._versao
+        resultado = calcular()
+        if conexao_desatualizada():
+            # A conexão foi emprestada antes da nova carga (ex.: aberta pela rota antes da
+            # verificação da versão): o resultado atende esta requisição, mas não fica guardado
+            with self._lock:
+                self._stats['conexao_desatualizada'] += 1
+            return resultado
+        if armazenar is None or armazenar(resultado):
+            self._guardar(chave, pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL), versao)
+        return resultado
+
+    def _guardar(self, chave, serializado, versao):
+        tamanho = len(serializado)
+        with self._lock:
+            # Uma nova carga chegou durante o cálculo: o resultado já nasceu velho
+            if versao != self._versao:
+                return
+            if tamanho > self.limite_bytes:
+                # Nunca guardado: o cálculo se repete a cada requisição. Avisado uma vez por versão
+                self._stats['grandes_demais'] += 1
+                relatorio = chave[0]
+                if relatorio not in self._grandes_avisados:
+                    self._grandes_avisados.add(relatorio)
+                    log.warning("⚠️ Resultado de '%s' com %.1f MB, acima do limite do cache (%.1f MB): "
+                                "recalculado a cada requisição (aumente CACHE_RELATORIOS_MB).",
+                                relatorio, tamanho / 1048576, self.limite_bytes / 1048576)
+                return
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._itens[chave] = serializado
+            self._bytes += tamanho
+            while self._bytes > self.limite_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self._bytes -= len(removido)
+                self._stats['remocoes'] += 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+            self._stats = self._stats_zerados()
+
+    def estatisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'itens': len(self._itens),
+                'bytes': self._bytes,
+                'limite_bytes': self.limite_bytes,
+                'versao': self._versao,
+            })
+        consultas = stats['acertos'] + stats['faltas']
+        stats['taxa_acerto'] = stats['acertos'] / consultas if consultas else 0.0
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache():
+    """Cache do processo (cada worker do gunicorn tem o seu); None se desligado."""
+    global _cache
+    if _limite_bytes() <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheResultados(_limite_bytes(), _intervalo_versao())
+    return _cache
+
+
+def versao_dados_atual():
+    """Versão dos dados vista pelo cache (verificada no máximo a cada CACHE_VERSAO_INTERVALO_S)."""
+    cache = obter_cache()
+    return cache.versao_atual() if cache else carimbo_versao_dados()
+
+
+def resultado_em_cache(relatorio, chave, armazenar=None):
+    """
+    Decorador que guarda o retorno da função no cache de resultados.
+
+    Args:
+        relatorio: Nome do relatório (primeira parte da chave)
+        chave: Função com a mesma assinatura da decorada que devolve uma tupla
+               com os parâmetros que determinam o resultado
+        armazenar: Função opcional (resultado) -> bool; False não guarda o resultado
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            cache = obter_cache()
+            if cache is None:
+                return funcao(*args, **kwargs)
+            return cache.obter_ou_calcular(relatorio, chave(*args, **kwargs),
+                                           lambda: funcao(*args, **kwargs), armazenar)
+        return envoltorio
+    return decorador
+
+
+def estatisticas_cache():
+    cache = obter_cache()
+    if cache is None:
+        return {'ativo': False}
+    return {'ativo': True, **cache.estatisticas()}
+
+
+def limpar_cache():
+    cache = obter_cache()
+    if cache is not None:
+        cache.limpar()
@@ -0,0 +1,130 @@
+# app/modulos/capacidades.py
+"""
+Registro das capacidades do esquema: tabelas e colunas disponíveis em cada banco.
+A estrutura só muda com a carga dos dados; em vez de cada relatório sondar o banco a
+cada requisição (SELECT 1 FROM ..., tentativas que falham antes do fallback), o
+catálogo do banco é lido uma vez por versão dos dados e compartilhado pelos módulos.
+O cubo da receita (tem_cubo_receita) e a coluna regras_mask (tem_mascara_regras) também
+são respondidos por aqui, e não guardados na conexão, que sobrevive a uma nova carga.
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .conexao_hibrida import ConexaoBanco, get_db_environment
+from .cache_resultados import versao_dados_atual
+
+# Esquemas internos do PostgreSQL, fora do registro
+_ESQUEMAS_SISTEMA = ('pg_catalog', 'information_schema', 'pg_toast')
+
+
+class Capacidades:
+    """Tabelas e colunas por esquema (no SQLite, cada banco anexado é um esquema)."""
+
+    def __init__(self, tabelas: Dict[str, List[str]], colunas: Dict[Tuple[str, str], List[str]], principal: str):
+        self.principal = principal
+        self._tabelas = tabelas
+        self._colunas = colunas
+        self._busca = {esquema: {tabela.lower() for tabela in nomes} for esquema, nomes in tabelas.items()}
+
+    def _esquema_da_tabela(self, tabela: str, esquema: Optional[str]) -> Optional[str]:
+        """Esquema onde a tabela está; sem esquema, procura no principal e depois nos demais."""
+        tabela = tabela.lower()
+        if esquema is not None:
+            return esquema if tabela in self._busca.get(esquema, ()) else None
+        for candidato in [self.principal, *self._busca]:
+            if tabela in self._busca.get(candidato, ()):
+                return candidato
+        return None
+
+    def tem_tabela(self, tabela: str, esquema: Optional[str] = None) -> bool:
+        """Tabela ou view existe no esquema (sem esquema: em qualquer um, como um nome sem prefixo)."""
+        return self._esquema_da_tabela(tabela, esquema) is not None
+
+    def tabelas(self, esquema: Optional[str] = None) -> List[str]:
+        """Tabelas do esquema (padrão: o principal)."""
+        return list(self._tabelas.get(esquema or self.principal, []))
+
+    def colunas(self, tabela: str, esquema: Optional[str] = None) -> List[str]:
+        """Colunas da tabela na ordem do banco; vazio se a tabela não existe."""
+        encontrado = self._esquema_da_tabela(tabela, esquema)
+        return list(self._colunas.get((encontrado, tabela.lower()), [])) if encontrado else []
+
+    def tem_coluna(self, tabela: str, coluna: str, esquema: Optional[str] = None) -> bool:
+        return coluna.lower() in (nome.lower() for nome in self.colunas(tabela, esquema))
+
+
+def sondar(conn) -> Capacidades:
+    """Lê o catálogo do banco da conexão (todas as tabelas e colunas, de uma vez)."""
+    cursor = conn.cursor()
+    try:
+        tabelas, colunas = {}, {}
+        if get_db_environment() == 'postgres':
+            cursor.execute("""
+                SELECT c.table_schema, c.table_name, c.column_name
+                FROM information_schema.columns c
+                WHERE c.table_schema NOT IN %s
+                ORDER BY c.table_schema, c.table_name, c.ordinal_position
+            """, (_ESQUEMAS_SISTEMA,))
+            for esquema, tabela, coluna in cursor.fetchall():
+                if (esquema, tabela) not in colunas:
+                    tabelas.setdefault(esquema, []).append(tabela)
+                    colunas[(esquema, tabela)] = []
+                colunas[(esquema, tabela)].append(coluna)
+            return Capacidades(tabelas, colunas, 'public')
+
+        cursor.execute("PRAGMA database_list")
+        esquemas = [linha[1] for linha in cursor.fetchall()]
+        for esquema in esquemas:
+            cursor.execute(f"SELECT name FROM {esquema}.sqlite_master WHERE type IN ('table', 'view')")
+            tabelas[esquema] = [linha[0] for linha in cursor.fetchall()]
+            for tabela in tabelas[esquema]:
+                cursor.execute(f'PRAGMA {esquema}.table_info("{tabela}")')
+                colunas[(esquema, tabela.lower())] = [linha[1] for linha in cursor.fetchall()]
+        return Capacidades(tabelas, colunas, 'main')
+    finally:
+        cursor.close()
+
+
+@lru_cache(maxsize=8)
+def _carregar(banco: str, _versao: str) -> Capacidades:
+    with ConexaoBanco(banco) as conn:
+        return sondar(conn)
+
+
+def capacidades(banco: str = 'saldos') -> Capacidades:
+    """Capacidades do banco em cache; relidas quando muda a versão dos dados."""
+    return _carregar(banco, versao_dados_atual())
+
+
+@lru_cache(maxsize=8)
+def _carregar_arquivo(caminho_db: str, _assinatura: Tuple) -> Capacidades:
+    import sqlite3
+    conn = sqlite3.connect(caminho_db)
+    try:
+        caminho_dimensoes = os.path.join(os.path.dirname(caminho_db), 'banco_dimensoes.db')
+        if os.path.exists(caminho_dimensoes):
+            conn.execute("ATTACH DATABASE ? AS dimensoes", (caminho_dimensoes,))
+        return sondar(conn)
+    finally:
+        conn.close()
+
+
+def capacidades_arquivo(caminho_db: str) -> Capacidades:
+    """
+    Capacidades de um arquivo SQLite avulso (com banco_dimensoes.db anexado, se houver ao lado),
+    para os relatórios que abrem o arquivo por conta própria. Relidas quando o arquivo muda.
+    """
+    try:
+        info = os.stat(caminho_db)
+        assinatura = (info.st_mtime_ns, info.st_size)
+    except OSError:
+        assinatura = None
+    return _carregar_arquivo(caminho_db, assinatura)
+
+
+def recarregar_capacidades():
+    """Descarta o registro em memória; a próxima consulta lê o catálogo do banco."""
+    _carregar.cache_clear()
+    _carregar_arquivo.cache_clear()
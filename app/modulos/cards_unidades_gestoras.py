@@ -1,15 +1,79 @@
 # app/modulos/cards_unidades_gestoras.py
 """
 Módulo para exibir cards com as Unidades Gestoras que possuem receita realizada
-Dinâmico com base nos filtros de tipo de receita selecionados
+Dinâmico com base nos filtros de tipo de receita selecionados.
+Os cards de todos os filtros especiais saem de uma única leitura da receita por
+(UG, campo dos filtros) e ficam juntos no cache: trocar a aba do filtro não consulta o banco.
 """
 
+import logging
 import sqlite3
 from typing import List, Dict, Optional
+
+import pandas as pd
 import psycopg2.extras
-from app.modulos.conexao_hibrida import get_db_environment, adaptar_query
+from app.modulos.conexao_hibrida import get_db_environment
+from app.modulos.consultas import registrar_consulta, consultar_df
 from app.modulos.formatacao import formatar_moeda
-from app.modulos.regras_contabeis_receita import get_filtro_conta, FILTROS_RELATORIO_ESPECIAIS
+from app.modulos.cubo_receita import VARIANTES_ORIGEM_RECEITA, tabela_receita, coluna_valor, filtro_regra, variante_origem_receita
+from app.modulos.cache_dimensoes import dimensao
+from app.modulos.cache_resultados import resultado_em_cache
+from app.modulos.regras_contabeis_receita import FILTROS_RELATORIO_ESPECIAIS
+
+log = logging.getLogger(__name__)
+
+# Campos usados pelos filtros especiais: formam o grão da leitura junto com a UG
+CAMPOS_FILTROS = sorted({regra['campo_filtro'].lower() for regra in FILTROS_RELATORIO_ESPECIAIS.values()})
+
+
+@registrar_consulta('cards_unidades_receita', variantes=VARIANTES_ORIGEM_RECEITA)
+def _consulta_receitas_por_ug(d, cubo=False, mascara=False):
+    regra_receita = filtro_regra('RECEITA_LIQUIDA', cubo, mascara)
+    valor_receita = coluna_valor('RECEITA_LIQUIDA', cubo)
+    campos = ''.join(f"fs.{campo},\n                " for campo in CAMPOS_FILTROS)
+
+    return f"""
+        SELECT
+                fs.coug,
+                {campos}SUM(CASE WHEN {d.int('fs.coexercicio')} = :ano THEN {valor_receita} ELSE 0 END) as receita_realizada,
+                SUM(CASE WHEN {d.int('fs.coexercicio')} = :ano_anterior THEN {valor_receita} ELSE 0 END) as receita_anterior
+        FROM {tabela_receita(cubo)} fs
+        WHERE fs.coug IS NOT NULL
+          AND {d.int('fs.coexercicio')} IN (:ano, :ano_anterior)
+          AND {d.int('fs.inmes')} <= :mes
+          {regra_receita}
+        GROUP BY {', '.join(str(i) for i in range(1, len(CAMPOS_FILTROS) + 2))}
+        """
+
+
+def unidades_do_filtro(receitas: pd.DataFrame, filtro_relatorio_key: Optional[str] = None) -> List[Dict]:
+    """
+    UGs com receita realizada no filtro, a partir da leitura por (UG, campos dos filtros),
+    ordenadas da maior para a menor receita.
+    """
+    regra = FILTROS_RELATORIO_ESPECIAIS.get(filtro_relatorio_key) if filtro_relatorio_key else None
+    if regra:
+        receitas = receitas[receitas[regra['campo_filtro'].lower()].astype(str).isin(regra['valores'])]
+    agrupado = receitas.groupby('coug', sort=True)[['receita_realizada', 'receita_anterior']].sum().reset_index()
+    agrupado = agrupado[agrupado['receita_realizada'] > 0]
+    agrupado = agrupado.sort_values('receita_realizada', ascending=False, kind='stable')
+
+    ugs = dimensao('unidades_gestoras')
+    unidades = []
+    for row in agrupado.itertuples(index=False):
+        noug = ugs.nome(row.coug, 'UG ')
+        variacao_absoluta = row.receita_realizada - row.receita_anterior
+        variacao_percentual = (variacao_absoluta / row.receita_anterior) * 100 if row.receita_anterior > 0 else 100.0
+        unidades.append({
+            'codigo': str(row.coug),
+            'nome': noug,
+            'descricao_completa': f"{row.coug} - {noug}",
+            'receita_realizada': row.receita_realizada or 0,
+            'receita_anterior': row.receita_anterior or 0,
+            'variacao_percentual': variacao_percentual or 0,
+            'variacao_absoluta': variacao_absoluta or 0
+        })
+    return unidades
 
 
 class CardsUnidadesGestoras:
@@ -23,111 +87,26 @@ class CardsUnidadesGestoras:
             self.conn.row_factory = sqlite3.Row
             self.cursor = conn.cursor()
 
-    def buscar_unidades_com_receita(self, ano: int, mes: int,
-                                   filtro_relatorio_key: Optional[str] = None) -> List[Dict]:
+    def buscar_receitas_por_ug(self, ano: int, mes: int) -> pd.DataFrame:
         """
-        Busca todas as unidades gestoras que possuem receita realizada
+        Receita realizada até o mês no exercício e no anterior por (UG, campos dos filtros):
+        uma leitura que atende todos os filtros especiais.
         """
-        filtro_dinamico = ""
-        if filtro_relatorio_key and filtro_relatorio_key in FILTROS_RELATORIO_ESPECIAIS:
-            regra = FILTROS_RELATORIO_ESPECIAIS[filtro_relatorio_key]
-            campo = regra['campo_filtro']
-            valores_str = ", ".join([f"'{v}'" for v in regra['valores']])
-            filtro_dinamico = f"AND fs.{campo} IN ({valores_str})"
+        params = {'ano': ano, 'ano_anterior': ano - 1, 'mes': mes}
+        df = consultar_df(self.conn, 'cards_unidades_receita', params, **variante_origem_receita())
+        df.columns = [col.lower() for col in df.columns]
+        df[['receita_realizada', 'receita_anterior']] = df[['receita_realizada', 'receita_anterior']].fillna(0).astype(float)
+        return df
 
-        # Define type casts para compatibilidade PostgreSQL/SQLite
-        if get_db_environment() == 'postgres':
-            type_cast_text = "::text"
-            type_cast_int = "::integer"
-        else:
-            type_cast_text = ""
-            type_cast_int = ""
-        
-        # Monta having clause com cast correto
-        having_clause = f"""
-        HAVING SUM(
-            CASE 
-                WHEN fs.coexercicio{type_cast_int} = {ano} 
-                AND fs.inmes{type_cast_int} <= {mes} 
-                AND {get_filtro_conta('RECEITA_LIQUIDA')} 
-                {filtro_dinamico} 
-                THEN fs.saldo_contabil 
-                ELSE 0 
-            END
-        ) > 0
+    def buscar_unidades_com_receita(self, ano: int, mes: int,
+                                   filtro_relatorio_key: Optional[str] = None) -> List[Dict]:
         """
-
-        query = f"""
-        WITH receitas_por_ug AS (
-            SELECT
-                fs.coug,
-                COALESCE(ug.noug, 'UG ' || fs.coug) as noug,
-                SUM(CASE
-                    WHEN fs.coexercicio{type_cast_int} = {ano}
-                    AND fs.inmes{type_cast_int} <= {mes}
-                    AND {get_filtro_conta('RECEITA_LIQUIDA')}
-                    {filtro_dinamico}
-                    THEN fs.saldo_contabil
-                    ELSE 0
-                END) as receita_realizada,
-                SUM(CASE
-                    WHEN fs.coexercicio{type_cast_int} = {ano-1}
-                    AND fs.inmes{type_cast_int} <= {mes}
-                    AND {get_filtro_conta('RECEITA_LIQUIDA')}
-                    {filtro_dinamico}
-                    THEN fs.saldo_contabil
-                    ELSE 0
-                END) as receita_anterior
-            FROM fato_saldos fs
-            LEFT JOIN dimensoes.unidades_gestoras ug ON fs.coug{type_cast_text} = ug.coug
-            WHERE fs.coug IS NOT NULL
-            GROUP BY fs.coug, ug.noug
-            {having_clause}
-        )
-        SELECT
-            coug,
-            noug,
-            receita_realizada,
-            receita_anterior,
-            CASE
-                WHEN receita_anterior > 0
-                THEN ((receita_realizada - receita_anterior) / receita_anterior) * 100
-                ELSE 100.0
-            END as variacao_percentual,
-            (receita_realizada - receita_anterior) as variacao_absoluta
-        FROM receitas_por_ug
-        ORDER BY receita_realizada DESC
+        Busca todas as unidades gestoras que possuem receita realizada
         """
-
-        query_adaptada = adaptar_query(query)
-        
         try:
-            self.cursor.execute(query_adaptada)
-            unidades = []
-
-            for row in self.cursor:
-                # Converte para dict se necessário
-                if get_db_environment() == 'postgres':
-                    row_dict = dict(row)
-                else:
-                    row_dict = dict(row)
-                
-                unidades.append({
-                    'codigo': str(row_dict['coug']),
-                    'nome': row_dict['noug'],
-                    'descricao_completa': f"{row_dict['coug']} - {row_dict['noug']}",
-                    'receita_realizada': row_dict['receita_realizada'] or 0,
-                    'receita_anterior': row_dict['receita_anterior'] or 0,
-                    'variacao_percentual': row_dict['variacao_percentual'] or 0,
-                    'variacao_absoluta': row_dict['variacao_absoluta'] or 0
-                })
-                
-            return unidades
-            
+            return unidades_do_filtro(self.buscar_receitas_por_ug(ano, mes), filtro_relatorio_key)
         except Exception as e:
-            print(f"Erro ao buscar unidades com receita: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Erro ao buscar unidades com receita: %s", e)
             return []
 
     def agrupar_por_faixa_valor(self, unidades: List[Dict]) -> Dict[str, List[Dict]]:
@@ -282,8 +261,60 @@ class CardsUnidadesGestoras:
         }
 
 
+def _cards_vazios() -> Dict:
+    return {
+        'dados_formatados': {'unidades': [], 'totais': {}, 'tem_dados': False},
+        'faixas': {},
+        'unidades_raw': [],
+        'totais_raw': {}
+    }
+
+
+def _montar_cards(cards: CardsUnidadesGestoras, unidades: List[Dict]) -> Dict:
+    totais = cards.calcular_totais(unidades)
+    faixas = cards.agrupar_por_faixa_valor(unidades)
+    dados_formatados = cards.formatar_para_html(unidades, totais)
+    return {
+        'dados_formatados': dados_formatados,
+        'faixas': faixas,
+        'unidades_raw': unidades,
+        'totais_raw': totais
+    }
+
+
+@resultado_em_cache('cards_unidades', chave=lambda conn, ano, mes, receitas=None: (int(ano), int(mes)),
+                    armazenar=lambda cards: bool(cards))
+def gerar_cards_todos_filtros(conn, ano: int, mes: int, receitas=None) -> Dict[str, Dict]:
+    """
+    Cards, faixas e destaques de todos os filtros especiais a partir de uma leitura só.
+
+    Args:
+        conn: Conexão com o banco de dados
+        ano: Ano de referência
+        mes: Mês de referência
+        receitas: Função opcional () -> DataFrame com a receita por (UG, campos dos filtros)
+                  (ex.: MotorBalancoReceita.receitas_por_ug); sem ela, consulta o banco
+
+    Returns:
+        Dict chave do filtro ('' = todas as receitas) -> mesmo formato de gerar_cards_unidades;
+        vazio se a leitura falhar
+    """
+    try:
+        cards = CardsUnidadesGestoras(conn)
+        df = receitas() if receitas is not None else cards.buscar_receitas_por_ug(ano, mes)
+        return {
+            chave: _montar_cards(cards, unidades_do_filtro(df, chave or None))
+            for chave in ['', *FILTROS_RELATORIO_ESPECIAIS]
+        }
+    except Exception as e:
+        log.exception("Erro ao gerar cards de unidades: %s", e)
+        return {}
+
+
 def gerar_cards_unidades(conn: sqlite3.Connection, ano: int, mes: int,
-                        filtro_relatorio_key: Optional[str] = None) -> Dict:
+                        filtro_relatorio_key: Optional[str] = None,
+                        unidades: Optional[List[Dict]] = None,
+                        receitas=None) -> Dict:
     """
     Função principal para gerar os cards de unidades gestoras
     
@@ -292,30 +323,17 @@ def gerar_cards_unidades(conn: sqlite3.Connection, ano: int, mes: int,
         ano: Ano de referência
         mes: Mês de referência
         filtro_relatorio_key: Chave do filtro de relatório especial
+        unidades: Unidades já lidas; dispensa a consulta e o lote dos filtros
+        receitas: Origem opcional da leitura do lote (ver gerar_cards_todos_filtros)
         
     Returns:
         Dict com dados formatados, faixas, dados brutos e totais
     """
+    if unidades is None:
+        chave = filtro_relatorio_key if filtro_relatorio_key in FILTROS_RELATORIO_ESPECIAIS else ''
+        return gerar_cards_todos_filtros(conn, ano, mes, receitas).get(chave) or _cards_vazios()
     try:
-        cards = CardsUnidadesGestoras(conn)
-        unidades = cards.buscar_unidades_com_receita(ano, mes, filtro_relatorio_key)
-        totais = cards.calcular_totais(unidades)
-        faixas = cards.agrupar_por_faixa_valor(unidades)
-        dados_formatados = cards.formatar_para_html(unidades, totais)
-        
-        return {
-            'dados_formatados': dados_formatados,
-            'faixas': faixas,
-            'unidades_raw': unidades,
-            'totais_raw': totais
-        }
+        return _montar_cards(CardsUnidadesGestoras(conn), unidades)
     except Exception as e:
-        print(f"Erro ao gerar cards de unidades: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            'dados_formatados': {'unidades': [], 'totais': {}, 'tem_dados': False},
-            'faixas': {},
-            'unidades_raw': [],
-            'totais_raw': {}
-        }
\ No newline at end of file
+        log.exception("Erro ao gerar cards de unidades: %s", e)
+        return _cards_vazios()
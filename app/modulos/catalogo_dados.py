@@ -0,0 +1,129 @@
+# app/modulos/catalogo_dados.py
+"""
+Catálogo dos períodos carregados (tabela catalogo_periodos).
+Gravado na carga (scripts/03_conversor_saldos_receita.py e migrar_dados.py): uma linha
+por exercício de fato_saldos com o último mês, o último bimestre, o número de linhas e a
+versão da carga (a mesma registrada em versao_dados, em UTC). A aplicação lê o catálogo uma vez por versão dos dados, em vez de
+calcular MAX/DISTINCT sobre fato_saldos a cada página; bancos gerados antes do catálogo
+têm o mesmo resumo calculado uma única vez a partir de fato_saldos.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .conexao_hibrida import ConexaoBanco
+from .cache_resultados import versao_dados_atual
+from .capacidades import capacidades
+from .versao_dados import nova_versao
+
+log = logging.getLogger(__name__)
+
+TABELA_CATALOGO = 'catalogo_periodos'
+
+_SQL_RESUMO = """
+    SELECT
+        CAST(coexercicio AS INTEGER) as coexercicio,
+        MAX(CAST(inmes AS INTEGER)) as ultimo_mes,
+        COUNT(*) as linhas
+    FROM fato_saldos
+    WHERE coexercicio IS NOT NULL AND inmes IS NOT NULL
+    GROUP BY 1
+"""
+
+
+def bimestre_do_mes(mes: int) -> int:
+    """Bimestre que contém o mês (mês 7 -> 4º bimestre)."""
+    return (int(mes) + 1) // 2
+
+
+def construir_catalogo(conn, postgres: bool = False, versao_carga: Optional[str] = None) -> int:
+    """
+    (Re)cria o catálogo a partir de fato_saldos na conexão informada.
+    Usado pelo conversor dos saldos (SQLite) e pelo migrar_dados.py (postgres=True).
+    versao_carga: versão da carga (nova_versao()[0]) que o chamador registra depois em
+    versao_dados; sem ela, uma versão gerada agora.
+    Retorna o número de exercícios catalogados.
+    """
+    cursor = conn.cursor()
+    cursor.execute(_SQL_RESUMO)
+    resumo = cursor.fetchall()
+    versao_carga = versao_carga or nova_versao()[0]
+    cursor.execute(f"DROP TABLE IF EXISTS {TABELA_CATALOGO}")
+    cursor.execute(f"""
+        CREATE TABLE {TABELA_CATALOGO} (
+            coexercicio INTEGER PRIMARY KEY,
+            ultimo_mes INTEGER NOT NULL,
+            ultimo_bimestre INTEGER NOT NULL,
+            linhas BIGINT NOT NULL,
+            versao_carga VARCHAR(15) NOT NULL
+        )
+    """)
+    marcador = '%s' if postgres else '?'
+    cursor.executemany(
+        f"INSERT INTO {TABELA_CATALOGO} (coexercicio, ultimo_mes, ultimo_bimestre, linhas, versao_carga) "
+        f"VALUES ({', '.join([marcador] * 5)})",
+        [(int(ano), int(mes), bimestre_do_mes(mes), int(linhas), versao_carga) for ano, mes, linhas in resumo]
+    )
+    conn.commit()
+    return len(resumo)
+
+
+@lru_cache(maxsize=1)
+def _carregar(_versao: str) -> Dict:
+    tem_catalogo = capacidades().tem_tabela(TABELA_CATALOGO)
+    with ConexaoBanco() as conn:
+        cursor = conn.cursor()
+        try:
+            if tem_catalogo:
+                cursor.execute(f"SELECT coexercicio, ultimo_mes, linhas, versao_carga FROM {TABELA_CATALOGO}")
+                linhas = cursor.fetchall()
+            else:
+                log.warning("⚠️ Banco sem %s; resumindo fato_saldos (rode o conversor para gravar o catálogo)", TABELA_CATALOGO)
+                cursor.execute(_SQL_RESUMO)
+                linhas = [(ano, mes, total, None) for ano, mes, total in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    exercicios = {
+        int(ano): {'ultimo_mes': int(mes), 'ultimo_bimestre': bimestre_do_mes(mes), 'linhas': int(total)}
+        for ano, mes, total, _ in linhas
+    }
+    return {
+        'exercicios': exercicios,
+        'versao_carga': next((versao for *_, versao in linhas if versao), None),
+        'versao_dados': _versao,
+    }
+
+
+def catalogo() -> Dict:
+    """
+    Catálogo dos dados atuais: {'exercicios': {ano: {ultimo_mes, ultimo_bimestre, linhas}},
+    'versao_carga', 'versao_dados'}. Relido só quando muda a versão dos dados.
+    """
+    return _carregar(versao_dados_atual())
+
+
+def recarregar_catalogo():
+    """Descarta o catálogo em memória; a próxima leitura vai ao banco."""
+    _carregar.cache_clear()
+
+
+def exercicios_disponiveis() -> List[int]:
+    """Exercícios com dados, do mais recente para o mais antigo."""
+    return sorted(catalogo()['exercicios'], reverse=True)
+
+
+def ultimo_periodo() -> Optional[Tuple[int, int]]:
+    """(ano, mês) mais recente carregado; None sem dados."""
+    exercicios = catalogo()['exercicios']
+    if not exercicios:
+        return None
+    ano = max(exercicios)
+    return ano, exercicios[ano]['ultimo_mes']
+
+
+def ultimo_bimestre() -> Optional[Tuple[int, int]]:
+    """(ano, bimestre) do último mês carregado; None sem dados."""
+    periodo = ultimo_periodo()
+    return (periodo[0], bimestre_do_mes(periodo[1])) if periodo else None
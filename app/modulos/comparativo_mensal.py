@@ -1,15 +1,77 @@
 # app/modulos/comparativo_mensal.py
 """
 Módulo para gerar o comparativo mensal acumulado de receitas
-Mostra a evolução acumulada mês a mês com variações percentuais
+Mostra a evolução acumulada mês a mês com variações percentuais, para o exercício
+atual e os anteriores (por padrão, só o anterior)
 """
 
 import sqlite3
 from typing import List, Dict, Optional
 
+import numpy as np
+
+from app.modulos.catalogo_dados import catalogo
+from app.modulos.periodo import obter_nome_mes
 from app.modulos.formatacao import formatar_moeda, formatar_percentual
-from app.modulos.regras_contabeis_receita import get_filtro_conta, FILTROS_RELATORIO_ESPECIAIS
-from app.modulos.conexao_hibrida import adaptar_query, get_db_environment
+from app.modulos.cubo_receita import VARIANTES_ORIGEM_RECEITA, tabela_receita, coluna_valor, filtro_regra, variante_origem_receita
+from app.modulos.consultas import registrar_consulta, executar_consulta, variante_filtro, variantes_filtro, sql_filtro
+
+
+# Cores das séries dos exercícios anteriores, do mais recente para o mais antigo
+_CORES_ANTERIORES = ['#95a5a6', '#7f8c8d', '#bdc3c7', '#566573', '#d5dbdb']
+_COR_ATUAL = '#2a5298'
+
+
+@registrar_consulta('comparativo_mensal_receita', variantes=[
+    {'com_coug': com_coug, **origem, **filtro}
+    for com_coug in (False, True) for origem in VARIANTES_ORIGEM_RECEITA for filtro in variantes_filtro()
+])
+def _consulta_comparativo_mensal(d, com_coug=False, cubo=False, mascara=False, campo_filtro=None, n_filtro=0):
+    """Receita líquida por exercício e mês; o acumulado é feito em memória (acumular_por_mes)."""
+    filtro_coug = "AND fs.coug = :coug" if com_coug else ""
+    filtro_dinamico = sql_filtro(d, campo_filtro, n_filtro)
+
+    return f"""
+        SELECT
+            fs.coexercicio,
+            fs.inmes,
+            SUM({coluna_valor('RECEITA_LIQUIDA', cubo)}) as receita_liquida
+        FROM {tabela_receita(cubo)} fs
+        WHERE
+            {d.int('fs.coexercicio')} BETWEEN :ano_inicial AND :ano
+            {filtro_regra('RECEITA_LIQUIDA', cubo, mascara)}
+            {filtro_coug}
+            {filtro_dinamico}
+        GROUP BY fs.coexercicio, fs.inmes
+        """
+
+
+def acumular_por_mes(mensais: List[Dict], anos: List[int], meses: List[int]) -> Dict[int, List[Optional[float]]]:
+    """
+    Receita acumulada até cada mês de `meses`, por exercício. Sem nenhum mês com
+    dados até ali, o valor é None (como o SUM vazio do SQL).
+    """
+    posicao = {ano: i for i, ano in enumerate(anos)}
+    grade = np.zeros((len(anos), 13))
+    com_dados = np.zeros((len(anos), 13), dtype=bool)
+    for row in mensais:
+        i = posicao.get(int(row['coexercicio']))
+        mes = int(row['inmes'])
+        if i is None or not 1 <= mes <= 12 or row['receita_liquida'] is None:
+            continue
+        grade[i, mes] += float(row['receita_liquida'])
+        com_dados[i, mes] = True
+    acumulado = np.cumsum(grade, axis=1)
+    algum = np.logical_or.accumulate(com_dados, axis=1)
+    return {
+        ano: [float(acumulado[i, mes]) if algum[i, mes] else None for mes in meses]
+        for ano, i in posicao.items()
+    }
+
+
+def _rgba(cor: str, alfa: float) -> str:
+    vermelho, verde, azul = (int(cor[k:k + 2], 16) for k in (1, 3, 5))
+    return f"rgba({vermelho}, {verde}, {azul}, {alfa})"
 
 
 class ComparativoMensalAcumulado:
@@ -19,72 +81,54 @@ class ComparativoMensalAcumulado:
         self.conn = conn
         
     def gerar_comparativo(self, ano: int, coug: Optional[str] = None, 
-                         filtro_relatorio_key: Optional[str] = None) -> List[Dict]:
+                         filtro_relatorio_key: Optional[str] = None,
+                         resultados: Optional[List[Dict]] = None,
+                         anos: int = 2) -> List[Dict]:
         """
-        Gera o comparativo mensal acumulado de forma compatível e robusta.
+        Gera o comparativo mensal acumulado dos `anos` exercícios até `ano`.
+        `resultados` recebe a receita por exercício e mês já lida (ex.: MotorBalancoReceita)
+        e dispensa a consulta.
         """
-        filtros_sql = []
+        # Exercícios comparados: no mínimo o anterior, no máximo desde o primeiro carregado
+        exercicios = catalogo()['exercicios']
+        inicio = min(ano - 1, max(ano - int(anos) + 1, min(exercicios, default=ano - 1)))
+        anos_comparados = list(range(inicio, ano + 1))
+        if resultados is None:
+            resultados = self._consultar(anos_comparados, coug, filtro_relatorio_key)
+        # Meses do exercício: do primeiro ao último carregado, pelo catálogo dos períodos
+        exercicio = exercicios.get(int(ano))
+        meses = list(range(1, exercicio['ultimo_mes'] + 1)) if exercicio else []
+        return self._montar_comparativo(anos_comparados, meses, acumular_por_mes(resultados, anos_comparados, meses))
+
+    def _consultar(self, anos: List[int], coug: Optional[str], filtro_relatorio_key: Optional[str]) -> List[Dict]:
+        variante, params = variante_filtro(filtro_relatorio_key)
+        params.update({'ano': anos[-1], 'ano_inicial': anos[0]})
         if coug:
-            coug_escaped = coug.replace("'", "''")
-            filtros_sql.append(f"fs.coug = '{coug_escaped}'")
-        
-        if filtro_relatorio_key and filtro_relatorio_key in FILTROS_RELATORIO_ESPECIAIS:
-            regra = FILTROS_RELATORIO_ESPECIAIS[filtro_relatorio_key]
-            campo = regra['campo_filtro'].lower()
-            valores_str = ", ".join([f"'{v}'" for v in regra['valores']])
-            filtros_sql.append(f"fs.{campo} IN ({valores_str})")
-        
-        where_clause = " AND " + " AND ".join(filtros_sql) if filtros_sql else ""
-        
-        # --- CORREÇÃO APLICADA AQUI ---
-        type_cast_numeric = "::integer" if get_db_environment() == 'postgres' else ""
-        
-        query_original = f"""
-        WITH meses AS (
-            SELECT DISTINCT inmes, nome_mes FROM dim_tempo WHERE coexercicio{type_cast_numeric} = {ano}
-        ),
-        receitas_mensais AS (
-            SELECT
-                coexercicio,
-                inmes,
-                SUM(saldo_contabil) as receita_liquida
-            FROM fato_saldos fs
-            WHERE
-                coexercicio{type_cast_numeric} IN ({ano}, {ano - 1})
-                AND {get_filtro_conta('RECEITA_LIQUIDA')}
-                {where_clause}
-            GROUP BY coexercicio, inmes
-        )
-        SELECT
-            m.inmes,
-            m.nome_mes,
-            (SELECT SUM(r.receita_liquida) FROM receitas_mensais r WHERE r.coexercicio{type_cast_numeric} = {ano} AND r.inmes{type_cast_numeric} <= m.inmes{type_cast_numeric}) as receita_atual,
-            (SELECT SUM(r.receita_liquida) FROM receitas_mensais r WHERE r.coexercicio{type_cast_numeric} = {ano - 1} AND r.inmes{type_cast_numeric} <= m.inmes{type_cast_numeric}) as receita_anterior
-        FROM meses m
-        ORDER BY m.inmes{type_cast_numeric}
-        """
-        
-        query_adaptada = adaptar_query(query_original)
-        
+            params['coug'] = coug
+
+        variante.update(variante_origem_receita())
+
         cursor = self.conn.cursor()
-        
+        executar_consulta(cursor, 'comparativo_mensal_receita', params, com_coug=bool(coug), **variante)
         try:
-            cursor.execute(query_adaptada)
             colunas = [desc[0].lower() for desc in cursor.description]
             resultados = [dict(zip(colunas, row)) for row in cursor.fetchall()]
         except Exception:
-            cursor.execute(query_adaptada)
+            executar_consulta(cursor, 'comparativo_mensal_receita', params, com_coug=bool(coug), **variante)
             # Fallback se a obtenção de colunas falhar (para conexões mais simples)
-            resultados = [dict(row) for row in cursor.fetchall()]
+            resultados = [{k.lower(): v for k, v in dict(row).items()} for row in cursor.fetchall()]
+        return resultados
 
+    def _montar_comparativo(self, anos: List[int], meses: List[int],
+                            acumulados: Dict[int, List[Optional[float]]]) -> List[Dict]:
+        ano, ano_anterior = anos[-1], anos[-2]
         dados_finais = []
-        for row in resultados:
-            row_lower = {k.lower(): v for k, v in row.items()}
-            
-            receita_atual = row_lower.get('receita_atual') or 0
-            receita_anterior = row_lower.get('receita_anterior') or 0
+        for posicao, mes in enumerate(meses):
+            receitas_por_ano = {exercicio: acumulados[exercicio][posicao] or 0 for exercicio in anos}
+            receita_atual = receitas_por_ano[ano]
+            receita_anterior = receitas_por_ano[ano_anterior]
 
-            if receita_atual != 0 or receita_anterior != 0:
+            if any(valor != 0 for valor in receitas_por_ano.values()):
                 variacao_absoluta = receita_atual - receita_anterior
                 if receita_anterior != 0:
                     variacao_percentual = (variacao_absoluta / abs(receita_anterior)) * 100
@@ -92,14 +136,15 @@ class ComparativoMensalAcumulado:
                     variacao_percentual = 100.0 if receita_atual != 0 else 0.0
 
                 dados_finais.append({
-                    'mes': row_lower.get('inmes'),
-                    'nome_mes': row_lower.get('nome_mes'),
+                    'mes': mes,
+                    'nome_mes': obter_nome_mes(mes),
                     'ano_atual': ano,
-                    'ano_anterior': ano - 1,
+                    'ano_anterior': ano_anterior,
                     'receita_atual': receita_atual,
                     'receita_anterior': receita_anterior,
                     'variacao_absoluta': variacao_absoluta,
-                    'variacao_percentual': variacao_percentual
+                    'variacao_percentual': variacao_percentual,
+                    'receitas_por_ano': receitas_por_ano
                 })
         
         return dados_finais
@@ -129,43 +174,37 @@ class ComparativoMensalAcumulado:
             return {'labels': [], 'datasets': []}
         
         labels = [item['nome_mes'] for item in dados]
-        valores_atuais = [item['receita_atual'] for item in dados]
-        valores_anteriores = [item['receita_anterior'] for item in dados]
+        ano_atual = dados[0]['ano_atual']
         
-        ano_atual = dados[0]['ano_atual'] if dados else 2025
-        ano_anterior = dados[0]['ano_anterior'] if dados else 2024
+        # Uma série por exercício, do mais antigo ao atual (em destaque)
+        datasets = []
+        for ano in sorted(dados[0]['receitas_por_ano']):
+            if ano == ano_atual:
+                cor, largura = _COR_ATUAL, 3
+            else:
+                cor, largura = _CORES_ANTERIORES[(ano_atual - 1 - ano) % len(_CORES_ANTERIORES)], 2
+            datasets.append({
+                'label': str(ano),
+                'data': [item['receitas_por_ano'][ano] for item in dados],
+                'borderColor': cor,
+                'backgroundColor': _rgba(cor, 0.1),
+                'borderWidth': largura,
+                'tension': 0.1
+            })
         
-        return {
-            'labels': labels,
-            'datasets': [
-                {
-                    'label': str(ano_anterior),
-                    'data': valores_anteriores,
-                    'borderColor': '#95a5a6',
-                    'backgroundColor': 'rgba(149, 165, 166, 0.1)',
-                    'borderWidth': 2,
-                    'tension': 0.1
-                },
-                {
-                    'label': str(ano_atual),
-                    'data': valores_atuais,
-                    'borderColor': '#2a5298',
-                    'backgroundColor': 'rgba(42, 82, 152, 0.1)',
-                    'borderWidth': 3,
-                    'tension': 0.1
-                }
-            ]
-        }
+        return {'labels': labels, 'datasets': datasets}
 
 
 def gerar_comparativo_mensal(conn: sqlite3.Connection, ano: int, 
                             coug: Optional[str] = None, 
-                            filtro_relatorio_key: Optional[str] = None) -> Dict:
+                            filtro_relatorio_key: Optional[str] = None,
+                            resultados: Optional[List[Dict]] = None,
+                            anos: int = 2) -> Dict:
     """
-    Função auxiliar para gerar o comparativo completo
+    Função auxiliar para gerar o comparativo completo (`anos` exercícios até `ano`)
     """
     comparativo = ComparativoMensalAcumulado(conn)
-    dados = comparativo.gerar_comparativo(ano, coug, filtro_relatorio_key)
+    dados = comparativo.gerar_comparativo(ano, coug, filtro_relatorio_key, resultados, anos)
     dados_html = comparativo.formatar_para_html(dados)
     dados_grafico = comparativo.gerar_dados_grafico(dados)
     
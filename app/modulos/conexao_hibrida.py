@@ -4,18 +4,40 @@ Sistema de conexão híbrido - SQLite local + PostgreSQL produção
 Ponto central e ÚNICA fonte de verdade para conexões.
 """
 
+import logging
 import os
 import sqlite3
+import threading
+import time
+import urllib.parse
+from functools import lru_cache
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
 
+from .perfil_consultas import CursorSQLite, cursor_postgres_instrumentado, perfil_ativo, registrar_retirada
+from .pool_conexoes import PoolConexoes
+from .versao_dados import verificar_versao_bancos, carimbo_versao_bancos, carimbo_versao_postgres
+
+log = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
 def get_db_environment():
-    """Verifica se está em produção (Railway/Postgres) ou local (SQLite)."""
+    """Verifica se está em produção (Railway/Postgres) ou local (SQLite). Lido uma vez por processo."""
     if os.environ.get('RAILWAY_ENVIRONMENT') or os.environ.get('DATABASE_URL'):
         return 'postgres'
     else:
         return 'sqlite'
 
+def remover_prefixos_sqlite(query: str) -> str:
+    """Remove os aliases dos bancos anexados no SQLite, que no Postgres são tabelas do mesmo banco."""
+    query = query.replace('lancamentos_db.', '')
+    # ADICIONE ESTA LINHA para remover prefixos de despesa também
+    query = query.replace('lancamentos_despesa_db.', '')
+    query = query.replace('saldos_despesa_db.', '')
+    return query
+
+@lru_cache(maxsize=1024)
 def adaptar_query(query: str) -> str:
     """
     Adapta a query para o ambiente de banco de dados correto.
@@ -23,88 +45,304 @@ def adaptar_query(query: str) -> str:
     if get_db_environment() == 'postgres':
         # Para Postgres, só precisamos trocar o placeholder e remover o alias do SQLite
         query = query.replace('?', '%s')
-        query = query.replace('lancamentos_db.', '')
-        # ADICIONE ESTA LINHA para remover prefixos de despesa também
-        query = query.replace('lancamentos_despesa_db.', '')
-        query = query.replace('saldos_despesa_db.', '')
+        query = remover_prefixos_sqlite(query)
     # Para SQLite, a query original com "dimensoes." e "?" já funciona
     return query
 
+class ConexaoPostgres(psycopg2.extensions.connection):
+    """Conexão do pool que registra as prepared statements já criadas na sessão."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.preparadas = set()
+
+    def cursor(self, *args, **kwargs):
+        if perfil_ativo():
+            classe = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            kwargs['cursor_factory'] = cursor_postgres_instrumentado(classe)
+        return super().cursor(*args, **kwargs)
+
+class ConexaoSQLite(sqlite3.Connection):
+    """Conexão SQLite do pool; os cursores medem as consultas para o perfil (perfil_consultas)."""
+
+    def cursor(self, factory=None):
+        if factory is None and perfil_ativo():
+            factory = CursorSQLite
+        return super().cursor(factory) if factory is not None else super().cursor()
+
+    def execute(self, sql, parameters=()):
+        # O execute() nativo da conexão não passa por cursor(); delega ao cursor medido
+        return self.cursor().execute(sql, parameters)
+
+def _config_pool():
+    """Lê a configuração do pool das variáveis de ambiente."""
+    return {
+        'tamanho_max': int(os.environ.get('DB_POOL_TAMANHO', 10)),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'validar_apos': float(os.environ.get('DB_POOL_VALIDAR_APOS', 30)),
+    }
+
+# --- POOLS DE CONEXÃO ---
+# Um pool para o PostgreSQL e um por banco principal no SQLite (cada um com seus anexos)
+_pools = {}
+_pools_lock = threading.Lock()
+_carimbo_visto = None  # último carimbo da versão dos dados lido neste processo
+_emprestimos = threading.local()  # pools dos quais a thread tem conexões emprestadas
+
+def _abrir_postgres():
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise ConnectionError("Variável de ambiente DATABASE_URL não encontrada.")
+
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    return psycopg2.connect(database_url, connection_factory=ConexaoPostgres)
+
+def _validar_postgres(conn, profunda):
+    if conn.closed:
+        return False
+    if profunda:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+    return True
+
+def _resetar_postgres(conn):
+    # Encerra qualquer transação aberta pela requisição anterior
+    conn.rollback()
+
+# --- BANCOS SQLITE ---
+_BASE_PATH_SQLITE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'dados', 'db'
+)
+
+# ATUALIZAÇÃO: Inclui os novos bancos de despesa
+DB_FILES = {
+    'saldos': 'banco_saldo_receita.db',
+    'lancamentos': 'banco_lancamento_receita.db',
+    'dimensoes': 'banco_dimensoes.db',
+    'saldos_despesa': 'banco_saldo_despesa.db',         # NOVO
+    'lancamentos_despesa': 'banco_lancamento_despesa.db' # NOVO
+}
+
+# Bancos anexados a cada banco principal (alias -> arquivo)
+BANCOS_ANEXADOS = {
+    'saldos': {
+        'dimensoes': 'banco_dimensoes.db',
+        'lancamentos_db': 'banco_lancamento_receita.db'
+    },
+    # Para saldos de despesa, anexa dimensões
+    'saldos_despesa': {
+        'dimensoes': 'banco_dimensoes.db',
+        'lancamentos_despesa_db': 'banco_lancamento_despesa.db'
+    },
+    # Para lançamentos de despesa, anexa dimensões
+    'lancamentos_despesa': {
+        'dimensoes': 'banco_dimensoes.db'
+    },
+}
+
+def sqlite_modo_leitura():
+    """Modo de serviço somente leitura (produção com SQLite): SQLITE_MODO_LEITURA=1."""
+    return os.environ.get('SQLITE_MODO_LEITURA', '').lower() in ('1', 'true', 'sim')
+
+def _arquivos_do_banco(db_name):
+    """Arquivo principal e anexos de um banco, como lista de (alias, arquivo)."""
+    principal = DB_FILES.get(db_name, 'banco_saldo_receita.db')
+    return [('main', principal)] + list(BANCOS_ANEXADOS.get(db_name, {}).items())
+
+def _uri_somente_leitura(caminho, imutavel):
+    uri = 'file:' + urllib.parse.quote(caminho) + '?mode=ro'
+    return uri + '&immutable=1' if imutavel else uri
+
+def _aplicar_perfil_leitura(conn, esquemas):
+    """Pragmas para leitura concorrente: mmap do arquivo inteiro, cache grande e sem escrita."""
+    cache_kib = int(os.environ.get('SQLITE_CACHE_MB', 64)) * 1024
+    for alias, caminho in esquemas:
+        conn.execute(f"PRAGMA {alias}.mmap_size = {os.path.getsize(caminho)}")
+        conn.execute(f"PRAGMA {alias}.cache_size = -{cache_kib}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA query_only = 1")
+
+def verificar_versao_dados(arquivos=None):
+    """
+    Confere os bancos SQLite contra o manifesto gravado pelos conversores.
+    Apenas os arquivos com versão confirmada são abertos como imutáveis no modo leitura.
+    """
+    arquivos = arquivos or sorted(set(DB_FILES.values()))
+    resultado = verificar_versao_bancos(_BASE_PATH_SQLITE, arquivos)
+    for arquivo, estado in resultado.items():
+        if estado in ('divergente', 'sem_registro'):
+            log.warning("⚠️ Banco '%s' sem versão confirmada (%s); será aberto sem immutable.", arquivo, estado)
+    return resultado
+
+def carimbo_versao_dados():
+    """
+    Identifica a versão atual dos dados: no SQLite pelo manifesto e pelos arquivos,
+    no PostgreSQL pela tabela gravada pelo migrar_dados.py. Muda a cada nova carga.
+    Ao ver um carimbo diferente do anterior, fecha os pools: as conexões abertas
+    antes da carga não servem mais nenhuma requisição.
+    """
+    global _carimbo_visto
+    if get_db_environment() == 'postgres':
+        with ConexaoBanco() as conn:
+            cursor = conn.cursor()
+            try:
+                carimbo = carimbo_versao_postgres(cursor)
+            finally:
+                cursor.close()
+    else:
+        carimbo = carimbo_versao_bancos(_BASE_PATH_SQLITE, sorted(set(DB_FILES.values())))
+
+    with _pools_lock:
+        anterior, _carimbo_visto = _carimbo_visto, carimbo
+    if anterior is not None and carimbo != anterior:
+        log.info("🔄 Nova versão dos dados; recriando os pools de conexão.")
+        fechar_pools()
+    return carimbo
+
+def _assinatura_arquivos(db_name):
+    """Tamanho e mtime dos arquivos do banco, para detectar uma nova carga com a aplicação no ar."""
+    assinatura = []
+    for _, arquivo in _arquivos_do_banco(db_name):
+        try:
+            st = os.stat(os.path.join(_BASE_PATH_SQLITE, arquivo))
+            assinatura.append((arquivo, st.st_size, st.st_mtime_ns))
+        except OSError:
+            assinatura.append((arquivo, None, None))
+    return tuple(assinatura)
+
+def _abrir_sqlite(db_name, estado_versao=None):
+    caminho_principal = os.path.join(_BASE_PATH_SQLITE, DB_FILES.get(db_name, 'banco_saldo_receita.db'))
+
+    if not os.path.exists(caminho_principal):
+        raise FileNotFoundError(f"Banco de dados '{db_name}' não encontrado: {caminho_principal}")
+
+    arquivos = [(alias, os.path.join(_BASE_PATH_SQLITE, arquivo))
+                for alias, arquivo in _arquivos_do_banco(db_name)]
+    arquivos = [(alias, caminho) for alias, caminho in arquivos if os.path.exists(caminho)]
+
+    # check_same_thread=False: a conexão passa entre threads, mas o pool garante um uso por vez
+    if estado_versao is None:
+        conn = sqlite3.connect(caminho_principal, check_same_thread=False, factory=ConexaoSQLite)
+        for alias, caminho in arquivos[1:]:
+            conn.execute(f"ATTACH DATABASE '{caminho}' AS {alias}")
+    else:
+        def imutavel(caminho):
+            return estado_versao.get(os.path.basename(caminho)) == 'ok'
+
+        conn = sqlite3.connect(_uri_somente_leitura(caminho_principal, imutavel(caminho_principal)),
+                               uri=True, check_same_thread=False, factory=ConexaoSQLite)
+        for alias, caminho in arquivos[1:]:
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (_uri_somente_leitura(caminho, imutavel(caminho)),))
+        _aplicar_perfil_leitura(conn, arquivos)
+
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _validar_sqlite(conn, profunda):
+    if profunda:
+        conn.execute("SELECT 1").fetchone()
+    return True
+
+def _resetar_sqlite(conn):
+    if conn.in_transaction:
+        conn.rollback()
+    # Alguns módulos trocam o row_factory; a próxima requisição recebe o padrão
+    conn.row_factory = sqlite3.Row
+
+def _criar_pool_sqlite(chave, db_name):
+    estado_versao = None
+    if sqlite_modo_leitura():
+        estado_versao = verificar_versao_dados([arquivo for _, arquivo in _arquivos_do_banco(db_name)])
+    pool = PoolConexoes(chave, lambda: _abrir_sqlite(db_name, estado_versao), _validar_sqlite,
+                        _resetar_sqlite, **_config_pool())
+    # Os conversores apagam e recriam os arquivos: conexões antigas continuariam lendo o arquivo removido
+    pool.assinatura = _assinatura_arquivos(db_name)
+    pool.verificado_em = time.monotonic()
+    return pool
+
+def _obter_pool(env, db_name):
+    chave = 'postgres' if env == 'postgres' else f'sqlite:{db_name}'
+    pool = _pools.get(chave)
+
+    # Uma nova carga dos conversores invalida as conexões SQLite abertas (no modo leitura, imutáveis)
+    if pool is not None and getattr(pool, 'assinatura', None) is not None \
+            and time.monotonic() - pool.verificado_em >= 1.0:
+        pool.verificado_em = time.monotonic()
+        if _assinatura_arquivos(db_name) != pool.assinatura:
+            log.info("🔄 Bancos de '%s' foram atualizados; recriando o pool de conexões.", db_name)
+            with _pools_lock:
+                if _pools.get(chave) is pool:
+                    del _pools[chave]
+            pool.fechar_todas()
+            pool = None
+
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(chave)
+            if pool is None:
+                if env == 'postgres':
+                    pool = PoolConexoes(chave, _abrir_postgres, _validar_postgres,
+                                        _resetar_postgres, **_config_pool())
+                else:
+                    pool = _criar_pool_sqlite(chave, db_name)
+                _pools[chave] = pool
+    return pool
+
+def obter_estatisticas_pool():
+    """Retorna as estatísticas de todos os pools de conexão criados neste processo."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.estatisticas() for pool in pools]
+
+def fechar_pools():
+    """Fecha as conexões ociosas de todos os pools (ex.: antes de substituir os bancos)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.fechar_todas()
+
+def conexao_desatualizada():
+    """
+    True se a thread usa uma conexão de um pool já fechado, isto é, emprestada antes
+    da última carga: o que for calculado com ela não deve ir para o cache.
+    """
+    return any(pool.encerrado for pool in getattr(_emprestimos, 'pools', ()))
+
 class ConexaoBanco:
-    """Gerenciador de contexto para garantir que a conexão seja sempre fechada."""
+    """Gerenciador de contexto que empresta uma conexão do pool e a devolve ao final."""
 
     def __init__(self, db_name='saldos'):
         self.conn = None
         self.env = get_db_environment()
         self.db_name = db_name
+        self.tempo_espera_ms = 0.0
+        self._pool = None
 
     def __enter__(self):
-        if self.env == 'postgres':
-            try:
-                database_url = os.environ.get('DATABASE_URL')
-                if not database_url:
-                    raise ConnectionError("Variável de ambiente DATABASE_URL não encontrada.")
-                
-                if database_url.startswith("postgres://"):
-                    database_url = database_url.replace("postgres://", "postgresql://", 1)
-                    
-                self.conn = psycopg2.connect(database_url)
-            except Exception as e:
-                print(f"Erro fatal ao conectar ao PostgreSQL: {e}")
-                raise
-        else: # sqlite
-            try:
-                project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-                base_path = os.path.join(project_root, 'dados', 'db')
-                
-                # ATUALIZAÇÃO: Inclui os novos bancos de despesa
-                db_files = {
-                    'saldos': 'banco_saldo_receita.db',
-                    'lancamentos': 'banco_lancamento_receita.db',
-                    'dimensoes': 'banco_dimensoes.db',
-                    'saldos_despesa': 'banco_saldo_despesa.db',         # NOVO
-                    'lancamentos_despesa': 'banco_lancamento_despesa.db' # NOVO
-                }
-                db_filename = db_files.get(self.db_name, 'banco_saldo_receita.db')
-                caminho_principal = os.path.join(base_path, db_filename)
-
-                if not os.path.exists(caminho_principal):
-                    raise FileNotFoundError(f"Banco de dados '{self.db_name}' não encontrado: {caminho_principal}")
-
-                self.conn = sqlite3.connect(caminho_principal)
-                self.conn.row_factory = sqlite3.Row
-                
-                # ATUALIZAÇÃO: Lógica de anexação para cada banco
-                if self.db_name == 'saldos':
-                    bancos_anexar = {
-                        'dimensoes': 'banco_dimensoes.db',
-                        'lancamentos_db': 'banco_lancamento_receita.db'
-                    }
-                elif self.db_name == 'saldos_despesa':
-                    # Para saldos de despesa, anexa dimensões
-                    bancos_anexar = {
-                        'dimensoes': 'banco_dimensoes.db',
-                        'lancamentos_despesa_db': 'banco_lancamento_despesa.db'
-                    }
-                elif self.db_name == 'lancamentos_despesa':
-                    # Para lançamentos de despesa, anexa dimensões
-                    bancos_anexar = {
-                        'dimensoes': 'banco_dimensoes.db'
-                    }
-                else:
-                    bancos_anexar = {}
-                
-                for alias, db_file in bancos_anexar.items():
-                    caminho_anexo = os.path.join(base_path, db_file)
-                    if os.path.exists(caminho_anexo):
-                        self.conn.execute(f"ATTACH DATABASE '{caminho_anexo}' AS {alias}")
-
-            except Exception as e:
-                print(f"Erro fatal ao conectar ou anexar bancos SQLite: {e}")
-                raise
+        self._pool = _obter_pool(self.env, self.db_name)
+        try:
+            self.conn, self.tempo_espera_ms = self._pool.obter()
+        except Exception as e:
+            if self.env == 'postgres':
+                log.critical("Erro fatal ao conectar ao PostgreSQL: %s", e)
+            else:
+                log.critical("Erro fatal ao conectar ou anexar bancos SQLite: %s", e)
+            raise
 
+        registrar_retirada(self.conn, self.db_name, self.tempo_espera_ms)
+        if not hasattr(_emprestimos, 'pools'):
+            _emprestimos.pools = []
+        _emprestimos.pools.append(self._pool)
         return self.conn
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.conn:
-            self.conn.close()
\ No newline at end of file
+            pools = getattr(_emprestimos, 'pools', [])
+            if self._pool in pools:
+                pools.remove(self._pool)
+            self._pool.devolver(self.conn)
+            self.conn = None
@@ -0,0 +1,236 @@
+# app/modulos/consultas.py
+"""
+Registro de consultas dos relatórios.
+Cada consulta é escrita uma única vez com parâmetros nomeados (:ano, :mes, ...),
+compilada uma vez por dialeto/variante e executada sempre com valores vinculados.
+No PostgreSQL as consultas viram prepared statements reaproveitados pela conexão do pool.
+"""
+
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+from .conexao_hibrida import get_db_environment, remover_prefixos_sqlite
+from .esquema_postgres import esquema_tipado
+from .perfil_consultas import registrar_rotulo
+from .regras_contabeis_receita import FILTROS_RELATORIO_ESPECIAIS
+
+# Parâmetro nomeado ":nome" (ignora os casts "::tipo" do PostgreSQL)
+_RE_PARAMETRO = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+# SQLSTATE 26000: prepared statement inexistente na sessão
+_PG_PREPARADA_INEXISTENTE = '26000'
+
+_REGISTRO = {}
+
+
+class Dialeto:
+    """Diferenças de sintaxe entre SQLite e PostgreSQL usadas pelos construtores de consulta."""
+
+    def __init__(self, nome: str, tipado: bool = False):
+        self.nome = nome
+        self.postgres = nome == 'postgres'
+        # Esquema tipado (migrar_tipos_postgres.py): as colunas já têm o tipo certo e os casts saem
+        self.com_cast = self.postgres and not tipado
+
+    def int(self, expressao: str) -> str:
+        """Compara a coluna como inteiro (no Postgres não tipado, exercício e mês são texto)."""
+        return f"CAST({expressao} AS INTEGER)" if self.com_cast else expressao
+
+    def txt(self, expressao: str) -> str:
+        """Converte para texto nas junções com as dimensões."""
+        return f"{expressao}::text" if self.com_cast else expressao
+
+    def id_linha(self) -> str:
+        """Identificador estável da linha: rowid no SQLite, a coluna id (SERIAL) no PostgreSQL."""
+        return 'id' if self.postgres else 'rowid'
+
+    def lista(self, prefixo: str, quantidade: int) -> str:
+        """Lista de parâmetros :prefixo_0, :prefixo_1, ... para cláusulas IN."""
+        return ', '.join(f':{prefixo}_{i}' for i in range(quantidade)) or 'NULL'
+
+
+class ConsultaCompilada:
+    """SQL final de uma consulta para um dialeto, com a ordem dos parâmetros."""
+
+    def __init__(self, nome, dialeto, sql_nomeado):
+        self.nome = nome
+        self.dialeto = dialeto
+        ordem = []
+
+        def posicional(m):
+            ordem.append(m.group(1))
+            return '%s' if dialeto == 'postgres' else '?'
+
+        if dialeto == 'postgres':
+            sql_nomeado = remover_prefixos_sqlite(sql_nomeado)
+            # Com parâmetros, o psycopg2 interpreta "%"; literais (ex.: LIKE) precisam de escape
+            self.sql = _RE_PARAMETRO.sub(posicional, sql_nomeado.replace('%', '%%'))
+        else:
+            self.sql = _RE_PARAMETRO.sub(posicional, sql_nomeado)
+        self.ordem = tuple(ordem)
+
+        # Versão PREPARE/EXECUTE: cada nome vira $n uma única vez
+        self.nomes_unicos = tuple(dict.fromkeys(ordem))
+        numeros = {nome_param: i + 1 for i, nome_param in enumerate(self.nomes_unicos)}
+        sql_numerado = _RE_PARAMETRO.sub(lambda m: f"${numeros[m.group(1)]}", sql_nomeado)
+        self.nome_preparado = 'rel_' + hashlib.md5(sql_numerado.encode('utf-8')).hexdigest()[:16]
+        self.sql_prepare = f"PREPARE {self.nome_preparado} AS {sql_numerado.strip().rstrip(';')}"
+        marcadores = ', '.join(['%s'] * len(self.nomes_unicos))
+        self.sql_execute = f"EXECUTE {self.nome_preparado} ({marcadores})" if marcadores else f"EXECUTE {self.nome_preparado}"
+
+        # O perfil de consultas exibe o nome registrado no lugar do SQL
+        registrar_rotulo(self.sql, nome)
+        registrar_rotulo(self.sql_execute, nome)
+
+    def valores(self, params: dict) -> tuple:
+        return tuple(params[nome_param] for nome_param in self.ordem)
+
+    def valores_unicos(self, params: dict) -> tuple:
+        return tuple(params[nome_param] for nome_param in self.nomes_unicos)
+
+
+def registrar_consulta(nome: str, variantes=None):
+    """
+    Decorador que registra o construtor de uma consulta.
+
+    O construtor recebe o Dialeto e as opções da variante (ex.: com_coug=True)
+    e devolve o SQL com parâmetros nomeados. `variantes` lista as combinações
+    usadas pela aplicação, compiladas antecipadamente em precompilar_consultas().
+    """
+    def decorador(construtor):
+        _REGISTRO[nome] = {'construtor': construtor, 'variantes': variantes or [{}]}
+        return construtor
+    return decorador
+
+
+@lru_cache(maxsize=None)
+def _compilar(nome, dialeto, tipado, variante):
+    construtor = _REGISTRO[nome]['construtor']
+    return ConsultaCompilada(nome, dialeto, construtor(Dialeto(dialeto, tipado), **dict(variante)))
+
+
+def dialeto_atual() -> Dialeto:
+    """Dialeto do ambiente atual, para o SQL montado fora do registro."""
+    return Dialeto(get_db_environment(), esquema_tipado())
+
+
+def obter_consulta(nome: str, **variante) -> ConsultaCompilada:
+    """Retorna a consulta compilada para o dialeto atual (compila na primeira vez)."""
+    if nome not in _REGISTRO:
+        raise KeyError(f"Consulta '{nome}' não registrada.")
+    return _compilar(nome, get_db_environment(), esquema_tipado(), tuple(sorted(variante.items())))
+
+
+def precompilar_consultas() -> int:
+    """Compila todas as variantes registradas para o dialeto atual. Retorna a quantidade."""
+    total = 0
+    for nome, registro in _REGISTRO.items():
+        for variante in registro['variantes']:
+            obter_consulta(nome, **variante)
+            total += 1
+    return total
+
+
+def faixa_meses(meses: list) -> tuple:
+    """Converte uma lista contígua de meses em limites (início, fim) para BETWEEN."""
+    return (min(meses), max(meses)) if meses else (1, 0)
+
+
+def variante_filtro(filtro_relatorio_key=None):
+    """
+    Variante e parâmetros de um filtro especial de relatório (FILTROS_RELATORIO_ESPECIAIS).
+
+    Returns:
+        Tupla (opções da variante, parâmetros :filtro_0, :filtro_1, ...)
+    """
+    regra = FILTROS_RELATORIO_ESPECIAIS.get(filtro_relatorio_key) if filtro_relatorio_key else None
+    if not regra:
+        return {'campo_filtro': None, 'n_filtro': 0}, {}
+    variante = {'campo_filtro': regra['campo_filtro'].lower(), 'n_filtro': len(regra['valores'])}
+    return variante, {f'filtro_{i}': valor for i, valor in enumerate(regra['valores'])}
+
+
+def variantes_filtro() -> list:
+    """Todas as variantes de filtro especial possíveis (inclusive sem filtro)."""
+    combinacoes = {(None, 0)} | {
+        (regra['campo_filtro'].lower(), len(regra['valores'])) for regra in FILTROS_RELATORIO_ESPECIAIS.values()
+    }
+    return [{'campo_filtro': campo, 'n_filtro': n} for campo, n in sorted(combinacoes, key=str)]
+
+
+def sql_filtro(d: Dialeto, campo_filtro, n_filtro, alias='fs') -> str:
+    """Trecho 'AND alias.campo IN (:filtro_0, ...)' do filtro especial; vazio se não houver filtro."""
+    if not campo_filtro:
+        return ""
+    return f"AND {alias}.{campo_filtro} IN ({d.lista('filtro', n_filtro)})"
+
+
+# --- EXECUÇÃO ---
+
+def _usar_preparadas() -> bool:
+    return os.environ.get('PG_PREPARED_STATEMENTS', '1').lower() not in ('0', 'false', 'nao')
+
+
+def _sql_para_execucao(conn, consulta: ConsultaCompilada, params: dict):
+    """SQL e valores a executar; no Postgres prepara a consulta na conexão se ainda não estiver."""
+    preparadas = getattr(conn, 'preparadas', None)
+    if consulta.dialeto != 'postgres' or preparadas is None or not _usar_preparadas():
+        return consulta.sql, consulta.valores(params)
+
+    if consulta.nome_preparado not in preparadas:
+        with conn.cursor() as cursor:
+            cursor.execute(consulta.sql_prepare)
+        preparadas.add(consulta.nome_preparado)
+    return consulta.sql_execute, consulta.valores_unicos(params)
+
+
+def _preparada_perdida(erro) -> bool:
+    for e in (erro, getattr(erro, '__cause__', None)):
+        if getattr(e, 'pgcode', None) == _PG_PREPARADA_INEXISTENTE:
+            return True
+    return False
+
+
+def _executar_com_repreparo(conn, consulta, params, executar):
+    try:
+        sql, valores = _sql_para_execucao(conn, consulta, params)
+        return executar(sql, valores)
+    except Exception as e:
+        if not _preparada_perdida(e):
+            raise
+        # A sessão perdeu as prepared statements (ex.: reinício do servidor): prepara de novo
+        conn.rollback()
+        conn.preparadas.clear()
+        sql, valores = _sql_para_execucao(conn, consulta, params)
+        return executar(sql, valores)
+
+
+def executar_consulta(cursor, nome: str, params: dict, preparada: bool = True, **variante):
+    """
+    Executa uma consulta registrada no cursor informado e devolve o próprio cursor.
+    preparada=False executa o SQL da consulta, sem PREPARE/EXECUTE: necessário nos cursores
+    nomeados do PostgreSQL, cujo DECLARE ... CURSOR FOR só aceita SELECT ou VALUES.
+    """
+    consulta = obter_consulta(nome, **variante)
+    if not preparada:
+        cursor.execute(consulta.sql, consulta.valores(params))
+        return cursor
+
+    def executar(sql, valores):
+        cursor.execute(sql, valores)
+        return cursor
+
+    return _executar_com_repreparo(cursor.connection, consulta, params, executar)
+
+
+def consultar_df(conn, nome: str, params: dict, **variante) -> pd.DataFrame:
+    """Executa uma consulta registrada e devolve um DataFrame."""
+    consulta = obter_consulta(nome, **variante)
+    return _executar_com_repreparo(
+        conn, consulta, params,
+        lambda sql, valores: pd.read_sql_query(sql, conn, params=valores)
+    )
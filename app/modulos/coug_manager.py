@@ -3,8 +3,14 @@
 Módulo de Gerenciamento de COUG (Código da Unidade Gestora)
 Centraliza todas as funcionalidades relacionadas a seleção e filtro de COUGs
 """
+import logging
 from flask import request
-from .conexao_hibrida import adaptar_query, get_db_environment
+from .conexao_hibrida import adaptar_query
+from .cache_dimensoes import dimensao
+from .cubo_receita import tem_cubo_receita, tabela_receita
+from .regras_mascara import condicao_regra, tem_mascara_regras
+
+log = logging.getLogger(__name__)
 
 class COUGManager:
     """Gerencia seleção e filtros de COUG em todo o sistema"""
@@ -13,24 +19,29 @@ class COUGManager:
         self.conn = conn
         self._cache_cougs = None
 
-    def listar_cougs_com_movimento(self, filtros_conta: list = None) -> list:
-        if self._cache_cougs is not None and not filtros_conta:
+    def listar_cougs_com_movimento(self, filtros_conta: list = None, regras: list = None) -> list:
+        """
+        Lista as UGs com movimento. `regras` (chaves de REGRAS_CONTAS) usa o cubo da
+        receita quando disponível; `filtros_conta` recebe trechos SQL aplicados ao fato.
+        """
+        if self._cache_cougs is not None and not filtros_conta and not regras:
             return self._cache_cougs
 
+        cubo = bool(regras) and not filtros_conta and tem_cubo_receita()
         condicao_filtros = ""
-        if filtros_conta:
-            condicao_filtros = f"AND fs.saldo_contabil != 0 AND ({' OR '.join(filtros_conta)})"
+        if cubo:
+            condicao_filtros = f"AND ({' OR '.join(f'fs.{regra.lower()} != 0' for regra in regras)})"
+        else:
+            mascara = bool(regras) and tem_mascara_regras('fato_saldos')
+            filtros_conta = list(filtros_conta or []) + [
+                condicao_regra('fato_saldos', regra, mascara) for regra in regras or []
+            ]
+            if filtros_conta:
+                condicao_filtros = f"AND fs.saldo_contabil != 0 AND ({' OR '.join(filtros_conta)})"
         
-        # --- CORREÇÃO AQUI ---
-        type_cast = "::text" if get_db_environment() == 'postgres' else ""
-
         query_original = f"""
-        SELECT DISTINCT
-            fs.coug as codigo,
-            COALESCE(ug.noug, 'UG ' || fs.coug) as nome,
-            fs.coug || ' - ' || COALESCE(ug.noug, 'UG ' || fs.coug) as descricao_completa
-        FROM fato_saldos fs
-        LEFT JOIN dimensoes.unidades_gestoras ug ON fs.coug{type_cast} = ug.coug
+        SELECT DISTINCT fs.coug as codigo
+        FROM {tabela_receita(cubo)} fs
         WHERE fs.coug IS NOT NULL
             {condicao_filtros}
         ORDER BY fs.coug
@@ -42,38 +53,29 @@ class COUGManager:
             cursor = self.conn.cursor()
             cursor.execute(query_adaptada)
 
-            # Para compatibilidade, extrai nomes das colunas e cria dicts
-            colunas = [desc[0].lower() for desc in cursor.description]
-            cougs = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+            # Nomes das UGs vêm do cache das dimensões
+            ugs = dimensao('unidades_gestoras')
+            cougs = []
+            for (codigo,) in cursor.fetchall():
+                nome = ugs.nome(codigo, 'UG ')
+                cougs.append({'codigo': codigo, 'nome': nome, 'descricao_completa': f"{codigo} - {nome}"})
 
-            if not filtros_conta:
+            if not filtros_conta and not regras:
                 self._cache_cougs = cougs
 
             return cougs
 
         except Exception as e:
-            print(f"Erro ao buscar COUGs: {e}")
+            log.error("Erro ao buscar COUGs: %s", e)
             return []
 
     def get_nome_coug(self, coug: str) -> str:
         if not coug: return "CONSOLIDADO"
-        
-        type_cast = "::text" if get_db_environment() == 'postgres' else ""
-
-        query_original = f"""
-        SELECT COALESCE(ug.noug, 'UG ' || %s) as nome
-        FROM (SELECT %s as coug) c
-        LEFT JOIN dimensoes.unidades_gestoras ug ON c.coug{type_cast} = ug.coug
-        """
-        query_adaptada = adaptar_query(query_original)
 
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query_adaptada, (coug, coug))
-            resultado = cursor.fetchone()
-            return resultado[0] if resultado else f"UG {coug}"
+            return dimensao('unidades_gestoras').nome(coug, 'UG ')
         except Exception as e:
-            print(f"Erro em get_nome_coug: {e}")
+            log.error("Erro em get_nome_coug: %s", e)
             return f"UG {coug}"
 
     def get_coug_da_url(self) -> str | None:
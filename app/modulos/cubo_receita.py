@@ -0,0 +1,123 @@
+# app/modulos/cubo_receita.py
+"""
+Cubo pré-agregado da receita (tabela cubo_receita).
+Gerado na carga (scripts/03_conversor_saldos_receita.py) a partir de fato_saldos, com uma
+coluna de medida por regra de REGRAS_CONTAS, no grão usado pelos relatórios de receita:
+exercício, mês, UG, categoria, origem, espécie, alínea e fonte.
+Os relatórios leem o cubo quando ele existe e voltam para fato_saldos quando não existe;
+no fato, as regras são testadas pelos bits de regras_mask (ou pelas faixas de contas, nos
+bancos carregados antes da coluna).
+"""
+
+from .capacidades import capacidades
+from .regras_contabeis_receita import REGRAS_CONTAS
+from .regras_mascara import COLUNA_MASCARA, bit_regra, condicao_regra, tem_mascara_regras
+
+TABELA_CUBO = 'cubo_receita'
+
+GRAO_CUBO = [
+    'coexercicio', 'inmes', 'coug', 'categoriareceita', 'cofontereceita',
+    'cosubfontereceita', 'coalinea', 'cofonte',
+]
+
+# Uma medida por regra contábil: PREVISAO_INICIAL_LIQUIDA -> previsao_inicial_liquida
+MEDIDAS_CUBO = {regra.lower(): regra for regra in REGRAS_CONTAS}
+
+INDICES_CUBO = [
+    ("idx_cubo_periodo", "coexercicio, inmes"),
+    ("idx_cubo_ug", "coug, coexercicio"),
+    ("idx_cubo_origem", "cofontereceita, coexercicio"),
+]
+
+# Variantes de origem das consultas de receita: o cubo ou o fato, com ou sem regras_mask
+VARIANTES_ORIGEM_RECEITA = [
+    {'cubo': True, 'mascara': False},
+    {'cubo': False, 'mascara': False},
+    {'cubo': False, 'mascara': True},
+]
+
+
+def sql_criar_cubo(origem: str = 'fato_saldos', mascara: bool = False) -> str:
+    """
+    CREATE TABLE ... AS SELECT do cubo (mesmo SQL no SQLite e no PostgreSQL).
+    Com `mascara`, as regras são lidas dos bits de regras_mask em vez das faixas de contas.
+    """
+    medidas = ',\n'.join(
+        f"            SUM(CASE WHEN {condicao_regra('fato_saldos', regra, mascara, alias='')} "
+        f"THEN COALESCE(saldo_contabil, 0) ELSE 0 END) as {coluna}"
+        for coluna, regra in MEDIDAS_CUBO.items()
+    )
+    # Linhas fora de todas as regras não contribuem para nenhuma medida
+    if mascara:
+        bits = sum(bit_regra('fato_saldos', regra) for regra in MEDIDAS_CUBO.values())
+        alguma_regra = f"({COLUNA_MASCARA} & {bits}) <> 0"
+    else:
+        alguma_regra = ' OR '.join(condicao_regra('fato_saldos', regra, False, alias='')
+                                   for regra in MEDIDAS_CUBO.values())
+    grao = ', '.join(GRAO_CUBO)
+    return f"""
+        CREATE TABLE {TABELA_CUBO} AS
+        SELECT
+            {grao},
+{medidas}
+        FROM {origem}
+        WHERE {alguma_regra}
+        GROUP BY {grao}
+        """
+
+
+def construir_cubo_receita(conn, mascara: bool = False) -> int:
+    """
+    (Re)cria o cubo e seus índices na conexão informada. Retorna o número de linhas.
+    `mascara` indica que fato_saldos já tem regras_mask preenchida.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {TABELA_CUBO}")
+    cursor.execute(sql_criar_cubo(mascara=mascara))
+    for nome, colunas in INDICES_CUBO:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {TABELA_CUBO} ({colunas})")
+    cursor.execute(f"SELECT COUNT(*) FROM {TABELA_CUBO}")
+    total = cursor.fetchone()[0]
+    conn.commit()
+    return total
+
+
+def tem_cubo_receita(banco: str = 'saldos') -> bool:
+    """
+    Indica se o banco possui o cubo. Respondido pelo registro de capacidades, relido
+    a cada nova versão dos dados: o cubo criado (ou removido) por uma carga passa a
+    valer para todas as conexões, inclusive as que já estavam abertas no pool.
+    """
+    caps = capacidades(banco)
+    return caps.tem_tabela(TABELA_CUBO, caps.principal)
+
+
+def variante_origem_receita() -> dict:
+    """Variante de origem (VARIANTES_ORIGEM_RECEITA) para os dados carregados agora."""
+    cubo = tem_cubo_receita()
+    return {'cubo': cubo, 'mascara': not cubo and tem_mascara_regras('fato_saldos')}
+
+
+def tabela_receita(cubo: bool) -> str:
+    """Tabela de origem dos relatórios de receita."""
+    return TABELA_CUBO if cubo else 'fato_saldos'
+
+
+def coluna_valor(regra: str, cubo: bool, alias: str = 'fs') -> str:
+    """Coluna somada para a regra: a medida do cubo ou o saldo contábil do fato."""
+    return f"{alias}.{regra.lower()}" if cubo else f"{alias}.saldo_contabil"
+
+
+def filtro_regra(regra: str, cubo: bool, mascara: bool = False, alias: str = 'fs') -> str:
+    """Trecho 'AND <condição da regra>' para consultas no fato; vazio no cubo (a medida já é filtrada)."""
+    return "" if cubo else f"AND {condicao_regra('fato_saldos', regra, mascara, alias)}"
+
+
+def medida(regra: str, cubo: bool, alias: str = 'fs', mascara: bool = False) -> str:
+    """
+    Valor de uma regra contábil por linha da origem: a coluna do cubo ou, direto do
+    fato, o saldo das linhas da regra (bit de regras_mask com `mascara`, senão as faixas).
+    """
+    if cubo:
+        return f"COALESCE({alias}.{regra.lower()}, 0)"
+    return f"CASE WHEN {condicao_regra('fato_saldos', regra, mascara, alias)} THEN COALESCE({alias}.saldo_contabil, 0) ELSE 0 END"
@@ -0,0 +1,158 @@
+# app/modulos/esquema_postgres.py
+"""
+Esquema tipado do PostgreSQL.
+A carga original grava exercício e mês como texto e os códigos ora como texto, ora como
+número; as consultas compensam com CAST(... AS INTEGER) e ::text, o que impede o uso
+dos índices nos predicados. migrar_tipos_postgres.py converte as colunas para os tipos
+abaixo e recria índices e estatísticas; depois disso, esquema_tipado() passa a ser
+verdadeiro e o Dialeto das consultas deixa de emitir os casts.
+"""
+
+import logging
+import os
+from functools import lru_cache
+
+from .conexao_hibrida import ConexaoBanco, get_db_environment
+from .cache_resultados import versao_dados_atual
+
+log = logging.getLogger(__name__)
+
+INTEIRO = 'integer'
+TEXTO = 'varchar'
+
+_CODIGOS_RECEITA = ['coug', 'cocontacontabil', 'categoriareceita', 'cofontereceita',
+                    'cosubfontereceita', 'coalinea', 'cofonte']
+
+# (esquema, tabela) -> {coluna: tipo}
+TIPOS_ESQUEMA = {
+    ('public', 'fato_saldos'): {
+        'coexercicio': INTEIRO, 'inmes': INTEIRO, 'intipoadm': INTEIRO,
+        **{coluna: TEXTO for coluna in _CODIGOS_RECEITA},
+    },
+    ('public', 'cubo_receita'): {
+        'coexercicio': INTEIRO, 'inmes': INTEIRO,
+        **{coluna: TEXTO for coluna in _CODIGOS_RECEITA if coluna != 'cocontacontabil'},
+    },
+    ('public', 'lancamentos'): {
+        'coexercicio': INTEIRO, 'inmes': INTEIRO, 'cougcontab': TEXTO,
+        **{coluna: TEXTO for coluna in _CODIGOS_RECEITA},
+    },
+    ('public', 'fato_saldo_despesa'): {
+        'coexercicio': INTEIRO, 'inmes': INTEIRO,
+        **{coluna: TEXTO for coluna in ['coug', 'cocontacontabil', 'cofuncao', 'cosubfuncao',
+                                        'incategoria', 'comodalidade', 'cofonte']},
+    },
+    ('public', 'dim_tempo'): {'coexercicio': INTEIRO, 'inmes': INTEIRO},
+    ('dimensoes', 'categorias'): {'cocategoriareceita': TEXTO},
+    ('dimensoes', 'origens'): {'cofontereceita': TEXTO},
+    ('dimensoes', 'especies'): {'cosubfontereceita': TEXTO},
+    ('dimensoes', 'alineas'): {'coalinea': TEXTO},
+    ('dimensoes', 'fontes'): {'cofonte': TEXTO},
+    ('dimensoes', 'unidades_gestoras'): {'coug': TEXTO},
+    ('dimensoes', 'funcoes'): {'cofuncao': TEXTO},
+    ('dimensoes', 'subfuncoes'): {'cosubfuncao': TEXTO},
+}
+
+# Índices simples, usáveis pelos predicados sem cast: (esquema, tabela) -> [(nome, colunas)]
+INDICES_TIPADOS = {
+    ('public', 'fato_saldos'): [
+        ('idx_tip_saldo_periodo', 'coexercicio, inmes'),
+        ('idx_tip_saldo_ug', 'coug, coexercicio'),
+        ('idx_tip_saldo_conta', 'cocontacontabil'),
+        ('idx_tip_saldo_alinea', 'coalinea'),
+        ('idx_tip_saldo_fonte', 'cofonte'),
+        ('idx_tip_saldo_origem', 'cofontereceita, coexercicio'),
+    ],
+    ('public', 'lancamentos'): [
+        ('idx_tip_lanc_periodo', 'coexercicio, inmes'),
+        ('idx_tip_lanc_ugcontab', 'cougcontab, coalinea'),
+        ('idx_tip_lanc_ug', 'coug'),
+    ],
+    ('public', 'fato_saldo_despesa'): [
+        ('idx_tip_saldo_desp_periodo', 'coexercicio, inmes'),
+        ('idx_tip_saldo_desp_funcao', 'cofuncao, cosubfuncao'),
+        ('idx_tip_saldo_desp_ug', 'coug'),
+    ],
+    ('dimensoes', 'categorias'): [('idx_tip_categorias', 'cocategoriareceita')],
+    ('dimensoes', 'origens'): [('idx_tip_origens', 'cofontereceita')],
+    ('dimensoes', 'especies'): [('idx_tip_especies', 'cosubfontereceita')],
+    ('dimensoes', 'alineas'): [('idx_tip_alineas', 'coalinea')],
+    ('dimensoes', 'fontes'): [('idx_tip_fontes', 'cofonte')],
+    ('dimensoes', 'unidades_gestoras'): [('idx_tip_unidades_gestoras', 'coug')],
+}
+
+# Tipos do information_schema aceitos como já convertidos
+_TIPOS_ACEITOS = {
+    INTEIRO: {'integer'},
+    TEXTO: {'character varying', 'text'},
+}
+
+_NUMERICOS = {'smallint', 'integer', 'bigint', 'numeric', 'real', 'double precision'}
+
+
+def tipos_atuais(cursor) -> dict:
+    """(esquema, tabela, coluna) -> data_type das colunas mapeadas que existem no banco."""
+    cursor.execute("""
+        SELECT table_schema, table_name, column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema IN ('public', 'dimensoes')
+    """)
+    return {
+        (esquema, tabela, coluna.lower()): tipo
+        for esquema, tabela, coluna, tipo in cursor.fetchall()
+        if coluna.lower() in TIPOS_ESQUEMA.get((esquema, tabela), {})
+    }
+
+
+def colunas_pendentes(cursor) -> list:
+    """Colunas que ainda não estão no tipo do esquema: [(esquema, tabela, coluna, tipo atual, tipo alvo)]."""
+    pendentes = []
+    for (esquema, tabela, coluna), tipo in sorted(tipos_atuais(cursor).items()):
+        alvo = TIPOS_ESQUEMA[(esquema, tabela)][coluna]
+        if tipo not in _TIPOS_ACEITOS[alvo]:
+            pendentes.append((esquema, tabela, coluna, tipo, alvo))
+    return pendentes
+
+
+def sql_converter_coluna(esquema: str, tabela: str, coluna: str, tipo_atual: str, alvo: str) -> str:
+    """ALTER TABLE ... TYPE com a conversão dos valores existentes."""
+    if alvo == INTEIRO:
+        # Texto vazio vira NULL; números com casas decimais (ex.: '2025.0') são truncados
+        usando = f"NULLIF(TRIM({coluna}::text), '')::numeric::integer"
+    elif tipo_atual in _NUMERICOS:
+        # Códigos gravados como número: sem a parte decimal ('130101', não '130101.0')
+        usando = f"{coluna}::bigint::text"
+    else:
+        usando = f"{coluna}::text"
+    return f"ALTER TABLE {esquema}.{tabela} ALTER COLUMN {coluna} TYPE {alvo} USING {usando}"
+
+
+@lru_cache(maxsize=1)
+def _detectar_esquema_tipado(_versao: str) -> bool:
+    try:
+        with ConexaoBanco() as conn:
+            cursor = conn.cursor()
+            try:
+                atuais = tipos_atuais(cursor)
+                pendentes = colunas_pendentes(cursor)
+            finally:
+                cursor.close()
+    except Exception as e:
+        log.warning("⚠️ Não foi possível verificar os tipos do esquema; mantendo os casts: %s", e)
+        return False
+    tem_fato = any(chave[:2] == ('public', 'fato_saldos') for chave in atuais)
+    return tem_fato and not pendentes
+
+
+def esquema_tipado() -> bool:
+    """
+    Indica se as consultas podem dispensar os casts. Só no PostgreSQL, e só quando
+    todas as colunas mapeadas já têm o tipo do esquema. ESQUEMA_TIPADO=1/0 força o valor.
+    A verificação é refeita quando muda a versão dos dados (a migração registra uma versão).
+    """
+    if get_db_environment() != 'postgres':
+        return False
+    forcado = os.environ.get('ESQUEMA_TIPADO')
+    if forcado is not None:
+        return forcado.lower() in ('1', 'true', 'sim')
+    return _detectar_esquema_tipado(versao_dados_atual())
@@ -0,0 +1,186 @@
+# app/modulos/exportacao_tabelas.py
+"""
+Exportação de tabelas inteiras do visualizador (XLSX, CSV e Parquet) com memória limitada.
+As linhas são lidas em blocos (cursor do lado do servidor no PostgreSQL, fetchmany no
+SQLite) e escritas à medida que chegam: o CSV vai direto para a resposta; XLSX e Parquet,
+que só fecham o arquivo no final, são gravados em modo streaming num arquivo temporário
+enviado em partes. Nenhum formato monta a tabela inteira em memória.
+
+Variáveis de ambiente:
+    EXPORTACAO_LINHAS_POR_BLOCO=10000   linhas lidas do banco por vez
+"""
+
+import csv
+import io
+import logging
+import os
+import tempfile
+import uuid
+from importlib.util import find_spec
+
+from flask import Response, send_file
+
+from .conexao_hibrida import ConexaoBanco, get_db_environment
+from .capacidades import capacidades
+
+log = logging.getLogger(__name__)
+
+# Formato -> (extensão, mimetype); o Flask acrescenta charset=utf-8 aos tipos text/*
+FORMATOS = {
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+# Linhas de dados por planilha (limite do Excel, menos o cabeçalho); o excedente continua na próxima
+_LINHAS_POR_PLANILHA = 1_048_575
+
+
+def _linhas_por_bloco() -> int:
+    return int(os.environ.get('EXPORTACAO_LINHAS_POR_BLOCO', 10000))
+
+
+def formatos_disponiveis() -> list:
+    """Formatos de exportação; Parquet só com o pyarrow instalado (dependência opcional)."""
+    return [formato for formato in FORMATOS if formato != 'parquet' or find_spec('pyarrow') is not None]
+
+
+def _tabela_qualificada(db_name: str, table_name: str) -> str:
+    """Nome da tabela para o SELECT, conferido no registro de capacidades (a URL não leva SQL ao banco)."""
+    postgres = get_db_environment() == 'postgres'
+    esquema = ('dimensoes' if db_name == 'dimensoes' else 'public') if postgres else None
+    if not capacidades(db_name).tem_tabela(table_name, esquema):
+        raise ValueError(f"Tabela '{table_name}' não encontrada em {db_name}.")
+    return f'"{esquema}"."{table_name}"' if postgres else f'"{table_name}"'
+
+
+def ler_em_blocos(conn, sql: str):
+    """
+    Gera (colunas, linhas) em blocos de EXPORTACAO_LINHAS_POR_BLOCO; o primeiro bloco sai
+    mesmo sem linhas, com as colunas. No PostgreSQL usa um cursor nomeado (do lado do
+    servidor): o resultado não é trazido inteiro para o worker.
+    """
+    tamanho = _linhas_por_bloco()
+    if get_db_environment() == 'postgres':
+        cursor = conn.cursor(name=f'exportacao_{uuid.uuid4().hex[:12]}')
+        cursor.itersize = tamanho
+    else:
+        cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        linhas = cursor.fetchmany(tamanho)
+        # No cursor nomeado, a descrição só existe depois do primeiro fetch
+        colunas = [desc[0] for desc in cursor.description]
+        yield colunas, [tuple(linha) for linha in linhas]
+        while len(linhas) == tamanho:
+            linhas = cursor.fetchmany(tamanho)
+            if linhas:
+                yield colunas, [tuple(linha) for linha in linhas]
+    finally:
+        cursor.close()
+
+
+# --- ESCRITORES ---
+
+def _gerar_csv(blocos):
+    """CSV em partes, uma por bloco (separador ';' e BOM, como o Excel em português espera)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+    yield '\ufeff'.encode('utf-8')
+    for indice, (colunas, linhas) in enumerate(blocos):
+        if indice == 0:
+            escritor.writerow(colunas)
+        escritor.writerows(linhas)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _gravar_xlsx(blocos, arquivo, nome_planilha: str) -> int:
+    """XLSX no modo write-only do openpyxl: as linhas vão para o disco, não ficam na memória."""
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    planilha, ocupadas, total = None, 0, 0
+    for colunas, linhas in blocos:
+        if planilha is None:
+            planilha = livro.create_sheet(nome_planilha[:31])
+            planilha.append(colunas)
+        for linha in linhas:
+            if ocupadas == _LINHAS_POR_PLANILHA:
+                sufixo = f'_{len(livro.worksheets) + 1}'
+                planilha = livro.create_sheet(nome_planilha[:31 - len(sufixo)] + sufixo)
+                planilha.append(colunas)
+                ocupadas = 0
+            planilha.append(linha)
+            ocupadas += 1
+        total += len(linhas)
+    livro.save(arquivo)
+    return total
+
+
+def _gravar_parquet(blocos, arquivo) -> int:
+    """Parquet em row groups, um por bloco; o esquema vem do primeiro bloco (colunas só nulas viram texto)."""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor, esquema, total = None, None, 0
+    try:
+        for colunas, linhas in blocos:
+            df = pd.DataFrame.from_records(linhas, columns=colunas)
+            if esquema is None:
+                esquema = pa.Schema.from_pandas(df, preserve_index=False)
+                for i, campo in enumerate(esquema):
+                    if pa.types.is_null(campo.type):
+                        esquema = esquema.set(i, pa.field(campo.name, pa.string()))
+                escritor = pq.ParquetWriter(arquivo, esquema)
+            if linhas:
+                escritor.write_table(pa.Table.from_pandas(df, schema=esquema, preserve_index=False))
+            total += len(linhas)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
+
+
+# --- RESPOSTA ---
+
+def _nome_arquivo(db_name: str, table_name: str, formato: str) -> str:
+    return f"{db_name}_{table_name}.{FORMATOS[formato][0]}"
+
+
+def resposta_exportacao(db_name: str, table_name: str, formato: str = 'xlsx'):
+    """
+    Resposta da exportação da tabela no formato pedido. Levanta ValueError para
+    formato indisponível ou tabela inexistente (antes de ler qualquer linha).
+    """
+    formato = (formato or 'xlsx').lower()
+    if formato not in formatos_disponiveis():
+        raise ValueError(f"Formato '{formato}' indisponível. Use: {', '.join(formatos_disponiveis())}.")
+    sql = f"SELECT * FROM {_tabela_qualificada(db_name, table_name)}"
+    nome = _nome_arquivo(db_name, table_name, formato)
+
+    if formato == 'csv':
+        def gerar():
+            # A conexão fica com o gerador e volta ao pool quando a resposta termina (ou é interrompida)
+            with ConexaoBanco(db_name) as conn:
+                yield from _gerar_csv(ler_em_blocos(conn, sql))
+
+        return Response(gerar(), mimetype=FORMATOS['csv'][1],
+                        headers={'Content-Disposition': f'attachment; filename="{nome}"'})
+
+    # Removido pelo sistema ao ser fechado (o send_file fecha ao fim do envio)
+    arquivo = tempfile.TemporaryFile(suffix=f'.{formato}')
+    try:
+        with ConexaoBanco(db_name) as conn:
+            if formato == 'xlsx':
+                total = _gravar_xlsx(ler_em_blocos(conn, sql), arquivo, table_name)
+            else:
+                total = _gravar_parquet(ler_em_blocos(conn, sql), arquivo)
+        arquivo.seek(0)
+    except Exception:
+        arquivo.close()
+        raise
+    log.info("Exportação de %s.%s em %s: %d linhas", db_name, table_name, formato, total)
+    return send_file(arquivo, mimetype=FORMATOS[formato][1], as_attachment=True, download_name=nome)
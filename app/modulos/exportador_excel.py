@@ -0,0 +1,111 @@
+# app/modulos/exportador_excel.py
+"""
+Exportação de relatórios para Excel: uma pasta de trabalho com várias planilhas.
+A pasta é escrita no modo write-only do openpyxl, linha a linha. O formato de cada
+coluna (moeda, percentual, texto) vira um estilo nomeado, registrado uma vez na
+pasta; as células só apontam para o estilo da sua coluna, sem o laço que formatava
+célula por célula depois da escrita. Linhas de destaque (totais e agrupadores)
+usam a variante em negrito do mesmo estilo.
+"""
+
+from io import BytesIO
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Formato da coluna -> (formato numérico do Excel, largura padrão)
+FORMATOS_COLUNA = {
+    'texto': ('General', 15),
+    'moeda': ('R$ #,##0.00', 22),
+    'percentual': ('0.00%', 15),
+    'inteiro': ('0', 10),
+}
+
+_COR_CABECALHO = '1F4E78'
+
+
+class Coluna:
+    """
+    Coluna de uma planilha.
+
+    Args:
+        titulo: Texto do cabeçalho
+        valor: Chave do item ou função item -> valor da célula
+        formato: Chave de FORMATOS_COLUNA
+        largura: Largura da coluna (padrão: a do formato)
+    """
+
+    def __init__(self, titulo: str, valor: Union[str, Callable[[Dict], object]],
+                 formato: str = 'texto', largura: Optional[float] = None):
+        self.titulo = titulo
+        self.valor = valor if callable(valor) else (lambda item, chave=valor: item.get(chave))
+        self.formato = formato
+        self.largura = largura or FORMATOS_COLUNA[formato][1]
+
+
+class PastaExcel:
+    """Pasta de trabalho com várias planilhas, formatadas por coluna."""
+
+    def __init__(self):
+        self.livro = Workbook(write_only=True)
+        self._registrar_estilos()
+
+    def _registrar_estilos(self):
+        """Um estilo por (formato, destaque) e o do cabeçalho, registrados uma vez."""
+        for formato, (numero, _) in FORMATOS_COLUNA.items():
+            for destaque in (False, True):
+                estilo = NamedStyle(name=self._nome_estilo(formato, destaque), number_format=numero)
+                estilo.font = Font(bold=destaque)
+                self.livro.add_named_style(estilo)
+        cabecalho = NamedStyle(name='cabecalho')
+        cabecalho.font = Font(bold=True, color='FFFFFF')
+        cabecalho.fill = PatternFill('solid', fgColor=_COR_CABECALHO)
+        cabecalho.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        self.livro.add_named_style(cabecalho)
+
+    @staticmethod
+    def _nome_estilo(formato: str, destaque: bool) -> str:
+        return f'{formato}_destaque' if destaque else formato
+
+    def adicionar_planilha(self, titulo: str, colunas: List[Coluna], itens: Iterable[Dict],
+                           destaque: Optional[Callable[[Dict], bool]] = None) -> int:
+        """
+        Escreve uma planilha: cabeçalho congelado com filtro, larguras e formatos das colunas.
+        destaque: função item -> bool para as linhas em negrito (totais, agrupadores).
+        Retorna o número de linhas de dados.
+        """
+        planilha = self.livro.create_sheet(titulo[:31])
+        for indice, coluna in enumerate(colunas, start=1):
+            planilha.column_dimensions[get_column_letter(indice)].width = coluna.largura
+        planilha.freeze_panes = 'A2'
+
+        def celula(valor, estilo):
+            cell = WriteOnlyCell(planilha, value=valor)
+            cell.style = estilo
+            return cell
+
+        planilha.append([celula(coluna.titulo, 'cabecalho') for coluna in colunas])
+        # Estilos resolvidos uma vez por coluna; por célula, só a referência ao estilo
+        estilos = {
+            variante: [self._nome_estilo(coluna.formato, variante) for coluna in colunas]
+            for variante in (False, True)
+        }
+        total = 0
+        for item in itens:
+            nomes = estilos[bool(destaque and destaque(item))]
+            planilha.append([celula(coluna.valor(item), nome) for coluna, nome in zip(colunas, nomes)])
+            total += 1
+        planilha.auto_filter.ref = f'A1:{get_column_letter(len(colunas))}{total + 1}'
+        return total
+
+    def salvar(self) -> BytesIO:
+        """Grava a pasta num buffer posicionado no início, pronto para o send_file."""
+        saida = BytesIO()
+        self.livro.save(saida)
+        saida.seek(0)
+        return saida
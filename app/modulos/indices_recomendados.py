@@ -0,0 +1,75 @@
+# app/modulos/indices_recomendados.py
+"""
+Índices das tabelas de fatos criados pelos conversores (scripts/0x_conversor_*.py).
+O conjunto padrão abaixo saiu do assessor de índices (scripts/assessor_indices.py);
+rodado com --gravar, o assessor grava o conjunto levantado sobre os dados atuais em
+dados/db/indices_recomendados.json, que passa a valer na próxima carga.
+"""
+
+import json
+import logging
+import os
+
+from .conexao_hibrida import _BASE_PATH_SQLITE
+
+log = logging.getLogger(__name__)
+
+# Tabela de fatos -> prefixo dos nomes de índice (o mesmo dos conversores)
+TABELAS_FATO = {
+    'fato_saldos': 'saldo',
+    'lancamentos': 'lancamento',
+    'fato_saldo_despesa': 'saldo_desp',
+    'fato_lancamento_despesa': 'lanc_desp',
+}
+
+# Conjunto criado pelos conversores, levantado pelo assessor sobre a carga atual. Os
+# índices de uma coluna só (inclusive os de valor, que nenhum plano usava) deram lugar
+# a compostos na ordem dos predicados e cobrindo as colunas lidas pelos relatórios.
+# Os de regras_mask são criados junto com a coluna (regras_mascara.py).
+INDICES_RECOMENDADOS = {
+    'fato_saldos': [
+        ('idx_saldo_exercicio_mes_cob', 'coexercicio, inmes, regras_mask, saldo_contabil'),
+        ('idx_saldo_exercicio_fontereceita_cob',
+         'coexercicio, cofontereceita, cosubfontereceita, inmes, regras_mask, saldo_contabil'),
+    ],
+    'dim_tempo': [
+        ('idx_tempo_periodo', 'coexercicio, inmes'),
+    ],
+    'lancamentos': [
+        ('idx_lancamento_exercicio_alinea_subfontereceita_mes', 'coexercicio, coalinea, cosubfontereceita, inmes'),
+        ('idx_lancamento_exercicio_alinea_ugcontab_mes', 'coexercicio, coalinea, cougcontab, inmes'),
+    ],
+    'fato_saldo_despesa': [
+        ('idx_saldo_desp_exercicio_mes_cob', 'coexercicio, inmes, regras_mask, saldo_contabil_despesa'),
+        ('idx_saldo_desp_exercicio_categoria_cob',
+         'coexercicio, incategoria, comodalidade, inmes, regras_mask, saldo_contabil_despesa'),
+    ],
+    # Sem consultas dos relatórios por enquanto: só o período
+    'fato_lancamento_despesa': [
+        ('idx_lanc_desp_periodo', 'coexercicio, inmes'),
+    ],
+}
+
+# Gravado pelo assessor (--gravar); quando existe, os conversores usam este conjunto
+ARQUIVO_RECOMENDADOS = os.path.join(_BASE_PATH_SQLITE, 'indices_recomendados.json')
+
+
+def indices_recomendados(tabela: str) -> list:
+    """[(nome, colunas)] a criar na tabela: o arquivo gravado pelo assessor ou o conjunto padrão."""
+    if os.path.exists(ARQUIVO_RECOMENDADOS):
+        try:
+            with open(ARQUIVO_RECOMENDADOS, 'r', encoding='utf-8') as f:
+                gravados = json.load(f)
+            if tabela in gravados:
+                return [tuple(indice) for indice in gravados[tabela]]
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ Índices recomendados inválidos (%s); usando o conjunto padrão: %s", ARQUIVO_RECOMENDADOS, e)
+    return list(INDICES_RECOMENDADOS.get(tabela, []))
+
+
+def gravar_recomendados(conjunto: dict):
+    """Grava o conjunto {tabela: [(nome, colunas)]} usado pelas próximas cargas."""
+    temporario = ARQUIVO_RECOMENDADOS + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(conjunto, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, ARQUIVO_RECOMENDADOS)
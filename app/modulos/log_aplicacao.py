@@ -0,0 +1,267 @@
+# app/modulos/log_aplicacao.py
+"""
+Logs da aplicação, no lugar dos print() de diagnóstico.
+Cada módulo usa logging.getLogger(__name__); aqui ficam os níveis por módulo, o limite
+de mensagens DEBUG por ponto do código e os campos estruturados (rota, UG, duração).
+As mensagens vão para uma fila e são escritas por uma thread própria: a requisição
+não espera pela saída padrão do gunicorn. Nos níveis de produção, as chamadas de
+DEBUG param no teste de nível do logger, sem montar a mensagem.
+
+Variáveis de ambiente:
+    LOG_NIVEL=INFO                  nível padrão dos módulos da aplicação
+    LOG_NIVEIS=modulo=NIVEL,...     níveis por módulo (ex.: relatorio_receita_fonte=DEBUG,conexao_hibrida=WARNING)
+    LOG_FORMATO=texto               'texto' ou 'json' (uma linha JSON por mensagem)
+    LOG_DEBUG_POR_SEGUNDO=20        mensagens DEBUG por ponto do código e segundo; o excedente é contado (0 = sem limite)
+    LOG_REQUISICAO_LENTA_MS=2000    requisições acima do limiar são registradas em WARNING; as demais, em DEBUG
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from flask import g, has_request_context, request
+
+# Loggers raiz da aplicação (app.*, database.py e config.py)
+_RAIZES = ('app', 'database', 'config')
+
+# Campos estruturados acrescentados ao texto da mensagem, nesta ordem
+CAMPOS = ('rota', 'coug', 'duracao_ms', 'status', 'suprimidas')
+
+_lock = threading.Lock()
+_listener = None
+_contagem = {}       # nível -> mensagens emitidas
+_suprimidas = 0      # mensagens DEBUG descartadas pelo limite
+
+log_requisicoes = logging.getLogger('app.requisicoes')
+
+
+def _nivel(texto, padrao=logging.INFO) -> int:
+    nivel = logging.getLevelName(str(texto).strip().upper())
+    return nivel if isinstance(nivel, int) else padrao
+
+
+def _nome_logger(modulo: str) -> str:
+    """Aceita o nome curto do módulo (relatorio_receita_fonte) ou o completo (app.modulos....)."""
+    modulo = modulo.strip()
+    if modulo.split('.')[0] in _RAIZES:
+        return modulo
+    for pacote in ('app.modulos', 'app.relatorios', 'app'):
+        nome = f'{pacote}.{modulo}'
+        if nome in logging.root.manager.loggerDict:
+            return nome
+    return f'app.modulos.{modulo}'
+
+
+def niveis_configurados() -> dict:
+    """Níveis pedidos em LOG_NIVEIS: {nome do logger: nível}."""
+    niveis = {}
+    for item in os.environ.get('LOG_NIVEIS', '').split(','):
+        if '=' in item:
+            modulo, nivel = item.split('=', 1)
+            niveis[_nome_logger(modulo)] = _nivel(nivel)
+    return niveis
+
+
+# --- FILTROS ---
+
+class _CamposRequisicao(logging.Filter):
+    """Acrescenta a rota e a UG da requisição em andamento (roda na thread que gerou a mensagem)."""
+
+    def filter(self, record):
+        if has_request_context():
+            if not hasattr(record, 'rota'):
+                record.rota = request.endpoint or request.path
+            if not hasattr(record, 'coug'):
+                coug = request.args.get('coug')
+                if coug:
+                    record.coug = coug
+        return True
+
+
+class _LimiteDebug(logging.Filter):
+    """
+    Limita as mensagens DEBUG de cada ponto do código (logger e linha) a N por segundo.
+    As descartadas são contadas e informadas na próxima mensagem aceita do mesmo ponto.
+    """
+
+    def __init__(self, por_segundo: int):
+        super().__init__()
+        self.por_segundo = por_segundo
+        self._janelas = {}   # (logger, linha) -> [início da janela, aceitas, descartadas]
+
+    def filter(self, record):
+        global _suprimidas
+        if record.levelno > logging.DEBUG or self.por_segundo <= 0:
+            return True
+        agora = time.monotonic()
+        with _lock:
+            janela = self._janelas.get((record.name, record.lineno))
+            if janela is None or agora - janela[0] >= 1.0:
+                descartadas = janela[2] if janela else 0
+                self._janelas[(record.name, record.lineno)] = [agora, 1, 0]
+                if descartadas:
+                    record.suprimidas = descartadas
+                return True
+            if janela[1] < self.por_segundo:
+                janela[1] += 1
+                return True
+            janela[2] += 1
+            _suprimidas += 1
+            return False
+
+
+class _Contagem(logging.Filter):
+    """Conta as mensagens emitidas por nível (métricas do /visualizador/logs)."""
+
+    def filter(self, record):
+        with _lock:
+            _contagem[record.levelname] = _contagem.get(record.levelname, 0) + 1
+        return True
+
+
+# --- FILA ---
+
+class _Fila(logging.handlers.QueueHandler):
+    """
+    Entrega a mensagem já montada à thread de escrita, com o traceback em exc_text
+    (o QueueHandler padrão o junta ao texto, e o formato JSON perderia o campo 'excecao').
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# --- FORMATOS ---
+
+class FormatoTexto(logging.Formatter):
+    """Linha de texto com os campos estruturados ao final: [rota=... coug=... duracao_ms=...]."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        texto = super().format(record)
+        campos = ' '.join(f'{campo}={getattr(record, campo)}' for campo in CAMPOS if hasattr(record, campo))
+        if not campos:
+            return texto
+        primeira, _, resto = texto.partition('\n')
+        return f'{primeira} [{campos}]' + (f'\n{resto}' if resto else '')
+
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por mensagem, para coletores de log."""
+
+    def format(self, record):
+        item = {
+            'quando': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'modulo': record.name,
+            'mensagem': record.getMessage(),
+            'pid': record.process,
+        }
+        for campo in CAMPOS:
+            if hasattr(record, campo):
+                item[campo] = getattr(record, campo)
+        if record.exc_text:
+            item['excecao'] = record.exc_text
+        return json.dumps(item, ensure_ascii=False, default=str)
+
+
+# --- CONFIGURAÇÃO ---
+
+def configurar_logs():
+    """
+    Configura os loggers da aplicação (uma vez por processo): níveis, fila com a thread
+    de escrita em stderr, filtros e formato. Chamado pelo create_app().
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        saida = logging.StreamHandler(sys.stderr)
+        saida.setFormatter(FormatoJSON() if os.environ.get('LOG_FORMATO', 'texto').lower() == 'json' else FormatoTexto())
+
+        fila = _Fila(queue.SimpleQueue())
+        fila.addFilter(_LimiteDebug(int(os.environ.get('LOG_DEBUG_POR_SEGUNDO', 20))))
+        fila.addFilter(_CamposRequisicao())
+        fila.addFilter(_Contagem())
+
+        nivel_padrao = _nivel(os.environ.get('LOG_NIVEL', 'INFO'))
+        for raiz in _RAIZES:
+            logger = logging.getLogger(raiz)
+            logger.setLevel(nivel_padrao)
+            logger.addHandler(fila)
+            logger.propagate = False
+        for nome, nivel in niveis_configurados().items():
+            logging.getLogger(nome).setLevel(nivel)
+
+        _listener = logging.handlers.QueueListener(fila.queue, saida, respect_handler_level=True)
+        _listener.start()
+    atexit.register(_listener.stop)
+
+
+def definir_nivel(modulo: str, nivel: str) -> str:
+    """Troca o nível de um módulo com a aplicação no ar. Retorna o nome do logger alterado."""
+    nome = _nome_logger(modulo)
+    logging.getLogger(nome).setLevel(_nivel(nivel))
+    return nome
+
+
+def _iniciar_requisicao():
+    g.inicio_log = time.perf_counter()
+
+
+def _finalizar_requisicao(response):
+    inicio = g.pop('inicio_log', None)
+    if inicio is None:
+        return response
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    if duracao_ms >= float(os.environ.get('LOG_REQUISICAO_LENTA_MS', 2000)):
+        log_requisicoes.warning("Requisição lenta: %s", request.full_path.rstrip('?'),
+                                extra={'duracao_ms': round(duracao_ms, 1), 'status': response.status_code})
+    elif log_requisicoes.isEnabledFor(logging.DEBUG):
+        log_requisicoes.debug("%s %s", request.method, request.full_path.rstrip('?'),
+                              extra={'duracao_ms': round(duracao_ms, 1), 'status': response.status_code})
+    return response
+
+
+def instalar_logs(app):
+    """Configura os logs e registra a medição das requisições na aplicação Flask."""
+    configurar_logs()
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_finalizar_requisicao)
+
+
+# --- MÉTRICAS ---
+
+def estatisticas_log() -> dict:
+    """Níveis efetivos, mensagens emitidas por nível e DEBUG descartadas pelo limite."""
+    niveis = {
+        nome: logging.getLevelName(logger.level)
+        for nome, logger in sorted(logging.root.manager.loggerDict.items())
+        if isinstance(logger, logging.Logger) and logger.level and nome.split('.')[0] in _RAIZES
+    }
+    with _lock:
+        contagem = dict(_contagem)
+        suprimidas = _suprimidas
+    return {
+        'ativo': _listener is not None,
+        'niveis': niveis,
+        'mensagens': contagem,
+        'debug_suprimidas': suprimidas,
+        'fila': _listener.queue.qsize() if _listener is not None else 0,
+    }
@@ -1,301 +1,121 @@
 # app/modulos/modal_lancamentos.py
 """
 Módulo para gerenciar o modal de lançamentos
-Permite visualizar lançamentos detalhados com filtros dinâmicos
+Permite visualizar lançamentos detalhados com filtros dinâmicos.
+O drill-down responde em duas fases: o resumo (/relatorios/api/lancamentos/resumo) traz
+quantidade, total líquido e quebras por evento e por conta, agregados no banco; as linhas
+(/relatorios/api/lancamentos/pagina) só vêm quando pedidas, uma página por vez com cursor
+de keyset sobre (nudocumento, coevento, linha), lidas do cursor em blocos e enviadas em
+streaming (NDJSON ou JSON) à medida que chegam.
 """
 
-import sqlite3
-from typing import Dict, List, Optional, Any
-from flask import jsonify
+import base64
+import json
+import logging
+import os
+import uuid
+from typing import Dict, List
+from flask import Response
+from app.modulos.conexao_hibrida import ConexaoBanco, get_db_environment
+from app.modulos.consultas import registrar_consulta, executar_consulta
 from app.modulos.formatacao import formatar_moeda
+from app.modulos.regras_mascara import condicao_regra
 
+log = logging.getLogger(__name__)
 
-class ModalLancamentos:
-    """Gerencia a exibição de lançamentos em modal"""
-    
-    def __init__(self, conn: sqlite3.Connection):
-        self.conn = conn
-        
-    def buscar_lancamentos(self, filtros: Dict[str, Any]) -> List[Dict]:
-        """
-        Busca lançamentos com base nos filtros fornecidos
-        
-        Args:
-            filtros: Dicionário com os filtros a aplicar
-                - ano: Ano de exercício
-                - mes: Mês limite (até)
-                - coug: Código da unidade gestora (opcional)
-                - cat_id: ID da categoria
-                - fonte_id: ID da fonte
-                - subfonte_id: ID da subfonte
-                - alinea_id: ID da alínea
-                - coalinea: Código da alínea (para relatório por fonte)
-                - cofonte: Código da fonte (para relatório por fonte)
-                
-        Returns:
-            Lista de lançamentos encontrados
-        """
-        # Monta a query base
-        query = """
-            SELECT 
-                COUG,
-                COCONTACONTABIL,
-                NUDOCUMENTO,
-                COEVENTO,
-                INDEBITOCREDITO,
-                VALANCAMENTO
-            FROM lancamentos_db.lancamentos
-            WHERE COEXERCICIO = ?
-              AND INMES <= ?
-        """
-        
-        params = [filtros['ano'], filtros['mes']]
-        
-        # Adiciona filtros opcionais
-        if filtros.get('cat_id'):
-            query += " AND CATEGORIARECEITA = ?"
-            params.append(filtros['cat_id'])
-            
-        if filtros.get('fonte_id'):
-            query += " AND COFONTERECEITA = ?"
-            params.append(filtros['fonte_id'])
-            
-        if filtros.get('subfonte_id'):
-            query += " AND COSUBFONTERECEITA = ?"
-            params.append(filtros['subfonte_id'])
-            
-        if filtros.get('alinea_id'):
-            query += " AND COALINEA = ?"
-            params.append(filtros['alinea_id'])
-            
-        # Filtros específicos para relatório por fonte
-        if filtros.get('coalinea'):
-            query += " AND COALINEA = ?"
-            params.append(filtros['coalinea'])
-            
-        if filtros.get('cofonte'):
-            query += " AND COFONTERECEITA = ?"
-            params.append(filtros['cofonte'])
-            
-        # Filtro de conta contábil para receitas
-        query += " AND COCONTACONTABIL BETWEEN '621200000' AND '621399999'"
-        
-        # Filtro de documento do ano
-        query += f" AND NUDOCUMENTO LIKE '{filtros['ano']}%'"
-        
-        # Filtro de COUG se fornecido
-        if filtros.get('coug'):
-            query += " AND COUGCONTAB = ?"
-            params.append(filtros['coug'])
-            
-        query += " ORDER BY COEVENTO, VALANCAMENTO DESC"
-        
-        try:
-            cursor = self.conn.execute(query, params)
-            lancamentos = []
-            
-            for row in cursor:
-                lancamentos.append({
-                    'COUG': row['COUG'],
-                    'COCONTACONTABIL': row['COCONTACONTABIL'],
-                    'NUDOCUMENTO': row['NUDOCUMENTO'],
-                    'COEVENTO': row['COEVENTO'],
-                    'INDEBITOCREDITO': row['INDEBITOCREDITO'],
-                    'VALANCAMENTO': row['VALANCAMENTO']
-                })
-                
-            return lancamentos
-            
-        except Exception as e:
-            print(f"Erro ao buscar lançamentos: {e}")
-            return []
-    
-    def calcular_total_liquido(self, lancamentos: List[Dict]) -> float:
-        """
-        Calcula o total líquido dos lançamentos
-        
-        Args:
-            lancamentos: Lista de lançamentos
-            
-        Returns:
-            Total líquido (créditos - débitos)
-        """
-        total = 0.0
-        
-        for lancamento in lancamentos:
-            dc = lancamento.get('INDEBITOCREDITO', '')
-            valor = float(lancamento.get('VALANCAMENTO', 0))
-            
-            if dc == 'C':
-                total += valor
-            elif dc == 'D':
-                total -= valor
-                
-        return total
-    
-    def formatar_lancamentos_para_modal(self, lancamentos: List[Dict], 
-                                      valor_relatorio: Optional[float] = None) -> Dict:
-        """
-        Formata os lançamentos para exibição no modal
-        
-        Args:
-            lancamentos: Lista de lançamentos
-            valor_relatorio: Valor apurado no relatório (opcional)
-            
-        Returns:
-            Dicionário com dados formatados para o modal
-        """
-        if not lancamentos:
-            return {
-                'tem_dados': False,
-                'mensagem': 'Nenhum lançamento encontrado para este item com os filtros aplicados.'
-            }
-        
-        # Calcula o total
-        total_liquido = self.calcular_total_liquido(lancamentos)
-        
-        # Formata cada lançamento
-        lancamentos_formatados = []
-        for lanc in lancamentos:
-            lancamentos_formatados.append({
-                'coug': lanc['COUG'] or '',
-                'conta_contabil': lanc['COCONTACONTABIL'] or '',
-                'documento': lanc['NUDOCUMENTO'] or '',
-                'evento': lanc['COEVENTO'] or '',
-                'dc': lanc['INDEBITOCREDITO'] or '',
-                'valor': lanc['VALANCAMENTO'],
-                'valor_formatado': formatar_moeda(lanc['VALANCAMENTO'])
-            })
-        
-        return {
-            'tem_dados': True,
-            'lancamentos': lancamentos_formatados,
-            'total_liquido': total_liquido,
-            'total_liquido_formatado': formatar_moeda(total_liquido),
-            'quantidade': len(lancamentos),
-            'valor_relatorio': valor_relatorio,
-            'valor_relatorio_formatado': formatar_moeda(valor_relatorio) if valor_relatorio else None
-        }
-    
-    def gerar_html_tabela(self, dados_formatados: Dict) -> str:
+# Parâmetro da requisição -> coluna de lancamentos, por origem do drill-down
+FILTROS_DRILLDOWN = {
+    'balanco': {
+        'cat_id': 'categoriareceita',
+        'fonte_id': 'cofontereceita',
+        'subfonte_id': 'cosubfontereceita',
+        'alinea_id': 'coalinea',
+        'coalinea': 'coalinea',
+        'cofonte': 'cofontereceita',
+        'coug': 'cougcontab',
+    },
+    'receita_fonte': {
+        'coug': 'cougcontab',
+        'coalinea': 'coalinea',
+        'cofonte': 'cofonte',
+    },
+}
+_VARIANTES_DRILLDOWN = [
+    {'origem': 'balanco', 'filtros': ('alinea_id', 'cat_id', 'coug', 'fonte_id', 'subfonte_id')},
+    {'origem': 'receita_fonte', 'filtros': ('coalinea', 'cofonte', 'coug')},
+    {'origem': 'receita_fonte', 'filtros': ('coalinea', 'coug')},
+]
+_MAXIMO_POR_PAGINA = 5000
+# Linhas lidas do cursor por vez ao montar a página
+_LINHAS_POR_BLOCO = 500
+
+
+def _lancamentos_por_pagina() -> int:
+    """Tamanho padrão da página do drill-down (LANCAMENTOS_POR_PAGINA)."""
+    return int(os.environ.get('LANCAMENTOS_POR_PAGINA', 500))
+
+
+def _where_drilldown(d, origem, filtros) -> str:
+    condicoes = [
+        f"{d.int('coexercicio')} = :ano",
+        f"{d.int('inmes')} <= :mes",
+        # lancamentos não tem regras_mask: a regra é testada pelas faixas de contas
+        condicao_regra('fato_saldos', 'RECEITA_LIQUIDA', False, alias=''),
+    ]
+    if origem == 'balanco':
+        # Só documentos do próprio exercício, como no modal do balanço
+        condicoes.append("nudocumento LIKE :prefixo_documento")
+    condicoes += [f"{FILTROS_DRILLDOWN[origem][parametro]} = :{parametro}" for parametro in filtros]
+    return '\n              AND '.join(condicoes)
+
+
+@registrar_consulta('lancamentos_pagina', variantes=[
+    {**variante, 'com_cursor': com_cursor} for variante in _VARIANTES_DRILLDOWN for com_cursor in (False, True)
+])
+def _consulta_pagina(d, origem='balanco', filtros=(), com_cursor=False):
+    id_linha = d.id_linha()
+    cursor_keyset = (f"AND (nudocumento, coevento, {id_linha}) > (:apos_documento, :apos_evento, :apos_linha)"
+                     if com_cursor else "")
+    return f"""
+        SELECT
+            cocontacontabil, coug, nudocumento, coevento, indebitocredito, valancamento,
+            {id_linha} as linha
+        FROM lancamentos_db.lancamentos
+        WHERE {_where_drilldown(d, origem, filtros)}
+          {cursor_keyset}
+        ORDER BY nudocumento, coevento, {id_linha}
+        LIMIT :limite
         """
-        Gera o HTML da tabela de lançamentos
-        
-        Args:
-            dados_formatados: Dados formatados pelo método formatar_lancamentos_para_modal
-            
-        Returns:
-            String HTML da tabela
+
+
+@registrar_consulta('lancamentos_resumo', variantes=_VARIANTES_DRILLDOWN)
+def _consulta_resumo(d, origem='balanco', filtros=()):
+    # Um só agregado por (evento, conta): dele saem o total e as duas quebras
+    return f"""
+        SELECT
+            coevento,
+            cocontacontabil,
+            COUNT(*) as quantidade,
+            SUM(CASE WHEN indebitocredito = 'C' THEN valancamento ELSE 0 END) as creditos,
+            SUM(CASE WHEN indebitocredito = 'D' THEN valancamento ELSE 0 END) as debitos
+        FROM lancamentos_db.lancamentos
+        WHERE {_where_drilldown(d, origem, filtros)}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
         """
-        if not dados_formatados['tem_dados']:
-            return f'<p>{dados_formatados["mensagem"]}</p>'
-        
-        html = '<div class="modal-info-container">'
-        
-        # Valor apurado no relatório (apenas se fornecido)
-        if dados_formatados.get('valor_relatorio_formatado'):
-            html += f'''
-                <div class="valor-apurado-info">
-                    <strong>Valor Apurado no Relatório:</strong> {dados_formatados['valor_relatorio_formatado']}
-                </div>
-            '''
-        
-        html += '</div>'
-        
-        # Tabela de lançamentos
-        html += '''
-        <div class="table-container">
-            <table class="lancamentos-table">
-                <colgroup>
-                    <col class="col-conta"><col class="col-ug"><col class="col-doc">
-                    <col class="col-evento"><col class="col-dc"><col class="col-valor">
-                </colgroup>
-                <thead>
-                    <tr>
-                        <th>Conta Contábil</th><th>UG Emitente</th><th>Documento</th>
-                        <th>Evento</th><th>D/C</th><th>Valor</th>
-                    </tr>
-                </thead>
-                <tbody>
-        '''
-        
-        for lanc in dados_formatados['lancamentos']:
-            html += f'''
-                <tr>
-                    <td>{lanc['conta_contabil']}</td>
-                    <td>{lanc['coug']}</td>
-                    <td>{lanc['documento']}</td>
-                    <td>{lanc['evento']}</td>
-                    <td>{lanc['dc']}</td>
-                    <td>{lanc['valor_formatado']}</td>
-                </tr>
-            '''
-        
-        html += f'''
-                </tbody>
-                <tfoot>
-                    <tr>
-                        <td colspan="5">Total Líquido dos Lançamentos:</td>
-                        <td>{dados_formatados['total_liquido_formatado']}</td>
-                    </tr>
-                </tfoot>
-            </table>
-        </div>
-        '''
-        
-        return html
 
 
-# Funções auxiliares para facilitar o uso
+def codificar_cursor(documento, evento, linha) -> str:
+    """Cursor opaco da próxima página (base64 da última chave lida)."""
+    return base64.urlsafe_b64encode(json.dumps([documento, evento, linha]).encode('utf-8')).decode('ascii')
 
-def processar_requisicao_lancamentos(conn: sqlite3.Connection, request_args: dict) -> Dict:
-    """
-    Processa uma requisição de lançamentos e retorna os dados formatados
-    
-    Args:
-        conn: Conexão com o banco de dados
-        request_args: Argumentos da requisição (request.args)
-        
-    Returns:
-        Dicionário com os lançamentos formatados ou erro
-    """
+
+def decodificar_cursor(cursor: str):
     try:
-        # Extrai os filtros da requisição
-        filtros = {
-            'ano': request_args.get('ano', type=int),
-            'mes': request_args.get('mes', type=int),
-            'coug': request_args.get('coug', ''),
-            'cat_id': request_args.get('cat_id'),
-            'fonte_id': request_args.get('fonte_id'),
-            'subfonte_id': request_args.get('subfonte_id'),
-            'alinea_id': request_args.get('alinea_id'),
-            'coalinea': request_args.get('coalinea'),
-            'cofonte': request_args.get('cofonte')
-        }
-        
-        # Valida filtros obrigatórios
-        if not filtros['ano'] or not filtros['mes']:
-            return {'erro': 'Ano e mês são obrigatórios'}
-        
-        # Cria instância do modal
-        modal = ModalLancamentos(conn)
-        
-        # Busca os lançamentos
-        lancamentos = modal.buscar_lancamentos(filtros)
-        
-        # Pega o valor do relatório se fornecido
-        valor_relatorio = request_args.get('valor_relatorio', type=float)
-        
-        # Formata para o modal
-        dados_formatados = modal.formatar_lancamentos_para_modal(lancamentos, valor_relatorio)
-        
-        # Adiciona o HTML da tabela
-        dados_formatados['html_tabela'] = modal.gerar_html_tabela(dados_formatados)
-        
-        return dados_formatados
-        
-    except Exception as e:
-        return {'erro': str(e)}
+        documento, evento, linha = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Cursor de paginação inválido')
+    return documento, evento, linha
 
 
 def gerar_botao_lancamentos(tem_lancamentos: bool, coug_selecionada: str, 
@@ -324,4 +144,198 @@ def gerar_botao_lancamentos(tem_lancamentos: bool, coug_selecionada: str,
             data-params='{params_json}'>
         Lançamentos
     </button>
-    '''
\ No newline at end of file
+    '''
+
+def _filtros_drilldown(request_args):
+    """Variante das consultas do drill-down e parâmetros comuns (ano, mês e filtros da origem)."""
+    ano = request_args.get('ano', type=int)
+    mes = request_args.get('mes', type=int)
+    if not ano or not mes:
+        raise ValueError('Ano e mês são obrigatórios')
+    origem = request_args.get('origem', 'balanco')
+    if origem not in FILTROS_DRILLDOWN:
+        raise ValueError(f"Origem inválida: {origem}")
+
+    params = {'ano': ano, 'mes': mes, 'prefixo_documento': f"{ano}%"}
+    filtros = []
+    for parametro in sorted(FILTROS_DRILLDOWN[origem]):
+        valor = request_args.get(parametro)
+        if valor:
+            filtros.append(parametro)
+            params[parametro] = valor
+    return {'origem': origem, 'filtros': tuple(filtros)}, params
+
+
+def _quebra(grupos: Dict, chave: str) -> List[Dict]:
+    linhas = []
+    for codigo, valores in grupos.items():
+        liquido = valores['creditos'] - valores['debitos']
+        linhas.append({
+            chave: codigo if codigo is not None else '',
+            'quantidade': valores['quantidade'],
+            'creditos': valores['creditos'],
+            'debitos': valores['debitos'],
+            'total_liquido': liquido,
+            'total_liquido_formatado': formatar_moeda(liquido)
+        })
+    return sorted(linhas, key=lambda linha: -abs(linha['total_liquido']))
+
+
+def buscar_resumo_lancamentos(conn, request_args) -> Dict:
+    """
+    Primeira fase do drill-down: quantidade, total líquido e quebras por evento e por conta
+    contábil, calculados no banco, sem trazer os lançamentos. As linhas ficam para
+    buscar_pagina_lancamentos, pedidas só quando o usuário abre o detalhe.
+
+    Args:
+        conn: Conexão com o banco de dados
+        request_args: Mesmos argumentos de buscar_pagina_lancamentos, mais valor_relatorio
+                      (opcional) para conferir o total com o valor apurado no relatório
+
+    Returns:
+        Dicionário com os totais, 'por_evento', 'por_conta' e, com valor_relatorio,
+        a diferença e se o total confere
+
+    Raises:
+        ValueError: parâmetros ausentes ou inválidos
+    """
+    variante, params = _filtros_drilldown(request_args)
+    cursor = conn.cursor()
+    try:
+        executar_consulta(cursor, 'lancamentos_resumo', params, **variante)
+        linhas = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    # No PostgreSQL, NUMERIC chega como Decimal: os valores viram float, como antes
+    linhas = [(evento, conta, quantidade, float(creditos or 0), float(debitos or 0))
+              for evento, conta, quantidade, creditos, debitos in linhas]
+    por_evento, por_conta = {}, {}
+    for evento, conta, quantidade, creditos, debitos in linhas:
+        for grupos, codigo in ((por_evento, evento), (por_conta, conta)):
+            grupo = grupos.setdefault(codigo, {'quantidade': 0, 'creditos': 0.0, 'debitos': 0.0})
+            grupo['quantidade'] += quantidade
+            grupo['creditos'] += creditos
+            grupo['debitos'] += debitos
+
+    quantidade = sum(linha[2] for linha in linhas)
+    total_creditos = sum(linha[3] for linha in linhas)
+    total_debitos = sum(linha[4] for linha in linhas)
+    total_liquido = total_creditos - total_debitos
+    resumo = {
+        'tem_dados': quantidade > 0,
+        'quantidade': quantidade,
+        'total_creditos': total_creditos,
+        'total_debitos': total_debitos,
+        'total_liquido': total_liquido,
+        'total_liquido_formatado': formatar_moeda(total_liquido),
+        'por_evento': _quebra(por_evento, 'evento'),
+        'por_conta': _quebra(por_conta, 'conta_contabil'),
+    }
+
+    valor_relatorio = request_args.get('valor_relatorio', type=float)
+    if valor_relatorio is not None:
+        diferenca = total_liquido - valor_relatorio
+        resumo.update({
+            'valor_relatorio': valor_relatorio,
+            'valor_relatorio_formatado': formatar_moeda(valor_relatorio),
+            'diferenca': diferenca,
+            'diferenca_formatada': formatar_moeda(diferenca),
+            'confere': abs(diferenca) < 0.01
+        })
+    return resumo
+
+
+def _parametros_pagina(request_args):
+    """Variante da consulta, parâmetros e limite da página (ValueError para parâmetros inválidos)."""
+    variante, params = _filtros_drilldown(request_args)
+    limite = request_args.get('limite', default=_lancamentos_por_pagina(), type=int)
+    limite = max(1, min(limite, _MAXIMO_POR_PAGINA))
+
+    apos = request_args.get('apos')
+    if apos:
+        params['apos_documento'], params['apos_evento'], params['apos_linha'] = decodificar_cursor(apos)
+    # Uma linha a mais indica se existe a próxima página
+    params['limite'] = limite + 1
+    return {**variante, 'com_cursor': bool(apos)}, params, limite
+
+
+def _ler_pagina(conn, variante, params, limite, info):
+    """
+    Gera os lançamentos da página à medida que saem do cursor, em blocos. No PostgreSQL
+    o cursor é nomeado (do lado do servidor) e executa o SQL da consulta, não o EXECUTE
+    da prepared statement, que o DECLARE não aceita. Ao final, preenche info com 'proximo'
+    (cursor da próxima página, None na última) e 'quantidade'.
+    """
+    nomeado = get_db_environment() == 'postgres'
+    if nomeado:
+        cursor = conn.cursor(name=f'pagina_{uuid.uuid4().hex[:12]}')
+        cursor.itersize = _LINHAS_POR_BLOCO
+    else:
+        cursor = conn.cursor()
+    quantidade, ultima, tem_proxima = 0, None, False
+    try:
+        executar_consulta(cursor, 'lancamentos_pagina', params, preparada=not nomeado, **variante)
+        while quantidade < limite:
+            bloco = cursor.fetchmany(min(_LINHAS_POR_BLOCO, limite - quantidade))
+            if not bloco:
+                break
+            for conta, coug, documento, evento, dc, valor, _ in bloco:
+                valor = float(valor or 0)
+                yield {
+                    'conta_contabil': conta or '',
+                    'coug': coug or '',
+                    'documento': documento or '',
+                    'evento': evento or '',
+                    'dc': dc or '',
+                    'valor': valor,
+                    'valor_formatado': formatar_moeda(valor)
+                }
+            quantidade += len(bloco)
+            ultima = bloco[-1]
+        tem_proxima = quantidade == limite and cursor.fetchone() is not None
+    finally:
+        cursor.close()
+    info['proximo'] = codificar_cursor(ultima[2], ultima[3], ultima[6]) if tem_proxima else None
+    info['quantidade'] = quantidade
+
+
+def resposta_pagina_lancamentos(request_args, formato: str = 'ndjson') -> Response:
+    """
+    Segunda fase do drill-down: uma página dos lançamentos, em streaming a partir do cursor.
+
+    Args:
+        request_args: Argumentos da requisição: ano, mes, origem ('balanco' ou 'receita_fonte'),
+                      os filtros de FILTROS_DRILLDOWN da origem, limite e apos (cursor
+                      devolvido pela página anterior)
+        formato: 'ndjson' (um lançamento por linha e, por último, {"pagina": {proximo,
+                 quantidade, limite}}) ou 'json' ({"lancamentos": [...], "pagina": {...}})
+
+    Raises:
+        ValueError: parâmetros ausentes ou inválidos (antes de a resposta começar)
+    """
+    variante, params, limite = _parametros_pagina(request_args)
+    info = {}
+
+    def lancamentos():
+        # A conexão fica com o gerador e volta ao pool quando a resposta termina (ou é interrompida)
+        with ConexaoBanco() as conn:
+            yield from _ler_pagina(conn, variante, params, limite, info)
+
+    def pagina():
+        return json.dumps({'proximo': info['proximo'], 'quantidade': info['quantidade'], 'limite': limite},
+                          ensure_ascii=False)
+
+    if formato == 'json':
+        def gerar():
+            yield '{"lancamentos": ['
+            for i, lancamento in enumerate(lancamentos()):
+                yield (',' if i else '') + json.dumps(lancamento, ensure_ascii=False)
+            yield '], "pagina": ' + pagina() + '}'
+        return Response(gerar(), mimetype='application/json')
+
+    def gerar():
+        for lancamento in lancamentos():
+            yield json.dumps(lancamento, ensure_ascii=False) + '\n'
+        yield '{"pagina": ' + pagina() + '}\n'
+    return Response(gerar(), mimetype='application/x-ndjson')
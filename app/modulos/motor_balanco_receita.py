@@ -0,0 +1,170 @@
+# app/modulos/motor_balanco_receita.py
+"""
+Motor de leitura única do Balanço Orçamentário da Receita.
+Uma única consulta agrupada (exercício, mês, UG, categoria, origem, espécie, alínea)
+alimenta todas as seções da página: a hierarquia do balanço, o comparativo mensal
+acumulado, os cards das UGs e o nome da UG selecionada. A lista de UGs do seletor não sai
+daqui: ela traz as UGs com receita em qualquer exercício carregado (COUGManager), não só
+nos dois lidos pelo motor.
+Com com_fonte=True (exportação para Excel) a leitura inclui a fonte de recursos e atende
+também as visões receita x fonte, sem uma consulta por planilha.
+"""
+
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .consultas import registrar_consulta, consultar_df
+from .cubo_receita import VARIANTES_ORIGEM_RECEITA, tabela_receita, medida, variante_origem_receita
+from .cache_resultados import resultado_em_cache
+from .cache_dimensoes import dimensao
+from .motor_colunar import obter_fato_colunar
+from .regras_contabeis_receita import FILTROS_RELATORIO_ESPECIAIS
+from .cards_unidades_gestoras import CAMPOS_FILTROS
+
+_MEDIDAS = ['previsao_inicial', 'previsao_atualizada', 'receita_liquida']
+_REGRAS_MEDIDAS = {
+    'previsao_inicial': 'PREVISAO_INICIAL_LIQUIDA',
+    'previsao_atualizada': 'PREVISAO_ATUALIZADA_LIQUIDA',
+    'receita_liquida': 'RECEITA_LIQUIDA',
+}
+_GRAO_MOTOR = ['coexercicio', 'inmes', 'coug', 'categoriareceita', 'cofontereceita', 'cosubfontereceita', 'coalinea']
+# Coluna do código -> (coluna do nome, tabela de dimensões, prefixo sem nome)
+NOMES_BALANCO = {
+    'categoriareceita': ('nome_categoria', 'categorias', 'Categoria '),
+    'cofontereceita': ('nome_fonte', 'origens', 'Fonte '),
+    'cosubfontereceita': ('nome_subfonte', 'especies', 'Subfonte '),
+    'coalinea': ('nome_alinea', 'alineas', 'Alínea '),
+}
+_NOMES_MOTOR = {**NOMES_BALANCO, 'coug': ('noug', 'unidades_gestoras', 'UG ')}
+_CAMPOS_BALANCO = ['previsao_inicial', 'previsao_atualizada', 'receita_atual', 'receita_anterior']
+
+
+@registrar_consulta('motor_balanco_receita', variantes=[
+    {**origem, 'com_fonte': com_fonte} for origem in VARIANTES_ORIGEM_RECEITA for com_fonte in (False, True)
+])
+def _consulta_motor(d, cubo=False, mascara=False, com_fonte=False):
+    return f"""
+        SELECT
+            fs.coexercicio,
+            fs.inmes,
+            fs.coug,
+            fs.categoriareceita,
+            fs.cofontereceita,
+            fs.cosubfontereceita,
+            fs.coalinea,
+            {'fs.cofonte,' if com_fonte else ''}
+            SUM({medida('PREVISAO_INICIAL_LIQUIDA', cubo, mascara=mascara)}) as previsao_inicial,
+            SUM({medida('PREVISAO_ATUALIZADA_LIQUIDA', cubo, mascara=mascara)}) as previsao_atualizada,
+            SUM({medida('RECEITA_LIQUIDA', cubo, mascara=mascara)}) as receita_liquida
+        FROM {tabela_receita(cubo)} fs
+        WHERE {d.int('fs.coexercicio')} IN (:ano, :ano_anterior)
+        GROUP BY {'1, 2, 3, 4, 5, 6, 7, 8' if com_fonte else '1, 2, 3, 4, 5, 6, 7'}
+        """
+
+
+@resultado_em_cache('motor_balanco_receita', chave=lambda conn, ano, com_fonte=False: (int(ano), bool(com_fonte)))
+def _carregar_dados(conn, ano: int, com_fonte: bool = False) -> pd.DataFrame:
+    """Leitura agrupada do exercício e do anterior; não depende do mês, da UG nem do filtro."""
+    fato = obter_fato_colunar()
+    if fato is not None:
+        return _carregar_dados_colunar(fato, ano, com_fonte)
+    params = {'ano': ano, 'ano_anterior': ano - 1}
+    df = consultar_df(conn, 'motor_balanco_receita', params, **variante_origem_receita(), com_fonte=com_fonte)
+    df.columns = [col.lower() for col in df.columns]
+    for coluna in ('coexercicio', 'inmes'):
+        df[coluna] = pd.to_numeric(df[coluna]).astype(int)
+    df[_MEDIDAS] = df[_MEDIDAS].fillna(0).astype(float)
+    return _nomear(df)
+
+
+def _carregar_dados_colunar(fato, ano: int, com_fonte: bool = False) -> pd.DataFrame:
+    """Mesma leitura de _consulta_motor, agregada sobre fato_saldos colunar."""
+    grao = _GRAO_MOTOR + ['cofonte'] if com_fonte else _GRAO_MOTOR
+    df = fato.agrupar(grao, _REGRAS_MEDIDAS, fato.mascara_em('coexercicio', [ano, ano - 1]))
+    return _nomear(df)
+
+
+def _nomear(df: pd.DataFrame) -> pd.DataFrame:
+    """Nomes das dimensões, postos em memória depois da agregação."""
+    for coluna_codigo, (coluna_nome, tabela, prefixo) in _NOMES_MOTOR.items():
+        df[coluna_nome] = dimensao(tabela).nomear(df[coluna_codigo], prefixo)
+    return df
+
+
+class MotorBalancoReceita:
+    """
+    Lê uma vez os dados do exercício e do anterior e deriva, em memória,
+    cada seção do balanço para a UG e o filtro especial pedidos.
+    com_fonte=True acrescenta a fonte de recursos ao grão (ver matriz_receita_fonte).
+    """
+
+    def __init__(self, conn, ano: int, mes: int, com_fonte: bool = False):
+        self.conn = conn
+        self.ano = ano
+        self.mes = mes
+        self.com_fonte = com_fonte
+        self.df = _carregar_dados(conn, ano, com_fonte)
+
+    def _filtrar(self, coug: Optional[str] = None, filtro_relatorio_key: Optional[str] = None) -> pd.DataFrame:
+        df = self.df
+        if coug:
+            df = df[df['coug'].astype(str) == str(coug)]
+        regra = FILTROS_RELATORIO_ESPECIAIS.get(filtro_relatorio_key) if filtro_relatorio_key else None
+        if regra:
+            df = df[df[regra['campo_filtro'].lower()].astype(str).isin(regra['valores'])]
+        return df
+
+    def _colunas_periodo(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Valores do balanço por linha: previsões do exercício e receitas até o mês nos dois exercícios."""
+        atual = df['coexercicio'] == self.ano
+        ate_mes = df['inmes'] <= self.mes
+        return df.assign(
+            previsao_inicial=df['previsao_inicial'].where(atual, 0.0),
+            previsao_atualizada=df['previsao_atualizada'].where(atual, 0.0),
+            receita_atual=df['receita_liquida'].where(atual & ate_mes, 0.0),
+            receita_anterior=df['receita_liquida'].where((df['coexercicio'] == self.ano - 1) & ate_mes, 0.0),
+        )
+
+    def linhas_balanco(self, coug: Optional[str] = None, filtro_relatorio_key: Optional[str] = None) -> List[Dict]:
+        """Linhas por alínea no formato de ProcessadorDadosReceita._processar_resultados_agregados."""
+        df = self._colunas_periodo(self._filtrar(coug, filtro_relatorio_key))
+        chaves = ['categoriareceita', 'nome_categoria', 'cofontereceita', 'nome_fonte',
+                  'cosubfontereceita', 'nome_subfonte', 'coalinea', 'nome_alinea']
+        agrupado = df.groupby(chaves, dropna=False, sort=True)[_CAMPOS_BALANCO].sum().reset_index()
+        agrupado = agrupado[agrupado[_CAMPOS_BALANCO].abs().sum(axis=1) > 0.01]
+        # Códigos ausentes chegam como None, como nas linhas lidas direto do cursor
+        return agrupado.astype(object).where(agrupado.notna(), None).to_dict('records')
+
+    def matriz_receita_fonte(self, coug: Optional[str] = None, filtro_relatorio_key: Optional[str] = None) -> pd.DataFrame:
+        """
+        Matriz (coalinea, cofonte) no formato de relatorio_receita_fonte.matriz_receita_fonte,
+        da qual saem as visões por receita e por fonte. Exige o motor criado com com_fonte=True.
+        """
+        if not self.com_fonte:
+            raise ValueError("Matriz receita x fonte exige o motor com com_fonte=True.")
+        df = self._colunas_periodo(self._filtrar(coug, filtro_relatorio_key))
+        return df.groupby(['coalinea', 'cofonte'], dropna=False, sort=True)[_CAMPOS_BALANCO].sum().reset_index()
+
+    def receitas_mensais(self, coug: Optional[str] = None, filtro_relatorio_key: Optional[str] = None) -> List[Dict]:
+        """Receita líquida por exercício e mês nos dois exercícios (entrada do ComparativoMensalAcumulado)."""
+        df = self._filtrar(coug, filtro_relatorio_key)
+        mensal = df.groupby(['coexercicio', 'inmes'], sort=True)['receita_liquida'].sum().reset_index()
+        return mensal.to_dict('records')
+
+    def receitas_por_ug(self) -> pd.DataFrame:
+        """
+        Receita realizada até o mês nos dois exercícios por (UG, campos dos filtros especiais):
+        a leitura que gera os cards das UGs de todos os filtros (ver gerar_cards_todos_filtros).
+        """
+        df = self._colunas_periodo(self.df)
+        df = df[df['coug'].notna()]
+        agrupado = df.groupby(['coug', *CAMPOS_FILTROS], dropna=False, sort=True)[['receita_atual', 'receita_anterior']].sum()
+        return agrupado.reset_index().rename(columns={'receita_atual': 'receita_realizada'})
+
+    def nome_coug(self, coug: Optional[str]) -> Optional[str]:
+        """Nome da UG a partir da própria leitura; None se a UG não aparece nos dados."""
+        if not coug:
+            return None
+        nomes = self.df.loc[self.df['coug'].astype(str) == str(coug), 'noug']
+        return nomes.iloc[0] if not nomes.empty else None
@@ -0,0 +1,283 @@
+# app/modulos/motor_colunar.py
+"""
+Motor colunar (opcional) da receita.
+Na carga (scripts/03_conversor_saldos_receita.py), fato_saldos é exportada para arquivos
+NumPy por coluna: os códigos ficam codificados por dicionário (int32, -1 para nulo), o
+exercício e o mês como int64 e o saldo como float64. Com MOTOR_COLUNAR=1 os relatórios de
+receita leem esses arquivos com mmap e agregam com máscaras vetorizadas e somas por grupo
+(bincount), sem consulta SQL nem conversão de linhas. Os workers do gunicorn mapeiam os
+mesmos arquivos e compartilham as páginas do cache do sistema operacional; as regras
+contábeis são avaliadas a cada agregação, só nas linhas selecionadas, sem cópias das
+colunas guardadas no processo.
+Só vale para o ambiente SQLite; no PostgreSQL os relatórios continuam em SQL.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .conexao_hibrida import get_db_environment, DB_FILES, _BASE_PATH_SQLITE
+from .cache_resultados import versao_dados_atual
+from .regras_mascara import COLUNA_MASCARA, bit_regra, contas_regra
+from .versao_dados import carimbo_versao_bancos
+
+log = logging.getLogger(__name__)
+
+ARQUIVO_MANIFESTO = 'manifesto.json'
+ARQUIVO_DICIONARIOS = 'dicionarios.json'
+
+# Colunas de fato_saldos exportadas e o formato de cada uma
+COLUNAS_INTEIRAS = ['coexercicio', 'inmes']
+COLUNAS_CODIGO = [
+    'coug', 'cocontacontabil', 'categoriareceita', 'cofontereceita',
+    'cosubfontereceita', 'coalinea', 'cofonte',
+]
+COLUNA_VALOR = 'saldo_contabil'
+
+_PASTA_PADRAO = os.path.join(os.path.dirname(_BASE_PATH_SQLITE), 'colunar')
+
+
+def pasta_colunar():
+    return os.environ.get('MOTOR_COLUNAR_DIR', _PASTA_PADRAO)
+
+
+def motor_colunar_ativo() -> bool:
+    return os.environ.get('MOTOR_COLUNAR') == '1' and get_db_environment() == 'sqlite'
+
+
+def _carimbo_saldos(caminho_db=None):
+    """Versão do banco de saldos da receita, gravada no manifesto para detectar arquivos velhos."""
+    if caminho_db is None:
+        caminho_db = os.path.join(_BASE_PATH_SQLITE, DB_FILES['saldos'])
+    return carimbo_versao_bancos(os.path.dirname(caminho_db), [os.path.basename(caminho_db)])
+
+
+# --- EXPORTAÇÃO (rodada na carga) ---
+
+def exportar_fato_saldos(caminho_db, pasta=None, tamanho_lote=200000) -> int:
+    """
+    Exporta fato_saldos do banco SQLite informado para a pasta colunar.
+    Chamar depois de registrar_versao_banco(), pois o manifesto guarda a versão do banco.
+    Retorna o número de linhas exportadas.
+    """
+    pasta = pasta or pasta_colunar()
+    colunas = COLUNAS_INTEIRAS + COLUNAS_CODIGO + [COLUNA_VALOR]
+    valores = {coluna: [] for coluna in colunas}
+
+    conn = sqlite3.connect(caminho_db)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(fato_saldos)")
+        if any(linha[1].lower() == COLUNA_MASCARA for linha in cursor.fetchall()):
+            colunas.append(COLUNA_MASCARA)
+            valores[COLUNA_MASCARA] = []
+        cursor.execute(f"SELECT {', '.join(colunas)} FROM fato_saldos")
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            for coluna, dados in zip(colunas, zip(*lote)):
+                valores[coluna].extend(dados)
+    finally:
+        conn.close()
+
+    # Grava numa pasta temporária e troca no fim; workers com os arquivos antigos
+    # mapeados continuam lendo a cópia antiga até recarregar
+    temporaria = pasta.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+
+    for coluna in COLUNAS_INTEIRAS:
+        serie = pd.to_numeric(pd.Series(valores.pop(coluna), dtype=object))
+        np.save(os.path.join(temporaria, f'{coluna}.npy'), serie.fillna(-1).to_numpy(dtype=np.int64))
+
+    dicionarios = {}
+    for coluna in COLUNAS_CODIGO:
+        codigos, uniques = pd.factorize(pd.Series(valores.pop(coluna), dtype=object))
+        np.save(os.path.join(temporaria, f'{coluna}.npy'), codigos.astype(np.int32))
+        dicionarios[coluna] = [v.item() if hasattr(v, 'item') else v for v in uniques.tolist()]
+
+    if COLUNA_MASCARA in valores:
+        mascara = pd.to_numeric(pd.Series(valores.pop(COLUNA_MASCARA), dtype=object)).fillna(0)
+        np.save(os.path.join(temporaria, f'{COLUNA_MASCARA}.npy'), mascara.to_numpy(dtype=np.int64))
+
+    saldo = pd.to_numeric(pd.Series(valores.pop(COLUNA_VALOR), dtype=object)).fillna(0)
+    np.save(os.path.join(temporaria, f'{COLUNA_VALOR}.npy'), saldo.to_numpy(dtype=np.float64))
+    linhas = len(saldo)
+
+    with open(os.path.join(temporaria, ARQUIVO_DICIONARIOS), 'w', encoding='utf-8') as f:
+        json.dump(dicionarios, f, ensure_ascii=False)
+    with open(os.path.join(temporaria, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as f:
+        json.dump({
+            'versao_saldos': _carimbo_saldos(caminho_db),
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'linhas': linhas,
+            'colunas': colunas,
+        }, f, indent=4, ensure_ascii=False)
+
+    antiga = pasta.rstrip(os.sep) + '.old'
+    shutil.rmtree(antiga, ignore_errors=True)
+    if os.path.exists(pasta):
+        os.replace(pasta, antiga)
+    os.replace(temporaria, pasta)
+    shutil.rmtree(antiga, ignore_errors=True)
+    return linhas
+
+
+# --- LEITURA ---
+
+def _avaliar_contas(contas, valores: List) -> np.ndarray:
+    """
+    Avalia as faixas de contas (início, fim) de uma regra sobre o dicionário de contas.
+    Compara como número quando os dois lados são numéricos, como o SQLite faz com a
+    coluna INTEGER; senão, como texto.
+    """
+    def comparavel(valor, limite):
+        if isinstance(valor, (int, float)) and limite.lstrip('-').isdigit():
+            return valor, int(limite)
+        return str(valor), limite
+
+    resultado = np.zeros(len(valores), dtype=bool)
+    for i, valor in enumerate(valores):
+        if valor is None:
+            continue
+        for limites in contas:
+            v, inicio = comparavel(valor, limites[0])
+            _, fim = comparavel(valor, limites[1])
+            if inicio <= v <= fim:
+                resultado[i] = True
+                break
+    return resultado
+
+
+class FatoColunar:
+    """fato_saldos mapeada em memória, com as operações usadas pelos relatórios de receita."""
+
+    def __init__(self, pasta: str):
+        self.pasta = pasta
+        with open(os.path.join(pasta, ARQUIVO_DICIONARIOS), 'r', encoding='utf-8') as f:
+            self.dicionarios = json.load(f)
+        self.colunas = {
+            coluna: np.load(os.path.join(pasta, f'{coluna}.npy'), mmap_mode='r')
+            for coluna in COLUNAS_INTEIRAS + COLUNAS_CODIGO + [COLUNA_VALOR]
+        }
+        # Bancos carregados antes de regras_mask não têm a coluna: as regras saem das faixas de contas
+        caminho_mascara = os.path.join(pasta, f'{COLUNA_MASCARA}.npy')
+        if os.path.exists(caminho_mascara):
+            self.colunas[COLUNA_MASCARA] = np.load(caminho_mascara, mmap_mode='r')
+        # Código -1 (nulo) indexa a última posição: None na decodificação
+        self._decodificacao = {
+            coluna: np.array(valores + [None], dtype=object)
+            for coluna, valores in self.dicionarios.items()
+        }
+        # Contas (posições do dicionário) de cada regra, para bancos sem regras_mask
+        self._contas_regra = {}
+
+    def __len__(self):
+        return len(self.colunas[COLUNA_VALOR])
+
+    # Máscaras de linhas
+
+    def mascara_em(self, coluna: str, valores) -> np.ndarray:
+        """Linhas cuja coluna está entre os valores (códigos comparados como texto)."""
+        if coluna in COLUNAS_INTEIRAS:
+            return np.isin(self.colunas[coluna], [int(v) for v in valores])
+        procurados = {str(v) for v in valores}
+        selecionados = np.array([str(v) in procurados for v in self.dicionarios[coluna]] + [False])
+        return selecionados[self.colunas[coluna]]
+
+    def mascara_nao_nula(self, coluna: str) -> np.ndarray:
+        return np.asarray(self.colunas[coluna]) >= 0
+
+    def na_regra(self, regra: str, linhas: np.ndarray) -> np.ndarray:
+        """Quais das linhas (posições) atendem à regra contábil: o bit de regras_mask ou as faixas de contas."""
+        if COLUNA_MASCARA in self.colunas:
+            return (self.colunas[COLUNA_MASCARA][linhas] & bit_regra('fato_saldos', regra)) != 0
+        contas = self._contas_regra.get(regra)
+        if contas is None:
+            contas = np.append(_avaliar_contas(contas_regra('fato_saldos', regra), self.dicionarios['cocontacontabil']), False)
+            self._contas_regra[regra] = contas
+        return contas[self.colunas['cocontacontabil'][linhas]]
+
+    # Agregação
+
+    def agrupar(self, chaves: List[str], medidas: Dict[str, Union[str, Tuple[str, np.ndarray]]],
+                mascara: np.ndarray) -> pd.DataFrame:
+        """
+        SUM das medidas por chaves nas linhas da máscara (equivale a um GROUP BY; os nulos
+        formam grupo próprio). As chaves voltam decodificadas, as medidas como float64.
+        Cada medida é o saldo contábil de uma regra, ou (regra, máscara de linhas) para somar
+        só parte das linhas (ex.: um exercício); a regra é avaliada só nas linhas da máscara.
+        """
+        linhas = np.flatnonzero(mascara)
+        codigos, cardinalidades = [], []
+        for chave in chaves:
+            coluna = self.colunas[chave][linhas]
+            if chave in COLUNAS_INTEIRAS:
+                _, codigo = np.unique(coluna, return_inverse=True)
+                codigos.append(codigo.astype(np.int64))
+                cardinalidades.append(int(codigo.max()) + 1 if len(codigo) else 1)
+            else:
+                codigos.append(coluna.astype(np.int64) + 1)
+                cardinalidades.append(len(self.dicionarios[chave]) + 1)
+
+        if float(np.prod(cardinalidades, dtype=float)) < 2 ** 62:
+            composta = np.zeros(len(linhas), dtype=np.int64)
+            for codigo, cardinalidade in zip(codigos, cardinalidades):
+                composta = composta * cardinalidade + codigo
+            _, primeira, grupo = np.unique(composta, return_index=True, return_inverse=True)
+        else:
+            _, primeira, grupo = np.unique(np.stack(codigos, axis=1), axis=0, return_index=True, return_inverse=True)
+        grupo = grupo.ravel()
+        total_grupos = len(primeira)
+
+        resultado = {}
+        for chave in chaves:
+            coluna = self.colunas[chave][linhas[primeira]]
+            if chave in COLUNAS_INTEIRAS:
+                resultado[chave] = pd.Series(coluna.astype(np.int64))
+            else:
+                resultado[chave] = pd.Series(self._decodificacao[chave][coluna], dtype=object).infer_objects()
+        saldo = self.colunas[COLUNA_VALOR][linhas]
+        for nome, medida in medidas.items():
+            regra, condicao = (medida, None) if isinstance(medida, str) else medida
+            somadas = self.na_regra(regra, linhas)
+            if condicao is not None:
+                somadas &= condicao[linhas]
+            resultado[nome] = np.bincount(grupo, weights=np.where(somadas, saldo, 0.0), minlength=total_grupos)
+        return pd.DataFrame(resultado)
+
+
+@lru_cache(maxsize=1)
+def _carregar(pasta: str, _versao: str) -> Optional[FatoColunar]:
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+    except (OSError, ValueError):
+        log.warning("⚠️ Motor colunar ativo, mas sem arquivos em %s; usando SQL.", pasta)
+        return None
+    if manifesto.get('versao_saldos') != _carimbo_saldos():
+        log.warning("⚠️ Arquivos do motor colunar não batem com a versão dos saldos; usando SQL.")
+        return None
+    try:
+        fato = FatoColunar(pasta)
+    except (OSError, ValueError, KeyError) as e:
+        log.warning("⚠️ Arquivos do motor colunar ilegíveis; usando SQL: %s", e)
+        return None
+    log.info("🧮 Motor colunar carregado: %s linhas de fato_saldos (%s)", f"{len(fato):,}", pasta)
+    return fato
+
+
+def obter_fato_colunar() -> Optional[FatoColunar]:
+    """fato_saldos colunar da versão atual dos dados; None quando desligado ou indisponível."""
+    if not motor_colunar_ativo():
+        return None
+    return _carregar(pasta_colunar(), versao_dados_atual())
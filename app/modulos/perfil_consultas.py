@@ -0,0 +1,401 @@
+# app/modulos/perfil_consultas.py
+"""
+Perfil das consultas executadas pela aplicação.
+Os cursores das conexões do pool medem cada consulta (impressão digital do SQL,
+duração, linhas e espera pela conexão) e agregam os números por rota.
+Consultas acima do limiar entram no log de consultas lentas com o plano
+(EXPLAIN QUERY PLAN no SQLite, EXPLAIN no PostgreSQL) capturado na mesma conexão.
+
+Variáveis de ambiente:
+    PERFIL_CONSULTAS=0            desliga a instrumentação
+    LIMIAR_CONSULTA_LENTA_MS=500  duração a partir da qual a consulta é registrada como lenta
+    PERFIL_MAX_LENTAS=200         tamanho do log de consultas lentas
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+import psycopg2.extensions
+from flask import g, has_request_context, request
+
+_MAX_ASSINATURAS = 2000
+_MAX_SQL_EXIBIDO = 4000
+_SEM_ROTA = '(fora de requisição)'
+
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_consultas = {}   # (rota, impressão) -> agregados
+_rotas = {}       # rota -> agregados por requisição
+_planos = {}      # impressão -> plano capturado
+_rotulos = {}     # SQL compilado -> nome da consulta registrada
+_descartadas = 0
+_gravacao = None  # lista de (banco, sql, parâmetros) enquanto gravar_consultas() estiver ativo
+
+
+@lru_cache(maxsize=1)
+def perfil_ativo():
+    return os.environ.get('PERFIL_CONSULTAS', '1').lower() not in ('0', 'false', 'nao')
+
+
+@lru_cache(maxsize=1)
+def _limiar_lenta_ms():
+    return float(os.environ.get('LIMIAR_CONSULTA_LENTA_MS', 500))
+
+
+_lentas = deque(maxlen=int(os.environ.get('PERFIL_MAX_LENTAS', 200)))
+
+
+def registrar_rotulo(sql: str, nome: str):
+    """Associa o SQL de uma consulta registrada ao seu nome, exibido no lugar do texto."""
+    _rotulos[sql] = nome
+
+
+@lru_cache(maxsize=4096)
+def normalizar_sql(sql: str) -> str:
+    """Forma canônica do SQL: literais viram '?', listas IN viram (...) e espaços são colapsados."""
+    texto = _RE_TEXTO.sub('?', sql)
+    texto = _RE_NUMERO.sub('?', texto)
+    texto = _RE_LISTA.sub('(...)', texto)
+    return _RE_ESPACOS.sub(' ', texto).strip()
+
+
+@lru_cache(maxsize=4096)
+def impressao_digital(sql: str) -> str:
+    return hashlib.md5(normalizar_sql(sql).encode('utf-8')).hexdigest()[:12]
+
+
+def _rota_atual():
+    if has_request_context():
+        return request.endpoint or request.path
+    return _SEM_ROTA
+
+
+# --- REGISTRO DAS CONSULTAS ---
+
+def _registrar(conn, sql, params, duracao_ms, linhas, explicar):
+    """Agrega uma consulta concluída e, se for lenta, grava no log com o plano."""
+    global _descartadas
+    impressao = impressao_digital(sql)
+    rota = _rota_atual()
+    banco = getattr(conn, 'db_name', None)
+    # A espera pela conexão é atribuída à primeira consulta feita após a retirada do pool
+    espera_ms = getattr(conn, 'espera_pendente_ms', 0.0)
+    if espera_ms:
+        conn.espera_pendente_ms = 0.0
+    if _gravacao is not None:
+        _gravacao.append((banco, sql, params))
+
+    with _lock:
+        chave = (rota, impressao)
+        item = _consultas.get(chave)
+        if item is None:
+            if len(_consultas) >= _MAX_ASSINATURAS:
+                _descartadas += 1
+                item = None
+            else:
+                item = _consultas[chave] = {
+                    'rota': rota,
+                    'impressao': impressao,
+                    'rotulo': _rotulos.get(sql),
+                    'sql': normalizar_sql(sql)[:_MAX_SQL_EXIBIDO],
+                    'banco': banco,
+                    'execucoes': 0,
+                    'tempo_total_ms': 0.0,
+                    'tempo_max_ms': 0.0,
+                    'linhas': 0,
+                    'espera_ms': 0.0,
+                }
+        if item is not None:
+            item['execucoes'] += 1
+            item['tempo_total_ms'] += duracao_ms
+            item['tempo_max_ms'] = max(item['tempo_max_ms'], duracao_ms)
+            item['linhas'] += max(linhas, 0)
+            item['espera_ms'] += espera_ms
+
+    if has_request_context():
+        req = g.get('perfil_consultas')
+        if req is not None:
+            req['consultas'] += 1
+            req['tempo_banco_ms'] += duracao_ms
+
+    if duracao_ms >= _limiar_lenta_ms():
+        plano = _planos.get(impressao)
+        if plano is None:
+            try:
+                plano = explicar()
+            except Exception as e:
+                plano = f"(plano indisponível: {e})"
+            with _lock:
+                if len(_planos) < _MAX_ASSINATURAS:
+                    _planos[impressao] = plano
+        _lentas.appendleft({
+            'quando': datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
+            'rota': rota,
+            'banco': banco,
+            'impressao': impressao,
+            'rotulo': _rotulos.get(sql),
+            'sql': sql.strip()[:_MAX_SQL_EXIBIDO],
+            'parametros': repr(params)[:500] if params else '',
+            'duracao_ms': duracao_ms,
+            'linhas': linhas,
+            'espera_ms': espera_ms,
+            'plano': plano,
+        })
+
+
+@contextmanager
+def gravar_consultas():
+    """
+    Grava o SQL e os parâmetros de todas as consultas executadas dentro do bloco
+    (usado pelo assessor de índices para reproduzir a carga de trabalho).
+    """
+    global _gravacao
+    gravadas = []
+    anterior, _gravacao = _gravacao, gravadas
+    try:
+        yield gravadas
+    finally:
+        _gravacao = anterior
+
+
+# --- CURSORES INSTRUMENTADOS ---
+
+class CursorSQLite(sqlite3.Cursor):
+    """
+    Cursor do SQLite que mede a consulta do execute() até o fim da leitura
+    (no SQLite a maior parte do trabalho acontece durante os fetch).
+    """
+
+    _medicao = None
+
+    def execute(self, sql, parameters=()):
+        self._concluir()
+        inicio = time.perf_counter()
+        resultado = super().execute(sql, parameters)
+        self._medicao = [sql, parameters, time.perf_counter() - inicio, 0]
+        if self.description is None:
+            # Comando sem linhas de retorno (PRAGMA, ATTACH...): já terminou
+            self._concluir()
+        return resultado
+
+    def _medir(self, leitura, contar):
+        medicao = self._medicao
+        if medicao is None:
+            return leitura()
+        inicio = time.perf_counter()
+        try:
+            resultado = leitura()
+        finally:
+            medicao[2] += time.perf_counter() - inicio
+        medicao[3] += contar(resultado)
+        return resultado
+
+    def fetchall(self):
+        resultado = self._medir(super().fetchall, len)
+        self._concluir()
+        return resultado
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        resultado = self._medir(lambda: sqlite3.Cursor.fetchmany(self, size), len)
+        if not resultado:
+            self._concluir()
+        return resultado
+
+    def fetchone(self):
+        resultado = self._medir(super().fetchone, lambda linha: 0 if linha is None else 1)
+        if resultado is None:
+            self._concluir()
+        return resultado
+
+    def __next__(self):
+        try:
+            return self._medir(super().__next__, lambda linha: 1)
+        except StopIteration:
+            self._concluir()
+            raise
+
+    def close(self):
+        self._concluir()
+        super().close()
+
+    def __del__(self):
+        # Cursor abandonado antes do fim da leitura (ex.: execute().fetchone()).
+        # Sem EXPLAIN: a conexão pode já estar com outra requisição.
+        try:
+            self._concluir(com_plano=False)
+        except Exception:
+            pass
+
+    def _concluir(self, com_plano=True):
+        medicao, self._medicao = self._medicao, None
+        if medicao is None:
+            return
+        sql, parametros, duracao, linhas = medicao
+        conn = self.connection
+
+        def explicar():
+            if not com_plano:
+                return "(cursor não consumido até o fim; plano não capturado)"
+            cursor = sqlite3.Connection.cursor(conn)
+            try:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, parametros)
+                return '\n'.join(f"{linha[0]}|{linha[1]}|{linha[3]}" for linha in cursor.fetchall())
+            finally:
+                cursor.close()
+
+        _registrar(conn, sql, parametros, duracao * 1000, linhas, explicar)
+
+
+class _MedicaoCursorPostgres:
+    """Mixin dos cursores do psycopg2: o resultado já chega inteiro no execute()."""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        resultado = super().execute(query, vars)
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        sql = query if isinstance(query, str) else self.query.decode('utf-8', 'replace')
+        conn = self.connection
+
+        def explicar():
+            # Savepoint para que uma falha no EXPLAIN não aborte a transação da requisição
+            cursor = psycopg2.extensions.connection.cursor(conn)
+            try:
+                cursor.execute("SAVEPOINT perfil_explain")
+                try:
+                    cursor.execute("EXPLAIN " + sql, vars)
+                    return '\n'.join(linha[0] for linha in cursor.fetchall())
+                except Exception:
+                    cursor.execute("ROLLBACK TO SAVEPOINT perfil_explain")
+                    raise
+                finally:
+                    cursor.execute("RELEASE SAVEPOINT perfil_explain")
+            finally:
+                cursor.close()
+
+        _registrar(conn, sql, vars, duracao_ms, self.rowcount, explicar)
+        return resultado
+
+
+@lru_cache(maxsize=None)
+def cursor_postgres_instrumentado(classe_cursor):
+    """Subclasse instrumentada da classe de cursor pedida (cursor padrão, DictCursor...)."""
+    return type(classe_cursor.__name__ + 'Medido', (_MedicaoCursorPostgres, classe_cursor), {})
+
+
+# --- AGREGADOS POR REQUISIÇÃO ---
+
+def registrar_retirada(conn, db_name, espera_ms):
+    """Chamado pelo ConexaoBanco ao retirar a conexão do pool."""
+    conn.db_name = db_name
+    conn.espera_pendente_ms = espera_ms
+    if has_request_context():
+        req = g.get('perfil_consultas')
+        if req is not None:
+            req['espera_ms'] += espera_ms
+
+
+def _iniciar_requisicao():
+    g.perfil_consultas = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_banco_ms': 0.0, 'espera_ms': 0.0}
+
+
+def _finalizar_requisicao(response):
+    req = g.pop('perfil_consultas', None)
+    if req is None:
+        return response
+    total_ms = (time.perf_counter() - req['inicio']) * 1000
+    rota = request.endpoint or request.path
+
+    with _lock:
+        item = _rotas.get(rota)
+        if item is None:
+            item = _rotas[rota] = {
+                'rota': rota, 'requisicoes': 0, 'consultas': 0,
+                'tempo_total_ms': 0.0, 'tempo_max_ms': 0.0, 'tempo_banco_ms': 0.0, 'espera_ms': 0.0,
+            }
+        item['requisicoes'] += 1
+        item['consultas'] += req['consultas']
+        item['tempo_total_ms'] += total_ms
+        item['tempo_max_ms'] = max(item['tempo_max_ms'], total_ms)
+        item['tempo_banco_ms'] += req['tempo_banco_ms']
+        item['espera_ms'] += req['espera_ms']
+
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={req["tempo_banco_ms"]:.1f};desc="{req["consultas"]} consultas", '
+        f'pool;dur={req["espera_ms"]:.1f}, total;dur={total_ms:.1f}'
+    )
+    return response
+
+
+def instalar_perfil(app):
+    """Registra os ganchos de requisição do perfil na aplicação Flask."""
+    if not perfil_ativo():
+        return
+    app.before_request(_iniciar_requisicao)
+    app.after_request(_finalizar_requisicao)
+
+
+# --- CONSULTA DOS RESULTADOS ---
+
+def obter_perfil(top=10):
+    """
+    Retrato do perfil: rotas ordenadas pelo tempo de banco, cada uma com as
+    `top` consultas de maior tempo total, e o log de consultas lentas.
+    """
+    with _lock:
+        consultas = [dict(item) for item in _consultas.values()]
+        rotas = {rota: dict(item) for rota, item in _rotas.items()}
+        descartadas = _descartadas
+    lentas = list(_lentas)
+
+    por_rota = {}
+    for item in consultas:
+        item['tempo_medio_ms'] = item['tempo_total_ms'] / item['execucoes'] if item['execucoes'] else 0.0
+        por_rota.setdefault(item['rota'], []).append(item)
+
+    resultado = []
+    for rota, itens in por_rota.items():
+        itens.sort(key=lambda item: item['tempo_total_ms'], reverse=True)
+        resumo = rotas.get(rota) or {
+            'rota': rota, 'requisicoes': 0, 'consultas': sum(item['execucoes'] for item in itens),
+            'tempo_total_ms': 0.0, 'tempo_max_ms': 0.0,
+            'tempo_banco_ms': sum(item['tempo_total_ms'] for item in itens), 'espera_ms': 0.0,
+        }
+        n = resumo['requisicoes']
+        resumo['tempo_medio_ms'] = resumo['tempo_total_ms'] / n if n else 0.0
+        resumo['consultas_por_requisicao'] = resumo['consultas'] / n if n else 0.0
+        resumo['top'] = itens[:top]
+        resultado.append(resumo)
+    resultado.sort(key=lambda resumo: resumo['tempo_banco_ms'], reverse=True)
+
+    return {
+        'ativo': perfil_ativo(),
+        'limiar_lenta_ms': _limiar_lenta_ms(),
+        'rotas': resultado,
+        'lentas': lentas,
+        'assinaturas_descartadas': descartadas,
+    }
+
+
+def limpar_perfil():
+    """Zera os agregados, os planos e o log de consultas lentas."""
+    global _descartadas
+    with _lock:
+        _consultas.clear()
+        _rotas.clear()
+        _planos.clear()
+        _lentas.clear()
+        _descartadas = 0
@@ -1,65 +1,60 @@
 # app/modulos/periodo.py
 """Gerenciamento do período de referência para relatórios - Versão híbrida"""
 
+import logging
 from datetime import datetime
 from app.modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from app.modulos.catalogo_dados import recarregar_catalogo, ultimo_periodo
+from app.modulos.consultas import dialeto_atual
+from app.modulos.capacidades import capacidades, recarregar_capacidades
 
-# Cache simples para evitar múltiplas leituras do banco na mesma requisição
-_cache_periodo = None
+log = logging.getLogger(__name__)
 
 def obter_periodo_referencia(force_reload=False):
-    """Retorna o mês e ano de referência baseado no último INMES disponível."""
-    global _cache_periodo
-    if _cache_periodo and not force_reload:
-        return _cache_periodo
-
+    """
+    Retorna o mês e ano de referência baseado no último INMES disponível, lido do
+    catálogo dos períodos (relido a cada nova versão dos dados ou com force_reload).
+    """
     try:
-        with ConexaoBanco() as conn:
-            cursor = conn.cursor()
-            
-            # CORREÇÃO: Adiciona type cast para PostgreSQL
-            if get_db_environment() == 'postgres':
-                query = "SELECT MAX(COEXERCICIO::integer * 100 + INMES::integer) as mes_ano FROM fato_saldos"
-            else:
-                query = "SELECT MAX(COEXERCICIO * 100 + INMES) as mes_ano FROM fato_saldos"
-                
-            query_adaptada = adaptar_query(query)
-            
-            try:
-                cursor.execute(query_adaptada)
-                resultado = cursor.fetchone()
-                # Em psycopg2 (RealDictCursor), o resultado é um dict. Em sqlite3.Row, pode ser acessado por índice ou nome.
-                res_val = resultado['mes_ano'] if isinstance(resultado, dict) else resultado[0]
-            except Exception:
-                # Se falhar, tenta na tabela de lançamentos (para SQLite local)
-                if get_db_environment() == 'postgres':
-                    query = "SELECT MAX(COEXERCICIO::integer * 100 + INMES::integer) as mes_ano FROM lancamentos"
-                else:
-                    query = "SELECT MAX(COEXERCICIO * 100 + INMES) as mes_ano FROM lancamentos_db.lancamentos"
-                    
-                query_adaptada = adaptar_query(query)
-                cursor.execute(query_adaptada)
-                resultado = cursor.fetchone()
-                res_val = resultado['mes_ano'] if isinstance(resultado, dict) else resultado[0]
+        if force_reload:
+            recarregar_capacidades()
+            recarregar_catalogo()
+        try:
+            ultimo = ultimo_periodo()
+        except Exception:
+            # Se falhar, tenta na tabela de lançamentos (para SQLite local)
+            ultimo = _ultimo_periodo_lancamentos()
 
-            if res_val:
-                ano = int(res_val) // 100
-                mes = int(res_val) % 100
-                mes_nome = obter_nome_mes(mes)
-                
-                _cache_periodo = {
-                    'mes': mes,
-                    'ano': ano,
-                    'mes_nome': mes_nome,
-                    'periodo_completo': f"{mes_nome}/{ano}"
-                }
-                return _cache_periodo
+        if ultimo:
+            ano, mes = ultimo
+            mes_nome = obter_nome_mes(mes)
+            return {
+                'mes': mes,
+                'ano': ano,
+                'mes_nome': mes_nome,
+                'periodo_completo': f"{mes_nome}/{ano}"
+            }
 
     except Exception as e:
-        print(f"AVISO: Não foi possível determinar o período a partir do banco de dados: {e}. Usando período padrão.")
+        log.warning("Não foi possível determinar o período a partir do banco de dados: %s. Usando período padrão.", e)
+
+    return periodo_padrao()
 
-    _cache_periodo = periodo_padrao()
-    return _cache_periodo
+def _ultimo_periodo_lancamentos():
+    """(ano, mês) mais recente da tabela de lançamentos; None se ela estiver vazia ou não existir."""
+    if not capacidades().tem_tabela('lancamentos'):
+        return None
+    with ConexaoBanco() as conn:
+        cursor = conn.cursor()
+        # Casts do PostgreSQL (dispensados quando o esquema é tipado)
+        d = dialeto_atual()
+        if get_db_environment() == 'postgres':
+            query = f"SELECT MAX({d.int('COEXERCICIO')} * 100 + {d.int('INMES')}) as mes_ano FROM lancamentos"
+        else:
+            query = "SELECT MAX(COEXERCICIO * 100 + INMES) as mes_ano FROM lancamentos_db.lancamentos"
+        cursor.execute(adaptar_query(query))
+        res_val = cursor.fetchone()[0]
+    return (int(res_val) // 100, int(res_val) % 100) if res_val else None
 
 def obter_nome_mes(mes):
     """Retorna o nome do mês."""
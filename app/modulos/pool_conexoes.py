@@ -0,0 +1,196 @@
+# app/modulos/pool_conexoes.py
+"""
+Pool de conexões reutilizáveis usado pelo ConexaoBanco.
+Mantém as conexões abertas entre requisições, com limite de tamanho,
+verificação de saúde na retirada e estatísticas de uso.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolEsgotadoError(ConnectionError):
+    """Nenhuma conexão ficou livre dentro do tempo limite de espera."""
+
+
+class PoolConexoes:
+    """
+    Pool thread-safe genérico. As conexões são criadas sob demanda até
+    `tamanho_max` e devolvidas ao pool ao final de cada uso.
+
+    Args:
+        nome: Identificação do pool (aparece nas estatísticas)
+        fabrica: Função sem argumentos que abre uma nova conexão
+        validar: Função (conn, profunda) -> bool usada na retirada
+        resetar: Função (conn) chamada na devolução para limpar o estado
+        tamanho_max: Número máximo de conexões abertas ao mesmo tempo
+        timeout: Segundos de espera por uma conexão livre
+        validar_apos: Segundos ociosos a partir dos quais a validação é profunda
+    """
+
+    def __init__(self, nome, fabrica, validar, resetar=None,
+                 tamanho_max=10, timeout=30.0, validar_apos=30.0):
+        self.nome = nome
+        self.tamanho_max = max(1, int(tamanho_max))
+        self.timeout = float(timeout)
+        self.validar_apos = float(validar_apos)
+        self._fabrica = fabrica
+        self._validar = validar
+        self._resetar = resetar
+        self._cond = threading.Condition()
+        self._ociosas = deque()  # (conexão, instante da devolução)
+        self._abertas = 0
+        self._pid = os.getpid()
+        self._encerrado = False
+        self._stats = self._stats_zerados()
+
+    @staticmethod
+    def _stats_zerados():
+        return {
+            'retiradas': 0,
+            'criadas': 0,
+            'reutilizadas': 0,
+            'descartadas': 0,
+            'falhas_validacao': 0,
+            'esperas': 0,
+            'esgotamentos': 0,
+            'tempo_espera_total_ms': 0.0,
+            'tempo_espera_max_ms': 0.0,
+        }
+
+    def _verificar_fork(self):
+        """Após um fork (workers do gunicorn), as conexões do processo pai não são reutilizadas."""
+        if self._pid != os.getpid():
+            self._ociosas.clear()
+            self._abertas = 0
+            self._pid = os.getpid()
+            self._stats = self._stats_zerados()
+
+    def obter(self):
+        """Retira uma conexão do pool. Retorna (conexão, tempo de espera em ms)."""
+        inicio = time.perf_counter()
+        limite = inicio + self.timeout
+        conn, devolvida_em = None, None
+
+        with self._cond:
+            self._verificar_fork()
+            esperou = False
+            while True:
+                if self._ociosas:
+                    conn, devolvida_em = self._ociosas.pop()
+                    break
+                if self._abertas < self.tamanho_max:
+                    self._abertas += 1
+                    break
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    self._stats['esgotamentos'] += 1
+                    raise PoolEsgotadoError(
+                        f"Pool '{self.nome}' esgotado: {self.tamanho_max} conexões em uso após {self.timeout:.0f}s de espera."
+                    )
+                if not esperou:
+                    self._stats['esperas'] += 1
+                    esperou = True
+                self._cond.wait(restante)
+
+        # Validação e criação acontecem fora do lock para não bloquear outras threads
+        if conn is not None:
+            profunda = (time.monotonic() - devolvida_em) >= self.validar_apos
+            if self._conexao_valida(conn, profunda):
+                reutilizada = True
+            else:
+                self._fechar(conn)
+                with self._cond:
+                    self._stats['falhas_validacao'] += 1
+                    self._stats['descartadas'] += 1
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._fabrica()
+            except Exception:
+                with self._cond:
+                    self._abertas -= 1
+                    self._cond.notify()
+                raise
+            reutilizada = False
+
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        with self._cond:
+            self._stats['retiradas'] += 1
+            self._stats['reutilizadas' if reutilizada else 'criadas'] += 1
+            self._stats['tempo_espera_total_ms'] += espera_ms
+            self._stats['tempo_espera_max_ms'] = max(self._stats['tempo_espera_max_ms'], espera_ms)
+        return conn, espera_ms
+
+    def devolver(self, conn, descartar=False):
+        """Devolve a conexão ao pool, descartando-a se não puder ser reaproveitada."""
+        if conn is None:
+            return
+        if not descartar and self._resetar:
+            try:
+                self._resetar(conn)
+            except Exception:
+                descartar = True
+
+        with self._cond:
+            if self._pid != os.getpid():
+                # Conexão herdada de outro processo: apenas abandona a referência
+                return
+            if descartar or self._encerrado:
+                descartar = True
+                self._abertas -= 1
+                self._stats['descartadas'] += 1
+            else:
+                self._ociosas.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if descartar:
+            self._fechar(conn)
+
+    def _conexao_valida(self, conn, profunda):
+        try:
+            return bool(self._validar(conn, profunda))
+        except Exception:
+            return False
+
+    @staticmethod
+    def _fechar(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def fechar_todas(self):
+        """Encerra o pool: fecha as conexões ociosas e as em uso ao serem devolvidas."""
+        with self._cond:
+            self._encerrado = True
+            ociosas = list(self._ociosas)
+            self._ociosas.clear()
+            self._abertas -= len(ociosas)
+        for conn, _ in ociosas:
+            self._fechar(conn)
+
+    @property
+    def encerrado(self):
+        """True depois de fechar_todas(): as conexões ainda emprestadas não voltam ao pool."""
+        return self._encerrado
+
+    def estatisticas(self):
+        """Retorna um retrato das estatísticas de uso do pool."""
+        with self._cond:
+            self._verificar_fork()
+            stats = dict(self._stats)
+            stats.update({
+                'nome': self.nome,
+                'tamanho_max': self.tamanho_max,
+                'abertas': self._abertas,
+                'ociosas': len(self._ociosas),
+                'em_uso': self._abertas - len(self._ociosas),
+            })
+        retiradas = stats['retiradas']
+        stats['tempo_espera_medio_ms'] = stats['tempo_espera_total_ms'] / retiradas if retiradas else 0.0
+        stats['taxa_reuso'] = stats['reutilizadas'] / retiradas if retiradas else 0.0
+        return stats
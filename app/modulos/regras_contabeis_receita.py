@@ -1,39 +1,54 @@
 # app/modulos/regras_contabeis_receita.py
 """Regras para classificação de contas contábeis e filtros de relatórios"""
 
-# <<< CORREÇÃO: Todas as regras de filtro SQL agora usam 'cocontacontabil' em minúsculas >>>
+
+def sql_contas(contas, coluna: str = 'cocontacontabil') -> str:
+    """
+    Filtro SQL de uma lista de faixas de contas (início, fim), dado estruturado das regras:
+    '=' para uma conta, IN para várias contas avulsas, BETWEEN para as faixas (unidas por OR).
+    O motor colunar avalia as mesmas faixas, sem ler o SQL.
+    """
+    if len(contas) > 1 and all(inicio == fim for inicio, fim in contas):
+        return f"{coluna} IN ({', '.join(repr(inicio) for inicio, _ in contas)})"
+    partes = [f"{coluna} = '{inicio}'" if inicio == fim else f"{coluna} BETWEEN '{inicio}' AND '{fim}'"
+              for inicio, fim in contas]
+    return partes[0] if len(partes) == 1 else ' OR '.join(f"({parte})" for parte in partes)
+
+
+# Cada regra guarda as faixas de cocontacontabil (início, fim); as consultas testam a regra
+# por regras_mask.condicao_regra (o bit da carga ou o filtro gerado destas faixas)
 REGRAS_CONTAS = {
     'PREVISAO_INICIAL': {
         'descricao': 'Previsão Inicial',
-        'filtro_sql': "cocontacontabil BETWEEN '521110000' AND '521119999'"
+        'contas': [('521110000', '521119999')]
     },
     'DEDUCOES_PREVISAO_INICIAL': {
         'descricao': 'Deduções da Previsão Inicial',
-        'filtro_sql': "cocontacontabil BETWEEN '521120000' AND '521129999'"
+        'contas': [('521120000', '521129999')]
     },
     'PREVISAO_INICIAL_LIQUIDA': {
         'descricao': 'Previsão Inicial Líquida',
-        'filtro_sql': "cocontacontabil BETWEEN '521110000' AND '521129999'"
+        'contas': [('521110000', '521129999')]
     },
     'PREVISAO_ATUALIZADA': {
         'descricao': 'Previsão Atualizada',
-        'filtro_sql': "cocontacontabil BETWEEN '521100000' AND '521299999'"
+        'contas': [('521100000', '521299999')]
     },
     'PREVISAO_ATUALIZADA_LIQUIDA': {
         'descricao': 'Previsão Atualizada Líquida',
-        'filtro_sql': "cocontacontabil BETWEEN '521110000' AND '521299999'"
+        'contas': [('521110000', '521299999')]
     },
     'RECEITA_BRUTA': {
         'descricao': 'Receita Bruta',
-        'filtro_sql': "cocontacontabil = '621200000'"
+        'contas': [('621200000', '621200000')]
     },
     'DEDUCOES_RECEITA_BRUTA': {
         'descricao': 'Dedução da Receita Bruta',
-        'filtro_sql': "cocontacontabil BETWEEN '621300000' AND '621399999'"
+        'contas': [('621300000', '621399999')]
     },
     'RECEITA_LIQUIDA': {
         'descricao': 'Receita Líquida',
-        'filtro_sql': "cocontacontabil BETWEEN '621200000' AND '621399999'"
+        'contas': [('621200000', '621399999')]
     }
 }
 
@@ -100,8 +115,3 @@ FILTROS_RELATORIO_ESPECIAIS = {
         'valores': ['24']
     }
 }
-
-
-def get_filtro_conta(tipo_conta):
-    """Retorna o filtro SQL para um tipo específico de conta"""
-    return REGRAS_CONTAS.get(tipo_conta, {}).get('filtro_sql', "1=0")
\ No newline at end of file
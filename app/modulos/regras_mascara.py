@@ -0,0 +1,141 @@
+# app/modulos/regras_mascara.py
+"""
+Registro único das regras de contas contábeis classificadas na carga.
+Os conversores gravam em cada linha dos fatos a coluna inteira regras_mask, com um bit
+por regra que a conta atende. As consultas testam o bit da regra no lugar das faixas
+de cocontacontabil; bancos carregados antes da coluna continuam usando as faixas.
+"""
+
+from .capacidades import capacidades
+from .regras_contabeis_receita import REGRAS_CONTAS, sql_contas
+
+COLUNA_MASCARA = 'regras_mask'
+
+# Banco (ConexaoBanco) de cada tabela de fatos
+BANCO_DA_TABELA = {'fato_saldos': 'saldos', 'fato_saldo_despesa': 'saldos_despesa'}
+
+# Regras por tabela de fatos: (bit, regra, faixas de cocontacontabil (início, fim)).
+# Das faixas saem o filtro SQL e a avaliação do motor colunar. O bit é o gravado em
+# regras_mask pela carga: nunca renumerar nem reaproveitar o bit de uma regra removida;
+# uma regra nova recebe um bit livre e passa a valer depois da próxima carga.
+REGRAS_MASCARA = {
+    'fato_saldos': [
+        (0, 'PREVISAO_INICIAL', REGRAS_CONTAS['PREVISAO_INICIAL']['contas']),
+        (1, 'DEDUCOES_PREVISAO_INICIAL', REGRAS_CONTAS['DEDUCOES_PREVISAO_INICIAL']['contas']),
+        (2, 'PREVISAO_INICIAL_LIQUIDA', REGRAS_CONTAS['PREVISAO_INICIAL_LIQUIDA']['contas']),
+        (3, 'PREVISAO_ATUALIZADA', REGRAS_CONTAS['PREVISAO_ATUALIZADA']['contas']),
+        (4, 'PREVISAO_ATUALIZADA_LIQUIDA', REGRAS_CONTAS['PREVISAO_ATUALIZADA_LIQUIDA']['contas']),
+        (5, 'RECEITA_BRUTA', REGRAS_CONTAS['RECEITA_BRUTA']['contas']),
+        (6, 'DEDUCOES_RECEITA_BRUTA', REGRAS_CONTAS['DEDUCOES_RECEITA_BRUTA']['contas']),
+        (7, 'RECEITA_LIQUIDA', REGRAS_CONTAS['RECEITA_LIQUIDA']['contas']),
+        # Faixas próprias do Anexo 2 do RREO
+        (8, 'RREO_PREVISAO_INICIAL', [('521100000', '521199999')]),
+        (9, 'RREO_SUPERAVIT_PREVISAO_ATUALIZADA', [('522130100', '522130199')]),
+    ],
+    'fato_saldo_despesa': [
+        (0, 'DOTACAO_INICIAL', [('522110000', '522119999')]),
+        (1, 'DOTACAO_AUTORIZADA', [('522110000', '522129999'), ('522150000', '522159999'),
+                                   ('522190000', '522199999')]),
+        (2, 'EMPENHADO', [('622130000', '622139999')]),
+        (3, 'LIQUIDADO', [('622130300', '622130300'), ('622130400', '622130400'),
+                          ('622130700', '622130700')]),
+        (4, 'PAGO', [('622920104', '622920104')]),
+    ],
+}
+
+
+def _validar_regras():
+    """Falha na importação se uma tabela repetir bit ou nome de regra, ou sair do INTEGER."""
+    for tabela, regras in REGRAS_MASCARA.items():
+        bits = [bit for bit, _, _ in regras]
+        nomes = [regra for _, regra, _ in regras]
+        if len(set(bits)) != len(bits) or len(set(nomes)) != len(nomes):
+            raise ValueError(f"Bits ou regras repetidos em REGRAS_MASCARA['{tabela}'].")
+        if not all(0 <= bit < 31 for bit in bits):
+            raise ValueError(f"Bit fora de 0..30 em REGRAS_MASCARA['{tabela}'].")
+
+
+_validar_regras()
+
+
+def _regra(tabela: str, regra: str):
+    for bit, nome, contas in REGRAS_MASCARA[tabela]:
+        if nome == regra:
+            return bit, contas
+    raise KeyError(f"Regra '{regra}' não registrada para {tabela}.")
+
+
+def bit_regra(tabela: str, regra: str) -> int:
+    return 1 << _regra(tabela, regra)[0]
+
+
+def contas_regra(tabela: str, regra: str):
+    """Faixas de cocontacontabil (início, fim) da regra."""
+    return _regra(tabela, regra)[1]
+
+
+def filtro_conta(tabela: str, regra: str, alias: str = '') -> str:
+    """Filtro da regra pelas faixas de cocontacontabil (com o alias da tabela, se houver)."""
+    coluna = f'{alias}.cocontacontabil' if alias else 'cocontacontabil'
+    return f"({sql_contas(contas_regra(tabela, regra), coluna)})"
+
+
+def condicao_regra(tabela: str, regra: str, mascara: bool, alias: str = 'fs') -> str:
+    """Condição SQL de uma regra: o bit em regras_mask ou, sem a coluna, as faixas de contas."""
+    if mascara:
+        prefixo = f"{alias}." if alias else ""
+        return f"({prefixo}{COLUNA_MASCARA} & {bit_regra(tabela, regra)}) <> 0"
+    return filtro_conta(tabela, regra, alias)
+
+
+def sql_mascara(tabela: str) -> str:
+    """
+    Expressão que calcula regras_mask de uma linha. As regras se sobrepõem (uma conta de
+    DOTACAO_INICIAL também é de DOTACAO_AUTORIZADA); a soma dá o mesmo que o OU só porque
+    cada regra soma uma potência de 2 distinta, nunca duas vezes o mesmo bit.
+    """
+    return ' + '.join(
+        f"(CASE WHEN {filtro_conta(tabela, regra)} THEN {1 << bit} ELSE 0 END)"
+        for bit, regra, _ in REGRAS_MASCARA[tabela]
+    )
+
+
+def adicionar_mascara_regras(conn, tabela: str, postgres: bool = False) -> int:
+    """
+    Cria (ou recalcula) regras_mask na tabela de fatos e o índice por exercício e máscara.
+    Usado pelos conversores (SQLite) e pelo migrar_dados.py (postgres=True).
+    Retorna quantas linhas atendem a alguma regra.
+    """
+    garantir_coluna_mascara(conn, tabela, postgres)
+    cursor = conn.cursor()
+    cursor.execute(f"UPDATE {tabela} SET {COLUNA_MASCARA} = {sql_mascara(tabela)}")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_{COLUNA_MASCARA} ON {tabela} (coexercicio, {COLUNA_MASCARA})")
+    cursor.execute(f"SELECT COUNT(*) FROM {tabela} WHERE {COLUNA_MASCARA} <> 0")
+    total = cursor.fetchone()[0]
+    conn.commit()
+    return total
+
+
+def garantir_coluna_mascara(conn, tabela: str, postgres: bool = False) -> None:
+    """Cria a coluna regras_mask (vazia) se a tabela ainda não a tiver."""
+    cursor = conn.cursor()
+    if not _tem_coluna(cursor, tabela, COLUNA_MASCARA, postgres):
+        cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {COLUNA_MASCARA} INTEGER")
+        conn.commit()
+
+
+def _tem_coluna(cursor, tabela: str, coluna: str, postgres: bool) -> bool:
+    if postgres:
+        cursor.execute("SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+                       (tabela, coluna))
+        return cursor.fetchone() is not None
+    cursor.execute(f"PRAGMA table_info({tabela})")
+    return any(linha[1].lower() == coluna for linha in cursor.fetchall())
+
+
+def tem_mascara_regras(tabela: str) -> bool:
+    """
+    Indica se a tabela de fatos tem regras_mask. Respondido pelo registro de capacidades,
+    relido a cada nova versão dos dados (não por conexão: as do pool sobrevivem à carga).
+    """
+    return capacidades(BANCO_DA_TABELA[tabela]).tem_coluna(tabela, COLUNA_MASCARA)
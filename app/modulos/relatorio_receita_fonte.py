@@ -1,14 +1,112 @@
 # app/modulos/relatorio_receita_fonte.py
 """
 Módulo para gerar relatórios agrupados por Código de Receita ou Código de Fonte
-Permite visualização hierárquica com expansão/colapso
+Permite visualização hierárquica com expansão/colapso.
+As duas visões saem da mesma matriz (alínea x fonte), lida uma vez por (ano, mês, UG,
+filtro) e guardada no cache de resultados: a troca de visão não volta ao banco.
 """
+import logging
 import sqlite3
+import pandas as pd
 from typing import List, Dict, Optional, Literal
-import psycopg2.extras
-from .conexao_hibrida import adaptar_query, get_db_environment
 from app.modulos.formatacao import formatar_moeda
-from app.modulos.regras_contabeis_receita import get_filtro_conta, FILTROS_RELATORIO_ESPECIAIS
+from app.modulos.regras_contabeis_receita import FILTROS_RELATORIO_ESPECIAIS
+from app.modulos.cubo_receita import VARIANTES_ORIGEM_RECEITA, tabela_receita, medida, variante_origem_receita
+from app.modulos.cache_resultados import resultado_em_cache
+from app.modulos.motor_colunar import obter_fato_colunar
+from app.modulos.consultas import registrar_consulta, consultar_df, variante_filtro, variantes_filtro, sql_filtro
+from app.modulos.cache_dimensoes import dimensao
+from app.modulos.capacidades import capacidades
+
+log = logging.getLogger(__name__)
+
+
+_MEDIDAS_MATRIZ = ['previsao_inicial', 'previsao_atualizada', 'receita_atual', 'receita_anterior']
+
+
+@registrar_consulta('receita_fonte_matriz', variantes=[
+    {'com_coug': com_coug, **origem, **filtro}
+    for com_coug in (False, True) for origem in VARIANTES_ORIGEM_RECEITA for filtro in variantes_filtro()
+])
+def _consulta_matriz(d, com_coug=False, cubo=False, mascara=False, campo_filtro=None, n_filtro=0):
+    """Valores do relatório por (alínea, fonte): previsões do exercício e receitas até o mês nos dois exercícios."""
+    filtro_coug = "AND fs.coug = :coug" if com_coug else ""
+    filtro_dinamico = sql_filtro(d, campo_filtro, n_filtro)
+    exercicio = d.int('fs.coexercicio')
+    ate_mes = f"{d.int('fs.inmes')} <= :mes"
+
+    return f"""
+        SELECT
+            fs.coalinea,
+            fs.cofonte,
+            SUM(CASE WHEN {exercicio} = :ano THEN {medida('PREVISAO_INICIAL_LIQUIDA', cubo, mascara=mascara)} ELSE 0 END) as previsao_inicial,
+            SUM(CASE WHEN {exercicio} = :ano THEN {medida('PREVISAO_ATUALIZADA_LIQUIDA', cubo, mascara=mascara)} ELSE 0 END) as previsao_atualizada,
+            SUM(CASE WHEN {exercicio} = :ano AND {ate_mes} THEN {medida('RECEITA_LIQUIDA', cubo, mascara=mascara)} ELSE 0 END) as receita_atual,
+            SUM(CASE WHEN {exercicio} = :ano_anterior AND {ate_mes} THEN {medida('RECEITA_LIQUIDA', cubo, mascara=mascara)} ELSE 0 END) as receita_anterior
+        FROM {tabela_receita(cubo)} fs
+        WHERE {exercicio} IN (:ano, :ano_anterior)
+          {filtro_coug}
+          {filtro_dinamico}
+        GROUP BY 1, 2
+        """
+
+
+@resultado_em_cache('receita_fonte_matriz',
+                    chave=lambda conn, ano, mes, coug=None, filtro_relatorio_key=None:
+                    (int(ano), int(mes), str(coug) if coug else None, filtro_relatorio_key))
+def matriz_receita_fonte(conn, ano: int, mes: int, coug: Optional[str] = None,
+                         filtro_relatorio_key: Optional[str] = None) -> pd.DataFrame:
+    """
+    Matriz (coalinea, cofonte) com previsões e receitas do período: uma leitura por
+    (ano, mês, UG, filtro), da qual saem as visões por receita e por fonte.
+    """
+    fato = obter_fato_colunar()
+    if fato is not None:
+        return _matriz_colunar(fato, ano, mes, coug, filtro_relatorio_key)
+
+    variante, params = variante_filtro(filtro_relatorio_key)
+    params.update({'ano': ano, 'ano_anterior': ano - 1, 'mes': mes, 'coug': str(coug) if coug else None})
+    df = consultar_df(conn, 'receita_fonte_matriz', params, com_coug=bool(coug),
+                      **variante_origem_receita(), **variante)
+    df.columns = [col.lower() for col in df.columns]
+    df[_MEDIDAS_MATRIZ] = df[_MEDIDAS_MATRIZ].fillna(0).astype(float)
+    return df
+
+
+def _matriz_colunar(fato, ano: int, mes: int, coug: Optional[str],
+                    filtro_relatorio_key: Optional[str]) -> pd.DataFrame:
+    """Mesma matriz de _consulta_matriz, agregada sobre fato_saldos colunar."""
+    mascara = fato.mascara_em('coexercicio', [ano, ano - 1])
+    if coug:
+        mascara &= fato.mascara_em('coug', [coug])
+    if filtro_relatorio_key and filtro_relatorio_key in FILTROS_RELATORIO_ESPECIAIS:
+        regra = FILTROS_RELATORIO_ESPECIAIS[filtro_relatorio_key]
+        mascara &= fato.mascara_em(regra['campo_filtro'].lower(), regra['valores'])
+
+    exercicio = fato.colunas['coexercicio']
+    atual = exercicio == ano
+    ate_mes = fato.colunas['inmes'] <= mes
+    return fato.agrupar(['coalinea', 'cofonte'], {
+        'previsao_inicial': ('PREVISAO_INICIAL_LIQUIDA', atual),
+        'previsao_atualizada': ('PREVISAO_ATUALIZADA_LIQUIDA', atual),
+        'receita_atual': ('RECEITA_LIQUIDA', atual & ate_mes),
+        'receita_anterior': ('RECEITA_LIQUIDA', (exercicio == ano - 1) & ate_mes),
+    }, mascara)
+
+
+def linhas_pivo(matriz: pd.DataFrame, campo_principal: str, campo_secundario: str) -> List[Dict]:
+    """
+    Linhas de uma visão a partir da matriz: (principal, secundário) com os totais do
+    principal, sem as linhas zeradas, na ordem do relatório.
+    """
+    df = matriz[matriz[campo_principal].notna()][[campo_principal, campo_secundario, *_MEDIDAS_MATRIZ]].copy()
+    totais = df.groupby(campo_principal, sort=False)[_MEDIDAS_MATRIZ].transform('sum')
+    for campo in _MEDIDAS_MATRIZ:
+        df[f'total_{campo}'] = totais[campo]
+    df = df[df[_MEDIDAS_MATRIZ].abs().sum(axis=1) > 0.01]
+    df = df.sort_values(['total_receita_atual', campo_principal, 'receita_atual'],
+                        ascending=[False, True, False], kind='stable')
+    return df.astype(object).where(df.notna(), None).to_dict('records')
 
 
 class RelatorioReceitaFonte:
@@ -19,206 +117,52 @@ class RelatorioReceitaFonte:
         self.estrutura = self._verificar_estrutura()
 
     def _verificar_estrutura(self):
-        """Verifica estrutura disponível no banco"""
-        tem_lancamentos = False
-        tem_tabela_fontes = False
-        
+        """Estrutura disponível no banco, lida do registro de capacidades (uma vez por versão dos dados)"""
         try:
-            cursor = self.conn.cursor()
-            
-            # Verifica se tem lançamentos - tentativa múltipla para SQLite
-            if get_db_environment() == 'postgres':
-                query = "SELECT 1 FROM information_schema.tables WHERE table_name = 'lancamentos' LIMIT 1"
-                cursor.execute(query)
-                if cursor.fetchone():
-                    tem_lancamentos = True
-            else:
-                # Para SQLite, tenta várias abordagens
-                queries_tentativa = [
-                    "SELECT 1 FROM lancamentos LIMIT 1",
-                    "SELECT 1 FROM lancamentos_db.lancamentos LIMIT 1",
-                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='lancamentos' LIMIT 1"
-                ]
-                
-                for query in queries_tentativa:
-                    try:
-                        cursor.execute(query)
-                        if cursor.fetchone() is not None:
-                            tem_lancamentos = True
-                            print(f"DEBUG - Tabela lancamentos encontrada com query: {query}")
-                            break
-                    except Exception as e:
-                        continue
-            
-            # Verifica se tem tabela fontes
-            if get_db_environment() == 'postgres':
-                query = "SELECT 1 FROM information_schema.tables WHERE table_schema = 'dimensoes' AND table_name = 'fontes' LIMIT 1"
-                cursor.execute(query)
-                if cursor.fetchone():
-                    tem_tabela_fontes = True
-            else:
-                try:
-                    cursor.execute("SELECT 1 FROM dimensoes.fontes LIMIT 1")
-                    tem_tabela_fontes = True
-                except:
-                    try:
-                        cursor.execute("SELECT 1 FROM fontes LIMIT 1")
-                        tem_tabela_fontes = True
-                    except:
-                        tem_tabela_fontes = False
-                        
+            caps = capacidades()
+            return {
+                'tem_lancamentos': caps.tem_tabela('lancamentos'),
+                'tem_tabela_fontes': caps.tem_tabela('fontes', 'dimensoes') or caps.tem_tabela('fontes')
+            }
         except Exception as e:
-            print(f"Erro ao verificar estrutura: {e}")
-            
-        resultado = {
-            'tem_lancamentos': tem_lancamentos,
-            'tem_tabela_fontes': tem_tabela_fontes
-        }
-        print(f"DEBUG - Estrutura verificada: {resultado}")
-        return resultado
+            log.error("Erro ao verificar estrutura: %s", e)
+            return {'tem_lancamentos': False, 'tem_tabela_fontes': False}
 
     def _gerar_relatorio(self, tipo: Literal['receita', 'fonte'],
                         ano: int, mes: int,
                         coug: Optional[str] = None,
-                        filtro_relatorio_key: Optional[str] = None) -> List[Dict]:
-
-        print(f"DEBUG - _gerar_relatorio chamado com: tipo={tipo}, ano={ano}, mes={mes}, coug={coug}, filtro={filtro_relatorio_key}")
+                        filtro_relatorio_key: Optional[str] = None,
+                        matriz: Optional[pd.DataFrame] = None) -> List[Dict]:
 
-        filtros = []
-        if coug:
-            coug_escaped = coug.replace("'", "''")
-            filtros.append(f"fs.coug = '{coug_escaped}'")
-
-        if filtro_relatorio_key and filtro_relatorio_key in FILTROS_RELATORIO_ESPECIAIS:
-            regra = FILTROS_RELATORIO_ESPECIAIS[filtro_relatorio_key]
-            campo = regra['campo_filtro']
-            valores_str = ", ".join([f"'{v}'" for v in regra['valores']])
-            filtros.append(f"fs.{campo} IN ({valores_str})")
-
-        where_clause = " AND " + " AND ".join(filtros) if filtros else ""
+        log.debug("_gerar_relatorio chamado com: tipo=%s, ano=%s, mes=%s, coug=%s, filtro=%s",
+                  tipo, ano, mes, coug, filtro_relatorio_key)
 
         # Define configuração baseada no tipo
+        # (os nomes vêm do cache das dimensões, depois da agregação)
         if tipo == 'receita':
             campo_principal = 'coalinea'
-            nome_principal = 'noalinea'
             tabela_principal = 'alineas'
             campo_secundario = 'cofonte'
-            nome_secundario = 'nofonte' if self.estrutura['tem_tabela_fontes'] else None
             tabela_secundaria = 'fontes' if self.estrutura['tem_tabela_fontes'] else None
         else:
             campo_principal = 'cofonte'
-            nome_principal = 'nofonte' if self.estrutura['tem_tabela_fontes'] else None
             tabela_principal = 'fontes' if self.estrutura['tem_tabela_fontes'] else None
             campo_secundario = 'coalinea'
-            nome_secundario = 'noalinea'
             tabela_secundaria = 'alineas'
-        
-        # Define type casts para PostgreSQL
-        if get_db_environment() == 'postgres':
-            type_cast_text = "::text"
-            type_cast_int = "::integer"
-        else:
-            type_cast_text = ""
-            type_cast_int = ""
 
-        # Monta joins condicionais
-        join_principal = ""
-        campo_nome_principal = f"'Código ' || fs.{campo_principal}"
-        
-        if tabela_principal and nome_principal:
-            if get_db_environment() == 'postgres':
-                join_principal = f"LEFT JOIN dimensoes.{tabela_principal} dp ON fs.{campo_principal}{type_cast_text} = dp.{campo_principal}"
-            else:
-                join_principal = f"LEFT JOIN dimensoes.{tabela_principal} dp ON fs.{campo_principal} = dp.{campo_principal}"
-            campo_nome_principal = f"COALESCE(dp.{nome_principal}, 'Código ' || fs.{campo_principal})"
-        
-        join_secundario = ""
-        campo_nome_secundario = f"'Código ' || fs.{campo_secundario}"
-        
-        if tabela_secundaria and nome_secundario:
-            if get_db_environment() == 'postgres':
-                join_secundario = f"LEFT JOIN dimensoes.{tabela_secundaria} ds ON fs.{campo_secundario}{type_cast_text} = ds.{campo_secundario}"
-            else:
-                join_secundario = f"LEFT JOIN dimensoes.{tabela_secundaria} ds ON fs.{campo_secundario} = ds.{campo_secundario}"
-            campo_nome_secundario = f"COALESCE(ds.{nome_secundario}, 'Código ' || fs.{campo_secundario})"
-
-        # Query principal com todos os ajustes
-        query_original = f"""
-        WITH dados_agregados AS (
-            SELECT
-                fs.{campo_principal},
-                {campo_nome_principal} as nome_principal,
-                fs.{campo_secundario},
-                {campo_nome_secundario} as nome_secundario,
-                fs.coexercicio,
-                fs.inmes,
-                SUM(CASE WHEN {get_filtro_conta('PREVISAO_INICIAL_LIQUIDA')} THEN COALESCE(fs.saldo_contabil, 0) ELSE 0 END) as previsao_inicial,
-                SUM(CASE WHEN {get_filtro_conta('PREVISAO_ATUALIZADA_LIQUIDA')} THEN COALESCE(fs.saldo_contabil, 0) ELSE 0 END) as previsao_atualizada,
-                SUM(CASE WHEN {get_filtro_conta('RECEITA_LIQUIDA')} THEN COALESCE(fs.saldo_contabil, 0) ELSE 0 END) as receita_liquida
-            FROM fato_saldos fs
-            {join_principal}
-            {join_secundario}
-            WHERE fs.{campo_principal} IS NOT NULL {where_clause}
-            GROUP BY 1, 2, 3, 4, 5, 6
-        ),
-        dados_sumarizados AS (
-            SELECT
-                {campo_principal}, 
-                nome_principal, 
-                {campo_secundario}, 
-                nome_secundario,
-                SUM(CASE WHEN coexercicio{type_cast_int} = {ano} THEN previsao_inicial ELSE 0 END) as previsao_inicial,
-                SUM(CASE WHEN coexercicio{type_cast_int} = {ano} THEN previsao_atualizada ELSE 0 END) as previsao_atualizada,
-                SUM(CASE WHEN coexercicio{type_cast_int} = {ano} AND inmes{type_cast_int} <= {mes} THEN receita_liquida ELSE 0 END) as receita_atual,
-                SUM(CASE WHEN coexercicio{type_cast_int} = {ano-1} AND inmes{type_cast_int} <= {mes} THEN receita_liquida ELSE 0 END) as receita_anterior
-            FROM dados_agregados 
-            WHERE coexercicio{type_cast_int} IN ({ano}, {ano-1})
-            GROUP BY 1, 2, 3, 4
-        ),
-        totais_principais AS (
-            SELECT
-                {campo_principal}, 
-                nome_principal,
-                SUM(previsao_inicial) as total_previsao_inicial, 
-                SUM(previsao_atualizada) as total_previsao_atualizada,
-                SUM(receita_atual) as total_receita_atual, 
-                SUM(receita_anterior) as total_receita_anterior
-            FROM dados_sumarizados 
-            GROUP BY 1, 2
-        )
-        SELECT 
-            ds.*, 
-            tp.total_previsao_inicial, 
-            tp.total_previsao_atualizada, 
-            tp.total_receita_atual, 
-            tp.total_receita_anterior
-        FROM dados_sumarizados ds
-        JOIN totais_principais tp ON ds.{campo_principal} = tp.{campo_principal}
-        WHERE (ABS(COALESCE(ds.previsao_inicial, 0)) + ABS(COALESCE(ds.previsao_atualizada, 0)) + 
-               ABS(COALESCE(ds.receita_atual, 0)) + ABS(COALESCE(ds.receita_anterior, 0))) > 0.01
-        ORDER BY tp.total_receita_atual DESC, ds.{campo_principal}, ds.receita_atual DESC
-        """
-
-        query_adaptada = adaptar_query(query_original)
-        
         try:
-            if get_db_environment() == 'postgres':
-                cursor = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-            else:
-                cursor = self.conn.cursor()
-                
-            cursor.execute(query_adaptada)
+            # A matriz alínea x fonte atende as duas visões; trocar de visão não refaz a agregação
+            # (a exportação do balanço passa a matriz já derivada do motor)
+            if matriz is None:
+                matriz = matriz_receita_fonte(self.conn, ano, mes, coug, filtro_relatorio_key)
+            linhas = linhas_pivo(matriz, campo_principal, campo_secundario)
 
             resultados = []
             grupos = {}
+            # Uma linha de DEBUG por item secundário: o nível é consultado uma vez, fora do laço
+            detalhar = log.isEnabledFor(logging.DEBUG)
 
-            for row in cursor:
-                # Converte para dict de forma segura
-                if get_db_environment() == 'postgres':
-                    row_dict = dict(row)
-                else:
-                    row_dict = dict(zip([d[0] for d in cursor.description], row))
-                
+            for row_dict in linhas:
                 codigo_principal = str(row_dict.get(campo_principal, ''))
                 if not codigo_principal:
                     continue
@@ -227,7 +171,7 @@ class RelatorioReceitaFonte:
                     grupos[codigo_principal] = {
                         'id': f'{tipo}-{codigo_principal}',
                         'codigo': codigo_principal,
-                        'descricao': row_dict.get('nome_principal', f'Código {codigo_principal}'),
+                        'descricao': self._nome(tabela_principal, codigo_principal),
                         'tipo': 'principal',
                         'nivel': 0,
                         'previsao_inicial': float(row_dict.get('total_previsao_inicial', 0) or 0),
@@ -251,12 +195,14 @@ class RelatorioReceitaFonte:
                         (receita_atual != 0 or receita_anterior != 0)  # Tem movimento
                     )
                     
-                    print(f"DEBUG - Item secundário: codigo={codigo_secundario}, coug={coug}, tipo={tipo}, receita_atual={receita_atual}, deve_mostrar_lancamentos={deve_mostrar_lancamentos}")
+                    if detalhar:
+                        log.debug("Item secundário: codigo=%s, tipo=%s, receita_atual=%s, deve_mostrar_lancamentos=%s",
+                                  codigo_secundario, tipo, receita_atual, deve_mostrar_lancamentos)
                     
                     item_secundario = {
                         'id': f'{tipo}-{codigo_principal}-{codigo_secundario}',
                         'codigo': str(codigo_secundario),
-                        'descricao': row_dict.get('nome_secundario', f'Código {codigo_secundario}'),
+                        'descricao': self._nome(tabela_secundaria, codigo_secundario),
                         'tipo': 'secundario',
                         'nivel': 1,
                         'pai_id': f'{tipo}-{codigo_principal}',
@@ -281,15 +227,19 @@ class RelatorioReceitaFonte:
                     self._calcular_variacoes(item)
                     resultados.append(item)
 
-            print(f"DEBUG - Total de resultados processados: {len(resultados)}")
+            log.debug("Total de resultados processados: %d", len(resultados))
             return resultados
             
         except Exception as e:
-            print(f"Erro ao gerar relatório: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Erro ao gerar relatório: %s", e)
             return []
 
+    def _nome(self, tabela: Optional[str], codigo) -> str:
+        """Nome do código na dimensão em memória; sem a tabela (ou sem o nome), 'Código X'."""
+        if tabela:
+            return dimensao(tabela).nome(codigo, 'Código ')
+        return f'Código {codigo}'
+
     def _calcular_variacoes(self, item: Dict) -> None:
         """Calcula variações absolutas e percentuais"""
         receita_atual = item.get('receita_atual', 0) or 0
@@ -330,10 +280,18 @@ class RelatorioReceitaFonte:
         return totais
 
 
-def gerar_relatorio_receita_fonte(conn, tipo, ano, mes, coug=None, filtro_relatorio_key=None):
-    """Função auxiliar para gerar o relatório"""
+@resultado_em_cache('receita_fonte',
+                    chave=lambda conn, tipo, ano, mes, coug=None, filtro_relatorio_key=None, matriz=None:
+                    (tipo, int(ano), int(mes), str(coug) if coug else None, filtro_relatorio_key),
+                    armazenar=lambda resultado: 'erro' not in resultado)
+def gerar_relatorio_receita_fonte(conn, tipo, ano, mes, coug=None, filtro_relatorio_key=None, matriz=None):
+    """
+    Função auxiliar para gerar o relatório.
+    matriz: matriz alínea x fonte já calculada (ex.: MotorBalancoReceita.matriz_receita_fonte);
+    sem ela, usa matriz_receita_fonte().
+    """
     try:
-        print(f"DEBUG - gerar_relatorio_receita_fonte: tipo={tipo}, ano={ano}, mes={mes}, coug={coug}")
+        log.debug("gerar_relatorio_receita_fonte: tipo=%s, ano=%s, mes=%s, coug=%s", tipo, ano, mes, coug)
         
         relatorio = RelatorioReceitaFonte(conn)
         dados = relatorio._gerar_relatorio(
@@ -341,7 +299,8 @@ def gerar_relatorio_receita_fonte(conn, tipo, ano, mes, coug=None, filtro_relato
             ano=ano, 
             mes=mes, 
             coug=coug, 
-            filtro_relatorio_key=filtro_relatorio_key
+            filtro_relatorio_key=filtro_relatorio_key,
+            matriz=matriz
         )
         totais = relatorio.calcular_totais(dados)
         
@@ -354,14 +313,12 @@ def gerar_relatorio_receita_fonte(conn, tipo, ano, mes, coug=None, filtro_relato
             'estrutura': relatorio.estrutura
         }
         
-        print(f"DEBUG - Resultado final: tem_dados={resultado['tem_dados']}, coug_selecionada={resultado['coug_selecionada']}")
+        log.debug("Resultado final: tem_dados=%s, coug_selecionada=%s", resultado['tem_dados'], resultado['coug_selecionada'])
         
         return resultado
         
     except Exception as e:
-        print(f"Erro ao gerar relatório receita/fonte: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Erro ao gerar relatório receita/fonte: %s", e)
         
         return {
             'tipo': tipo,
@@ -0,0 +1,153 @@
+# app/modulos/versao_dados.py
+"""
+Controle de versão dos bancos SQLite gerados pelos conversores (scripts/0x_conversor_*.py).
+Os conversores registram cada banco em dados/db/versao_dados.json ao final da carga;
+a aplicação confere esse registro antes de abrir os arquivos como imutáveis.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+log = logging.getLogger(__name__)
+
+ARQUIVO_VERSAO = 'versao_dados.json'
+
+# Versão de uma carga: instante em UTC, AAAAMMDDHHMMSSZ (não depende do fuso da máquina)
+FORMATO_VERSAO = '%Y%m%d%H%M%SZ'
+
+
+def nova_versao():
+    """(versão, gerado_em) de uma carga concluída agora."""
+    agora = datetime.now(timezone.utc)
+    return agora.strftime(FORMATO_VERSAO), agora.isoformat(timespec='seconds')
+
+
+def assinatura_banco(caminho_db):
+    """
+    Identifica o conteúdo de um banco SQLite pelo tamanho e pelo contador de
+    alterações do cabeçalho (bytes 24-27), que não muda ao copiar o arquivo.
+    """
+    with open(caminho_db, 'rb') as f:
+        cabecalho = f.read(100)
+    return {
+        'tamanho': os.path.getsize(caminho_db),
+        'contador_alteracoes': int.from_bytes(cabecalho[24:28], 'big') if len(cabecalho) >= 28 else 0,
+    }
+
+
+def carregar_manifesto(base_path):
+    """Lê o manifesto de versões; retorna {} se não existir ou estiver corrompido."""
+    caminho = os.path.join(base_path, ARQUIVO_VERSAO)
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("⚠️ Manifesto de versão inválido (%s): %s", caminho, e)
+        return {}
+
+
+def registrar_versao_banco(caminho_db, versao=None):
+    """
+    Registra a versão de um banco recém-gerado. Deve ser chamado após fechar a conexão.
+    versao: (versão, gerado_em) de nova_versao(), quando a carga já a gravou no banco
+    (ex.: no catálogo dos períodos); sem ela, a versão é gerada agora.
+    """
+    base_path = os.path.dirname(os.path.abspath(caminho_db))
+    manifesto = carregar_manifesto(base_path)
+
+    registro = assinatura_banco(caminho_db)
+    registro['versao'], registro['gerado_em'] = versao or nova_versao()
+    manifesto[os.path.basename(caminho_db)] = registro
+
+    # Grava em arquivo temporário e substitui, para nunca deixar um manifesto pela metade
+    caminho = os.path.join(base_path, ARQUIVO_VERSAO)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=4, ensure_ascii=False)
+    os.replace(temporario, caminho)
+    print(f"🏷️ Versão {registro['versao']} registrada para '{os.path.basename(caminho_db)}'")
+    return registro
+
+
+def verificar_versao_bancos(base_path, arquivos):
+    """
+    Confere os arquivos informados contra o manifesto.
+
+    Returns:
+        Dict arquivo -> 'ok' | 'divergente' | 'sem_registro' | 'ausente'
+    """
+    manifesto = carregar_manifesto(base_path)
+    resultado = {}
+    for arquivo in arquivos:
+        caminho = os.path.join(base_path, arquivo)
+        if not os.path.exists(caminho):
+            resultado[arquivo] = 'ausente'
+            continue
+        registro = manifesto.get(arquivo)
+        if not registro:
+            resultado[arquivo] = 'sem_registro'
+            continue
+        atual = assinatura_banco(caminho)
+        iguais = all(atual[chave] == registro.get(chave) for chave in ('tamanho', 'contador_alteracoes'))
+        resultado[arquivo] = 'ok' if iguais else 'divergente'
+    return resultado
+
+
+def carimbo_versao_bancos(base_path, arquivos):
+    """
+    Carimbo da versão dos dados: muda sempre que um conversor regrava algum dos bancos.
+    Combina a versão registrada no manifesto com a assinatura atual de cada arquivo.
+    """
+    manifesto = carregar_manifesto(base_path)
+    partes = []
+    for arquivo in arquivos:
+        caminho = os.path.join(base_path, arquivo)
+        if not os.path.exists(caminho):
+            partes.append(f"{arquivo}@ausente")
+            continue
+        assinatura = assinatura_banco(caminho)
+        versao = (manifesto.get(arquivo) or {}).get('versao', 'sem_registro')
+        partes.append(f"{arquivo}@{versao}:{assinatura['tamanho']}:{assinatura['contador_alteracoes']}")
+    return '|'.join(partes)
+
+
+# --- PostgreSQL: a versão da carga fica numa tabela do próprio banco ---
+
+TABELA_VERSAO_POSTGRES = 'versao_dados'
+
+
+def registrar_versao_postgres(pg_conn, banco='carga', versao=None):
+    """
+    Registra no PostgreSQL a versão de uma carga concluída (chamado pelo migrar_dados.py).
+    versao: (versão, gerado_em) de nova_versao(), como em registrar_versao_banco.
+    """
+    versao, gerado_em = versao or nova_versao()
+    cursor = pg_conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_VERSAO_POSTGRES} (
+            banco TEXT PRIMARY KEY,
+            versao TEXT NOT NULL,
+            gerado_em TEXT NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO {TABELA_VERSAO_POSTGRES} (banco, versao, gerado_em) VALUES (%s, %s, %s)
+        ON CONFLICT (banco) DO UPDATE SET versao = EXCLUDED.versao, gerado_em = EXCLUDED.gerado_em
+    """, (banco, versao, gerado_em))
+    pg_conn.commit()
+    cursor.close()
+    print(f"🏷️ Versão {versao} registrada para '{banco}' no PostgreSQL")
+    return versao
+
+
+def carimbo_versao_postgres(cursor):
+    """Carimbo da versão dos dados no PostgreSQL; 'sem_registro' se nenhuma carga foi registrada."""
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (TABELA_VERSAO_POSTGRES,))
+    if not cursor.fetchone()[0]:
+        return 'sem_registro'
+    cursor.execute(f"SELECT banco, versao FROM {TABELA_VERSAO_POSTGRES} ORDER BY banco")
+    return '|'.join(f"{banco}@{versao}" for banco, versao in cursor.fetchall()) or 'sem_registro'
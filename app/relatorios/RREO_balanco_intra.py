@@ -5,6 +5,7 @@ Combina os dados de receitas e despesas intra-orçamentárias em um único relat
 """
 import pandas as pd
 from ..modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from ..modulos.cache_resultados import resultado_em_cache
 from .RREO_receita_intra import BalancoOrcamentarioReceitaIntraAnexo2
 from .RREO_despesa_intra import BalancoOrcamentarioDespesaIntraAnexo2
 
@@ -18,6 +19,7 @@ class BalancoOrcamentarioIntraAnexo2:
         self.ano = ano
         self.bimestre = bimestre
 
+    @resultado_em_cache('rreo_intra', chave=lambda self: (self.ano, self.bimestre))
     def gerar_relatorio(self) -> dict:
         """Gera o relatório completo de receitas e despesas intra-orçamentárias"""
         
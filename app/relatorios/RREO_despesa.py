@@ -4,7 +4,16 @@ Módulo para gerar o Demonstrativo da Execução Orçamentária da Despesa.
 Segue a mesma lógica do RREO_receita.py com regras específicas para despesas.
 """
 import pandas as pd
-from ..modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from ..modulos.conexao_hibrida import ConexaoBanco
+from ..modulos.consultas import consultar_df
+from ..modulos.regras_mascara import tem_mascara_regras
+from .consultas_rreo import parametros_bimestre
+
+_MEDIDAS = ['dotacao_inicial', 'dotacao_autorizada', 'empenhado_bimestre', 'empenhado_ate_bimestre',
+            'liquidado_bimestre', 'liquidado_ate_bimestre', 'pago_ate_bimestre']
+# Colunas do filtro de linhas zeradas (_FILTRO_DESPESA_NAO_NULA)
+_MEDIDAS_NAO_NULAS = ['dotacao_inicial', 'dotacao_autorizada', 'empenhado_ate_bimestre',
+                      'liquidado_ate_bimestre', 'pago_ate_bimestre']
 
 class BalancoOrcamentarioDespesaAnexo2:
     """
@@ -25,148 +34,42 @@ class BalancoOrcamentarioDespesaAnexo2:
         for i in range(1, self.bimestre + 1):
             self.meses_ate_bimestre.extend(self.bimestre_map.get(i, []))
 
-    def _executar_query(self, query: str, params=None) -> pd.DataFrame:
-        """Executa uma query e retorna um DataFrame do Pandas."""
+        self._dados_consolidados = None
+
+    def _executar_query(self, nome_consulta: str, params: dict, **variante) -> pd.DataFrame:
+        """Executa uma consulta registrada e retorna um DataFrame do Pandas."""
         with ConexaoBanco(db_name='saldos_despesa') as conn:
-            query_adaptada = adaptar_query(query)
-            df = pd.read_sql_query(query_adaptada, conn, params=params)
+            df = consultar_df(conn, nome_consulta, params,
+                              mascara=tem_mascara_regras('fato_saldo_despesa'), **variante)
             df.columns = [col.lower() for col in df.columns]
             return df
 
-    def _get_dados_base(self, filtro_modalidade: str, filtro_categoria: str = None) -> pd.DataFrame:
-        """Busca e calcula os valores base do banco de dados com a nova lógica de bimestres."""
-        env = get_db_environment()
-        placeholder = '%s' if env == 'postgres' else '?'
-        inmes_column = "CAST(fs.inmes AS INTEGER)" if env == 'postgres' else "fs.inmes"
-        coexercicio_column = "CAST(fs.coexercicio AS INTEGER)" if env == 'postgres' else "fs.coexercicio"
-        
-        # Criar placeholders para cada uso
-        placeholders_no_bimestre = ', '.join([placeholder] * len(self.meses_apenas_no_bimestre))
-        placeholders_ate_bimestre = ', '.join([placeholder] * len(self.meses_ate_bimestre))
-        
-        # Se não houver meses, usar NULL para evitar erro SQL
-        if not self.meses_apenas_no_bimestre:
-            placeholders_no_bimestre = 'NULL'
-        if not self.meses_ate_bimestre:
-            placeholders_ate_bimestre = 'NULL'
-        
-        # Montar parâmetros na ordem exata da query
-        params = []
-        
-        # dotacao_inicial: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # dotacao_autorizada: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # empenhado_bimestre: apenas_no_bimestre
-        if self.meses_apenas_no_bimestre:
-            params.extend(self.meses_apenas_no_bimestre)
-        
-        # empenhado_ate_bimestre: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # liquidado_bimestre: apenas_no_bimestre
-        if self.meses_apenas_no_bimestre:
-            params.extend(self.meses_apenas_no_bimestre)
-        
-        # liquidado_ate_bimestre: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # pago_ate_bimestre: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # WHERE: ano
-        params.append(self.ano)
-        
-        # Filtro de categoria se especificado
-        filtro_categoria_sql = ""
-        if filtro_categoria:
-            filtro_categoria_sql = f" AND fs.incategoria = {placeholder}"
-            params.append(filtro_categoria)
+    def _get_dados_consolidados(self) -> pd.DataFrame:
+        """Lê uma única vez as medidas do exercício por categoria e grupo de modalidade."""
+        if self._dados_consolidados is None:
+            params = parametros_bimestre(self.ano, self.meses_ate_bimestre, self.meses_apenas_no_bimestre)
+            df = self._executar_query('rreo_despesa_consolidada', params)
+            df['incategoria'] = df['incategoria'].astype(str)
+            self._dados_consolidados = df
+        return self._dados_consolidados
 
-        query = f"""
-        WITH saldos_agregados AS (
-            SELECT
-                fs.incategoria,
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil BETWEEN '522110000' AND '522119999' 
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as dotacao_inicial,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND (
-                        (fs.cocontacontabil BETWEEN '522110000' AND '522129999') OR
-                        (fs.cocontacontabil BETWEEN '522150000' AND '522159999') OR
-                        (fs.cocontacontabil BETWEEN '522190000' AND '522199999')
-                    )
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as dotacao_autorizada,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_no_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil BETWEEN '622130000' AND '622139999'
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as empenhado_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil BETWEEN '622130000' AND '622139999'
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as empenhado_ate_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_no_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil IN ('622130300', '622130400', '622130700')
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as liquidado_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil IN ('622130300', '622130400', '622130700')
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as liquidado_ate_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil = '622920104'
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as pago_ate_bimestre
-                
-            FROM fato_saldo_despesa fs
-            WHERE {coexercicio_column} = {placeholder} 
-            AND {filtro_modalidade}
-            {filtro_categoria_sql}
-            GROUP BY fs.incategoria
-        )
-        SELECT * FROM saldos_agregados
-        WHERE (
-            ABS(dotacao_inicial) + ABS(dotacao_autorizada) + 
-            ABS(empenhado_ate_bimestre) + ABS(liquidado_ate_bimestre) + 
-            ABS(pago_ate_bimestre)
-        ) > 0.01
-        ORDER BY incategoria;
+    def _get_dados_base(self, modalidade: str, filtro_categoria: str = None) -> pd.DataFrame:
         """
-        
-        return self._executar_query(query, params)
+        Linhas por categoria da leitura consolidada, com o mesmo recorte da consulta rreo_despesa_base.
+        `modalidade` é uma das chaves de FILTROS_MODALIDADE ('exceto_intra', 'intra', 'todas').
+        """
+        df = self._get_dados_consolidados()
+        if modalidade != 'todas':
+            df = df[df['grupo_modalidade'] == modalidade]
+        if filtro_categoria:
+            df = df[df['incategoria'] == str(filtro_categoria)]
+        df = df.groupby('incategoria', sort=True)[_MEDIDAS].sum().reset_index()
+        nao_nula = df[_MEDIDAS_NAO_NULAS].abs().sum(axis=1) > 0.01
+        return df[nao_nula].reset_index(drop=True)
 
     def _get_reserva_contingencia(self) -> pd.Series:
         """Busca dados da Reserva de Contingência (categoria 9)"""
-        df_reserva = self._get_dados_base("1=1", "9")  # Todas modalidades, categoria 9
+        df_reserva = self._get_dados_base('todas', "9")  # Todas modalidades, categoria 9
         if not df_reserva.empty:
             return df_reserva.sum(numeric_only=True)
         return pd.Series()
@@ -253,8 +156,8 @@ class BalancoOrcamentarioDespesaAnexo2:
     def gerar_relatorio(self) -> dict:
         """Gera o relatório completo de despesas"""
         # Filtros de modalidade
-        filtro_exceto_intra = "fs.comodalidade != '91'"
-        filtro_apenas_intra = "fs.comodalidade = '91'"
+        filtro_exceto_intra = 'exceto_intra'
+        filtro_apenas_intra = 'intra'
         
         # DESPESAS CORRENTES (categorias 1, 2, 3)
         total_correntes, linhas_correntes = self._processar_grupo_despesas(
@@ -3,8 +3,16 @@
 Módulo para gerar o Demonstrativo da Execução Orçamentária da Despesa por Função.
 Segue a mesma lógica do RREO_despesa.py com regras específicas para classificação funcional.
 """
+import logging
 import pandas as pd
-from ..modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from ..modulos.conexao_hibrida import ConexaoBanco
+from ..modulos.cache_resultados import resultado_em_cache
+from ..modulos.cache_dimensoes import dimensao
+from ..modulos.consultas import consultar_df
+from ..modulos.regras_mascara import tem_mascara_regras
+from .consultas_rreo import parametros_bimestre
+
+log = logging.getLogger(__name__)
 
 class BalancoOrcamentarioDespesaFuncionalAnexo2:
     """
@@ -25,151 +33,26 @@ class BalancoOrcamentarioDespesaFuncionalAnexo2:
         for i in range(1, self.bimestre + 1):
             self.meses_ate_bimestre.extend(self.bimestre_map.get(i, []))
 
-    def _executar_query(self, query: str, params=None) -> pd.DataFrame:
-        """Executa uma query e retorna um DataFrame do Pandas."""
+    def _executar_query(self, nome_consulta: str, params: dict, **variante) -> pd.DataFrame:
+        """Executa uma consulta registrada e retorna um DataFrame do Pandas."""
         with ConexaoBanco(db_name='saldos_despesa') as conn:
-            query_adaptada = adaptar_query(query)
-            df = pd.read_sql_query(query_adaptada, conn, params=params)
+            df = consultar_df(conn, nome_consulta, params,
+                              mascara=tem_mascara_regras('fato_saldo_despesa'), **variante)
             df.columns = [col.lower() for col in df.columns]
             return df
 
-    def _get_dados_base_funcional(self, filtro_modalidade: str, filtro_funcao: str = None, filtro_subfuncao: str = None) -> pd.DataFrame:
-        """Busca e calcula os valores base do banco de dados por função/subfunção."""
-        env = get_db_environment()
-        placeholder = '%s' if env == 'postgres' else '?'
-        inmes_column = "CAST(fs.inmes AS INTEGER)" if env == 'postgres' else "fs.inmes"
-        coexercicio_column = "CAST(fs.coexercicio AS INTEGER)" if env == 'postgres' else "fs.coexercicio"
-        
-        # Criar placeholders para cada uso
-        placeholders_no_bimestre = ', '.join([placeholder] * len(self.meses_apenas_no_bimestre))
-        placeholders_ate_bimestre = ', '.join([placeholder] * len(self.meses_ate_bimestre))
-        
-        # Se não houver meses, usar NULL para evitar erro SQL
-        if not self.meses_apenas_no_bimestre:
-            placeholders_no_bimestre = 'NULL'
-        if not self.meses_ate_bimestre:
-            placeholders_ate_bimestre = 'NULL'
-        
-        # Montar parâmetros na ordem exata da query
-        params = []
-        
-        # dotacao_inicial: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # dotacao_autorizada: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # empenhado_bimestre: apenas_no_bimestre
-        if self.meses_apenas_no_bimestre:
-            params.extend(self.meses_apenas_no_bimestre)
-        
-        # empenhado_ate_bimestre: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # liquidado_bimestre: apenas_no_bimestre
-        if self.meses_apenas_no_bimestre:
-            params.extend(self.meses_apenas_no_bimestre)
-        
-        # liquidado_ate_bimestre: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # pago_ate_bimestre: ate_bimestre
-        if self.meses_ate_bimestre:
-            params.extend(self.meses_ate_bimestre)
-        
-        # WHERE: ano
-        params.append(self.ano)
-        
-        # Filtros de função e subfunção se especificados
-        filtro_funcao_sql = ""
+    def _get_dados_base_funcional(self, modalidade: str, filtro_funcao: str = None, filtro_subfuncao: str = None) -> pd.DataFrame:
+        """
+        Busca e calcula os valores base do banco de dados por função/subfunção.
+        `modalidade` é uma das chaves de FILTROS_MODALIDADE ('exceto_intra', 'intra', 'todas').
+        """
+        params = parametros_bimestre(self.ano, self.meses_ate_bimestre, self.meses_apenas_no_bimestre)
         if filtro_funcao:
-            filtro_funcao_sql = f" AND fs.cofuncao = {placeholder}"
-            params.append(filtro_funcao)
-            
-        filtro_subfuncao_sql = ""
+            params['funcao'] = filtro_funcao
         if filtro_subfuncao:
-            filtro_subfuncao_sql = f" AND fs.cosubfuncao = {placeholder}"
-            params.append(filtro_subfuncao)
-
-        query = f"""
-        WITH saldos_agregados AS (
-            SELECT
-                fs.cofuncao,
-                fs.cosubfuncao,
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil BETWEEN '522110000' AND '522119999' 
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as dotacao_inicial,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND (
-                        (fs.cocontacontabil BETWEEN '522110000' AND '522129999') OR
-                        (fs.cocontacontabil BETWEEN '522150000' AND '522159999') OR
-                        (fs.cocontacontabil BETWEEN '522190000' AND '522199999')
-                    )
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as dotacao_autorizada,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_no_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil BETWEEN '622130000' AND '622139999'
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as empenhado_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil BETWEEN '622130000' AND '622139999'
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as empenhado_ate_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_no_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil IN ('622130300', '622130400', '622130700')
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as liquidado_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil IN ('622130300', '622130400', '622130700')
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as liquidado_ate_bimestre,
-                
-                SUM(CASE 
-                    WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) 
-                    AND fs.cocontacontabil = '622920104'
-                    THEN fs.saldo_contabil_despesa
-                    ELSE 0 
-                END) as pago_ate_bimestre
-                
-            FROM fato_saldo_despesa fs
-            WHERE {coexercicio_column} = {placeholder} 
-            AND {filtro_modalidade}
-            {filtro_funcao_sql}
-            {filtro_subfuncao_sql}
-            GROUP BY fs.cofuncao, fs.cosubfuncao
-        )
-        SELECT * FROM saldos_agregados
-        WHERE (
-            ABS(dotacao_inicial) + ABS(dotacao_autorizada) + 
-            ABS(empenhado_ate_bimestre) + ABS(liquidado_ate_bimestre) + 
-            ABS(pago_ate_bimestre)
-        ) > 0.01
-        ORDER BY cofuncao, cosubfuncao;
-        """
-        
-        return self._executar_query(query, params)
+            params['subfuncao'] = filtro_subfuncao
+        return self._executar_query('rreo_despesa_funcional', params, modalidade=modalidade,
+                                    com_funcao=bool(filtro_funcao), com_subfuncao=bool(filtro_subfuncao))
 
     def _criar_linha(self, dados_serie: pd.Series, descricao: str, tipo: str, nivel: int, pai_id: str = None) -> dict:
         """Cria uma linha formatada para o relatório"""
@@ -264,63 +147,25 @@ class BalancoOrcamentarioDespesaFuncionalAnexo2:
         return total_grupo, linhas
 
     def _enriquecer_com_nomes_funcoes(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Busca os nomes das funções e subfunções"""
+        """Põe os nomes das funções e subfunções a partir do cache das dimensões"""
+        df['cofuncao'] = df['cofuncao'].astype(str)
+        df['cosubfuncao'] = df['cosubfuncao'].astype(str)
         try:
-            # Busca nomes das funções
-            with ConexaoBanco(db_name='dimensoes') as conn:
-                env = get_db_environment()
-                placeholder = '%s' if env == 'postgres' else '?'
-                
-                # Lista de códigos únicos de funções
-                codigos_funcao = [str(f) for f in df['cofuncao'].unique()]
-                placeholders_funcao = ', '.join([placeholder] * len(codigos_funcao))
-                
-                query_funcoes = f"""
-                SELECT cofuncao, nofuncao 
-                FROM funcoes 
-                WHERE cofuncao IN ({placeholders_funcao})
-                """
-                df_func_nomes = pd.read_sql_query(adaptar_query(query_funcoes), conn, params=codigos_funcao)
-                df_func_nomes.columns = [col.lower() for col in df_func_nomes.columns]
-                df_func_nomes['cofuncao'] = df_func_nomes['cofuncao'].astype(str)
-                
-                # Lista de códigos únicos de subfunções
-                codigos_subfuncao = [str(f) for f in df['cosubfuncao'].unique()]
-                placeholders_subfuncao = ', '.join([placeholder] * len(codigos_subfuncao))
-                
-                query_subfuncoes = f"""
-                SELECT cosubfuncao, nosubfuncao 
-                FROM subfuncoes 
-                WHERE cosubfuncao IN ({placeholders_subfuncao})
-                """
-                df_subfunc_nomes = pd.read_sql_query(adaptar_query(query_subfuncoes), conn, params=codigos_subfuncao)
-                df_subfunc_nomes.columns = [col.lower() for col in df_subfunc_nomes.columns]
-                df_subfunc_nomes['cosubfuncao'] = df_subfunc_nomes['cosubfuncao'].astype(str)
-                
-            # Converte colunas para string para merge
-            df['cofuncao'] = df['cofuncao'].astype(str)
-            df['cosubfuncao'] = df['cosubfuncao'].astype(str)
-            
-            # Faz o merge
-            df = df.merge(df_func_nomes, on='cofuncao', how='left')
-            df = df.merge(df_subfunc_nomes, on='cosubfuncao', how='left')
-            
-            # Preenche nomes faltantes
-            df['nofuncao'] = df['nofuncao'].fillna('Função ' + df['cofuncao'])
-            df['nosubfuncao'] = df['nosubfuncao'].fillna('Subfunção ' + df['cosubfuncao'])
-            
+            df['nofuncao'] = dimensao('funcoes').nomear(df['cofuncao'], 'Função ')
+            df['nosubfuncao'] = dimensao('subfuncoes').nomear(df['cosubfuncao'], 'Subfunção ')
         except Exception as e:
-            print(f"Erro ao buscar nomes de funções: {e}")
-            df['nofuncao'] = 'Função ' + df['cofuncao'].astype(str)
-            df['nosubfuncao'] = 'Subfunção ' + df['cosubfuncao'].astype(str)
+            log.error("Erro ao buscar nomes de funções: %s", e)
+            df['nofuncao'] = 'Função ' + df['cofuncao']
+            df['nosubfuncao'] = 'Subfunção ' + df['cosubfuncao']
             
         return df
 
+    @resultado_em_cache('rreo_despesa_funcional', chave=lambda self: (self.ano, self.bimestre))
     def gerar_relatorio(self) -> dict:
         """Gera o relatório completo de despesas por função"""
         # Filtros de modalidade
-        filtro_exceto_intra = "fs.comodalidade != '91'"
-        filtro_apenas_intra = "fs.comodalidade = '91'"
+        filtro_exceto_intra = 'exceto_intra'
+        filtro_apenas_intra = 'intra'
         
         # DESPESAS (EXCETO INTRA-ORÇAMENTÁRIAS) POR FUNÇÃO
         total_exceto_intra, linhas_exceto_intra = self._processar_despesas_por_funcao(filtro_exceto_intra)
@@ -4,9 +4,15 @@ Módulo para gerar o Demonstrativo Completo do Balanço Orçamentário (Receitas
 Combina os dados de receitas e despesas em um único relatório.
 """
 import pandas as pd
-from ..modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from ..modulos.conexao_hibrida import ConexaoBanco
+from ..modulos.cache_resultados import resultado_em_cache
+from ..modulos.consultas import consultar_df
+from ..modulos.regras_mascara import tem_mascara_regras
+from .consultas_rreo import nomes_receita, parametros_bimestre
 from .RREO_despesa import BalancoOrcamentarioDespesaAnexo2
 
+_MEDIDAS = ['previsao_inicial', 'previsao_atualizada', 'realizado_bimestre', 'realizado_ate_bimestre']
+
 class BalancoOrcamentarioAnexo2:
     """
     Gera os dados para o Balanço Orçamentário da Receita, com lógica de
@@ -27,93 +33,37 @@ class BalancoOrcamentarioAnexo2:
         for i in range(1, self.bimestre + 1):
             self.meses_ate_bimestre.extend(self.bimestre_map.get(i, []))
 
-    def _executar_query(self, query: str, params=None) -> pd.DataFrame:
-        """Executa uma query e retorna um DataFrame do Pandas."""
+        self._dados_consolidados = None
+
+    def _executar_query(self, nome_consulta: str, params: dict) -> pd.DataFrame:
+        """Executa uma consulta registrada e retorna um DataFrame do Pandas."""
         with ConexaoBanco() as conn:
-            query_adaptada = adaptar_query(query)
-            df = pd.read_sql_query(query_adaptada, conn, params=params)
+            df = consultar_df(conn, nome_consulta, params, mascara=tem_mascara_regras('fato_saldos'))
             df.columns = [col.lower() for col in df.columns]
             return df
 
-    def _get_dados_base(self, tipo_receita_sql: str) -> pd.DataFrame:
-        """Busca e calcula os valores base do banco de dados com a nova lógica de bimestres."""
-        env = get_db_environment()
-        placeholder = '%s' if env == 'postgres' else '?'
-        inmes_column = "CAST(fs.inmes AS INTEGER)" if env == 'postgres' else "fs.inmes"
-        coexercicio_column = "CAST(fs.coexercicio AS INTEGER)" if env == 'postgres' else "fs.coexercicio"
-        
-        placeholders_no_bimestre = ', '.join([placeholder] * len(self.meses_apenas_no_bimestre))
-        placeholders_ate_bimestre = ', '.join([placeholder] * len(self.meses_ate_bimestre))
-        
-        # Os parâmetros agora são usados para todas as colunas
-        params = self.meses_ate_bimestre + self.meses_ate_bimestre + self.meses_apenas_no_bimestre + self.meses_ate_bimestre + [self.ano]
-        
-        type_cast = "::text" if env == 'postgres' else ""
-
-        query = f"""
-        WITH saldos_agregados AS (
-            SELECT
-                fs.cofontereceita,
-                fs.cosubfontereceita,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '521100000' AND '521199999' THEN fs.saldo_contabil ELSE 0 END) as previsao_inicial,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '521100000' AND '521299999' THEN fs.saldo_contabil ELSE 0 END) as previsao_atualizada,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_no_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '621200000' AND '621399999' THEN fs.saldo_contabil ELSE 0 END) as realizado_bimestre,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '621200000' AND '621399999' THEN fs.saldo_contabil ELSE 0 END) as realizado_ate_bimestre
-            FROM fato_saldos fs
-            WHERE {coexercicio_column} = {placeholder} AND ({tipo_receita_sql})
-            GROUP BY fs.cofontereceita, fs.cosubfontereceita
-        )
-        SELECT
-            sa.*,
-            ori.nofontereceita,
-            esp.nosubfontereceita
-        FROM saldos_agregados sa
-        LEFT JOIN dimensoes.origens ori ON sa.cofontereceita{type_cast} = ori.cofontereceita
-        LEFT JOIN dimensoes.especies esp ON sa.cosubfontereceita{type_cast} = esp.cosubfontereceita
-        WHERE sa.previsao_atualizada != 0 OR sa.realizado_ate_bimestre != 0
-        ORDER BY sa.cofontereceita, sa.cosubfontereceita;
-        """
-        
-        return self._executar_query(query, params)
+    def _get_dados_consolidados(self) -> pd.DataFrame:
+        """Lê uma única vez as medidas do exercício por origem/espécie (todas as faixas)."""
+        if self._dados_consolidados is None:
+            params = parametros_bimestre(self.ano, self.meses_ate_bimestre, self.meses_apenas_no_bimestre)
+            self._dados_consolidados = nomes_receita(self._executar_query('rreo_receita_consolidada', params))
+        return self._dados_consolidados
+
+    def _get_dados_base(self, fonte_inicial: str, fonte_final: str) -> pd.DataFrame:
+        """Linhas das fontes de receita na faixa informada, a partir da leitura consolidada."""
+        df = self._get_dados_consolidados()
+        colunas = ['cofontereceita', 'cosubfontereceita'] + _MEDIDAS + ['nofontereceita', 'nosubfontereceita']
+        fonte = df['cofontereceita'].astype(str)
+        na_faixa = df['cofontereceita'].notna() & (fonte >= fonte_inicial) & (fonte <= fonte_final)
+        com_valor = (df['previsao_atualizada'] != 0) | (df['realizado_ate_bimestre'] != 0)
+        return df.loc[na_faixa & com_valor, colunas].reset_index(drop=True)
 
     def _get_saldos_exercicios_anteriores(self) -> dict:
-        """Busca os dados para as linhas de Saldos de Exercícios Anteriores."""
-        env = get_db_environment()
-        placeholder = '%s' if env == 'postgres' else '?'
-        inmes_column = "CAST(fs.inmes AS INTEGER)" if env == 'postgres' else "fs.inmes"
-        coexercicio_column = "CAST(fs.coexercicio AS INTEGER)" if env == 'postgres' else "fs.coexercicio"
-        cocontacorrente_like = "fs.cocontacorrente LIKE %s" if env == 'postgres' else "fs.cocontacorrente LIKE ?"
-
-        placeholders_no_bimestre = ', '.join([placeholder] * len(self.meses_apenas_no_bimestre))
-        placeholders_ate_bimestre = ', '.join([placeholder] * len(self.meses_ate_bimestre))
-
-        query_rpps = f"""
-        SELECT
-            SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '521100000' AND '521199999' THEN fs.saldo_contabil ELSE 0 END) as previsao_inicial,
-            SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '521100000' AND '521299999' THEN fs.saldo_contabil ELSE 0 END) as previsao_atualizada,
-            SUM(CASE WHEN {inmes_column} IN ({placeholders_no_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '621200000' AND '621399999' THEN fs.saldo_contabil ELSE 0 END) as realizado_bimestre,
-            SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '621200000' AND '621399999' THEN fs.saldo_contabil ELSE 0 END) as realizado_ate_bimestre
-        FROM fato_saldos fs
-        WHERE {coexercicio_column} = {placeholder} AND {cocontacorrente_like}
-        """
-        params_rpps = self.meses_ate_bimestre + self.meses_ate_bimestre + self.meses_apenas_no_bimestre + self.meses_ate_bimestre + [self.ano, '99%']
-        df_rpps = self._executar_query(query_rpps, params_rpps)
-
-        query_superavit = f"""
-        SELECT
-            SUM(fs.saldo_contabil) as previsao_atualizada
-        FROM fato_saldos fs
-        WHERE {coexercicio_column} = {placeholder}
-          AND {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'})
-          AND fs.cocontacontabil BETWEEN '522130100' AND '522130199'
-        """
-        params_superavit = [self.ano] + self.meses_ate_bimestre
-        df_superavit = self._executar_query(query_superavit, params_superavit)
-
-        return {
-            'rpps': df_rpps.iloc[0] if not df_rpps.empty else pd.Series(dtype='float64'),
-            'superavit': df_superavit.iloc[0] if not df_superavit.empty else pd.Series(dtype='float64')
-        }
+        """Dados das linhas de Saldos de Exercícios Anteriores, somados da leitura consolidada."""
+        df = self._get_dados_consolidados()
+        rpps = pd.Series({medida: df[f'rpps_{medida}'].sum() for medida in _MEDIDAS}, dtype='float64')
+        superavit = pd.Series({'previsao_atualizada': df['superavit_previsao_atualizada'].sum()}, dtype='float64')
+        return {'rpps': rpps, 'superavit': superavit}
 
     def _processar_hierarquia(self, df: pd.DataFrame, tipo_receita_principal: str) -> list:
         linhas_relatorio = []
@@ -150,13 +100,14 @@ class BalancoOrcamentarioAnexo2:
             'saldo': previsao_atualizada - realizado_ate_bimestre
         }
 
+    @resultado_em_cache('rreo_anexo2', chave=lambda self: (self.ano, self.bimestre))
     def gerar_relatorio(self) -> dict:
         """Gera o relatório completo de receitas e despesas"""
         # --- PARTE 1: RECEITAS ---
-        df_correntes = self._get_dados_base("fs.cofontereceita BETWEEN '11' AND '19'")
+        df_correntes = self._get_dados_base('11', '19')
         linhas_correntes = self._processar_hierarquia(df_correntes, "RECEITAS CORRENTES")
         
-        df_capital = self._get_dados_base("fs.cofontereceita BETWEEN '21' AND '29'")
+        df_capital = self._get_dados_base('21', '29')
         linhas_capital = self._processar_hierarquia(df_capital, "RECEITAS DE CAPITAL")
         
         total_correntes = linhas_correntes[0] if linhas_correntes else {}
@@ -165,7 +116,7 @@ class BalancoOrcamentarioAnexo2:
         total_exceto_intra = {k: total_correntes.get(k, 0) + total_capital.get(k, 0) for k in total_correntes if isinstance(total_correntes.get(k), (int, float))}
         linha_total_exceto_intra = self._criar_linha(pd.Series(total_exceto_intra), "RECEITAS (EXCETO INTRA-ORÇAMENTÁRIAS) (I)", 'total_grupo', 0)
         
-        df_intra = self._get_dados_base("fs.cofontereceita BETWEEN '71' AND '79'")
+        df_intra = self._get_dados_base('71', '79')
         linhas_intra = self._processar_hierarquia(df_intra, "RECEITAS (INTRA-ORÇAMENTÁRIAS) (II)")
         # CORREÇÃO: RECEITAS (INTRA-ORÇAMENTÁRIAS) deve ter mesmo tom que TOTAL DAS RECEITAS
         total_intra = linhas_intra[0] if linhas_intra else self._criar_linha(pd.Series(), "RECEITAS (INTRA-ORÇAMENTÁRIAS) (II)", 'total_geral', 0)
@@ -4,7 +4,10 @@ Módulo para gerar o Demonstrativo da Execução Orçamentária da Receita Intra
 Focado apenas nas receitas intra (fontes 71-79).
 """
 import pandas as pd
-from ..modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from ..modulos.conexao_hibrida import ConexaoBanco
+from ..modulos.consultas import consultar_df
+from ..modulos.regras_mascara import tem_mascara_regras
+from .consultas_rreo import nomes_receita, parametros_bimestre
 
 class BalancoOrcamentarioReceitaIntraAnexo2:
     """
@@ -25,54 +28,18 @@ class BalancoOrcamentarioReceitaIntraAnexo2:
         for i in range(1, self.bimestre + 1):
             self.meses_ate_bimestre.extend(self.bimestre_map.get(i, []))
 
-    def _executar_query(self, query: str, params=None) -> pd.DataFrame:
-        """Executa uma query e retorna um DataFrame do Pandas."""
+    def _executar_query(self, nome_consulta: str, params: dict) -> pd.DataFrame:
+        """Executa uma consulta registrada e retorna um DataFrame do Pandas."""
         with ConexaoBanco() as conn:
-            query_adaptada = adaptar_query(query)
-            df = pd.read_sql_query(query_adaptada, conn, params=params)
+            df = consultar_df(conn, nome_consulta, params, mascara=tem_mascara_regras('fato_saldos'))
             df.columns = [col.lower() for col in df.columns]
             return df
 
-    def _get_dados_base(self, tipo_receita_sql: str) -> pd.DataFrame:
-        """Busca e calcula os valores base do banco de dados com a nova lógica de bimestres."""
-        env = get_db_environment()
-        placeholder = '%s' if env == 'postgres' else '?'
-        inmes_column = "CAST(fs.inmes AS INTEGER)" if env == 'postgres' else "fs.inmes"
-        coexercicio_column = "CAST(fs.coexercicio AS INTEGER)" if env == 'postgres' else "fs.coexercicio"
-        
-        placeholders_no_bimestre = ', '.join([placeholder] * len(self.meses_apenas_no_bimestre))
-        placeholders_ate_bimestre = ', '.join([placeholder] * len(self.meses_ate_bimestre))
-        
-        # Os parâmetros agora são usados para todas as colunas
-        params = self.meses_ate_bimestre + self.meses_ate_bimestre + self.meses_apenas_no_bimestre + self.meses_ate_bimestre + [self.ano]
-        
-        type_cast = "::text" if env == 'postgres' else ""
-
-        query = f"""
-        WITH saldos_agregados AS (
-            SELECT
-                fs.cofontereceita,
-                fs.cosubfontereceita,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '521100000' AND '521199999' THEN fs.saldo_contabil ELSE 0 END) as previsao_inicial,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '521100000' AND '521299999' THEN fs.saldo_contabil ELSE 0 END) as previsao_atualizada,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_no_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '621200000' AND '621399999' THEN fs.saldo_contabil ELSE 0 END) as realizado_bimestre,
-                SUM(CASE WHEN {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'}) AND fs.cocontacontabil BETWEEN '621200000' AND '621399999' THEN fs.saldo_contabil ELSE 0 END) as realizado_ate_bimestre
-            FROM fato_saldos fs
-            WHERE {coexercicio_column} = {placeholder} AND ({tipo_receita_sql})
-            GROUP BY fs.cofontereceita, fs.cosubfontereceita
-        )
-        SELECT
-            sa.*,
-            ori.nofontereceita,
-            esp.nosubfontereceita
-        FROM saldos_agregados sa
-        LEFT JOIN dimensoes.origens ori ON sa.cofontereceita{type_cast} = ori.cofontereceita
-        LEFT JOIN dimensoes.especies esp ON sa.cosubfontereceita{type_cast} = esp.cosubfontereceita
-        WHERE sa.previsao_atualizada != 0 OR sa.realizado_ate_bimestre != 0
-        ORDER BY sa.cofontereceita, sa.cosubfontereceita;
-        """
-        
-        return self._executar_query(query, params)
+    def _get_dados_base(self, fonte_inicial: str, fonte_final: str) -> pd.DataFrame:
+        """Busca e calcula os valores base das fontes de receita na faixa informada."""
+        params = parametros_bimestre(self.ano, self.meses_ate_bimestre, self.meses_apenas_no_bimestre)
+        params.update({'fonte_ini': fonte_inicial, 'fonte_fim': fonte_final})
+        return nomes_receita(self._executar_query('rreo_receita_base', params))
 
     def _processar_hierarquia(self, df: pd.DataFrame, tipo_receita_principal: str) -> list:
         """Processa a hierarquia de receitas intra-orçamentárias"""
@@ -121,7 +88,7 @@ class BalancoOrcamentarioReceitaIntraAnexo2:
     def gerar_relatorio(self) -> dict:
         """Gera o relatório completo de receitas intra-orçamentárias"""
         # Apenas receitas correntes intra (fontes 71-79)
-        df_correntes_intra = self._get_dados_base("fs.cofontereceita BETWEEN '71' AND '79'")
+        df_correntes_intra = self._get_dados_base('71', '79')
         linhas_correntes_intra = self._processar_hierarquia(df_correntes_intra, "RECEITAS CORRENTES INTRA-ORÇAMENTÁRIAS")
         
         # Total das receitas intra
@@ -1,7 +1,13 @@
 # app/relatorios/analise_inconsistencias.py
 
+import logging
 import pandas as pd
 from ..modulos.conexao_hibrida import ConexaoBanco, get_db_environment, adaptar_query
+from ..modulos.consultas import dialeto_atual
+from ..modulos.cache_dimensoes import dimensao
+from ..modulos.catalogo_dados import exercicios_disponiveis
+
+log = logging.getLogger(__name__)
 
 # --- FUNÇÃO DE FORMATAÇÃO MANUAL - NÃO DEPENDE DO SERVIDOR ---
 def _formatar_moeda(valor):
@@ -33,13 +39,17 @@ def _executar_query(query, params=None):
         df.columns = [col.lower() for col in df.columns]
         return df
 
+def _com_nomes_ugs(df):
+    """Nome da UG (cache das dimensões) em cada linha agrupada por coug."""
+    df['coug'] = df['coug'].astype(str)
+    df['noug'] = dimensao('unidades_gestoras').nomear(df['coug'], None).fillna('Nome da UG não encontrado')
+    return df
+
 def obter_exercicios_disponiveis():
     try:
-        query = "SELECT DISTINCT coexercicio FROM fato_saldos ORDER BY coexercicio DESC;"
-        df = _executar_query(query)
-        return df['coexercicio'].tolist()
+        return exercicios_disponiveis()
     except Exception as e:
-        print(f"Erro ao obter exercícios: {e}")
+        log.error("Erro ao obter exercícios: %s", e)
         return [2025, 2024]
 
 def analisar_fontes_superavit(exercicio):
@@ -55,16 +65,13 @@ def analisar_fontes_superavit(exercicio):
         inconsistencias['saldo_formatado'] = inconsistencias['saldo_total'].apply(_formatar_moeda)
         return inconsistencias.to_dict('records')
     except Exception as e:
-        print(f"Erro na análise de fontes de superávit: {e}")
+        log.error("Erro na análise de fontes de superávit: %s", e)
         return []
 
 def analisar_ugs_invalidas(exercicio):
     try:
-        type_cast = "::text" if get_db_environment() == 'postgres' else ""
-        df_ugs = _executar_query("SELECT coug, noug FROM dimensoes.unidades_gestoras")
-        df_ugs['coug'] = df_ugs['coug'].astype(str)
-
-        query_saldos = f"SELECT coug, cocontacontabil, cocontacorrente, saldo_contabil FROM fato_saldos WHERE coexercicio = %s AND intipoadm = 1 AND coug{type_cast} != '130101';"
+        d = dialeto_atual()
+        query_saldos = f"SELECT coug, cocontacontabil, cocontacorrente, saldo_contabil FROM fato_saldos WHERE coexercicio = %s AND intipoadm = 1 AND {d.txt('coug')} != '130101';"
         df_saldos = _executar_query(query_saldos, params=(exercicio,))
         if df_saldos.empty: return []
 
@@ -72,20 +79,15 @@ def analisar_ugs_invalidas(exercicio):
         inconsistencias = agrupado[agrupado['saldo_total'] != 0].copy()
         if inconsistencias.empty: return []
         
-        inconsistencias['coug'] = inconsistencias['coug'].astype(str)
-        resultado_final = pd.merge(inconsistencias, df_ugs, on='coug', how='left')
-        resultado_final['noug'] = resultado_final['noug'].fillna('Nome da UG não encontrado')
+        resultado_final = _com_nomes_ugs(inconsistencias)
         resultado_final['saldo_formatado'] = resultado_final['saldo_total'].apply(_formatar_moeda)
         return resultado_final.to_dict('records')
     except Exception as e:
-        print(f"Erro na análise de UGs inválidas: {e}")
+        log.error("Erro na análise de UGs inválidas: %s", e)
         return []
 
 def analisar_saldos_negativos(exercicio):
     try:
-        df_ugs = _executar_query("SELECT coug, noug FROM dimensoes.unidades_gestoras")
-        df_ugs['coug'] = df_ugs['coug'].astype(str)
-
         query = "SELECT coug, cocontacontabil, cocontacorrente, saldo_contabil FROM fato_saldos WHERE coexercicio = %s AND cocontacontabil = '621200000';"
         df = _executar_query(query, params=(exercicio,))
         if df.empty: return []
@@ -94,12 +96,10 @@ def analisar_saldos_negativos(exercicio):
         inconsistencias = agrupado[agrupado['saldo_total'] < 0].copy()
         if inconsistencias.empty: return []
         
-        inconsistencias['coug'] = inconsistencias['coug'].astype(str)
-        resultado_final = pd.merge(inconsistencias, df_ugs, on='coug', how='left')
-        resultado_final['noug'] = resultado_final['noug'].fillna('Nome da UG não encontrado')
+        resultado_final = _com_nomes_ugs(inconsistencias)
         resultado_final['saldo_formatado'] = resultado_final['saldo_total'].apply(_formatar_moeda)
         sorted_records = resultado_final.sort_values(by='saldo_total', ascending=True).to_dict('records')
         return sorted_records
     except Exception as e:
-        print(f"Erro na análise de saldos negativos: {e}")
+        log.error("Erro na análise de saldos negativos: %s", e)
         return []
\ No newline at end of file
@@ -4,6 +4,7 @@ Relatório de Balanço Orçamentário da Receita - Versão Simplificada
 Demonstrativo consolidado comparativo entre previsão e realização das receitas
 """
 
+import logging
 import sqlite3
 import os
 from datetime import datetime
@@ -13,10 +14,14 @@ from typing import Dict, List
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from modulos.regras_contabeis_receita import get_filtro_conta
+from modulos.regras_mascara import COLUNA_MASCARA, condicao_regra
+from modulos.cubo_receita import TABELA_CUBO, medida
+from modulos.capacidades import capacidades_arquivo
 from modulos.periodo import obter_periodo_referencia
 from modulos.formatacao import formatar_moeda, formatar_percentual
 
+log = logging.getLogger(__name__)
+
 
 class BalancoOrcamentarioReceita:
     """Classe para gerar o Balanço Orçamentário da Receita Consolidado"""
@@ -34,43 +39,26 @@ class BalancoOrcamentarioReceita:
         if os.path.exists(caminho_dimensoes):
             try:
                 conn.execute(f"ATTACH DATABASE '{caminho_dimensoes}' AS dimensoes")
-                print(f"Banco de dimensões anexado com sucesso")
+                log.debug("Banco de dimensões anexado com sucesso")
             except Exception as e:
-                print(f"Aviso: Não foi possível anexar banco de dimensões: {e}")
+                log.warning("Não foi possível anexar banco de dimensões: %s", e)
         else:
-            print(f"Aviso: Banco de dimensões não encontrado em {caminho_dimensoes}")
+            log.warning("Banco de dimensões não encontrado em %s", caminho_dimensoes)
         
         return conn
     
     def verificar_estrutura_banco(self, conn):
-        """Verifica a estrutura do banco de dados"""
-        cursor = conn.cursor()
-        
-        # Verifica tabelas existentes no banco principal
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tabelas_principais = [row[0] for row in cursor.fetchall()]
-        
-        # Verifica tabelas no banco de dimensões (se anexado)
-        tabelas_dimensoes = []
-        tem_dimensoes_anexadas = False
-        try:
-            cursor.execute("SELECT name FROM dimensoes.sqlite_master WHERE type='table'")
-            tabelas_dimensoes = [row[0] for row in cursor.fetchall()]
-            tem_dimensoes_anexadas = len(tabelas_dimensoes) > 0
-        except:
-            pass
-        
-        # Verifica colunas da fato_saldos
-        colunas_fato = []
-        if 'fato_saldos' in tabelas_principais:
-            cursor.execute("PRAGMA table_info(fato_saldos)")
-            colunas_fato = [row[1] for row in cursor.fetchall()]
+        """Verifica a estrutura do banco de dados (registro de capacidades, relido só quando o arquivo muda)"""
+        caps = capacidades_arquivo(self.caminho_db)
+        tabelas_principais = caps.tabelas()
+        tabelas_dimensoes = caps.tabelas('dimensoes')
+        colunas_fato = caps.colunas('fato_saldos', 'main')
         
         return {
             'tabelas': tabelas_principais,
             'tabelas_dimensoes': tabelas_dimensoes,
             'colunas_fato': colunas_fato,
-            'tem_dimensoes': tem_dimensoes_anexadas,
+            'tem_dimensoes': len(tabelas_dimensoes) > 0,
             'tem_colunas_calculadas': any(col in colunas_fato for col in ['PREVISAO INICIAL', 'RECEITA LIQUIDA'])
         }
     
@@ -191,6 +179,18 @@ class BalancoOrcamentarioReceita:
         
         # Define campo de valor e joins
         campo_valor = 'saldo_contabil' if 'saldo_contabil' in estrutura['colunas_fato'] else 'VALANCAMENTO'
+
+        # Cubo pré-agregado gerado pelo conversor: mesmas regras, bem menos linhas
+        regras = ('PREVISAO_INICIAL_LIQUIDA', 'PREVISAO_ATUALIZADA_LIQUIDA', 'RECEITA_LIQUIDA')
+        if TABELA_CUBO in estrutura['tabelas']:
+            origem = TABELA_CUBO
+            valor = {regra: medida(regra, True, 'l') for regra in regras}
+        else:
+            origem = 'fato_saldos'
+            # regras_mask do próprio arquivo do relatório (ou as faixas de contas, sem a coluna)
+            mascara = COLUNA_MASCARA in estrutura['colunas_fato']
+            valor = {regra: f"CASE WHEN {condicao_regra('fato_saldos', regra, mascara, 'l')} THEN l.{campo_valor} ELSE 0 END"
+                     for regra in regras}
         
         if estrutura['tem_dimensoes']:
             # Usa prefixo 'dimensoes.' para acessar tabelas do banco anexado
@@ -215,34 +215,30 @@ class BalancoOrcamentarioReceita:
             -- Previsão Inicial Líquida
             SUM(CASE 
                 WHEN l.COEXERCICIO = {self.periodo['ano']} 
-                AND {get_filtro_conta('PREVISAO_INICIAL_LIQUIDA')} 
-                THEN l.{campo_valor} ELSE 0 
+                THEN {valor['PREVISAO_INICIAL_LIQUIDA']} ELSE 0 
             END) as previsao_inicial,
             
             -- Previsão Atualizada Líquida
             SUM(CASE 
                 WHEN l.COEXERCICIO = {self.periodo['ano']} 
-                AND {get_filtro_conta('PREVISAO_ATUALIZADA_LIQUIDA')} 
-                THEN l.{campo_valor} ELSE 0 
+                THEN {valor['PREVISAO_ATUALIZADA_LIQUIDA']} ELSE 0 
             END) as previsao_atualizada,
             
             -- Receita Realizada Atual
             SUM(CASE 
                 WHEN l.COEXERCICIO = {self.periodo['ano']} 
                 AND l.INMES <= {self.periodo['mes']}
-                AND {get_filtro_conta('RECEITA_LIQUIDA')} 
-                THEN l.{campo_valor} ELSE 0 
+                THEN {valor['RECEITA_LIQUIDA']} ELSE 0 
             END) as receita_atual,
             
             -- Receita Realizada Anterior
             SUM(CASE 
                 WHEN l.COEXERCICIO = {self.periodo['ano'] - 1} 
                 AND l.INMES <= {self.periodo['mes']}
-                AND {get_filtro_conta('RECEITA_LIQUIDA')} 
-                THEN l.{campo_valor} ELSE 0 
+                THEN {valor['RECEITA_LIQUIDA']} ELSE 0 
             END) as receita_anterior
             
-        FROM fato_saldos l
+        FROM {origem} l
         {joins}
         GROUP BY l.CATEGORIARECEITA, nome_categoria, 
                  l.COFONTERECEITA, nome_fonte
@@ -4,7 +4,11 @@ Módulo para calcular superávit/déficit baseado nas tabelas de receitas e desp
 Separado para manter a responsabilidade única e não interferir nos códigos existentes.
 """
 import pandas as pd
-from ..modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from ..modulos.conexao_hibrida import ConexaoBanco
+from ..modulos.cache_resultados import resultado_em_cache
+from ..modulos.consultas import consultar_df
+from ..modulos.regras_mascara import tem_mascara_regras
+from .consultas_rreo import parametros_bimestre
 
 class CalculoSuperavitDeficit:
     """
@@ -23,68 +27,37 @@ class CalculoSuperavitDeficit:
         for i in range(1, self.bimestre + 1):
             self.meses_ate_bimestre.extend(self.bimestre_map.get(i, []))
 
-    def _executar_query_receitas(self, query: str, params=None) -> pd.DataFrame:
-        """Executa query na base de receitas."""
+    def _executar_query_receitas(self, nome_consulta: str, params: dict) -> pd.DataFrame:
+        """Executa consulta registrada na base de receitas."""
         with ConexaoBanco() as conn:
-            query_adaptada = adaptar_query(query)
-            df = pd.read_sql_query(query_adaptada, conn, params=params)
+            df = consultar_df(conn, nome_consulta, params, mascara=tem_mascara_regras('fato_saldos'))
             df.columns = [col.lower() for col in df.columns]
             return df
 
-    def _executar_query_despesas(self, query: str, params=None) -> pd.DataFrame:
-        """Executa query na base de despesas."""
+    def _executar_query_despesas(self, nome_consulta: str, params: dict) -> pd.DataFrame:
+        """Executa consulta registrada na base de despesas."""
         with ConexaoBanco(db_name='saldos_despesa') as conn:
-            query_adaptada = adaptar_query(query)
-            df = pd.read_sql_query(query_adaptada, conn, params=params)
+            df = consultar_df(conn, nome_consulta, params, mascara=tem_mascara_regras('fato_saldo_despesa'))
             df.columns = [col.lower() for col in df.columns]
             return df
 
     def _get_receitas_realizadas(self) -> float:
         """Busca total de receitas realizadas até o bimestre."""
-        env = get_db_environment()
-        placeholder = '%s' if env == 'postgres' else '?'
-        inmes_column = "CAST(fs.inmes AS INTEGER)" if env == 'postgres' else "fs.inmes"
-        coexercicio_column = "CAST(fs.coexercicio AS INTEGER)" if env == 'postgres' else "fs.coexercicio"
-        
-        placeholders_ate_bimestre = ', '.join([placeholder] * len(self.meses_ate_bimestre))
-        
-        query = f"""
-        SELECT SUM(fs.saldo_contabil) as total_receitas_realizado
-        FROM fato_saldos fs
-        WHERE {coexercicio_column} = {placeholder}
-          AND {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'})
-          AND fs.cocontacontabil BETWEEN '621200000' AND '621399999'
-        """
-        
-        params = [self.ano] + self.meses_ate_bimestre
-        df = self._executar_query_receitas(query, params)
+        params = parametros_bimestre(self.ano, self.meses_ate_bimestre, [])
+        df = self._executar_query_receitas('superavit_receitas_realizadas', params)
         
         resultado = df['total_receitas_realizado'].iloc[0] if not df.empty else 0
         return resultado or 0
 
     def _get_despesas_liquidadas(self) -> float:
         """Busca total de despesas liquidadas até o bimestre."""
-        env = get_db_environment()
-        placeholder = '%s' if env == 'postgres' else '?'
-        inmes_column = "CAST(fs.inmes AS INTEGER)" if env == 'postgres' else "fs.inmes"
-        coexercicio_column = "CAST(fs.coexercicio AS INTEGER)" if env == 'postgres' else "fs.coexercicio"
-        
-        placeholders_ate_bimestre = ', '.join([placeholder] * len(self.meses_ate_bimestre))
-        
-        query = f"""
-        SELECT SUM(fs.saldo_contabil_despesa) as total_despesas_liquidado
-        FROM fato_saldo_despesa fs
-        WHERE {coexercicio_column} = {placeholder}
-          AND {inmes_column} IN ({placeholders_ate_bimestre or 'NULL'})
-          AND fs.cocontacontabil IN ('622130300', '622130400', '622130700')
-        """
-        
-        params = [self.ano] + self.meses_ate_bimestre
-        df = self._executar_query_despesas(query, params)
+        params = parametros_bimestre(self.ano, self.meses_ate_bimestre, [])
+        df = self._executar_query_despesas('superavit_despesas_liquidadas', params)
         
         resultado = df['total_despesas_liquidado'].iloc[0] if not df.empty else 0
         return resultado or 0
 
+    @resultado_em_cache('rreo_superavit_deficit', chave=lambda self: (self.ano, self.bimestre))
     def calcular(self) -> dict:
         """
         Calcula superávit/déficit e retorna dados formatados para o template.
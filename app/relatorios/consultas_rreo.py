@@ -0,0 +1,266 @@
+# app/relatorios/consultas_rreo.py
+"""
+Consultas registradas dos demonstrativos do RREO (Anexo 2 e despesa por função).
+Os meses entram como limites de faixa (:ate_ini/:ate_fim e :bim_ini/:bim_fim),
+de modo que o mesmo SQL atende a todos os bimestres. As contas de cada medida vêm do
+registro de regras_mask (variante mascara=True testa o bit da regra).
+"""
+from ..modulos.consultas import registrar_consulta, faixa_meses
+from ..modulos.regras_mascara import condicao_regra
+from ..modulos.cache_dimensoes import dimensao
+
+# Filtros de modalidade da despesa (91 = aplicação direta intra-orçamentária)
+FILTROS_MODALIDADE = {
+    'exceto_intra': "fs.comodalidade != '91'",
+    'intra': "fs.comodalidade = '91'",
+    'todas': "1=1",
+}
+
+_MEDIDAS_RECEITA = """
+                SUM(CASE WHEN {inmes} BETWEEN :ate_ini AND :ate_fim AND {previsao_inicial} THEN fs.saldo_contabil ELSE 0 END) as previsao_inicial,
+                SUM(CASE WHEN {inmes} BETWEEN :ate_ini AND :ate_fim AND {previsao_atualizada} THEN fs.saldo_contabil ELSE 0 END) as previsao_atualizada,
+                SUM(CASE WHEN {inmes} BETWEEN :bim_ini AND :bim_fim AND {receita_realizada} THEN fs.saldo_contabil ELSE 0 END) as realizado_bimestre,
+                SUM(CASE WHEN {inmes} BETWEEN :ate_ini AND :ate_fim AND {receita_realizada} THEN fs.saldo_contabil ELSE 0 END) as realizado_ate_bimestre"""
+
+# Mesmas medidas restritas às contas correntes do RPPS, com prefixo rpps_
+_MEDIDAS_RECEITA_RPPS = """
+                SUM(CASE WHEN {rpps} AND {inmes} BETWEEN :ate_ini AND :ate_fim AND {previsao_inicial} THEN fs.saldo_contabil ELSE 0 END) as rpps_previsao_inicial,
+                SUM(CASE WHEN {rpps} AND {inmes} BETWEEN :ate_ini AND :ate_fim AND {previsao_atualizada} THEN fs.saldo_contabil ELSE 0 END) as rpps_previsao_atualizada,
+                SUM(CASE WHEN {rpps} AND {inmes} BETWEEN :bim_ini AND :bim_fim AND {receita_realizada} THEN fs.saldo_contabil ELSE 0 END) as rpps_realizado_bimestre,
+                SUM(CASE WHEN {rpps} AND {inmes} BETWEEN :ate_ini AND :ate_fim AND {receita_realizada} THEN fs.saldo_contabil ELSE 0 END) as rpps_realizado_ate_bimestre"""
+
+_MEDIDAS_DESPESA = """
+                SUM(CASE
+                    WHEN {inmes} BETWEEN :ate_ini AND :ate_fim
+                    AND {dotacao_inicial}
+                    THEN fs.saldo_contabil_despesa
+                    ELSE 0
+                END) as dotacao_inicial,
+
+                SUM(CASE
+                    WHEN {inmes} BETWEEN :ate_ini AND :ate_fim
+                    AND {dotacao_autorizada}
+                    THEN fs.saldo_contabil_despesa
+                    ELSE 0
+                END) as dotacao_autorizada,
+
+                SUM(CASE
+                    WHEN {inmes} BETWEEN :bim_ini AND :bim_fim
+                    AND {empenhado}
+                    THEN fs.saldo_contabil_despesa
+                    ELSE 0
+                END) as empenhado_bimestre,
+
+                SUM(CASE
+                    WHEN {inmes} BETWEEN :ate_ini AND :ate_fim
+                    AND {empenhado}
+                    THEN fs.saldo_contabil_despesa
+                    ELSE 0
+                END) as empenhado_ate_bimestre,
+
+                SUM(CASE
+                    WHEN {inmes} BETWEEN :bim_ini AND :bim_fim
+                    AND {liquidado}
+                    THEN fs.saldo_contabil_despesa
+                    ELSE 0
+                END) as liquidado_bimestre,
+
+                SUM(CASE
+                    WHEN {inmes} BETWEEN :ate_ini AND :ate_fim
+                    AND {liquidado}
+                    THEN fs.saldo_contabil_despesa
+                    ELSE 0
+                END) as liquidado_ate_bimestre,
+
+                SUM(CASE
+                    WHEN {inmes} BETWEEN :ate_ini AND :ate_fim
+                    AND {pago}
+                    THEN fs.saldo_contabil_despesa
+                    ELSE 0
+                END) as pago_ate_bimestre"""
+
+_FILTRO_DESPESA_NAO_NULA = """
+        WHERE (
+            ABS(dotacao_inicial) + ABS(dotacao_autorizada) +
+            ABS(empenhado_ate_bimestre) + ABS(liquidado_ate_bimestre) +
+            ABS(pago_ate_bimestre)
+        ) > 0.01"""
+
+
+# Placeholder das medidas -> regra do registro de regras_mask
+_CONTAS_RECEITA = {
+    'previsao_inicial': 'RREO_PREVISAO_INICIAL',
+    'previsao_atualizada': 'PREVISAO_ATUALIZADA',
+    'receita_realizada': 'RECEITA_LIQUIDA',
+}
+
+_CONTAS_DESPESA = {
+    'dotacao_inicial': 'DOTACAO_INICIAL',
+    'dotacao_autorizada': 'DOTACAO_AUTORIZADA',
+    'empenhado': 'EMPENHADO',
+    'liquidado': 'LIQUIDADO',
+    'pago': 'PAGO',
+}
+
+VARIANTES_MASCARA = [{'mascara': False}, {'mascara': True}]
+
+
+def _contas(tabela: str, contas: dict, mascara: bool) -> dict:
+    return {chave: condicao_regra(tabela, regra, mascara) for chave, regra in contas.items()}
+
+
+def _medidas_receita(d, mascara: bool) -> str:
+    return _MEDIDAS_RECEITA.format(inmes=d.int('fs.inmes'), **_contas('fato_saldos', _CONTAS_RECEITA, mascara))
+
+
+def _medidas_despesa(d, mascara: bool) -> str:
+    return _MEDIDAS_DESPESA.format(inmes=d.int('fs.inmes'), **_contas('fato_saldo_despesa', _CONTAS_DESPESA, mascara))
+
+
+def nomes_receita(df):
+    """Nomes de origem e espécie nas linhas da receita, pelo cache das dimensões (sem nome: None)."""
+    df['nofontereceita'] = dimensao('origens').nomear(df['cofontereceita'])
+    df['nosubfontereceita'] = dimensao('especies').nomear(df['cosubfontereceita'])
+    return df
+
+
+def parametros_bimestre(ano: int, meses_ate_bimestre: list, meses_apenas_no_bimestre: list) -> dict:
+    """Parâmetros comuns dos demonstrativos bimestrais (as listas de meses são contíguas)."""
+    ate_ini, ate_fim = faixa_meses(meses_ate_bimestre)
+    bim_ini, bim_fim = faixa_meses(meses_apenas_no_bimestre)
+    return {'ano': ano, 'ate_ini': ate_ini, 'ate_fim': ate_fim, 'bim_ini': bim_ini, 'bim_fim': bim_fim}
+
+
+@registrar_consulta('rreo_receita_base', variantes=VARIANTES_MASCARA)
+def _consulta_receita_base(d, mascara=False):
+    return f"""
+        WITH saldos_agregados AS (
+            SELECT
+                fs.cofontereceita,
+                fs.cosubfontereceita,{_medidas_receita(d, mascara)}
+            FROM fato_saldos fs
+            WHERE {d.int('fs.coexercicio')} = :ano AND (fs.cofontereceita BETWEEN :fonte_ini AND :fonte_fim)
+            GROUP BY fs.cofontereceita, fs.cosubfontereceita
+        )
+        SELECT sa.*
+        FROM saldos_agregados sa
+        WHERE sa.previsao_atualizada != 0 OR sa.realizado_ate_bimestre != 0
+        ORDER BY sa.cofontereceita, sa.cosubfontereceita
+        """
+
+
+@registrar_consulta('rreo_receita_consolidada', variantes=VARIANTES_MASCARA)
+def _consulta_receita_consolidada(d, mascara=False):
+    """
+    Uma única leitura do exercício para a receita do Anexo 2: medidas por origem/espécie
+    (todas as faixas de origem) e, na mesma passada, as parcelas de RPPS (conta corrente 99*)
+    e do superávit financeiro usadas nos Saldos de Exercícios Anteriores.
+    """
+    inmes = d.int('fs.inmes')
+    rpps = "fs.cocontacorrente LIKE '99%'"
+    contas = _contas('fato_saldos', _CONTAS_RECEITA, mascara)
+    superavit = condicao_regra('fato_saldos', 'RREO_SUPERAVIT_PREVISAO_ATUALIZADA', mascara)
+    return f"""
+        WITH saldos_agregados AS (
+            SELECT
+                fs.cofontereceita,
+                fs.cosubfontereceita,{_medidas_receita(d, mascara)},{_MEDIDAS_RECEITA_RPPS.format(inmes=inmes, rpps=rpps, **contas)},
+                SUM(CASE WHEN {inmes} BETWEEN :ate_ini AND :ate_fim AND {superavit} THEN fs.saldo_contabil ELSE 0 END) as superavit_previsao_atualizada
+            FROM fato_saldos fs
+            WHERE {d.int('fs.coexercicio')} = :ano
+            GROUP BY fs.cofontereceita, fs.cosubfontereceita
+        )
+        SELECT sa.*
+        FROM saldos_agregados sa
+        ORDER BY sa.cofontereceita, sa.cosubfontereceita
+        """
+
+
+@registrar_consulta('rreo_despesa_base', variantes=[
+    {'modalidade': modalidade, 'com_categoria': com_categoria, 'mascara': mascara}
+    for modalidade in FILTROS_MODALIDADE for com_categoria in (False, True) for mascara in (False, True)
+])
+def _consulta_despesa_base(d, modalidade='todas', com_categoria=False, mascara=False):
+    filtro_categoria_sql = " AND fs.incategoria = :categoria" if com_categoria else ""
+    return f"""
+        WITH saldos_agregados AS (
+            SELECT
+                fs.incategoria,{_medidas_despesa(d, mascara)}
+
+            FROM fato_saldo_despesa fs
+            WHERE {d.int('fs.coexercicio')} = :ano
+            AND {FILTROS_MODALIDADE[modalidade]}
+            {filtro_categoria_sql}
+            GROUP BY fs.incategoria
+        )
+        SELECT * FROM saldos_agregados{_FILTRO_DESPESA_NAO_NULA}
+        ORDER BY incategoria
+        """
+
+
+@registrar_consulta('rreo_despesa_consolidada', variantes=VARIANTES_MASCARA)
+def _consulta_despesa_consolidada(d, mascara=False):
+    """
+    Uma única leitura do exercício para a despesa do Anexo 2, por categoria e grupo de
+    modalidade; as linhas por categoria, a reserva e o total intra saem desse resultado.
+    """
+    return f"""
+        SELECT
+            fs.incategoria,
+            CASE
+                WHEN {FILTROS_MODALIDADE['intra']} THEN 'intra'
+                WHEN {FILTROS_MODALIDADE['exceto_intra']} THEN 'exceto_intra'
+                ELSE 'sem_modalidade'
+            END as grupo_modalidade,{_medidas_despesa(d, mascara)}
+
+        FROM fato_saldo_despesa fs
+        WHERE {d.int('fs.coexercicio')} = :ano
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """
+
+
+@registrar_consulta('rreo_despesa_funcional', variantes=[
+    {'modalidade': modalidade, 'mascara': mascara} for modalidade in FILTROS_MODALIDADE for mascara in (False, True)
+])
+def _consulta_despesa_funcional(d, modalidade='todas', com_funcao=False, com_subfuncao=False, mascara=False):
+    filtro_funcao_sql = " AND fs.cofuncao = :funcao" if com_funcao else ""
+    filtro_subfuncao_sql = " AND fs.cosubfuncao = :subfuncao" if com_subfuncao else ""
+    return f"""
+        WITH saldos_agregados AS (
+            SELECT
+                fs.cofuncao,
+                fs.cosubfuncao,{_medidas_despesa(d, mascara)}
+
+            FROM fato_saldo_despesa fs
+            WHERE {d.int('fs.coexercicio')} = :ano
+            AND {FILTROS_MODALIDADE[modalidade]}
+            {filtro_funcao_sql}
+            {filtro_subfuncao_sql}
+            GROUP BY fs.cofuncao, fs.cosubfuncao
+        )
+        SELECT * FROM saldos_agregados{_FILTRO_DESPESA_NAO_NULA}
+        ORDER BY cofuncao, cosubfuncao
+        """
+
+
+@registrar_consulta('superavit_receitas_realizadas', variantes=VARIANTES_MASCARA)
+def _consulta_receitas_realizadas(d, mascara=False):
+    return f"""
+        SELECT SUM(fs.saldo_contabil) as total_receitas_realizado
+        FROM fato_saldos fs
+        WHERE {d.int('fs.coexercicio')} = :ano
+          AND {d.int('fs.inmes')} BETWEEN :ate_ini AND :ate_fim
+          AND {condicao_regra('fato_saldos', 'RECEITA_LIQUIDA', mascara)}
+        """
+
+
+@registrar_consulta('superavit_despesas_liquidadas', variantes=VARIANTES_MASCARA)
+def _consulta_despesas_liquidadas(d, mascara=False):
+    return f"""
+        SELECT SUM(fs.saldo_contabil_despesa) as total_despesas_liquidado
+        FROM fato_saldo_despesa fs
+        WHERE {d.int('fs.coexercicio')} = :ano
+          AND {d.int('fs.inmes')} BETWEEN :ate_ini AND :ate_fim
+          AND {condicao_regra('fato_saldo_despesa', 'LIQUIDADO', mascara)}
+        """
@@ -0,0 +1,180 @@
+# app/relatorios/snapshots_rreo.py
+"""
+Retratos (snapshots) dos demonstrativos do RREO dos bimestres fechados.
+Depois da carga, gerar_snapshots_rreo() calcula todos os anexos de cada (ano, bimestre)
+fechado e grava um arquivo JSON compactado por bimestre. As rotas servem esses arquivos
+e só calculam ao vivo o bimestre em aberto (ou quando os retratos não batem com a versão
+atual dos dados), sem nenhuma consulta ao banco para a navegação histórica.
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+from ..modulos.conexao_hibrida import carimbo_versao_dados
+from ..modulos.catalogo_dados import exercicios_disponiveis, ultimo_bimestre, ultimo_periodo
+from ..modulos.cache_resultados import versao_dados_atual
+from .RREO_receita import BalancoOrcamentarioAnexo2
+from .RREO_balanco_intra import BalancoOrcamentarioIntraAnexo2
+from .RREO_despesa_funcional import BalancoOrcamentarioDespesaFuncionalAnexo2
+from .RREO_despesa_funcional_intra import BalancoOrcamentarioDespesaFuncionalIntraAnexo2
+from .calculo_superavit_deficit import CalculoSuperavitDeficit
+
+log = logging.getLogger(__name__)
+
+# Anexo -> (classe construída com (ano, bimestre), método que gera os dados)
+ANEXOS = {
+    'anexo2': (BalancoOrcamentarioAnexo2, 'gerar_relatorio'),
+    'superavit_deficit': (CalculoSuperavitDeficit, 'calcular'),
+    'intra': (BalancoOrcamentarioIntraAnexo2, 'gerar_relatorio'),
+    'despesa_funcional': (BalancoOrcamentarioDespesaFuncionalAnexo2, 'gerar_relatorio'),
+    'despesa_funcional_intra': (BalancoOrcamentarioDespesaFuncionalIntraAnexo2, 'gerar_relatorio'),
+}
+
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+_PASTA_PADRAO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'dados', 'snapshots_rreo'
+)
+
+
+def pasta_snapshots():
+    return os.environ.get('RREO_SNAPSHOTS_DIR', _PASTA_PADRAO)
+
+
+def _arquivo_bimestre(ano, bimestre):
+    return os.path.join(pasta_snapshots(), f'rreo_{int(ano)}_{int(bimestre)}.json.gz')
+
+
+def _para_json(valor):
+    """Valores numpy/pandas que o json não serializa sozinho."""
+    if hasattr(valor, 'item'):
+        return valor.item()
+    if isinstance(valor, pd.Series):
+        return valor.to_dict()
+    raise TypeError(f"Valor não serializável no retrato do RREO: {type(valor)}")
+
+
+def _gravar_json_gz(caminho, conteudo):
+    # Grava em arquivo temporário e substitui, para nunca deixar um retrato pela metade
+    temporario = caminho + '.tmp'
+    with gzip.open(temporario, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(conteudo, f, ensure_ascii=False, separators=(',', ':'), default=_para_json)
+    os.replace(temporario, caminho)
+
+
+# --- GERAÇÃO (rodada após a carga: scripts/06_gerar_snapshots_rreo.py) ---
+
+def bimestres_fechados(anos, ultimo_periodo):
+    """
+    Bimestres cujo último mês é anterior ao último mês carregado; o bimestre
+    do último mês ainda pode receber lançamentos e fica de fora.
+    """
+    if ultimo_periodo is None:
+        return []
+    ultimo = ultimo_periodo[0] * 100 + ultimo_periodo[1]
+    return [(ano, bimestre) for ano in sorted(anos) for bimestre in range(1, 7)
+            if ano * 100 + bimestre * 2 < ultimo]
+
+
+def gerar_snapshots_rreo(forcar=False):
+    """
+    Calcula e grava os retratos de todos os bimestres fechados. Sem `forcar`, os
+    bimestres já gravados para a versão atual dos dados não são recalculados.
+    """
+    pasta = pasta_snapshots()
+    os.makedirs(pasta, exist_ok=True)
+    versao = carimbo_versao_dados()
+    manifesto = carregar_manifesto() or {}
+    mesma_versao = manifesto.get('versao') == versao
+
+    # Anos com dados e o último (ano, mês) carregado, do catálogo dos períodos
+    anos, ultimo = exercicios_disponiveis(), ultimo_periodo()
+    fechados = bimestres_fechados(anos, ultimo)
+
+    gravados = []
+    for ano, bimestre in fechados:
+        chave = f'{ano}-{bimestre}'
+        if not forcar and mesma_versao and chave in manifesto.get('bimestres', []) \
+                and os.path.exists(_arquivo_bimestre(ano, bimestre)):
+            gravados.append(chave)
+            continue
+        print(f"📸 Gerando retrato do RREO {bimestre}º bimestre/{ano}...")
+        anexos = {nome: getattr(classe(ano, bimestre), metodo)() for nome, (classe, metodo) in ANEXOS.items()}
+        _gravar_json_gz(_arquivo_bimestre(ano, bimestre), {'versao': versao, 'ano': ano, 'bimestre': bimestre, 'anexos': anexos})
+        gravados.append(chave)
+
+    # Período padrão das rotas (último bimestre com dados) e anos do filtro
+    periodo_padrao = list(ultimo_bimestre()) if ultimo else None
+    manifesto = {
+        'versao': versao,
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'anos_disponiveis': anos,
+        'periodo_padrao': periodo_padrao,
+        'bimestres': gravados,
+    }
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=4, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+    print(f"✅ {len(gravados)} bimestres fechados com retrato (versão {versao})")
+    return manifesto
+
+
+# --- LEITURA (rotas) ---
+
+def carregar_manifesto():
+    caminho = os.path.join(pasta_snapshots(), ARQUIVO_MANIFESTO)
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return _ler_manifesto(caminho, st.st_mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _ler_manifesto(caminho, _mtime_ns):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("⚠️ Manifesto dos retratos do RREO inválido (%s): %s", caminho, e)
+        return None
+
+
+def manifesto_valido():
+    """Manifesto dos retratos, se ele foi gerado para a versão atual dos dados."""
+    manifesto = carregar_manifesto()
+    if manifesto and manifesto.get('versao') == versao_dados_atual():
+        return manifesto
+    return None
+
+
+@lru_cache(maxsize=32)
+def _ler_snapshot(caminho, _mtime_ns):
+    with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def obter_anexo(nome, ano, bimestre):
+    """
+    Dados de um anexo do RREO: do retrato, se o bimestre está fechado e o retrato
+    bate com a versão atual dos dados; senão, calculados ao vivo.
+    """
+    manifesto = manifesto_valido()
+    if manifesto and f'{ano}-{bimestre}' in manifesto.get('bimestres', []):
+        caminho = _arquivo_bimestre(ano, bimestre)
+        try:
+            snapshot = _ler_snapshot(caminho, os.stat(caminho).st_mtime_ns)
+            if snapshot.get('versao') == manifesto['versao'] and nome in snapshot['anexos']:
+                return snapshot['anexos'][nome]
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ Retrato do RREO %sº bimestre/%s ilegível; calculando ao vivo: %s", bimestre, ano, e)
+
+    classe, metodo = ANEXOS[nome]
+    return getattr(classe(ano, bimestre), metodo)()
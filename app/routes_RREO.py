@@ -1,43 +1,30 @@
-import math
+import logging
 from flask import render_template, request, Blueprint
-from app.relatorios.RREO_receita import BalancoOrcamentarioAnexo2
-from app.relatorios.RREO_balanco_intra import BalancoOrcamentarioIntraAnexo2
-from app.relatorios.RREO_despesa_funcional import BalancoOrcamentarioDespesaFuncionalAnexo2  # NOVO IMPORT
-from app.relatorios.RREO_despesa_funcional_intra import BalancoOrcamentarioDespesaFuncionalIntraAnexo2  # NOVO IMPORT
-from app.relatorios.calculo_superavit_deficit import CalculoSuperavitDeficit
-from app.modulos.conexao_hibrida import ConexaoBanco, adaptar_query
-import pandas as pd
+from app.relatorios.snapshots_rreo import obter_anexo
+from app.modulos.catalogo_dados import exercicios_disponiveis, ultimo_bimestre
+from app.modulos.cache_http import instalar_get_condicional
 from datetime import datetime
 
 # Se você já tem um blueprint definido, pode usar o mesmo
 # Se não, este é um exemplo de como criar um
 rreo_bp = Blueprint('rreo', __name__, url_prefix='/rreo')
+log = logging.getLogger(__name__)
+# ETag/Last-Modified: 304 sem consultar o banco quando o cliente já tem a versão atual
+instalar_get_condicional(rreo_bp)
 
 def _get_periodo_padrao():
-    """Busca no banco o último ano e bimestre com dados para usar como filtro padrão."""
+    """Último ano e bimestre com dados, do catálogo dos períodos, para usar como filtro padrão."""
     try:
-        with ConexaoBanco() as conn:
-            # Busca o último ano que tenha registros
-            query_ano = "SELECT MAX(CAST(coexercicio AS INTEGER)) as ano FROM fato_saldos"
-            df_ano = pd.read_sql_query(adaptar_query(query_ano), conn)
-            # Se não houver dados, usa o ano atual como padrão
-            ano_padrao = df_ano['ano'].iloc[0] if not df_ano.empty and not pd.isna(df_ano['ano'].iloc[0]) else datetime.now().year
-
-            # Com o último ano, busca o último mês de registro
-            query_mes = "SELECT MAX(CAST(inmes AS INTEGER)) as mes FROM fato_saldos WHERE CAST(coexercicio AS INTEGER) = ?"
-            params_mes = [int(ano_padrao)]
-            df_mes = pd.read_sql_query(adaptar_query(query_mes), conn, params=params_mes)
-            # Se não houver, usa o mês 1 como padrão
-            mes_padrao = df_mes['mes'].iloc[0] if not df_mes.empty and not pd.isna(df_mes['mes'].iloc[0]) else 1
-            
-            # Calcula o bimestre a partir do mês (Ex: Mês 6 / 2 = 3º Bi; Mês 7 / 2 = 3.5 -> 4º Bi)
-            bimestre_padrao = math.ceil(mes_padrao / 2)
-            
-            return int(ano_padrao), int(bimestre_padrao)
+        periodo = ultimo_bimestre()
     except Exception as e:
-        print(f"Erro ao buscar período padrão: {e}")
-        # Em caso de qualquer erro, retorna um valor padrão seguro
-        return datetime.now().year, 1
+        log.error("Erro ao buscar período padrão: %s", e)
+        periodo = None
+    # Sem dados (ou em caso de erro), um valor padrão seguro
+    return periodo or (datetime.now().year, 1)
+
+def _get_anos_disponiveis():
+    """Anos com dados para o filtro, do catálogo dos períodos."""
+    return exercicios_disponiveis() or [datetime.now().year]
 
 @rreo_bp.route('/anexo2')
 def balanco_orcamentario_anexo2():
@@ -51,17 +38,13 @@ def balanco_orcamentario_anexo2():
     bimestre_selecionado = request.args.get('bimestre', default=bimestre_padrao, type=int)
 
     # Busca os anos disponíveis para popular o dropdown do filtro
-    with ConexaoBanco() as conn:
-        df_anos = pd.read_sql_query(adaptar_query("SELECT DISTINCT CAST(coexercicio AS INTEGER) as ano FROM fato_saldos ORDER BY ano DESC"), conn)
-        anos_disponiveis = df_anos['ano'].tolist() if not df_anos.empty else [datetime.now().year]
+    anos_disponiveis = _get_anos_disponiveis()
 
     # Gera os dados do relatório
-    relatorio_builder = BalancoOrcamentarioAnexo2(ano=ano_selecionado, bimestre=bimestre_selecionado)
-    dados_relatorio = relatorio_builder.gerar_relatorio()
+    dados_relatorio = obter_anexo('anexo2', ano_selecionado, bimestre_selecionado)
 
     # Calcula superávit/déficit separadamente
-    calculo_superavit_deficit = CalculoSuperavitDeficit(ano=ano_selecionado, bimestre=bimestre_selecionado)
-    dados_superavit_deficit = calculo_superavit_deficit.calcular()
+    dados_superavit_deficit = obter_anexo('superavit_deficit', ano_selecionado, bimestre_selecionado)
 
     return render_template(
         'rreo/RREO_balanco_orcamentario.html',
@@ -84,13 +67,10 @@ def balanco_orcamentario_intra():
     bimestre_selecionado = request.args.get('bimestre', default=bimestre_padrao, type=int)
 
     # Busca os anos disponíveis para popular o dropdown do filtro
-    with ConexaoBanco() as conn:
-        df_anos = pd.read_sql_query(adaptar_query("SELECT DISTINCT CAST(coexercicio AS INTEGER) as ano FROM fato_saldos ORDER BY ano DESC"), conn)
-        anos_disponiveis = df_anos['ano'].tolist() if not df_anos.empty else [datetime.now().year]
+    anos_disponiveis = _get_anos_disponiveis()
 
     # Gera os dados do relatório intra-orçamentário
-    relatorio_builder = BalancoOrcamentarioIntraAnexo2(ano=ano_selecionado, bimestre=bimestre_selecionado)
-    dados_relatorio = relatorio_builder.gerar_relatorio()
+    dados_relatorio = obter_anexo('intra', ano_selecionado, bimestre_selecionado)
 
     return render_template(
         'rreo/RREO_balanco_intra.html',
@@ -114,13 +94,10 @@ def balanco_orcamentario_despesa_funcional():
     bimestre_selecionado = request.args.get('bimestre', default=bimestre_padrao, type=int)
 
     # Busca os anos disponíveis para popular o dropdown do filtro
-    with ConexaoBanco() as conn:
-        df_anos = pd.read_sql_query(adaptar_query("SELECT DISTINCT CAST(coexercicio AS INTEGER) as ano FROM fato_saldos ORDER BY ano DESC"), conn)
-        anos_disponiveis = df_anos['ano'].tolist() if not df_anos.empty else [datetime.now().year]
+    anos_disponiveis = _get_anos_disponiveis()
 
     # Gera os dados do relatório por função
-    relatorio_builder = BalancoOrcamentarioDespesaFuncionalAnexo2(ano=ano_selecionado, bimestre=bimestre_selecionado)
-    dados_relatorio = relatorio_builder.gerar_relatorio()
+    dados_relatorio = obter_anexo('despesa_funcional', ano_selecionado, bimestre_selecionado)
 
     return render_template(
         'rreo/RREO_balanco_despesa_funcional.html',
@@ -142,13 +119,10 @@ def balanco_orcamentario_despesa_funcional_intra():
     bimestre_selecionado = request.args.get('bimestre', default=bimestre_padrao, type=int)
 
     # Busca os anos disponíveis para popular o dropdown do filtro
-    with ConexaoBanco() as conn:
-        df_anos = pd.read_sql_query(adaptar_query("SELECT DISTINCT CAST(coexercicio AS INTEGER) as ano FROM fato_saldos ORDER BY ano DESC"), conn)
-        anos_disponiveis = df_anos['ano'].tolist() if not df_anos.empty else [datetime.now().year]
+    anos_disponiveis = _get_anos_disponiveis()
 
     # Gera os dados do relatório intra por função
-    relatorio_builder = BalancoOrcamentarioDespesaFuncionalIntraAnexo2(ano=ano_selecionado, bimestre=bimestre_selecionado)
-    dados_relatorio = relatorio_builder.gerar_relatorio()
+    dados_relatorio = obter_anexo('despesa_funcional_intra', ano_selecionado, bimestre_selecionado)
 
     return render_template(
         'rreo/RREO_balanco_despesa_funcional_intra.html',
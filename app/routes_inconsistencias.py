@@ -9,6 +9,7 @@ from .relatorios.analise_inconsistencias import (
     obter_exercicios_disponiveis
 )
 import datetime
+from .modulos.cache_http import instalar_get_condicional
 
 inconsistencias_bp = Blueprint(
     'inconsistencias',
@@ -16,6 +17,8 @@ inconsistencias_bp = Blueprint(
     # Aponta para a pasta correta onde o template está
     template_folder='templates/relatorios_inconsistencias'
 )
+# ETag/Last-Modified: 304 sem consultar o banco quando o cliente já tem a versão atual
+instalar_get_condicional(inconsistencias_bp)
 
 # Define a URL
 @inconsistencias_bp.route('/relatorio')
@@ -5,25 +5,35 @@ Versão refatorada para usar o módulo de conexão híbrida.
 """
 
 from flask import Blueprint, render_template, request, send_file, jsonify
-import pandas as pd
-from io import BytesIO
 from datetime import datetime
-import traceback
+import logging
 import psycopg2
 import psycopg2.extras
 import sqlite3
 
-from app.modulos.conexao_hibrida import ConexaoBanco, adaptar_query, get_db_environment
+from app.modulos.conexao_hibrida import ConexaoBanco, get_db_environment
 from app.modulos.periodo import obter_periodo_referencia
 from app.modulos.formatacao import formatar_moeda, formatar_percentual
-from app.modulos.regras_contabeis_receita import get_filtro_conta, FILTROS_RELATORIO_ESPECIAIS
+from app.modulos.regras_contabeis_receita import FILTROS_RELATORIO_ESPECIAIS
 from app.modulos.coug_manager import COUGManager
 from app.modulos.comparativo_mensal import gerar_comparativo_mensal
 from app.modulos.cards_unidades_gestoras import gerar_cards_unidades
+from app.modulos.motor_balanco_receita import MotorBalancoReceita, NOMES_BALANCO
 from app.modulos.relatorio_receita_fonte import gerar_relatorio_receita_fonte
-from app.modulos.modal_lancamentos import processar_requisicao_lancamentos, gerar_botao_lancamentos
+from app.modulos.modal_lancamentos import (
+    gerar_botao_lancamentos, buscar_resumo_lancamentos, resposta_pagina_lancamentos
+)
+from app.modulos.consultas import registrar_consulta, executar_consulta, variante_filtro, variantes_filtro, sql_filtro
+from app.modulos.cubo_receita import VARIANTES_ORIGEM_RECEITA, tabela_receita, medida, variante_origem_receita
+from app.modulos.cache_resultados import resultado_em_cache
+from app.modulos.cache_dimensoes import dimensao
+from app.modulos.cache_http import instalar_get_condicional
+from app.modulos.exportador_excel import PastaExcel, Coluna, MIMETYPE_XLSX
 
 relatorios_bp = Blueprint('relatorios', __name__, url_prefix='/relatorios')
+log = logging.getLogger(__name__)
+# ETag/Last-Modified: 304 sem consultar o banco quando o cliente já tem a versão atual
+instalar_get_condicional(relatorios_bp)
 
 
 def gerar_resumo_executivo(dados):
@@ -45,119 +55,154 @@ def gerar_resumo_executivo(dados):
             resumo['categoria_principal'] = {'descricao': cat_principal['descricao'], 'valor': cat_principal['receita_atual']}
         return resumo
     except Exception as e:
-        print(f"Erro ao gerar resumo executivo: {e}")
+        log.error("Erro ao gerar resumo executivo: %s", e)
         return None
 
-def exportar_excel_balanco(dados, periodo, coug_selecionada, coug_manager, filtro_relatorio_key=None):
-    rows = []
-    for item in dados:
-        if item.get('nivel', -2) >= -1:
-            indent = '    ' * max(0, item.get('nivel', 0))
-            row = {
-                'Código': item.get('codigo', ''), 'Descrição': indent + item.get('descricao', ''),
-                f'Previsão Inicial {periodo["ano"]}': item.get('previsao_inicial', 0),
-                f'Previsão Atualizada {periodo["ano"]}': item.get('previsao_atualizada', 0),
-                f'Receita Realizada {periodo["mes"]}/{periodo["ano"]}': item.get('receita_atual', 0),
-                f'Receita Realizada {periodo["mes"]}/{periodo["ano"]-1}': item.get('receita_anterior', 0),
-                'Variação Absoluta': item.get('variacao_absoluta', 0),
-                'Variação %': item.get('variacao_percentual', 0) / 100
-            }
-            rows.append(row)
-    df = pd.DataFrame(rows)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Balanço Orçamentário', index=False)
-        worksheet = writer.sheets['Balanço Orçamentário']
-        worksheet.column_dimensions['B'].width = 60
-        for col_letter in ['C', 'D', 'E', 'F', 'G']:
-            worksheet.column_dimensions[col_letter].width = 22
-            for cell in worksheet[col_letter][1:]: cell.number_format = 'R$ #,##0.00'
-        worksheet.column_dimensions['H'].width = 15
-        for cell in worksheet['H'][1:]: cell.number_format = '0.00%'
-    output.seek(0)
+def _colunas_valores(periodo):
+    """Colunas de valores do balanço e das visões receita x fonte."""
+    ano, mes = periodo['ano'], periodo['mes']
+    return [
+        Coluna(f'Previsão Inicial {ano}', 'previsao_inicial', 'moeda'),
+        Coluna(f'Previsão Atualizada {ano}', 'previsao_atualizada', 'moeda'),
+        Coluna(f'Receita Realizada {mes}/{ano}', 'receita_atual', 'moeda'),
+        Coluna(f'Receita Realizada {mes}/{ano - 1}', 'receita_anterior', 'moeda'),
+        Coluna('Variação Absoluta', 'variacao_absoluta', 'moeda'),
+        Coluna('Variação %', lambda item: (item.get('variacao_percentual') or 0) / 100, 'percentual'),
+    ]
+
+
+def _descricao_indentada(item):
+    return '    ' * max(0, item.get('nivel', 0)) + (item.get('descricao') or '')
+
+
+def exportar_excel_balanco(conn, motor, dados, periodo, coug_selecionada, coug_manager, filtro_relatorio_key=None):
+    """
+    Pasta Excel do balanço: balanço orçamentário, comparativo mensal, unidades gestoras e
+    as visões receita x fonte e fonte x receita, cada uma numa planilha. Todas saem da
+    leitura do motor (criado com com_fonte=True), sem uma consulta por planilha.
+    """
+    ano, mes = periodo['ano'], periodo['mes']
+    pasta = PastaExcel()
+
+    pasta.adicionar_planilha('Balanço Orçamentário', [
+        Coluna('Código', 'codigo', largura=15),
+        Coluna('Descrição', _descricao_indentada, largura=60),
+        *_colunas_valores(periodo),
+    ], (item for item in dados if item.get('nivel', -2) >= -1), destaque=lambda item: item.get('nivel', 0) <= 0)
+
+    comparativo = gerar_comparativo_mensal(conn, ano, coug_selecionada, filtro_relatorio_key,
+                                           resultados=motor.receitas_mensais(coug_selecionada, filtro_relatorio_key))
+    pasta.adicionar_planilha('Comparativo Mensal', [
+        Coluna('Mês', 'nome_mes'),
+        Coluna(f'Acumulado {ano}', 'receita_atual', 'moeda'),
+        Coluna(f'Acumulado {ano - 1}', 'receita_anterior', 'moeda'),
+        Coluna('Variação Absoluta', 'variacao_absoluta', 'moeda'),
+        Coluna('Variação %', lambda item: (item.get('variacao_percentual') or 0) / 100, 'percentual'),
+    ], comparativo['dados_brutos'])
+
+    cards = gerar_cards_unidades(conn, ano, mes, filtro_relatorio_key, receitas=motor.receitas_por_ug)
+    pasta.adicionar_planilha('Unidades Gestoras', [
+        Coluna('Código', 'codigo', largura=12),
+        Coluna('Unidade Gestora', 'nome', largura=60),
+        Coluna(f'Receita Realizada {mes}/{ano}', 'receita_realizada', 'moeda'),
+        Coluna(f'Receita Realizada {mes}/{ano - 1}', 'receita_anterior', 'moeda'),
+        Coluna('Variação Absoluta', 'variacao_absoluta', 'moeda'),
+        Coluna('Variação %', lambda item: (item.get('variacao_percentual') or 0) / 100, 'percentual'),
+    ], cards['unidades_raw'])
+
+    # Uma matriz alínea x fonte para as duas visões
+    matriz = motor.matriz_receita_fonte(coug_selecionada, filtro_relatorio_key)
+    for tipo, titulo in (('receita', 'Receita x Fonte'), ('fonte', 'Fonte x Receita')):
+        relatorio = gerar_relatorio_receita_fonte(conn, tipo, ano, mes, coug_selecionada, filtro_relatorio_key,
+                                                  matriz=matriz)
+        pasta.adicionar_planilha(titulo, [
+            Coluna('Código', 'codigo', largura=15),
+            Coluna('Descrição', _descricao_indentada, largura=60),
+            *_colunas_valores(periodo),
+        ], relatorio['dados'], destaque=lambda item: item.get('nivel') == 0)
+
     sufixo_coug = coug_manager.get_sufixo_arquivo(coug_selecionada)
     sufixo_filtro = f"_{filtro_relatorio_key}" if filtro_relatorio_key else ""
-    filename = f'balanco_orcamentario_receita{sufixo_coug}{sufixo_filtro}_{periodo["ano"]}_{periodo["mes"]:02d}.xlsx'
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=filename)
+    filename = f'balanco_orcamentario_receita{sufixo_coug}{sufixo_filtro}_{ano}_{mes:02d}.xlsx'
+    return send_file(pasta.salvar(), mimetype=MIMETYPE_XLSX, as_attachment=True, download_name=filename)
 
 
-class ProcessadorDadosReceita:
-    """Processa dados para o relatório de balanço orçamentário"""
-    def __init__(self, conn):
-        self.conn = conn
-        if get_db_environment() == 'postgres':
-            self.cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        else:
-            self.conn.row_factory = sqlite3.Row
-            self.cursor = conn.cursor()
-        self.coug_manager = COUGManager(self.conn)
-
-    def buscar_dados_balanco(self, mes, ano, coug=None, filtro_relatorio_key=None):
-        query_original = self._montar_query_agregada(mes, ano, coug, filtro_relatorio_key)
-        query_adaptada = adaptar_query(query_original)
-        try:
-            self.cursor.execute(query_adaptada)
-            resultados = self.cursor.fetchall()
-            return self._processar_resultados_agregados(resultados)
-        except Exception as e:
-            print(f"Erro ao buscar dados agregados: {e}")
-            traceback.print_exc()
-            return []
+@registrar_consulta('balanco_receita_agregado', variantes=[
+    {'com_coug': com_coug, **origem, **filtro}
+    for com_coug in (False, True) for origem in VARIANTES_ORIGEM_RECEITA for filtro in variantes_filtro()
+])
+def _consulta_balanco_receita(d, com_coug=False, cubo=False, mascara=False, campo_filtro=None, n_filtro=0):
+    filtro_coug = "AND fs.coug = :coug" if com_coug else ""
+    filtro_dinamico = sql_filtro(d, campo_filtro, n_filtro)
 
-    def _montar_query_agregada(self, mes, ano, coug=None, filtro_relatorio_key=None):
-        filtro_coug = self.coug_manager.aplicar_filtro_query("fs", coug)
-        filtro_dinamico = ""
-        if filtro_relatorio_key and filtro_relatorio_key in FILTROS_RELATORIO_ESPECIAIS:
-            regra = FILTROS_RELATORIO_ESPECIAIS[filtro_relatorio_key]
-            campo = regra['campo_filtro']
-            valores_str = ", ".join([f"'{v}'" for v in regra['valores']])
-            filtro_dinamico = f"AND fs.{campo} IN ({valores_str})"
-        
-        # --- CORREÇÃO APLICADA AQUI ---
-        type_cast_text = "::text" if get_db_environment() == 'postgres' else ""
-        type_cast_numeric = "::integer" if get_db_environment() == 'postgres' else ""
-
-        return f"""
+    return f"""
         WITH dados_agregados AS (
             SELECT
                 fs.categoriareceita,
-                COALESCE(cat.nocategoriareceita, 'Categoria ' || fs.categoriareceita) as nome_categoria,
                 fs.cofontereceita,
-                COALESCE(ori.nofontereceita, 'Fonte ' || fs.cofontereceita) as nome_fonte,
                 fs.cosubfontereceita,
-                COALESCE(esp.nosubfontereceita, 'Subfonte ' || fs.cosubfontereceita) as nome_subfonte,
                 fs.coalinea,
-                COALESCE(ali.noalinea, 'Alínea ' || fs.coalinea) as nome_alinea,
                 fs.coexercicio,
                 fs.inmes,
-                SUM(CASE WHEN {get_filtro_conta('PREVISAO_INICIAL_LIQUIDA')} THEN COALESCE(fs.saldo_contabil, 0) ELSE 0 END) as previsao_inicial,
-                SUM(CASE WHEN {get_filtro_conta('PREVISAO_ATUALIZADA_LIQUIDA')} THEN COALESCE(fs.saldo_contabil, 0) ELSE 0 END) as previsao_atualizada,
-                SUM(CASE WHEN {get_filtro_conta('RECEITA_LIQUIDA')} THEN COALESCE(fs.saldo_contabil, 0) ELSE 0 END) as receita_liquida
-            FROM fato_saldos fs
-            LEFT JOIN dimensoes.categorias cat ON fs.categoriareceita{type_cast_text} = cat.cocategoriareceita
-            LEFT JOIN dimensoes.origens ori ON fs.cofontereceita{type_cast_text} = ori.cofontereceita
-            LEFT JOIN dimensoes.especies esp ON fs.cosubfontereceita{type_cast_text} = esp.cosubfontereceita
-            LEFT JOIN dimensoes.alineas ali ON fs.coalinea{type_cast_text} = ali.coalinea
-            WHERE 1=1 {filtro_coug} {filtro_dinamico}
-            GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9, 10
+                SUM({medida('PREVISAO_INICIAL_LIQUIDA', cubo, mascara=mascara)}) as previsao_inicial,
+                SUM({medida('PREVISAO_ATUALIZADA_LIQUIDA', cubo, mascara=mascara)}) as previsao_atualizada,
+                SUM({medida('RECEITA_LIQUIDA', cubo, mascara=mascara)}) as receita_liquida
+            FROM {tabela_receita(cubo)} fs
+            WHERE {d.int('fs.coexercicio')} IN (:ano, :ano_anterior) {filtro_coug} {filtro_dinamico}
+            GROUP BY 1, 2, 3, 4, 5, 6
         ),
         dados_calculados AS (
             SELECT
-                categoriareceita, nome_categoria, cofontereceita, nome_fonte,
-                cosubfontereceita, nome_subfonte, coalinea, nome_alinea,
-                SUM(CASE WHEN coexercicio{type_cast_numeric} = {ano} THEN previsao_inicial ELSE 0 END) as previsao_inicial,
-                SUM(CASE WHEN coexercicio{type_cast_numeric} = {ano} THEN previsao_atualizada ELSE 0 END) as previsao_atualizada,
-                SUM(CASE WHEN coexercicio{type_cast_numeric} = {ano} AND inmes{type_cast_numeric} <= {mes} THEN receita_liquida ELSE 0 END) as receita_atual,
-                SUM(CASE WHEN coexercicio{type_cast_numeric} = {ano-1} AND inmes{type_cast_numeric} <= {mes} THEN receita_liquida ELSE 0 END) as receita_anterior
+                categoriareceita, cofontereceita, cosubfontereceita, coalinea,
+                SUM(CASE WHEN {d.int('coexercicio')} = :ano THEN previsao_inicial ELSE 0 END) as previsao_inicial,
+                SUM(CASE WHEN {d.int('coexercicio')} = :ano THEN previsao_atualizada ELSE 0 END) as previsao_atualizada,
+                SUM(CASE WHEN {d.int('coexercicio')} = :ano AND {d.int('inmes')} <= :mes THEN receita_liquida ELSE 0 END) as receita_atual,
+                SUM(CASE WHEN {d.int('coexercicio')} = :ano_anterior AND {d.int('inmes')} <= :mes THEN receita_liquida ELSE 0 END) as receita_anterior
             FROM dados_agregados
-            WHERE coexercicio{type_cast_numeric} IN ({ano}, {ano-1})
-            GROUP BY 1, 2, 3, 4, 5, 6, 7, 8
+            GROUP BY 1, 2, 3, 4
         )
         SELECT * FROM dados_calculados
         WHERE (ABS(previsao_inicial) + ABS(previsao_atualizada) + ABS(receita_atual) + ABS(receita_anterior)) > 0.01
         ORDER BY categoriareceita, cofontereceita, cosubfontereceita, coalinea
         """
 
+
+class ProcessadorDadosReceita:
+    """Processa dados para o relatório de balanço orçamentário"""
+    def __init__(self, conn):
+        self.conn = conn
+        if get_db_environment() == 'postgres':
+            self.cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        else:
+            self.conn.row_factory = sqlite3.Row
+            self.cursor = conn.cursor()
+        self.coug_manager = COUGManager(self.conn)
+
+    def buscar_dados_balanco(self, mes, ano, coug=None, filtro_relatorio_key=None, motor=None):
+        try:
+            return self._dados_balanco(mes, ano, coug, filtro_relatorio_key, motor)
+        except Exception as e:
+            log.exception("Erro ao buscar dados agregados: %s", e)
+            return []
+
+    @resultado_em_cache('balanco_receita', chave=lambda self, mes, ano, coug=None, filtro_relatorio_key=None, motor=None:
+                        (int(mes), int(ano), str(coug) if coug else None, filtro_relatorio_key))
+    def _dados_balanco(self, mes, ano, coug=None, filtro_relatorio_key=None, motor=None):
+        if motor is not None:
+            return self._processar_resultados_agregados(motor.linhas_balanco(coug, filtro_relatorio_key))
+        variante, params = variante_filtro(filtro_relatorio_key)
+        params.update({'ano': ano, 'ano_anterior': ano - 1, 'mes': mes})
+        if coug:
+            params['coug'] = str(coug)
+        executar_consulta(self.cursor, 'balanco_receita_agregado', params, com_coug=bool(coug),
+                          **variante_origem_receita(), **variante)
+        # Nomes das dimensões postos em memória, depois da agregação
+        linhas = [dict(row) for row in self.cursor.fetchall()]
+        for row in linhas:
+            for coluna_codigo, (coluna_nome, tabela, prefixo) in NOMES_BALANCO.items():
+                row[coluna_nome] = dimensao(tabela).nome(row.get(coluna_codigo), prefixo)
+        return self._processar_resultados_agregados(linhas)
+
     def _processar_resultados_agregados(self, resultados):
         if not resultados:
             return []
@@ -244,18 +289,28 @@ def balanco_orcamentario_receita():
             filtro_relatorio_key = request.args.get('filtro')
             processador = ProcessadorDadosReceita(conn)
             coug_selecionada = processador.coug_manager.get_coug_da_url()
-            dados = processador.buscar_dados_balanco(periodo['mes'], periodo['ano'], coug_selecionada, filtro_relatorio_key)
+            # Uma única leitura agrupada alimenta todas as seções da página
+            # (na exportação, com a fonte de recursos no grão, para as visões receita x fonte)
+            motor = MotorBalancoReceita(conn, periodo['ano'], periodo['mes'], com_fonte=(formato == 'excel'))
+            dados = processador.buscar_dados_balanco(periodo['mes'], periodo['ano'], coug_selecionada, filtro_relatorio_key, motor=motor)
             if formato == 'excel':
-                return exportar_excel_balanco(dados, periodo, coug_selecionada, processador.coug_manager, filtro_relatorio_key)
-            
-            # As chamadas a seguir precisam de uma conexão ativa
-            conn_para_modulos = conn
+                return exportar_excel_balanco(conn, motor, dados, periodo, coug_selecionada,
+                                              processador.coug_manager, filtro_relatorio_key)
             
-            comparativo_mensal = gerar_comparativo_mensal(conn_para_modulos, periodo['ano'], coug_selecionada, filtro_relatorio_key)
-            dados_cards = gerar_cards_unidades(conn_para_modulos, periodo['ano'], periodo['mes'], filtro_relatorio_key)
+            # O motor lê o exercício e o anterior; mais exercícios no gráfico vão ao banco numa só consulta
+            anos_comparativo = request.args.get('anos_comparativo', default=2, type=int)
+            mensais = motor.receitas_mensais(coug_selecionada, filtro_relatorio_key) if anos_comparativo <= 2 else None
+            comparativo_mensal = gerar_comparativo_mensal(conn, periodo['ano'], coug_selecionada, filtro_relatorio_key,
+                                                          resultados=mensais, anos=anos_comparativo)
+            # Cards de todos os filtros numa leitura só, em cache: trocar de aba não recalcula
+            dados_cards = gerar_cards_unidades(conn, periodo['ano'], periodo['mes'], filtro_relatorio_key,
+                                               receitas=motor.receitas_por_ug)
             resumo = gerar_resumo_executivo(dados)
-            cougs = processador.coug_manager.listar_cougs_com_movimento([get_filtro_conta('RECEITA_LIQUIDA')])
-            nome_coug = processador.coug_manager.get_nome_coug(coug_selecionada) if coug_selecionada else "Consolidado"
+            cougs = processador.coug_manager.listar_cougs_com_movimento(regras=['RECEITA_LIQUIDA'])
+            if coug_selecionada:
+                nome_coug = motor.nome_coug(coug_selecionada) or processador.coug_manager.get_nome_coug(coug_selecionada)
+            else:
+                nome_coug = "Consolidado"
 
             chart_data_categorias = [{"label": item['descricao'], "value": item['receita_atual']} for item in dados if item.get('nivel') == 0 and item.get('receita_atual', 0) > 0]
             chart_data_origens = [{"label": item['descricao'], "value": item['receita_atual']} for item in dados if item.get('nivel') == 1 and item.get('receita_atual', 0) > 0]
@@ -274,21 +329,29 @@ def balanco_orcamentario_receita():
                 dados_cards=dados_cards, gerar_botao_lancamentos=gerar_botao_lancamentos
             )
     except Exception as e:
-        traceback.print_exc()
+        log.exception("Erro inesperado ao gerar o balanço orçamentário")
         return render_template('erro.html', mensagem=f"Erro inesperado ao gerar relatório: {e}")
 
-@relatorios_bp.route('/api/lancamentos', methods=['GET'])
-def api_lancamentos():
+@relatorios_bp.route('/api/lancamentos/resumo', methods=['GET'])
+def api_lancamentos_resumo():
+    """Totais e quebras do drill-down agregados no banco; as linhas ficam para /api/lancamentos/pagina."""
     try:
         with ConexaoBanco() as conn:
-            resultado = processar_requisicao_lancamentos(conn, request.args)
-            if 'erro' in resultado:
-                return jsonify(resultado), 400
-            return jsonify(resultado)
+            return jsonify(buscar_resumo_lancamentos(conn, request.args))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
     except Exception as e:
-        traceback.print_exc()
+        log.exception("Erro ao resumir lançamentos")
         return jsonify({"erro": str(e)}), 500
 
+@relatorios_bp.route('/api/lancamentos/pagina', methods=['GET'])
+def api_lancamentos_pagina():
+    """Drill-down paginado por keyset, em streaming; ?formato=json ou ndjson (padrão), ?limite=N e ?apos=<cursor>."""
+    try:
+        return resposta_pagina_lancamentos(request.args, request.args.get('formato', 'ndjson'))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
 @relatorios_bp.route('/api/relatorio-receita-fonte')
 def api_relatorio_receita_fonte():
     try:
@@ -303,115 +366,7 @@ def api_relatorio_receita_fonte():
             )
             return jsonify(resultado)
     except Exception as e:
-        traceback.print_exc()
-        return jsonify({"erro": str(e)}), 500
-
-@relatorios_bp.route('/api/lancamentos-receita-fonte')
-def api_lancamentos_receita_fonte():
-    try:
-        with ConexaoBanco() as conn:
-            ano = int(request.args.get('ano'))
-            mes = int(request.args.get('mes'))
-            coug = request.args.get('coug')
-            coalinea = request.args.get('coalinea')
-            cofonte = request.args.get('cofonte')
-            valor_relatorio = float(request.args.get('valor_relatorio', 0.0))
-
-            if not all([ano, mes, coug, coalinea]):
-                return jsonify({"erro": "Parâmetros obrigatórios faltando (ano, mes, coug, coalinea)"}), 400
-            
-            # CORREÇÃO: Adiciona type casts para PostgreSQL
-            if get_db_environment() == 'postgres':
-                query_sql = f"""
-                    SELECT 
-                        cocontacontabil, coug, nudocumento, coevento, indebitocredito, valancamento
-                    FROM lancamentos
-                    WHERE coexercicio::integer = %s
-                      AND inmes::integer <= %s
-                      AND cougcontab = %s
-                      AND coalinea = %s
-                      AND ({get_filtro_conta('RECEITA_LIQUIDA')})
-                """
-            else:
-                query_sql = f"""
-                    SELECT 
-                        cocontacontabil, coug, nudocumento, coevento, indebitocredito, valancamento
-                    FROM lancamentos
-                    WHERE coexercicio = ?
-                      AND inmes <= ?
-                      AND cougcontab = ?
-                      AND coalinea = ?
-                      AND ({get_filtro_conta('RECEITA_LIQUIDA')})
-                """
-            
-            query_params = [ano, mes, coug, coalinea]
-            if cofonte:
-                if get_db_environment() == 'postgres':
-                    query_sql += " AND cofonte = %s"
-                else:
-                    query_sql += " AND cofonte = ?"
-                query_params.append(cofonte)
-            
-            query_sql += " ORDER BY nudocumento, coevento"
-            
-            query_adaptada = adaptar_query(query_sql)
-            
-            if get_db_environment() == 'postgres':
-                cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-            else:
-                cursor = conn.cursor()
-            
-            cursor.execute(query_adaptada, query_params)
-            
-            lancamentos = [dict(row) for row in cursor.fetchall()]
-
-            total_liquido = sum(l['valancamento'] if l['indebitocredito'] == 'C' else -l['valancamento'] for l in lancamentos)
-
-            html = ""
-            if lancamentos:
-                html += f"""
-                <div class="modal-info-container">
-                    <div class="valor-apurado-info">
-                        <strong>Valor Apurado no Relatório:</strong> {formatar_moeda(valor_relatorio)}
-                    </div>
-                </div>
-                <div class="table-container">
-                    <table class="lancamentos-table">
-                        <thead>
-                            <tr><th>Conta Contábil</th><th>UG Emitente</th><th>Documento</th><th>Evento</th><th>D/C</th><th>Valor</th></tr>
-                        </thead>
-                        <tbody>
-                """
-                for lanc in lancamentos:
-                    html += f"""
-                        <tr>
-                            <td>{lanc['cocontacontabil']}</td>
-                            <td>{lanc['coug']}</td>
-                            <td>{lanc['nudocumento']}</td>
-                            <td>{lanc['coevento']}</td>
-                            <td>{lanc['indebitocredito']}</td>
-                            <td>{formatar_moeda(lanc['valancamento'])}</td>
-                        </tr>
-                    """
-                html += f"""
-                        </tbody>
-                        <tfoot>
-                            <tr>
-                                <td colspan="5">Total Líquido dos Lançamentos:</td>
-                                <td>{formatar_moeda(total_liquido)}</td>
-                            </tr>
-                        </tfoot>
-                    </table>
-                </div>
-                """
-                resultado = {'tem_dados': True, 'html_tabela': html}
-            else:
-                resultado = {'tem_dados': False, 'html_tabela': '<div class="modal-info-container"><p>Nenhum lançamento encontrado para este item.</p></div>'}
-
-            return jsonify(resultado)
-
-    except Exception as e:
-        traceback.print_exc()
+        log.exception("Erro ao gerar relatório receita/fonte")
         return jsonify({"erro": str(e)}), 500
 
 @relatorios_bp.app_template_filter('formatar_moeda')
@@ -1,15 +1,18 @@
 # app/routes_visualizador.py (v5.1 - Completo e Sincronizado com JSON)
-import pandas as pd
 import sqlite3
+import logging
 import os
-import traceback
 import json # Importa a biblioteca JSON
-from flask import Blueprint, render_template, request, send_file
-from io import BytesIO
-from app.modulos.conexao_hibrida import ConexaoBanco, get_db_environment, adaptar_query
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for
+from app.modulos.conexao_hibrida import ConexaoBanco, get_db_environment, adaptar_query, obter_estatisticas_pool
+from app.modulos.perfil_consultas import obter_perfil, limpar_perfil
+from app.modulos.cache_resultados import estatisticas_cache, limpar_cache
+from app.modulos.log_aplicacao import estatisticas_log, definir_nivel
+from app.modulos.exportacao_tabelas import resposta_exportacao, formatos_disponiveis
 import psycopg2.extras
 
 visualizador_bp = Blueprint('visualizador', __name__, url_prefix='/visualizador')
+log = logging.getLogger(__name__)
 
 # --- FUNÇÕES AUXILIARES ---
 
@@ -73,12 +76,11 @@ def estrutura_banco(db_name):
                 try:
                     with open(arquivo_chaves, 'r', encoding='utf-8') as f:
                         chaves_primarias_salvas = json.load(f)
-                    # Imprime no console do Flask para depuração
-                    print(f"DEBUG: Carregado {len(chaves_primarias_salvas)} chaves do arquivo JSON.")
+                    log.debug("Carregado %d chaves do arquivo JSON.", len(chaves_primarias_salvas))
                 except Exception as e:
-                    print(f"DEBUG: Erro ao ler o arquivo chaves_primarias.json: {e}")
+                    log.warning("Erro ao ler o arquivo chaves_primarias.json: %s", e)
             else:
-                print("DEBUG: Arquivo chaves_primarias.json não encontrado.")
+                log.debug("Arquivo chaves_primarias.json não encontrado.")
 
         # --- LÓGICA DE LEITURA DO BANCO (sem alteração) ---
         with ConexaoBanco(db_name) as conn:
@@ -101,10 +103,10 @@ def estrutura_banco(db_name):
                 estrutura[t['name']] = info
 
     except Exception as e:
-        traceback.print_exc()
+        log.exception("Erro ao buscar estrutura do banco")
         return render_template('erro.html', mensagem=f"Erro ao buscar estrutura do banco: {e}")
     
-    return render_template('visualizador/estrutura.html', db_name=db_name, estrutura=estrutura)
+    return render_template('visualizador/estrutura.html', db_name=db_name, estrutura=estrutura, formatos=formatos_disponiveis())
 
 @visualizador_bp.route('/dados/<db_name>/<table_name>')
 def visualizar_dados(db_name, table_name):
@@ -125,9 +127,9 @@ def visualizar_dados(db_name, table_name):
             cursor.execute(f"SELECT * FROM {table_name} LIMIT {per_page} OFFSET {offset}")
             dados = cursor.fetchall()
             total_pages = (total_registros + per_page - 1) // per_page if total_registros > 0 else 1
-            return render_template('visualizador/dados.html', db_name=db_name, table_name=table_name, colunas=colunas, dados=dados, page=page, total_pages=total_pages, total_registros=total_registros, per_page=per_page, valores_unicos={}, campos_filtro=[])
+            return render_template('visualizador/dados.html', db_name=db_name, table_name=table_name, colunas=colunas, dados=dados, page=page, total_pages=total_pages, total_registros=total_registros, per_page=per_page, valores_unicos={}, campos_filtro=[], formatos=formatos_disponiveis())
     except Exception as e:
-        traceback.print_exc()
+        log.exception("Erro ao visualizar dados")
         return render_template('erro.html', mensagem=f"Erro ao visualizar dados: {e}")
 
 # --- INÍCIO DO CÓDIGO RESTAURADO ---
@@ -146,7 +148,7 @@ def executar_query(db_name):
                 tabelas_raw = get_table_list(cursor, db_name)
                 tabelas_disponiveis = [t[0] for t in tabelas_raw]
     except Exception as e:
-        print(f"Erro ao listar tabelas para query: {e}")
+        log.error("Erro ao listar tabelas para query: %s", e)
     
     if request.method == 'POST':
         query = request.form.get('query', '').strip()
@@ -175,23 +177,54 @@ def executar_query(db_name):
 
 @visualizador_bp.route('/exportar/<db_name>/<table_name>')
 def exportar_dados(db_name, table_name):
+    """Tabela inteira em XLSX, CSV ou Parquet (?formato=), lida e enviada em blocos."""
     try:
-        with ConexaoBanco(db_name) as conn:
-            schema = 'dimensoes' if db_name == 'dimensoes' else 'public'
-            full_table_name = f'"{schema}"."{table_name}"' if get_db_environment() == 'postgres' else table_name
-            df = pd.read_sql_query(f"SELECT * FROM {full_table_name}", conn)
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name=table_name[:31], index=False)
-            output.seek(0)
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f"{db_name}_{table_name}.xlsx"
-            )
+        return resposta_exportacao(db_name, table_name, request.args.get('formato', 'xlsx'))
+    except ValueError as e:
+        return render_template('erro.html', mensagem=str(e)), 400
     except Exception as e:
-        traceback.print_exc()
+        log.exception("Erro ao exportar dados")
         return render_template('erro.html', mensagem=f"Erro ao exportar dados: {e}")
 
-# --- FIM DO CÓDIGO RESTAURADO ---
\ No newline at end of file
+# --- FIM DO CÓDIGO RESTAURADO ---
+
+@visualizador_bp.route('/api/pool')
+def estatisticas_pool():
+    """Estatísticas dos pools de conexão deste processo (worker)."""
+    return jsonify({'pid': os.getpid(), 'pools': obter_estatisticas_pool()})
+
+@visualizador_bp.route('/perfil')
+def perfil_consultas():
+    """Consultas mais custosas por rota e log de consultas lentas deste processo (worker)."""
+    top = request.args.get('top', 10, type=int)
+    return render_template('visualizador/perfil.html', perfil=obter_perfil(top=top),
+                           pools=obter_estatisticas_pool(), cache=estatisticas_cache(),
+                           pid=os.getpid(), top=top)
+
+@visualizador_bp.route('/perfil/limpar', methods=['POST'])
+def limpar_perfil_consultas():
+    limpar_perfil()
+    return redirect(url_for('visualizador.perfil_consultas'))
+
+@visualizador_bp.route('/cache')
+def estatisticas_cache_relatorios():
+    """Acertos, faltas e ocupação do cache de resultados deste processo (worker)."""
+    return jsonify({'pid': os.getpid(), 'cache': estatisticas_cache()})
+
+@visualizador_bp.route('/cache/limpar', methods=['POST'])
+def limpar_cache_relatorios():
+    limpar_cache()
+    return redirect(url_for('visualizador.perfil_consultas'))
+
+@visualizador_bp.route('/logs', methods=['GET', 'POST'])
+def estatisticas_logs():
+    """
+    Níveis dos logs e mensagens emitidas por nível deste processo (worker).
+    POST com modulo e nivel troca o nível de um módulo sem reiniciar (ex.: modulo=relatorio_receita_fonte&nivel=DEBUG).
+    """
+    if request.method == 'POST':
+        modulo, nivel = request.values.get('modulo'), request.values.get('nivel')
+        if not modulo or not nivel:
+            return jsonify({'erro': "Informe 'modulo' e 'nivel'."}), 400
+        log.warning("Nível do log de %s alterado para %s", definir_nivel(modulo, nivel), nivel.upper())
+    return jsonify({'pid': os.getpid(), 'logs': estatisticas_log()})
@@ -7,7 +7,6 @@ class Config:
         # Produção - PostgreSQL na sua VPS
         DATABASE_URL = os.environ.get('DATABASE_URL')
         DATABASE_TYPE = 'postgresql'
-        print("🚀 Usando PostgreSQL (Servidor)")
     else:
         # Local - SQLite (3 bancos separados)
         DATABASE_TYPE = 'sqlite'
@@ -17,7 +16,6 @@ class Config:
             'lancamentos': os.path.join(BASE_PATH, 'banco_lancamento_receita.db'),
             'dimensoes': os.path.join(BASE_PATH, 'banco_dimensoes.db')
         }
-        print("💻 Usando SQLite (Local - 3 bancos)")
 
 # Para debug
 def get_config_info():
@@ -1,8 +1,11 @@
 # database.py - Conexão universal para SQLite e PostgreSQL
+import logging
 import sqlite3
 import os
 from config import Config
 
+log = logging.getLogger(__name__)
+
 def get_connection(banco_tipo='saldos'):
     """
     Retorna conexão apropriada
@@ -13,12 +16,12 @@ def get_connection(banco_tipo='saldos'):
     if config.DATABASE_TYPE == 'postgresql':
         try:
             import psycopg2
-            print(f"🔗 Conectando ao PostgreSQL...")
+            log.debug("🔗 Conectando ao PostgreSQL...")
             conn = psycopg2.connect(config.DATABASE_URL)
-            print("✅ Conexão PostgreSQL estabelecida!")
+            log.debug("✅ Conexão PostgreSQL estabelecida!")
             return conn
         except Exception as e:
-            print(f"❌ Erro ao conectar PostgreSQL: {e}")
+            log.error("❌ Erro ao conectar PostgreSQL: %s", e)
             raise
     else:
         try:
@@ -26,16 +29,16 @@ def get_connection(banco_tipo='saldos'):
             if not caminho_banco:
                 raise ValueError(f"Tipo de banco '{banco_tipo}' não encontrado")
             
-            print(f"🔗 Conectando ao SQLite ({banco_tipo}): {caminho_banco}")
+            log.debug("🔗 Conectando ao SQLite (%s): %s", banco_tipo, caminho_banco)
             if not os.path.exists(caminho_banco):
-                print(f"⚠️  Banco {banco_tipo} não encontrado: {caminho_banco}")
+                log.warning("⚠️  Banco %s não encontrado: %s", banco_tipo, caminho_banco)
                 return None
             
             conn = sqlite3.connect(caminho_banco)
-            print(f"✅ Conexão SQLite ({banco_tipo}) estabelecida!")
+            log.debug("✅ Conexão SQLite (%s) estabelecida!", banco_tipo)
             return conn
         except Exception as e:
-            print(f"❌ Erro ao conectar SQLite ({banco_tipo}): {e}")
+            log.error("❌ Erro ao conectar SQLite (%s): %s", banco_tipo, e)
             raise
 
 def execute_query(query, params=None):
@@ -57,7 +60,7 @@ def execute_query(query, params=None):
             return cursor.rowcount
             
     except Exception as e:
-        print(f"❌ Erro na query: {e}")
+        log.error("❌ Erro na query: %s", e)
         conn.rollback()
         raise
     finally:
@@ -73,14 +76,14 @@ def test_connection():
         if config.DATABASE_TYPE == 'postgresql':
             cursor.execute("SELECT version();")
             version = cursor.fetchone()[0]
-            print(f"✅ PostgreSQL conectado: {version}")
+            log.info("✅ PostgreSQL conectado: %s", version)
         else:
             cursor.execute("SELECT sqlite_version();")
             version = cursor.fetchone()[0]
-            print(f"✅ SQLite conectado: versão {version}")
+            log.info("✅ SQLite conectado: versão %s", version)
         
         conn.close()
         return True
     except Exception as e:
-        print(f"❌ Teste de conexão falhou: {e}")
+        log.error("❌ Teste de conexão falhou: %s", e)
         return False
\ No newline at end of file
@@ -3,6 +3,10 @@ import sqlite3
 import psycopg2
 import os
 from config import Config
+from app.modulos.cubo_receita import construir_cubo_receita
+from app.modulos.catalogo_dados import construir_catalogo
+from app.modulos.regras_mascara import adicionar_mascara_regras, garantir_coluna_mascara
+from app.modulos.versao_dados import nova_versao, registrar_versao_postgres
 
 # URL do PostgreSQL (pública do Railway)
 POSTGRES_URL = "url"
@@ -185,8 +189,33 @@ def migrar_tudo():
     
     # 2. Migrar dados prioritários (banco saldos)
     print("\n📦 MIGRANDO BANCO SALDOS (prioritário)")
+    # O SQLite já traz regras_mask; a coluna precisa existir antes do INSERT
+    pg_conn = conectar_postgres()
+    if pg_conn:
+        try:
+            garantir_coluna_mascara(pg_conn, 'fato_saldos', postgres=True)
+        except Exception as e:
+            print(f"❌ Erro ao criar a coluna regras_mask: {e}")
+            pg_conn.rollback()
+        finally:
+            pg_conn.close()
     migrar_tabela('saldos', 'fato_saldos')
     migrar_tabela('saldos', 'dim_tempo')
+
+    # Máscara das regras contábeis, cubo pré-agregado da receita e catálogo dos períodos, recalculados no PostgreSQL
+    # O catálogo grava a mesma versão registrada ao final da migração
+    versao = nova_versao()
+    pg_conn = conectar_postgres()
+    if pg_conn:
+        try:
+            print(f"✅ regras_mask calculada: {adicionar_mascara_regras(pg_conn, 'fato_saldos', postgres=True)} linhas com regra")
+            print(f"✅ cubo_receita criado com {construir_cubo_receita(pg_conn, mascara=True)} linhas")
+            print(f"✅ catalogo_periodos com {construir_catalogo(pg_conn, postgres=True, versao_carga=versao[0])} exercícios")
+        except Exception as e:
+            print(f"❌ Erro ao criar regras_mask/cubo_receita/catalogo_periodos: {e}")
+            pg_conn.rollback()
+        finally:
+            pg_conn.close()
     
     # 3. Migrar lançamentos
     print("\n📦 MIGRANDO BANCO LANÇAMENTOS")
@@ -197,6 +226,17 @@ def migrar_tudo():
     migrar_tabela('dimensoes', 'categorias')
     migrar_tabela('dimensoes', 'origens') 
     migrar_tabela('dimensoes', 'unidades_gestoras')
+
+    # Nova versão dos dados: invalida o cache de relatórios da aplicação
+    pg_conn = conectar_postgres()
+    if pg_conn:
+        try:
+            registrar_versao_postgres(pg_conn, versao=versao)
+        except Exception as e:
+            print(f"❌ Erro ao registrar a versão dos dados: {e}")
+            pg_conn.rollback()
+        finally:
+            pg_conn.close()
     
     print("\n🎉 MIGRAÇÃO CONCLUÍDA!")
     print("=" * 50)
@@ -0,0 +1,89 @@
+# migrar_tipos_postgres.py - Converte as colunas do PostgreSQL para o esquema tipado
+"""
+Converte exercício/mês para integer e os códigos para varchar (ver
+app/modulos/esquema_postgres.py), cria os índices simples usados pelos predicados
+sem cast e atualiza as estatísticas. Pode ser rodado de novo: só converte o que falta.
+Depois da conversão, a aplicação detecta o esquema tipado e deixa de emitir os casts.
+"""
+from migrar_dados import conectar_postgres
+from app.modulos.esquema_postgres import INDICES_TIPADOS, TIPOS_ESQUEMA, colunas_pendentes, sql_converter_coluna
+from app.modulos.versao_dados import registrar_versao_postgres
+
+
+def converter_colunas(pg_conn):
+    """Converte as colunas pendentes, uma transação por coluna. Retorna quantas falharam."""
+    cursor = pg_conn.cursor()
+    pendentes = colunas_pendentes(cursor)
+    if not pendentes:
+        print("✅ Todas as colunas já estão no tipo do esquema")
+        return 0
+
+    falhas = 0
+    for esquema, tabela, coluna, tipo_atual, alvo in pendentes:
+        try:
+            cursor.execute(sql_converter_coluna(esquema, tabela, coluna, tipo_atual, alvo))
+            pg_conn.commit()
+            print(f"✅ {esquema}.{tabela}.{coluna}: {tipo_atual} → {alvo}")
+        except Exception as e:
+            # Ex.: uma view dependente da coluna impede o ALTER; a coluna fica como está
+            pg_conn.rollback()
+            falhas += 1
+            print(f"❌ {esquema}.{tabela}.{coluna}: {e}")
+    return falhas
+
+
+def criar_indices(pg_conn):
+    cursor = pg_conn.cursor()
+    for (esquema, tabela), indices in INDICES_TIPADOS.items():
+        cursor.execute("SELECT to_regclass(%s)", (f"{esquema}.{tabela}",))
+        if cursor.fetchone()[0] is None:
+            continue
+        for nome, colunas in indices:
+            try:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {esquema}.{tabela} ({colunas})")
+                pg_conn.commit()
+                print(f"✅ Índice {nome}")
+            except Exception as e:
+                pg_conn.rollback()
+                print(f"❌ Índice {nome}: {e}")
+
+
+def atualizar_estatisticas(pg_conn):
+    cursor = pg_conn.cursor()
+    for esquema, tabela in TIPOS_ESQUEMA:
+        cursor.execute("SELECT to_regclass(%s)", (f"{esquema}.{tabela}",))
+        if cursor.fetchone()[0] is not None:
+            cursor.execute(f"ANALYZE {esquema}.{tabela}")
+    pg_conn.commit()
+    print("✅ Estatísticas atualizadas")
+
+
+def migrar_tipos():
+    print("🔧 MIGRAÇÃO DO ESQUEMA TIPADO")
+    print("=" * 50)
+    pg_conn = conectar_postgres()
+    if not pg_conn:
+        return
+
+    try:
+        falhas = converter_colunas(pg_conn)
+        criar_indices(pg_conn)
+        atualizar_estatisticas(pg_conn)
+        # Nova versão: a aplicação refaz a detecção do esquema e invalida caches e ETags
+        registrar_versao_postgres(pg_conn, banco='esquema_tipado')
+    except Exception as e:
+        print(f"❌ Erro na migração dos tipos: {e}")
+        pg_conn.rollback()
+        return
+    finally:
+        pg_conn.close()
+
+    if falhas:
+        print(f"\n⚠️ {falhas} colunas não convertidas; as consultas continuam com os casts")
+    else:
+        print("\n🎉 ESQUEMA TIPADO! As consultas passam a dispensar os casts.")
+
+
+if __name__ == "__main__":
+    migrar_tipos()
+    input("Pressione Enter para fechar...")
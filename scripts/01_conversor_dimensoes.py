@@ -2,6 +2,7 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
 import time
 import chardet
 import glob
@@ -13,6 +14,9 @@ if os.path.basename(os.getcwd()) == 'scripts':
 else:
     BASE_DIR = os.getcwd()
 
+sys.path.insert(0, BASE_DIR)
+from app.modulos.versao_dados import registrar_versao_banco
+
 CAMINHO_DADOS_BRUTOS = os.path.join(BASE_DIR, 'dados', 'dados_brutos', 'dimensao')
 CAMINHO_DB = os.path.join(BASE_DIR, 'dados', 'db')
 NOME_BANCO_DADOS = 'banco_dimensoes.db'
@@ -176,8 +180,11 @@ def criar_banco_dimensoes_automatico():
     
     print("\n🔧 Otimizando banco de dados...")
     cursor.executescript("ANALYZE; VACUUM;")
+    # Sem WAL no arquivo final: a aplicação abre os bancos como somente leitura/imutáveis
+    cursor.execute("PRAGMA journal_mode=DELETE")
     conn.commit()
     conn.close()
+    registrar_versao_banco(caminho_db)
     
     print("\n" + "=" * 60)
     print(f"🎉 Processamento Concluído em {time.time() - start_time:.2f}s!")
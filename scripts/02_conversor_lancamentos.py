@@ -1,6 +1,7 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
 import time
 import numpy as np
 
@@ -10,6 +11,10 @@ if os.path.basename(os.getcwd()) == 'scripts':
 else:
     BASE_DIR = os.getcwd()
 
+sys.path.insert(0, BASE_DIR)
+from app.modulos.versao_dados import registrar_versao_banco
+from app.modulos.indices_recomendados import indices_recomendados
+
 # Caminhos
 CAMINHO_DADOS_BRUTOS = os.path.join(BASE_DIR, 'dados', 'dados_brutos')
 CAMINHO_DB = os.path.join(BASE_DIR, 'dados', 'db')
@@ -282,16 +287,8 @@ def processar_lancamentos():
         # Desabilita temporariamente algumas verificações
         cursor.execute("PRAGMA foreign_keys=OFF")
         
-        indices = [
-            ("idx_lancamento_periodo", "coexercicio, inmes"),
-            ("idx_lancamento_alinea", "coalinea"),
-            ("idx_lancamento_fonte", "cofonte"),
-            ("idx_lancamento_conta", "cocontacontabil"),
-            ("idx_lancamento_ug", "coug"),
-            ("idx_lancamento_valor", "valancamento")
-        ]
-        
-        for idx_name, idx_cols in indices:
+        # Conjunto levantado pelo assessor de índices (scripts/assessor_indices.py)
+        for idx_name, idx_cols in indices_recomendados("lancamentos"):
             print(f"    - Criando {idx_name}...")
             cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON lancamentos ({idx_cols})")
         
@@ -299,9 +296,12 @@ def processar_lancamentos():
         print("\n  - Otimizando banco de dados...")
         cursor.execute("ANALYZE")
         cursor.execute("VACUUM")
+        # Sem WAL no arquivo final: a aplicação abre os bancos como somente leitura/imutáveis
+        cursor.execute("PRAGMA journal_mode=DELETE")
         
         conn.commit()
         conn.close()
+        registrar_versao_banco(caminho_db)
         
         end_time = time.time()
         tempo_total = end_time - start_time
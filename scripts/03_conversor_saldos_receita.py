@@ -1,6 +1,7 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
 import time
 import numpy as np
 
@@ -10,6 +11,14 @@ if os.path.basename(os.getcwd()) == 'scripts':
 else:
     BASE_DIR = os.getcwd()
 
+sys.path.insert(0, BASE_DIR)
+from app.modulos.versao_dados import nova_versao, registrar_versao_banco
+from app.modulos.indices_recomendados import indices_recomendados
+from app.modulos.cubo_receita import construir_cubo_receita, MEDIDAS_CUBO
+from app.modulos.catalogo_dados import construir_catalogo
+from app.modulos.regras_mascara import adicionar_mascara_regras, REGRAS_MASCARA
+from app.modulos.motor_colunar import exportar_fato_saldos, pasta_colunar
+
 # Caminhos
 CAMINHO_DADOS_BRUTOS = os.path.join(BASE_DIR, 'dados', 'dados_brutos')
 CAMINHO_DB = os.path.join(BASE_DIR, 'dados', 'db')
@@ -297,32 +306,43 @@ def processar_saldos():
         ORDER BY coexercicio, inmes
         """)
         
-        print("\n  - Criando índices otimizados...")
+        print("\n  - Classificando as contas nas regras contábeis (regras_mask)...")
+        linhas_com_regra = adicionar_mascara_regras(conn, 'fato_saldos')
+        print(f"    ✓ {linhas_com_regra:,} registros em alguma das {len(REGRAS_MASCARA['fato_saldos'])} regras")
+        
+        print("\n  - Criando cubo pré-agregado da receita (cubo_receita)...")
+        linhas_cubo = construir_cubo_receita(conn, mascara=True)
+        print(f"    ✓ {linhas_cubo:,} linhas no cubo ({len(MEDIDAS_CUBO)} medidas, "
+              f"{total_processed / max(linhas_cubo, 1):.1f} registros do fato por linha)")
         
-        indices = [
-            ("idx_saldo_periodo", "coexercicio, inmes"),
-            ("idx_saldo_alinea", "coalinea"),
-            ("idx_saldo_fonte", "cofonte"),
-            ("idx_saldo_conta", "cocontacontabil"),
-            ("idx_saldo_ug", "coug"),
-            ("idx_saldo_valor", "saldo_contabil"),
-            ("idx_tempo_periodo", "coexercicio, inmes", "dim_tempo")
-        ]
+        print("\n  - Gravando o catálogo dos períodos (catalogo_periodos)...")
+        # Mesma versão no catálogo e no registro de versao_dados
+        versao = nova_versao()
+        exercicios_catalogo = construir_catalogo(conn, versao_carga=versao[0])
+        print(f"    ✓ {exercicios_catalogo} exercícios catalogados")
         
-        for idx_info in indices:
-            idx_name = idx_info[0]
-            idx_cols = idx_info[1]
-            table_name = idx_info[2] if len(idx_info) > 2 else "fato_saldos"
-            print(f"    - Criando {idx_name}...")
-            cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table_name} ({idx_cols})")
+        print("\n  - Criando índices otimizados...")
+        
+        # Conjunto levantado pelo assessor de índices (scripts/assessor_indices.py)
+        for table_name in ("fato_saldos", "dim_tempo"):
+            for idx_name, idx_cols in indices_recomendados(table_name):
+                print(f"    - Criando {idx_name}...")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table_name} ({idx_cols})")
         
         # Otimização final
         print("\n  - Otimizando banco de dados...")
         cursor.execute("ANALYZE")
         cursor.execute("VACUUM")
+        # Sem WAL no arquivo final: a aplicação abre os bancos como somente leitura/imutáveis
+        cursor.execute("PRAGMA journal_mode=DELETE")
         
         conn.commit()
         conn.close()
+        registrar_versao_banco(caminho_db, versao)
+        
+        print("\n  - Exportando fato_saldos para o motor colunar...")
+        linhas_colunar = exportar_fato_saldos(caminho_db)
+        print(f"    ✓ {linhas_colunar:,} linhas em {pasta_colunar()} (ativar com MOTOR_COLUNAR=1)")
         
         end_time = time.time()
         tempo_total = end_time - start_time
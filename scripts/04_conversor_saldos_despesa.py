@@ -2,6 +2,7 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
 import time
 import numpy as np
 
@@ -11,6 +12,11 @@ if os.path.basename(os.getcwd()) == 'scripts':
 else:
     BASE_DIR = os.getcwd()
 
+sys.path.insert(0, BASE_DIR)
+from app.modulos.versao_dados import registrar_versao_banco
+from app.modulos.indices_recomendados import indices_recomendados
+from app.modulos.regras_mascara import adicionar_mascara_regras, REGRAS_MASCARA
+
 CAMINHO_DADOS_BRUTOS = os.path.join(BASE_DIR, 'dados', 'dados_brutos')
 CAMINHO_DB = os.path.join(BASE_DIR, 'dados', 'db')
 os.makedirs(CAMINHO_DB, exist_ok=True)
@@ -219,18 +225,14 @@ def processar_saldos_despesa():
         print(f"     Total débito: R$ {stats['debito_total']:,.2f}")
         print(f"     Total crédito: R$ {stats['credito_total']:,.2f}")
         
-        print("\n  - Criando índices otimizados...")
+        print("\n  - Classificando as contas nas regras contábeis (regras_mask)...")
+        linhas_com_regra = adicionar_mascara_regras(conn, 'fato_saldo_despesa')
+        print(f"    ✓ {linhas_com_regra:,} registros em alguma das {len(REGRAS_MASCARA['fato_saldo_despesa'])} regras")
         
-        indices = [
-            ("idx_saldo_desp_periodo", "coexercicio, inmes"),
-            ("idx_saldo_desp_ug", "coug"),
-            ("idx_saldo_desp_conta", "cocontacontabil"),
-            ("idx_saldo_desp_fonte", "cofonte"),
-            ("idx_saldo_desp_natureza", "conatureza"),
-            ("idx_saldo_desp_classe", "coclasseorc")
-        ]
+        print("\n  - Criando índices otimizados...")
         
-        for idx_name, idx_cols in indices:
+        # Conjunto levantado pelo assessor de índices (scripts/assessor_indices.py)
+        for idx_name, idx_cols in indices_recomendados("fato_saldo_despesa"):
             print(f"    - Criando {idx_name}...")
             cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON fato_saldo_despesa ({idx_cols})")
         
@@ -238,9 +240,12 @@ def processar_saldos_despesa():
         print("\n  - Otimizando banco de dados...")
         cursor.execute("ANALYZE")
         cursor.execute("VACUUM")
+        # Sem WAL no arquivo final: a aplicação abre os bancos como somente leitura/imutáveis
+        cursor.execute("PRAGMA journal_mode=DELETE")
         
         conn.commit()
         conn.close()
+        registrar_versao_banco(caminho_db)
         
         end_time = time.time()
         tempo_total = end_time - start_time
@@ -2,6 +2,7 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
 import time
 import numpy as np
 
@@ -11,6 +12,10 @@ if os.path.basename(os.getcwd()) == 'scripts':
 else:
     BASE_DIR = os.getcwd()
 
+sys.path.insert(0, BASE_DIR)
+from app.modulos.versao_dados import registrar_versao_banco
+from app.modulos.indices_recomendados import indices_recomendados
+
 CAMINHO_DADOS_BRUTOS = os.path.join(BASE_DIR, 'dados', 'dados_brutos')
 CAMINHO_DB = os.path.join(BASE_DIR, 'dados', 'db')
 os.makedirs(CAMINHO_DB, exist_ok=True)
@@ -268,18 +273,8 @@ def processar_lancamentos_despesa():
         
         print("\n  - Criando índices otimizados...")
         
-        indices = [
-            ("idx_lanc_desp_periodo", "coexercicio, inmes"),
-            ("idx_lanc_desp_ug", "coug"),
-            ("idx_lanc_desp_conta", "cocontacontabil"),
-            ("idx_lanc_desp_fonte", "cofonte"),
-            ("idx_lanc_desp_natureza", "conatureza"),
-            ("idx_lanc_desp_evento", "coevento"),
-            ("idx_lanc_desp_valor", "valancamento"),
-            ("idx_lanc_desp_dc", "indebitocredito")
-        ]
-        
-        for idx_name, idx_cols in indices:
+        # Conjunto levantado pelo assessor de índices (scripts/assessor_indices.py)
+        for idx_name, idx_cols in indices_recomendados("fato_lancamento_despesa"):
             print(f"    - Criando {idx_name}...")
             cursor.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON fato_lancamento_despesa ({idx_cols})")
         
@@ -287,9 +282,12 @@ def processar_lancamentos_despesa():
         print("\n  - Otimizando banco de dados...")
         cursor.execute("ANALYZE")
         cursor.execute("VACUUM")
+        # Sem WAL no arquivo final: a aplicação abre os bancos como somente leitura/imutáveis
+        cursor.execute("PRAGMA journal_mode=DELETE")
         
         conn.commit()
         conn.close()
+        registrar_versao_banco(caminho_db)
         
         end_time = time.time()
         tempo_total = end_time - start_time
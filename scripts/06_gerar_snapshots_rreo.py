@@ -0,0 +1,37 @@
+# scripts/06_gerar_snapshots_rreo.py
+# Gera os retratos do RREO dos bimestres fechados. Rodar depois dos conversores (01 a 05)
+# ou do migrar_dados.py; use --forcar para recalcular todos os bimestres.
+import os
+import sys
+import time
+
+# --- CONFIGURAÇÃO ---
+if os.path.basename(os.getcwd()) == 'scripts':
+    BASE_DIR = os.path.dirname(os.getcwd())
+else:
+    BASE_DIR = os.getcwd()
+
+sys.path.insert(0, BASE_DIR)
+from app.relatorios.snapshots_rreo import gerar_snapshots_rreo, pasta_snapshots
+
+
+def main():
+    forcar = '--forcar' in sys.argv
+    print("=" * 60)
+    print("📸 RETRATOS DO RREO (BIMESTRES FECHADOS)")
+    print(f"   Pasta: {pasta_snapshots()}")
+    print("=" * 60)
+    inicio = time.time()
+    try:
+        manifesto = gerar_snapshots_rreo(forcar=forcar)
+        print(f"   Período padrão: {manifesto['periodo_padrao']}")
+        print(f"   Tempo total: {time.time() - inicio:.2f} segundos")
+    except Exception as e:
+        print(f"\n❌ ERRO ao gerar os retratos: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
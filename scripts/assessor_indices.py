@@ -0,0 +1,127 @@
+# scripts/assessor_indices.py
+# Assessor de índices: reproduz as consultas dos relatórios e dos detalhamentos sobre os
+# dados atuais, mostra os planos e propõe índices compostos/de cobertura (parciais no
+# PostgreSQL). Opções:
+#   --aplicar   cria os índices propostos e compara os tempos antes e depois
+#   --gravar    grava o conjunto recomendado em dados/db/indices_recomendados.json,
+#               que os conversores passam a criar no lugar do conjunto padrão
+import os
+import sys
+import tempfile
+import time
+
+# --- CONFIGURAÇÃO ---
+if os.path.basename(os.getcwd()) == 'scripts':
+    BASE_DIR = os.path.dirname(os.getcwd())
+else:
+    BASE_DIR = os.getcwd()
+
+# Sem cache de resultados, sem retratos do RREO e sem motor colunar: toda consulta vai ao banco.
+# Sem prepared statements, para o SQL gravado poder passar pelo EXPLAIN.
+os.environ['CACHE_RELATORIOS_MB'] = '0'
+os.environ['RREO_SNAPSHOTS_DIR'] = tempfile.mkdtemp(prefix='assessor_rreo_')
+os.environ['MOTOR_COLUNAR'] = '0'
+os.environ['PG_PREPARED_STATEMENTS'] = '0'
+os.environ['PERFIL_CONSULTAS'] = '1'
+
+sys.path.insert(0, BASE_DIR)
+from main import app  # a aplicação completa, com a rota inicial usada pelos templates
+from app.modulos.assessor_indices import (
+    aplicar_propostas, conjunto_recomendado, medir, plano, propor_indices, reproduzir_carga, sql_indice
+)
+from app.modulos.indices_recomendados import ARQUIVO_RECOMENDADOS, gravar_recomendados
+from app.modulos.conexao_hibrida import ConexaoBanco, fechar_pools, get_db_environment
+
+
+def medir_carga(consultas, chave):
+    for consulta in consultas:
+        with ConexaoBanco(consulta['banco'] or 'saldos') as conn:
+            try:
+                consulta[chave] = medir(conn, consulta['sql'], consulta['parametros'])
+            except Exception as e:
+                print(f"   ⚠️ {consulta['rotulo']}: {e}")
+                consulta[chave] = None
+
+
+def imprimir_analise(analises):
+    for tabela, analise in analises.items():
+        print(f"\n📋 {tabela}")
+        sem_uso = sorted(set(analise['existentes']) - analise['usados'])
+        print(f"   Índices usados nos planos: {', '.join(sorted(analise['usados'])) or '(nenhum)'}")
+        if sem_uso:
+            print(f"   ⚠️ Sem uso na carga (candidatos a remoção): {', '.join(sem_uso)}")
+        if not analise['propostas']:
+            print("   ✅ Nenhum índice novo proposto")
+        for proposta in analise['propostas']:
+            print(f"   💡 {sql_indice(tabela, proposta)}")
+            print(f"      usado por: {', '.join(sorted(set(proposta['consultas'])))[:200]}")
+
+
+def imprimir_tempos(consultas):
+    print("\n⏱️ TEMPOS (ms, melhor de 3)")
+    total_antes = total_depois = 0.0
+    for consulta in sorted(consultas, key=lambda c: -(c.get('antes_ms') or 0)):
+        antes, depois = consulta.get('antes_ms'), consulta.get('depois_ms')
+        if antes is None or depois is None:
+            continue
+        total_antes += antes
+        total_depois += depois
+        print(f"   {antes:9.2f} → {depois:9.2f}  {consulta['rotulo'][:70]}")
+    if total_antes:
+        print(f"   Total: {total_antes:.2f} → {total_depois:.2f} ms ({total_depois / total_antes:.0%} do tempo anterior)")
+
+
+def main():
+    aplicar = '--aplicar' in sys.argv
+    gravar = '--gravar' in sys.argv
+    print("=" * 60)
+    print("🔎 ASSESSOR DE ÍNDICES")
+    print(f"   Banco: {get_db_environment()}")
+    print("=" * 60)
+    inicio = time.time()
+    try:
+        print("\n▶️ Reproduzindo a carga de trabalho...")
+        consultas = reproduzir_carga(app)
+        print(f"   {len(consultas)} consultas distintas")
+
+        analises = propor_indices(consultas)
+        imprimir_analise(analises)
+
+        if aplicar:
+            print("\n▶️ Medindo antes...")
+            medir_carga(consultas, 'antes_ms')
+            print("\n▶️ Aplicando as propostas...")
+            alterados = aplicar_propostas(analises)
+            if alterados:
+                from app.modulos.versao_dados import registrar_versao_banco
+                fechar_pools()
+                for arquivo in sorted(set(alterados)):
+                    registrar_versao_banco(arquivo)
+                if any(os.path.basename(arquivo) == 'banco_saldo_receita.db' for arquivo in alterados):
+                    # O motor colunar confere a versão do banco de saldos
+                    from app.modulos.motor_colunar import exportar_fato_saldos
+                    exportar_fato_saldos(next(a for a in alterados if os.path.basename(a) == 'banco_saldo_receita.db'))
+            print("\n▶️ Medindo depois...")
+            medir_carga(consultas, 'depois_ms')
+            imprimir_tempos(consultas)
+            for consulta in consultas:
+                with ConexaoBanco(consulta['banco'] or 'saldos') as conn:
+                    depois = plano(conn, consulta['sql'], consulta['parametros'])
+                if depois != consulta['plano_antes']:
+                    print(f"\n   🔁 {consulta['rotulo'][:70]}\n      antes: {consulta['plano_antes'].replace(chr(10), ' | ')}"
+                          f"\n      depois: {depois.replace(chr(10), ' | ')}")
+
+        if gravar:
+            gravar_recomendados(conjunto_recomendado(analises))
+            print(f"\n💾 Conjunto recomendado gravado em {ARQUIVO_RECOMENDADOS}")
+
+        print(f"\n✅ Concluído em {time.time() - inicio:.2f} segundos")
+    except Exception as e:
+        print(f"\n❌ ERRO no assessor de índices: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
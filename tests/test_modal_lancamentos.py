@@ -0,0 +1,114 @@
+# tests/test_modal_lancamentos.py
+"""Drill-down de lançamentos no PostgreSQL: prepared statements ligadas e valores NUMERIC."""
+
+import json
+import os
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from app.modulos import consultas, modal_lancamentos
+
+
+class _CursorFalso:
+    def __init__(self, conexao, nome=None, linhas=()):
+        self.connection = conexao
+        self.nome = nome
+        self.executados = []
+        self.linhas = list(linhas)
+
+    def execute(self, sql, valores=None):
+        self.executados.append(sql)
+
+    def fetchmany(self, quantidade):
+        bloco, self.linhas = self.linhas[:quantidade], self.linhas[quantidade:]
+        return bloco
+
+    def fetchone(self):
+        return self.linhas.pop(0) if self.linhas else None
+
+    def fetchall(self):
+        linhas, self.linhas = self.linhas, []
+        return linhas
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _ConexaoFalsa:
+    def __init__(self, linhas=()):
+        self.preparadas = set()
+        self.cursores = []
+        self.linhas = linhas
+
+    def cursor(self, name=None):
+        cursor = _CursorFalso(self, name, self.linhas)
+        self.cursores.append(cursor)
+        return cursor
+
+
+class _Argumentos(dict):
+    """Imita request.args (get com type)."""
+
+    def get(self, chave, default=None, type=None):
+        valor = super().get(chave, default)
+        return type(valor) if type is not None and valor is not None else valor
+
+
+_VARIANTE = {'origem': 'receita_fonte', 'filtros': ('coalinea', 'coug'), 'com_cursor': False}
+_PARAMS = {'ano': 2024, 'mes': 12, 'prefixo_documento': '2024%', 'coalinea': '1', 'coug': '1', 'limite': 11}
+
+
+class TestPaginaPostgres(unittest.TestCase):
+
+    def setUp(self):
+        for alvo in (modal_lancamentos, consultas):
+            patcher = mock.patch.object(alvo, 'get_db_environment', return_value='postgres')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(consultas, 'esquema_tipado', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(os.environ, {'PG_PREPARED_STATEMENTS': '1'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cursor_nomeado_nao_recebe_execute(self):
+        conexao = _ConexaoFalsa()
+        info = {}
+
+        self.assertEqual(list(modal_lancamentos._ler_pagina(conexao, _VARIANTE, dict(_PARAMS), 10, info)), [])
+
+        nomeados = [cursor for cursor in conexao.cursores if cursor.nome]
+        self.assertEqual(len(nomeados), 1)
+        self.assertEqual(len(nomeados[0].executados), 1)
+        sql = nomeados[0].executados[0].lstrip()
+        self.assertFalse(sql.upper().startswith(('EXECUTE', 'PREPARE')), sql)
+        self.assertTrue(sql.upper().startswith('SELECT'), sql)
+        self.assertEqual(conexao.preparadas, set())
+        self.assertEqual(info, {'proximo': None, 'quantidade': 0})
+
+    def test_valores_decimal_viram_float(self):
+        resumo = [('521', '6212', 1, Decimal('10.50'), None), ('521', '6213', 1, Decimal('2.25'), Decimal('1'))]
+        pagina = [('6212', '1', '2024NE1', '521', 'C', Decimal('10.50'), 1)]
+        info = {}
+
+        lancamentos = list(modal_lancamentos._ler_pagina(_ConexaoFalsa(pagina), _VARIANTE, dict(_PARAMS), 10, info))
+        self.assertEqual(lancamentos[0]['valor'], 10.5)
+        json.dumps(lancamentos)
+
+        resumo = modal_lancamentos.buscar_resumo_lancamentos(
+            _ConexaoFalsa(resumo),
+            _Argumentos(ano='2024', mes='12', origem='receita_fonte', coalinea='1', coug='1'))
+        self.assertEqual(resumo['total_liquido'], 11.75)
+        json.dumps(resumo)
+
+
+if __name__ == '__main__':
+    unittest.main()